@@ -0,0 +1,155 @@
+# language: ru
+Функционал: Инструменты для документов Codev
+  Как AI-агент использующий Codev
+  Я хочу быстро находить прошлые уроки и состояние документов
+  Чтобы не сканировать все файлы проекта вручную
+
+  Предыстория:
+    Дано создан тестовый проект с Codev
+
+  Сценарий: Поиск уроков в обзорах
+    Дано обзор "0001-auth.md" содержит урок "Кэшируйте токены доступа"
+    И обзор "0002-billing.md" содержит урок "Проверяйте лимиты платежей"
+    Когда я обновляю поисковый индекс
+    И я ищу "токенов" в секции "Уроки на будущее"
+    Тогда первым найден документ "codev/reviews/0001-auth.md"
+
+  Сценарий: Инкрементальное обновление поискового индекса
+    Дано обзор "0001-auth.md" содержит урок "Кэшируйте токены доступа"
+    И обзор "0002-billing.md" содержит урок "Проверяйте лимиты платежей"
+    И поисковый индекс обновлён
+    Когда я меняю урок в обзоре "0001-auth.md" на "Ротируйте ключи шифрования"
+    И я обновляю поисковый индекс
+    Тогда переиндексировано документов: 1
+    И я ищу "ключи" в секции "Уроки на будущее"
+    И первым найден документ "codev/reviews/0001-auth.md"
+
+  Сценарий: Связи и статусы документов по номеру
+    Дано существуют документы Codev:
+      | документ              |
+      | specs/0001-auth.md    |
+      | plans/0001-auth.md    |
+      | reviews/0001-auth.md  |
+      | specs/0002-billing.md |
+      | plans/0002-billing.md |
+      | specs/0003-search.md  |
+    Когда я обновляю граф документов
+    Тогда спецификации без плана: "0003"
+    И планы без обзора: "0002"
+    И статус функции "billing" равен "planned"
+    И статус функции "0001" равен "reviewed"
+
+  Сценарий: Документы одного вида с общим номером отмечаются как конфликт
+    Дано существуют документы Codev:
+      | документ               |
+      | specs/0001-auth.md     |
+      | specs/0001-sso.md      |
+      | plans/0001-auth.md     |
+      | specs/0002-billing.md  |
+    Когда я обновляю граф документов
+    Тогда для номера "0001" найден конфликт specs: "0001-auth.md, 0001-sso.md"
+    И статус функции "0002" равен "specified"
+
+  Сценарий: Статус документа берётся из метаданных, а не из фаз плана
+    Дано в codev существует документ "plans/0001-auth.md":
+      """
+      # План: Аутентификация
+
+      ## Метаданные
+      - **Спецификация**: codev/specs/0001-auth.md
+
+      ## Разбиение по фазам
+
+      ### Фаза 1: Схема базы данных
+      **Статус**: completed
+      """
+    И в codev существует документ "plans/0002-billing.md":
+      """
+      # План: Оплата
+
+      ## Метаданные
+      - **Статус**: черновик
+
+      ### Фаза 1: Счета
+      **Статус**: completed
+      """
+    Когда я обновляю граф документов
+    Тогда статус документа "codev/plans/0001-auth.md" в графе не указан
+    И статус документа "codev/plans/0002-billing.md" в графе равен "черновик"
+
+  Сценарий: Проверка документов по схеме из шаблонов протокола
+    Дано план "0001-auth.md" скопирован из шаблона протокола "spider"
+    И из шаблона протокола "spider" собран план "0002-billing.md" без секции "Метрики успеха"
+    И из шаблона протокола "spider" собран план "0003-search.md" без секции "Карта зависимостей"
+    Когда я проверяю документы по схемам протокола "spider"
+    Тогда документ "codev/plans/0001-auth.md" соответствует схеме
+    И в документе "codev/plans/0002-billing.md" найдена ошибка "missing-section" для "Метрики успеха"
+    И документ "codev/plans/0003-search.md" соответствует схеме
+    И в документе "codev/plans/0003-search.md" найдено предупреждение "missing-optional-section" для "Карта зависимостей"
+
+  Сценарий: Подсекции шаблона без плейсхолдеров проверяются
+    Дано из шаблона протокола "spider" собран обзор "0001-auth.md" без секции "Что получилось хорошо"
+    И из шаблона протокола "spider" собран обзор "0002-billing.md" без секции "Результаты нагрузочного тестирования"
+    Когда я проверяю документы по схемам протокола "spider"
+    Тогда в документе "codev/reviews/0001-auth.md" найдена ошибка "missing-section" для "Что получилось хорошо"
+    И документ "codev/reviews/0002-billing.md" соответствует схеме
+    И в документе "codev/reviews/0002-billing.md" найдено предупреждение "missing-optional-section" для "Результаты нагрузочного тестирования"
+
+  Сценарий: Принятые в репозитории названия секций соответствуют схеме
+    Тогда документы самого репозитория проходят проверку по схемам протокола "spider"
+
+  Сценарий: Повторная проверка затрагивает только изменённые документы
+    Дано план "0001-auth.md" скопирован из шаблона протокола "spider"
+    И план "0002-billing.md" скопирован из шаблона протокола "spider"
+    И документы проверены по схемам протокола "spider"
+    Когда я дописываю строку в план "0002-billing.md"
+    И я проверяю документы по схемам протокола "spider"
+    Тогда заново проверено документов: 1
+
+  Сценарий: Пакетное создание документов по бэклогу
+    Дано существуют документы Codev:
+      | документ              |
+      | specs/0001-auth.md    |
+      | specs/0002-billing.md |
+    И бэклог из 200 функций
+    Когда я создаю документы по бэклогу с обзорами
+    Тогда созданы спецификации, планы и обзоры с номерами от "0003" до "0202"
+    И пакет создан быстрее чем за 5 с
+    И в созданных документах есть все секции схемы протокола "spider"
+    И промежуточные файлы пакета удалены
+
+  Сценарий: Ошибка в пакете не оставляет частично созданных документов
+    Дано существуют документы Codev:
+      | документ           |
+      | specs/0001-auth.md |
+    И бэклог из 50 функций
+    И в бэклоге есть функция со слишком длинным названием
+    Когда я создаю документы по бэклогу
+    Тогда создание пакета завершилось ошибкой
+    И документы пакета не созданы
+    И промежуточные файлы пакета удалены
+    Дано бэклог из 3 функций
+    Когда я создаю документы по бэклогу
+    Тогда созданы спецификации и планы с номерами от "0002" до "0004"
+
+  Сценарий: Пакет, прерванный после фиксации, дописывается при следующем запуске
+    Дано пакет из 5 функций прерван после фиксации журнала
+    И бэклог из 3 функций
+    Когда я создаю документы по бэклогу
+    Тогда созданы документы прерванного пакета с номерами от "0001" до "0005"
+    И созданы спецификации и планы с номерами от "0006" до "0008"
+    И промежуточные файлы пакета удалены
+
+  Сценарий: Пакет с записью на диск сбрасывает файлы и каталоги перед фиксацией
+    Дано существуют документы Codev:
+      | документ           |
+      | specs/0001-auth.md |
+    И бэклог из 20 функций
+    Когда я создаю документы по бэклогу с записью на диск
+    Тогда созданы спецификации и планы с номерами от "0002" до "0021"
+    И файлы пакета, журнал и каталоги сброшены на диск
+    И промежуточные файлы пакета удалены
+
+  Сценарий: Одновременные импорты получают непересекающиеся номера
+    Когда два импорта бэклога по 100 функций запущены одновременно
+    Тогда номера пакетов не пересекаются и идут подряд
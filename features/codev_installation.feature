@@ -42,6 +42,47 @@
     И пользовательские планы сохранены
     И протоколы обновлены до новой версии
 
+  Сценарий: Установка из индексированного архива скелета
+    Дано скелет Codev упакован в архив
+    Когда я запускаю установку Codev
+    Тогда протоколы SPIDER и SPIDER-SOLO доступны
+    И установленные протоколы совпадают с codev-skeleton
+
+  Сценарий: Из архива без Zen MCP извлекается только SPIDER-SOLO
+    Дано скелет Codev упакован в архив
+    И Zen MCP недоступен
+    Когда я запускаю установку Codev
+    Тогда установлены только протоколы "spider-solo"
+    И протокол не требует мультиагентной консультации
+
+  Сценарий: Изменённый архив скелета не устанавливается
+    Дано скелет Codev упакован в архив
+    И в архиве скелета изменён файл "protocols/spider-solo/protocol.md"
+    Когда я запускаю установку Codev
+    Тогда установка Codev завершилась ошибкой "SHA-256 не совпадает"
+
+  Сценарий: Архив с путём за пределы каталога codev не устанавливается
+    Дано скелет Codev упакован в архив
+    И в архив скелета добавлен файл "../escape.md" с записью в манифесте
+    Когда я запускаю установку Codev
+    Тогда установка Codev завершилась ошибкой "недопустимый путь в архиве"
+    И вне каталога codev не создан файл "escape.md"
+
+  Сценарий: Обновление из архива удаляет файлы, которых нет в скелете
+    Дано скелет Codev упакован в архив
+    И Codev уже установлен
+    И в установленном протоколе "spider-solo" есть файл "templates/obsolete.md" старой версии
+    Когда я запускаю обновление Codev
+    Тогда файл протокола старой версии удалён
+    И пользовательские спецификации сохранены
+
+  Сценарий: Протоколы без Zen MCP выбираются по флагам манифеста архива
+    Дано скелет Codev упакован в архив
+    И в манифесте архива протокол "tick" не требует Zen MCP
+    И Zen MCP недоступен
+    Когда я запускаю установку Codev
+    Тогда установлены только протоколы "spider-solo", "tick"
+
 Структура сценария: Сохранение прав доступа к файлам
     Дано файл CLAUDE.md с правами "<права>"
     Когда я запускаю установку Codev
@@ -52,3 +93,7 @@
       | 644   |
       | 600   |
       | 444   |
+
+    @examples:examples/file_permissions.jsonl
+    Примеры: Режимы доступа
+      | права |
@@ -0,0 +1,28 @@
+# language: ru
+Функционал: Единый слой запуска внешних команд
+  Как разработчик Codev
+  Я хочу запускать git и mcp из шагов через один слой
+  Чтобы ограничивать параллельность, видеть длительности и прогонять сценарии без внешних CLI
+
+  Сценарий: Идемпотентная команда выполняется один раз за прогон
+    Дано слой команд в режиме "live"
+    Когда я дважды выполняю через слой команд "git --version"
+    Тогда первый результат получен запуском процесса
+    И второй результат взят из памяти с тем же выводом
+
+  Сценарий: Отсутствующая программа не прерывает шаг исключением
+    Дано слой команд в режиме "live"
+    Когда я выполняю через слой команд "codev-no-such-program --help"
+    Тогда команда завершилась с ошибкой "not-found"
+
+  Сценарий: Записанный вывод воспроизводится без запуска процесса
+    Дано слой команд записывает программу "git" в режиме "record"
+    Когда я выполняю через слой команд "git --version"
+    И я переключаю слой команд в режим "replay" и убираю программы из PATH
+    И я выполняю через слой команд "git --version"
+    Тогда результат воспроизведён из записи с исходным выводом
+
+  Сценарий: Число одновременных процессов ограничено
+    Дано слой команд ограничен 2 процессами в режиме "live"
+    Когда я параллельно выполняю 4 команды по 0.2 секунды
+    Тогда одновременно работало не более 2 процессов
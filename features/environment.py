@@ -5,12 +5,32 @@ import os
 import sys
 from pathlib import Path
 
+# Добавить project root в PYTHONPATH
+PROJECT_ROOT = Path(__file__).parent.parent
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from features.support import example_sources  # noqa: E402
+from features.support.feature_cache import FeatureCache, default_cache_dir, install  # noqa: E402
+
+# behave загружает environment.py до разбора .feature файлов
+install(FeatureCache(default_cache_dir(Path(__file__).parent)))
+# Outline с внешними CSV/JSONL примерами строят сценарии по мере прогона
+example_sources.install()
+
 
 def before_all(context):
     """Настройка перед всеми тестами"""
-    # Добавить project root в PYTHONPATH
-    project_root = Path(__file__).parent.parent
-    sys.path.insert(0, str(project_root))
+    from features.support import settings
+    from features.support.commands import CommandRunner
+    from features.support.step_index import IndexedStepRegistry
+
+    project_root = PROJECT_ROOT
+
+    # Поиск шагов через префиксный индекс вместо перебора всех шаблонов
+    runner = context._runner
+    if not isinstance(runner.step_registry, IndexedStepRegistry):
+        runner.step_registry = IndexedStepRegistry(runner.step_registry)
 
     # Сохранить оригинальные переменные окружения
     context.original_env = dict(os.environ)
@@ -19,6 +39,12 @@ def before_all(context):
     context.project_root = project_root
     context.test_mode = True
 
+    # Все внешние команды (git, mcp) идут через общий слой запуска
+    context.commands = CommandRunner.from_env()
+
+    # .env, окружение, userdata и ссылка Zen MCP читаются один раз за процесс
+    context.settings_service = settings.service(project_root)
+
     print(f"\n🧪 Starting Codev BDD tests")
     print(f"📁 Project root: {project_root}")
     print(f"🐍 Python: {sys.version}")
@@ -30,6 +56,11 @@ def after_all(context):
     os.environ.clear()
     os.environ.update(context.original_env)
 
+    stats = context.commands.stats()
+    if stats.run or stats.memo or stats.replay:
+        print(f"\n⏱  Commands ({context.commands.mode}): {stats.run} run, {stats.memo} memoized, "
+              f"{stats.replay} replayed, {stats.failed} failed, {stats.duration:.2f}s")
+
     print(f"\n✅ Codev BDD tests completed")
 
 
@@ -37,6 +68,8 @@ def before_scenario(context, scenario):
     """Настройка перед каждым сценарием"""
     # Сброс состояния контекста
     context.test_dir = None
+    # Все шаги сценария видят один снимок; файлы перечитываются только после изменения
+    context.settings = context.settings_service.snapshot()
     context.installation_failed = False
     context.error_message = None
 
@@ -0,0 +1,48 @@
+# language: ru
+Функционал: Кэш окружений для запуска тестов сгенерированных проектов
+  Как разработчик Codev
+  Я хочу запускать тесты проектов в окружениях с их зависимостями
+  Чтобы не создавать новое окружение для каждого сценария и проекта
+
+  Предыстория:
+    Дано локальный wheelhouse с пакетом "codevdemo"
+    И пустой кэш окружений
+
+  Сценарий: Проекты с одинаковыми зависимостями используют одно окружение
+    Дано проект "alpha" с зависимостями "codevdemo"
+    И проект "beta" с зависимостями "codevdemo"
+    Когда я запускаю тесты проекта "alpha" в окружении из кэша
+    И я запускаю тесты проекта "beta" в окружении из кэша
+    Тогда тесты проекта "alpha" прошли
+    И тесты проекта "beta" прошли
+    И окружение создано 1 раз и переиспользовано 1 раз
+    И подготовка окружения для "beta" заняла меньше 0.1 секунды
+
+  Сценарий: Давно не использованные окружения вытесняются сверх лимита
+    Дано лимит кэша окружений "1"
+    И проект "alpha" без зависимостей
+    И проект "gamma" с зависимостями "codevdemo"
+    Когда я запускаю тесты проекта "alpha" в окружении из кэша
+    И я запускаю тесты проекта "gamma" в окружении из кэша
+    Тогда тесты проекта "gamma" прошли
+    И в кэше осталось только окружение проекта "gamma"
+
+  Сценарий: Используемое окружение не вытесняется до освобождения
+    Дано лимит кэша окружений "1"
+    И проект "alpha" без зависимостей
+    И проект "gamma" с зависимостями "codevdemo"
+    И окружение проекта "alpha" занято другим процессом
+    Когда я запускаю тесты проекта "gamma" в окружении из кэша
+    Тогда тесты проекта "gamma" прошли
+    И занятое окружение осталось в кэше
+    Когда другой процесс освобождает окружение
+    И я вытесняю окружения сверх лимита, кроме окружения проекта "gamma"
+    Тогда в кэше осталось только окружение проекта "gamma"
+    И в кэше нет файлов блокировки вытесненных окружений
+
+  Сценарий: Локальные зависимости учитываются в ключе окружения по содержимому
+    Дано проект "alpha" с локальным пакетом "lib" содержимым "1"
+    И проект "beta" с локальным пакетом "lib" содержимым "2"
+    Тогда ключи окружений проектов "alpha" и "beta" различаются
+    Когда я меняю локальный пакет "lib" проекта "alpha" на "3"
+    Тогда ключ окружения проекта "alpha" изменился
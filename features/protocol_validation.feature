@@ -0,0 +1,28 @@
+# language: ru
+Функционал: Валидация протоколов Codev
+  Как мейнтейнер Codev
+  Я хочу автоматически проверять протоколы и их копии в codev-skeleton
+  Чтобы копии не расходились и каждый протокол содержал обязательные фазы и шаблоны
+
+  Предыстория:
+    Дано создана копия протоколов проекта и codev-skeleton
+
+  Сценарий: Протоколы проекта структурно корректны
+    Когда я проверяю корпус протоколов
+    Тогда структурных ошибок в протоколах нет
+
+  Сценарий: Обнаружение расхождения с codev-skeleton на уровне секций
+    Дано в "codev/protocols/spider/protocol.md" удалена секция "Именование веток"
+    Когда я проверяю корпус протоколов
+    Тогда обнаружено расхождение "drift-removed" для секции "Именование веток"
+    И структурных ошибок в протоколах нет
+
+  Сценарий: Отсутствующий шаблон протокола
+    Дано из протокола "codev/protocols/spider-solo" удалён шаблон "review.md"
+    Когда я проверяю корпус протоколов
+    Тогда обнаружена ошибка "missing-template" в "codev/protocols/spider-solo/protocol.md"
+
+  Сценарий: Повторная проверка использует кэш разбора
+    Дано корпус протоколов уже проверен
+    Когда я проверяю корпус протоколов
+    Тогда ни один файл не разобран повторно
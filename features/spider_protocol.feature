@@ -11,7 +11,7 @@
   Сценарий: Фаза Specification - создание спецификации
     Когда я начинаю фазу Specification для "user authentication"
     Тогда создан файл "codev/specs/0001-user-authentication.md"
-    И спецификация содержит секцию "Цель"
+    И спецификация содержит секцию "Постановка задачи"
     И спецификация содержит секцию "Желаемое состояние"
     И спецификация содержит секцию "Критерии успеха"
 
@@ -30,6 +30,21 @@
     И создан git commit для каждой подфазы
     И commit messages следуют Conventional Commits
 
+  Сценарий: История коммитов с нарушениями соглашений
+    Дано план "0001-user-authentication.md" создан
+    И в репозитории проекта созданы коммиты:
+      | сообщение                                             |
+      | [Spec 0001] Первоначальный черновик спецификации      |
+      | [Spec 0001][Phase: подготовка] feat: каркас модуля    |
+      | [Spec 0001][Phase: миграция] feat: схема базы данных  |
+      | update stuff                                          |
+    Когда я проверяю историю коммитов проекта
+    Тогда найдены нарушения истории коммитов:
+      | код                  |
+      | commit-phase-unknown |
+      | commit-conventional  |
+      | phase-no-commits     |
+
   Сценарий: Фаза Defend - написание тестов
     Дано реализация завершена
     Когда я начинаю фазу Defend
@@ -38,21 +53,42 @@
     И покрытие кода >= 90%
     И все тесты проходят успешно
 
+  Сценарий: Фаза Defend - покрытие ниже порога протокола
+    Дано реализация завершена
+    И в реализации есть функция без тестов
+    Когда я начинаю фазу Defend
+    Тогда все тесты проходят успешно
+    И покрытие кода ниже порога протокола
+
+  Сценарий: Фаза Defend - покрытие проекта без каталога src
+    Дано реализация без каталога src с виртуальным окружением в проекте
+    Когда я измеряю покрытие проекта
+    Тогда покрытие считается только по модулям проекта: "main.py"
+
   Сценарий: Фаза Evaluate - оценка качества
     Дано тесты написаны и проходят
+    И для спецификации задан бюджет производительности:
+      | бенчмарк    | бюджет |
+      | bench_hello | 1ms    |
     Когда я начинаю фазу Evaluate
     Тогда запущены все тесты
     И проверено соответствие спецификации
     И проверена производительность
     И создан отчёт оценки
 
+  Сценарий: Фаза Evaluate - регрессия производительности
+    Дано тесты написаны и проходят
+    И для спецификации записано базовое время "bench_hello" 1ns
+    Когда я начинаю фазу Evaluate
+    Тогда оценка производительности не пройдена с ошибкой "perf-regression"
+
   Сценарий: Фаза Review - извлечение уроков
     Дано все фазы завершены
     Когда я начинаю фазу Review
     Тогда создан файл "codev/reviews/0001-user-authentication.md"
     И обзор содержит "Что получилось хорошо"
-    И обзор содержит "Что можно улучшить"
-    И обзор содержит "Уроки на будущее"
+    И обзор содержит "Что было сложным"
+    И обзор содержит "Что сделали бы иначе"
 
   Сценарий: Мультиагентная консультация в SPIDER
     Дано Zen MCP доступен
@@ -60,6 +96,7 @@
     Тогда запрашивается консультация у Gemini Pro
     И запрашивается консультация у GPT-5
     И спецификация обновлена на основе консультаций
+    И первые замечания внесены до завершения самой медленной модели
     И зафиксированы мнения экспертов
 
 Структура сценария: Нумерация документов
@@ -73,3 +110,7 @@
       | 0001-feature-a            | feature-b          | 0002  |
       | 0001, 0002, 0003          | feature-d          | 0004  |
       | 0001, 0003 (пропуск 0002) | feature-new        | 0004  |
+
+    @examples:examples/spec_numbering.csv
+    Примеры: Сгенерированные наборы с пропусками
+      | существующие | название | номер |
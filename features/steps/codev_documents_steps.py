@@ -0,0 +1,456 @@
+"""
+Step definitions для инструментов работы с документами Codev
+"""
+from pathlib import Path
+from behave import given, when, then
+
+
+def _write_review(context, filename, lesson):
+    """Записать обзор с одним уроком"""
+    review_file = context.test_project / 'codev' / 'reviews' / filename
+    review_file.write_text(f"""# Обзор: {filename}
+
+## Что получилось хорошо
+
+- Фаза завершена в срок
+
+## Уроки на будущее
+
+1. {lesson}
+""", encoding='utf-8')
+
+
+def _update_search_index(context):
+    """Обновить поисковый индекс тестового проекта"""
+    from features.support.search_index import SearchIndex
+
+    with SearchIndex(context.test_project) as index:
+        context.index_stats = index.update()
+
+
+@given('обзор "{filename}" содержит урок "{lesson}"')
+def step_review_with_lesson(context, filename, lesson):
+    """Создать обзор с уроком"""
+    _write_review(context, filename, lesson)
+
+
+@given('поисковый индекс обновлён')
+def step_search_index_ready(context):
+    """Построить поисковый индекс"""
+    _update_search_index(context)
+
+
+@when('я меняю урок в обзоре "{filename}" на "{lesson}"')
+def step_change_review_lesson(context, filename, lesson):
+    """Изменить урок в существующем обзоре"""
+    _write_review(context, filename, lesson)
+
+
+@when('я обновляю поисковый индекс')
+def step_update_search_index(context):
+    """Инкрементально обновить поисковый индекс"""
+    _update_search_index(context)
+
+
+@when('я ищу "{query}" в секции "{section}"')
+@then('я ищу "{query}" в секции "{section}"')
+def step_search_in_section(context, query, section):
+    """Выполнить поиск с фильтром по секции"""
+    from features.support.search_index import SearchIndex
+
+    with SearchIndex(context.test_project) as index:
+        context.search_hits = index.search(query, section=section)
+
+
+@then('первым найден документ "{path}"')
+def step_verify_top_hit(context, path):
+    """Проверить первый результат поиска"""
+    assert context.search_hits, "Поиск ничего не нашёл"
+    assert context.search_hits[0].path == path, \
+        f"Первым найден {context.search_hits[0].path}, ожидался {path}"
+
+
+@then('переиндексировано документов: {count:d}')
+def step_verify_reindexed(context, count):
+    """Проверить число переиндексированных документов"""
+    stats = context.index_stats
+    changed = stats.added + stats.updated
+    assert changed == count, f"Переиндексировано {changed}, ожидалось {count}"
+    assert stats.unchanged > 0, "Неизменённые документы тоже были переиндексированы"
+
+
+@given('существуют документы Codev:')
+def step_codev_documents_exist(context):
+    """Создать документы по списку путей относительно codev/"""
+    for row in context.table:
+        doc_file = context.test_project / 'codev' / row['документ']
+        doc_file.parent.mkdir(parents=True, exist_ok=True)
+        doc_file.write_text(f"# {doc_file.stem}\n", encoding='utf-8')
+
+
+@given('в codev существует документ "{path}":')
+def step_codev_document_with_text(context, path):
+    """Создать документ с заданным содержимым относительно codev/"""
+    doc_file = context.test_project / 'codev' / path
+    doc_file.parent.mkdir(parents=True, exist_ok=True)
+    doc_file.write_text(context.text + '\n', encoding='utf-8')
+
+
+@when('я обновляю граф документов')
+def step_update_document_graph(context):
+    """Инкрементально обновить граф документов"""
+    from features.support.doc_graph import DocumentGraph
+
+    context.document_graph = DocumentGraph(context.test_project)
+    context.document_graph.update()
+
+    if not hasattr(context, 'cleanup_functions'):
+        context.cleanup_functions = []
+    context.cleanup_functions.insert(0, lambda ctx: ctx.document_graph.close())
+
+
+def _numbers(paths):
+    from features.support.documents import parse_document_name
+
+    return ', '.join(parse_document_name(Path(p).name)[0] for p in paths)
+
+
+@then('спецификации без плана: "{numbers}"')
+def step_verify_specs_without_plan(context, numbers):
+    """Проверить список спецификаций без плана"""
+    found = _numbers(context.document_graph.specs_without_plan())
+    assert found == numbers, f"Спецификации без плана: {found}, ожидалось {numbers}"
+
+
+@then('планы без обзора: "{numbers}"')
+def step_verify_plans_without_review(context, numbers):
+    """Проверить список планов без обзора"""
+    found = _numbers(context.document_graph.plans_without_review())
+    assert found == numbers, f"Планы без обзора: {found}, ожидалось {numbers}"
+
+
+@then('статус функции "{feature}" равен "{status}"')
+def step_verify_feature_status(context, feature, status):
+    """Проверить сводный статус функции"""
+    feature_status = context.document_graph.feature_status(feature)
+    assert feature_status is not None, f"Функция {feature} не найдена"
+    assert feature_status.status == status, \
+        f"Статус {feature}: {feature_status.status}, ожидался {status}"
+
+
+@then('статус документа "{path}" в графе не указан')
+def step_verify_document_status_missing(context, path):
+    """Статус фазы не считается статусом документа"""
+    status = context.document_graph.document_status(path)
+    assert status is None, f"Статус {path}: {status!r}, ожидался не указан"
+
+
+@then('статус документа "{path}" в графе равен "{status}"')
+def step_verify_document_status(context, path, status):
+    """Проверить статус из метаданных документа"""
+    found = context.document_graph.document_status(path)
+    assert found == status, f"Статус {path}: {found!r}, ожидался {status!r}"
+
+
+def _copy_template(context, kind, name, protocol, skip_heading=None):
+    """Создать документ из шаблона протокола, опционально без одной секции"""
+    from features.support.document_schema import KIND_TEMPLATES
+    from features.support.documents import parse_sections
+
+    template = (context.test_project / 'codev' / 'protocols' / protocol / 'templates'
+                / KIND_TEMPLATES[kind])
+    lines = template.read_text(encoding='utf-8').splitlines()
+    if skip_heading:
+        section = next(s for s in parse_sections('\n'.join(lines)) if s.heading == skip_heading)
+        del lines[section.line - 1:section.end_line]
+
+    target = context.test_project / 'codev' / kind / name
+    target.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def _validate_documents(context, protocol):
+    """Проверить документы тестового проекта по схемам протокола"""
+    from features.support.document_schema import validate_documents
+    from features.support.documents import cache_dir
+
+    context.schema_report = validate_documents(
+        context.test_project, protocol,
+        cache_path=cache_dir(context.test_project / 'codev') / 'validation.json')
+
+
+@given('из шаблона протокола "{protocol}" собран план "{plan_file}" без секции "{heading}"')
+def step_plan_from_template_without_section(context, plan_file, protocol, heading):
+    """Создать план из шаблона без указанной секции"""
+    _copy_template(context, 'plans', plan_file, protocol, skip_heading=heading)
+
+
+@given('из шаблона протокола "{protocol}" собран обзор "{review_file}" без секции "{heading}"')
+def step_review_from_template_without_section(context, review_file, protocol, heading):
+    """Создать обзор из шаблона без указанной секции или подсекции"""
+    _copy_template(context, 'reviews', review_file, protocol, skip_heading=heading)
+
+
+@given('план "{plan_file}" скопирован из шаблона протокола "{protocol}"')
+def step_plan_from_template(context, plan_file, protocol):
+    """Создать план из шаблона"""
+    _copy_template(context, 'plans', plan_file, protocol)
+
+
+@given('документы проверены по схемам протокола "{protocol}"')
+def step_documents_validated(context, protocol):
+    """Выполнить первую проверку документов"""
+    _validate_documents(context, protocol)
+
+
+@when('я дописываю строку в план "{plan_file}"')
+def step_append_to_plan(context, plan_file):
+    """Изменить содержимое плана"""
+    plan = context.test_project / 'codev' / 'plans' / plan_file
+    with open(plan, 'a', encoding='utf-8') as f:
+        f.write('\nДополнительное примечание.\n')
+
+
+@when('я проверяю документы по схемам протокола "{protocol}"')
+def step_validate_documents(context, protocol):
+    """Проверить документы по схемам протокола"""
+    _validate_documents(context, protocol)
+
+
+@then('документ "{path}" соответствует схеме')
+def step_verify_document_valid(context, path):
+    """Проверить отсутствие ошибок в документе"""
+    errors = [f for f in context.schema_report.errors if f.path == path]
+    assert not errors, "Ошибки схемы: " + '; '.join(f"{f.line}: {f.message}" for f in errors)
+
+
+@then('в документе "{path}" найдена ошибка "{code}" для "{heading}"')
+def step_verify_schema_error(context, path, code, heading):
+    """Проверить наличие ошибки с номером строки"""
+    matches = [f for f in context.schema_report.errors
+               if f.path == path and f.code == code and f"'{heading}'" in f.message]
+    assert matches, f"Ошибка {code} для '{heading}' в {path} не найдена"
+    assert matches[0].line > 0, "Для ошибки не указана строка"
+
+
+@then('в документе "{path}" найдено предупреждение "{code}" для "{heading}"')
+def step_verify_schema_warning(context, path, code, heading):
+    """Проверить предупреждение о необязательной секции"""
+    matches = [f for f in context.schema_report.findings
+               if f.severity == 'warning' and f.path == path and f.code == code
+               and f"'{heading}'" in f.message]
+    assert matches, f"Предупреждение {code} для '{heading}' в {path} не найдено"
+
+
+@then('заново проверено документов: {count:d}')
+def step_verify_revalidated(context, count):
+    """Проверить что из кэша взяты все неизменённые документы"""
+    report = context.schema_report
+    assert report.validated == count, \
+        f"Заново проверено {report.validated}, ожидалось {count}"
+    assert report.cached == report.documents - count, "Кэш проверок не использован"
+
+
+def _create_from_backlog(context, reviews=False, durable=False):
+    """Создать документы по бэклогу; ошибка сохраняется в context.scaffold_error"""
+    from features.support.scaffold import Scaffolder, ScaffoldError
+
+    scaffolder = Scaffolder(context.test_project, reviews=reviews, durable=durable)
+    context.scaffold_result, context.scaffold_error = None, None
+    try:
+        context.scaffold_result = scaffolder.create(context.backlog)
+    except ScaffoldError as e:
+        context.scaffold_error = e
+
+
+def _project_documents(context):
+    codev_dir = context.test_project / 'codev'
+    return sorted(p.relative_to(codev_dir).as_posix()
+                  for kind in ('specs', 'plans', 'reviews') for p in (codev_dir / kind).glob('*.md'))
+
+
+@given('бэклог из {count:d} функций')
+def step_backlog(context, count):
+    """Бэклог с однотипными названиями функций"""
+    from features.support.scaffold import read_backlog
+
+    context.backlog = read_backlog(f"Экспорт отчётов {n}" for n in range(1, count + 1))
+
+
+@given('в бэклоге есть функция со слишком длинным названием')
+def step_backlog_long_title(context):
+    """Название, из которого получается имя файла длиннее допустимого"""
+    from features.support.scaffold import FeatureRequest, slugify
+
+    title = 'Очень длинное название ' * 20
+    context.backlog.append(FeatureRequest(title.strip(), slugify(title)))
+    context.documents_before = _project_documents(context)
+
+
+@given('пакет из {count:d} функций прерван после фиксации журнала')
+def step_interrupted_batch(context, count):
+    """Подготовить и зафиксировать пакет, не публикуя файлы"""
+    # pylint: disable=protected-access
+    from features.support.scaffold import Scaffolder, read_backlog
+
+    scaffolder = Scaffolder(context.test_project, durable=False)
+    features = read_backlog(f"Прерванная функция {n}" for n in range(1, count + 1))
+    scaffolder._commit(scaffolder._stage(features, scaffolder.next_number(),
+                                         scaffolder._templates()))
+
+
+@when('я создаю документы по бэклогу')
+def step_create_from_backlog(context):
+    """Создать спецификации и планы по бэклогу"""
+    _create_from_backlog(context)
+
+
+@when('я создаю документы по бэклогу с обзорами')
+def step_create_from_backlog_with_reviews(context):
+    """Создать спецификации, планы и обзоры по бэклогу"""
+    _create_from_backlog(context, reviews=True)
+
+
+@when('я создаю документы по бэклогу с записью на диск')
+def step_create_from_backlog_durable(context):
+    """Создать документы с fsync файлов и каталогов, как codev-scaffold без --no-sync"""
+    _create_from_backlog(context, durable=True)
+
+
+@when('два импорта бэклога по {count:d} функций запущены одновременно')
+def step_concurrent_imports(context, count):
+    """Запустить два процесса codev-scaffold на одном проекте"""
+    import json
+    import subprocess
+    import sys
+
+    backlog = context.test_project / 'backlog.txt'
+    backlog.write_text('\n'.join(f"Импорт {n}" for n in range(1, count + 1)) + '\n',
+                       encoding='utf-8')
+    command = [sys.executable, '-m', 'features.support.scaffold', str(backlog),
+               '--root', str(context.test_project), '--no-sync', '--json']
+    processes = [subprocess.Popen(command, cwd=context.project_root, stdout=subprocess.PIPE,
+                                  stderr=subprocess.PIPE, text=True) for _ in range(2)]
+    context.scaffold_runs = []
+    for process in processes:
+        stdout, stderr = process.communicate(timeout=60)
+        assert process.returncode == 0, f"codev-scaffold завершился с ошибкой: {stderr}"
+        context.scaffold_runs.append(json.loads(stdout))
+
+
+@then('созданы спецификации и планы с номерами от "{first}" до "{last}"')
+def step_verify_scaffolded(context, first, last):
+    """Проверить непрерывный диапазон номеров и файлы каждого вида"""
+    _verify_scaffolded(context, first, last, ('specs', 'plans'))
+
+
+@then('созданы спецификации, планы и обзоры с номерами от "{first}" до "{last}"')
+def step_verify_scaffolded_with_reviews(context, first, last):
+    """Проверить непрерывный диапазон номеров и файлы каждого вида"""
+    _verify_scaffolded(context, first, last, ('specs', 'plans', 'reviews'))
+
+
+def _verify_scaffolded(context, first, last, kinds):
+    assert context.scaffold_error is None, f"Пакет не создан: {context.scaffold_error}"
+    result = context.scaffold_result
+    assert (result.numbers[0], result.numbers[-1]) == (first, last), \
+        f"Созданы номера {result.numbers[0]}-{result.numbers[-1]}, ожидались {first}-{last}"
+    for kind in kinds:
+        names = sorted(p.name for p in result.files if p.parent.name == kind)
+        assert [name[:4] for name in names] == result.numbers, f"В {kind} не хватает документов"
+        assert all(p.exists() for p in result.files), "Не все документы опубликованы"
+
+
+@then('пакет создан быстрее чем за {seconds:g} с')
+def step_verify_scaffold_time(context, seconds):
+    """Проверить время создания пакета"""
+    elapsed = context.scaffold_result.elapsed
+    assert elapsed < seconds, f"Пакет создан за {elapsed:.3f} с, ожидалось меньше {seconds} с"
+
+
+@then('в созданных документах есть все секции схемы протокола "{protocol}"')
+def step_verify_scaffolded_sections(context, protocol):
+    """Документы пакета повторяют структуру шаблонов протокола"""
+    _validate_documents(context, protocol)
+    created = {p.relative_to(context.test_project).as_posix()
+               for p in context.scaffold_result.files}
+    missing = [f for f in context.schema_report.findings
+               if f.path in created and f.code in ('missing-section', 'missing-optional-section')]
+    assert not missing, "Нет секций: " + '; '.join(f"{f.path}: {f.message}" for f in missing[:5])
+    title = context.scaffold_result.files[0].read_text(encoding='utf-8').splitlines()[0]
+    assert context.backlog[0].title in title, f"Название не подставлено в заголовок: {title}"
+
+
+@then('создание пакета завершилось ошибкой')
+def step_verify_scaffold_failed(context):
+    """Проверить отказ создания пакета"""
+    assert context.scaffold_error is not None, "Пакет создан, ожидалась ошибка"
+
+
+@then('документы пакета не созданы')
+def step_verify_nothing_published(context):
+    """Ни одного документа пакета не появилось в codev/"""
+    created = sorted(set(_project_documents(context)) - set(context.documents_before))
+    assert not created, f"Частично созданы документы: {created[:5]}"
+
+
+@then('промежуточные файлы пакета удалены')
+def step_verify_no_scaffold_leftovers(context):
+    """Не осталось каталога подготовки и журнала"""
+    from features.support.scaffold import JOURNAL, STAGING_DIR
+
+    codev_dir = context.test_project / 'codev'
+    leftovers = [name for name in (STAGING_DIR, JOURNAL) if (codev_dir / name).exists()]
+    assert not leftovers, f"Остались промежуточные файлы: {leftovers}"
+
+
+@then('созданы документы прерванного пакета с номерами от "{first}" до "{last}"')
+def step_verify_recovered(context, first, last):
+    """Прерванный пакет дописан до начала нового"""
+    documents = _project_documents(context)
+    for number in range(int(first), int(last) + 1):
+        for kind in ('specs', 'plans'):
+            assert any(d.startswith(f'{kind}/{number:04d}-прерванная') for d in documents), \
+                f"Нет документа {kind}/{number:04d} прерванного пакета"
+
+
+@then('номера пакетов не пересекаются и идут подряд')
+def step_verify_concurrent_ranges(context):
+    """Два одновременных импорта получили смежные непересекающиеся диапазоны"""
+    ranges = sorted((int(run['first']), int(run['last'])) for run in context.scaffold_runs)
+    (first_a, last_a), (first_b, last_b) = ranges
+    assert last_a < first_b, f"Диапазоны номеров пересекаются: {ranges}"
+    assert first_b == last_a + 1, f"Между диапазонами пропуск: {ranges}"
+    documents = [d for d in _project_documents(context) if d.startswith('specs/')]
+    assert len(documents) == len({d[6:10] for d in documents}), "Номера спецификаций повторяются"
+
+
+@then('для номера "{number}" найден конфликт {kind}: "{paths}"')
+def step_verify_number_conflict(context, number, kind, paths):
+    """Проверить что документы одного вида с общим номером не затирают друг друга"""
+    feature = context.document_graph.feature_status(number)
+    expected = [f'codev/{kind}/{name.strip()}' for name in paths.split(',')]
+    assert feature.conflicts.get(kind) == expected, \
+        f"Конфликты {number}: {feature.conflicts}, ожидалось {kind}: {expected}"
+    assert [f.number for f in context.document_graph.conflicts()] == [number], \
+        "Конфликт не найден в списке конфликтов графа"
+
+
+@then('документы самого репозитория проходят проверку по схемам протокола "{protocol}"')
+def step_verify_repository_documents(context, protocol):
+    """Гейт не отвергает существующие документы codev/ репозитория"""
+    from features.support.document_schema import validate_documents
+
+    report = validate_documents(context.project_root, protocol, jobs=1)
+    assert report.documents, "В репозитории нет документов codev/"
+    assert not report.errors, "Ошибки схемы: " + '; '.join(
+        f"{f.path}:{f.line}: {f.message}" for f in report.errors[:5])
+
+
+@then('файлы пакета, журнал и каталоги сброшены на диск')
+def step_verify_scaffold_synced(context):
+    """fsync: файлы и журнал в staging, каталоги staging, codev/ после фиксации, specs/ и plans/"""
+    assert context.scaffold_error is None, f"Пакет не создан: {context.scaffold_error}"
+    result = context.scaffold_result
+    kinds = {path.parent for path in result.files}
+    expected = len(result.files) + 1 + len(kinds) + 1 + 1 + len(kinds)
+    assert result.synced == expected, f"fsync вызван {result.synced} раз, ожидалось {expected}"
@@ -6,7 +6,32 @@ import shutil
 import tempfile
 from pathlib import Path
 from behave import given, when, then
-import subprocess
+
+
+def _install_protocols(context, codev_dir):
+    """Протоколы из архива скелета (если он собран) или из дерева codev-skeleton
+
+    Выбор протоколов по доступности Zen MCP делает только установка из архива;
+    из дерева, как и раньше, копируются все протоколы.
+    """
+    from features.support.skeleton_archive import SkeletonArchive
+
+    archive_path = getattr(context, 'skeleton_archive', None)
+    if archive_path is not None:
+        zen_available = getattr(context, 'zen_mcp_available', True)
+        with SkeletonArchive(archive_path) as archive:
+            context.skeleton_install = archive.extract(codev_dir, zen_available=zen_available)
+        return
+
+    protocols_src = context.project_root / 'codev-skeleton' / 'protocols'
+    protocols_dst = codev_dir / 'protocols'
+    if protocols_src.exists():
+        for protocol_dir in protocols_src.iterdir():
+            if protocol_dir.is_dir():
+                dst = protocols_dst / protocol_dir.name
+                if dst.exists():
+                    shutil.rmtree(dst)
+                shutil.copytree(protocol_dir, dst)
 
 
 @given('создан временный тестовый проект')
@@ -17,9 +42,9 @@ def step_create_temp_project(context):
     os.chdir(context.test_dir)
 
     # Инициализировать git
-    subprocess.run(['git', 'init'], check=True, capture_output=True)
-    subprocess.run(['git', 'config', 'user.name', 'Test User'], check=True)
-    subprocess.run(['git', 'config', 'user.email', 'test@example.com'], check=True)
+    context.commands.run(['git', 'init'], check=True)
+    context.commands.run(['git', 'config', 'user.name', 'Test User'], check=True)
+    context.commands.run(['git', 'config', 'user.email', 'test@example.com'], check=True)
 
 
 @given('файл CLAUDE.md существует с содержимым "{content}"')
@@ -70,6 +95,78 @@ def step_claude_md_with_permissions(context, permissions):
     context.original_permissions = permissions
 
 
+@given('скелет Codev упакован в архив')
+def step_pack_skeleton_archive(context):
+    """Собрать архив codev-skeleton во временном каталоге проекта"""
+    from features.support.skeleton_archive import build
+
+    context.skeleton_archive = build(context.project_root / 'codev-skeleton',
+                                     Path(context.test_dir) / '.dist', version='0.1.0-test')
+
+
+@given('в архиве скелета изменён файл "{name}"')
+def step_tamper_skeleton_archive(context, name):
+    """Переписать архив с изменённым файлом и прежним манифестом"""
+    import zipfile
+
+    archive_path = context.skeleton_archive
+    with zipfile.ZipFile(archive_path) as archive:
+        entries = [(info, archive.read(info)) for info in archive.infolist()]
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for info, data in entries:
+            archive.writestr(info, data + b'\n<!-- tampered -->\n' if info.filename == name else data)
+
+
+def _rewrite_skeleton_archive(context, edit):
+    """Пересобрать архив скелета; edit(manifest, entries) меняет манифест и файлы"""
+    import json
+    import zipfile
+    from features.support.skeleton_archive import MANIFEST_NAME, tree_hash
+
+    archive_path = context.skeleton_archive
+    with zipfile.ZipFile(archive_path) as archive:
+        entries = {name: archive.read(name) for name in archive.namelist()}
+    manifest = json.loads(entries.pop(MANIFEST_NAME))
+    edit(manifest, entries)
+    manifest['tree_hash'] = tree_hash(manifest['files'])
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr(MANIFEST_NAME, json.dumps(manifest))
+        for name, data in entries.items():
+            archive.writestr(name, data)
+
+
+@given('в архив скелета добавлен файл "{name}" с записью в манифесте')
+def step_add_skeleton_archive_entry(context, name):
+    """Файл с корректным SHA-256 в манифесте: отклонить его может только проверка пути"""
+    import hashlib
+
+    data = b'# escaped\n'
+
+    def add(manifest, entries):
+        entries[name] = data
+        manifest['files'][name] = {'sha256': hashlib.sha256(data).hexdigest(), 'size': len(data)}
+
+    _rewrite_skeleton_archive(context, add)
+
+
+@given('в манифесте архива протокол "{protocol}" не требует Zen MCP')
+def step_skeleton_archive_single_agent(context, protocol):
+    """Снять флаг multi_agent протокола в манифесте архива"""
+    def clear(manifest, entries):
+        manifest['protocols'][protocol]['multi_agent'] = False
+
+    _rewrite_skeleton_archive(context, clear)
+
+
+@given('в установленном протоколе "{protocol}" есть файл "{name}" старой версии')
+def step_stale_protocol_file(context, protocol, name):
+    """Файл, которого нет в новой версии скелета"""
+    stale = Path(context.test_dir) / 'codev' / 'protocols' / protocol / name
+    stale.parent.mkdir(parents=True, exist_ok=True)
+    stale.write_text('# removed from skeleton\n', encoding='utf-8')
+    context.stale_protocol_file = stale
+
+
 @when('я запускаю установку Codev')
 def step_install_codev(context):
     """Запустить установку Codev"""
@@ -89,16 +186,7 @@ def step_install_codev(context):
             (codev_dir / subdir).mkdir(parents=True, exist_ok=True)
 
         # Копировать протоколы
-        protocols_src = skeleton_dir / 'protocols'
-        protocols_dst = codev_dir / 'protocols'
-
-        if protocols_src.exists():
-            for protocol_dir in protocols_src.iterdir():
-                if protocol_dir.is_dir():
-                    dst = protocols_dst / protocol_dir.name
-                    if dst.exists():
-                        shutil.rmtree(dst)
-                    shutil.copytree(protocol_dir, dst)
+        _install_protocols(context, codev_dir)
 
         # Создать или обновить CLAUDE.md
         claude_md = Path(context.test_dir) / 'CLAUDE.md'
@@ -120,21 +208,11 @@ def step_install_codev(context):
 @when('я запускаю обновление Codev')
 def step_update_codev(context):
     """Обновить существующую установку Codev"""
-    skeleton_dir = context.project_root / 'codev-skeleton'
     codev_dir = Path(context.test_dir) / 'codev'
 
     try:
         # Обновить только протоколы, сохраняя пользовательские файлы
-        protocols_src = skeleton_dir / 'protocols'
-        protocols_dst = codev_dir / 'protocols'
-
-        if protocols_src.exists():
-            for protocol_dir in protocols_src.iterdir():
-                if protocol_dir.is_dir():
-                    dst = protocols_dst / protocol_dir.name
-                    if dst.exists():
-                        shutil.rmtree(dst)
-                    shutil.copytree(protocol_dir, dst)
+        _install_protocols(context, codev_dir)
 
         context.update_failed = False
 
@@ -243,6 +321,39 @@ def step_verify_no_multiagent_requirement(context):
            'single agent' in content.lower()
 
 
+@then('установлены только протоколы {protocols}')
+def step_verify_only_protocols(context, protocols):
+    """Проверить набор установленных протоколов"""
+    expected = sorted(p.strip().strip('"') for p in protocols.split(','))
+    protocols_dir = Path(context.test_dir) / 'codev' / 'protocols'
+    installed = sorted(p.name for p in protocols_dir.iterdir() if p.is_dir())
+    assert installed == expected, f"Установлены {installed}, ожидались {expected}"
+
+
+@then('установленные протоколы совпадают с codev-skeleton')
+def step_verify_protocols_match_skeleton(context):
+    """Сравнить установленные файлы протоколов с деревом codev-skeleton"""
+    skeleton = context.project_root / 'codev-skeleton' / 'protocols'
+    protocols_dir = Path(context.test_dir) / 'codev' / 'protocols'
+    installed = sorted(p.relative_to(protocols_dir) for p in protocols_dir.rglob('*') if p.is_file())
+    assert installed, "Протоколы не установлены"
+    for relative in installed:
+        assert (protocols_dir / relative).read_bytes() == (skeleton / relative).read_bytes(), \
+            f"{relative} отличается от codev-skeleton"
+    assert context.skeleton_install.version == '0.1.0-test', \
+        f"Установлена версия {context.skeleton_install.version}"
+
+
+@then('установка Codev завершилась ошибкой "{message}"')
+def step_verify_installation_error(context, message):
+    """Проверить отказ установки и текст ошибки"""
+    assert context.installation_failed, "Установка прошла успешно"
+    assert message in context.error_message, \
+        f"Ошибка '{context.error_message}' не содержит '{message}'"
+    protocols_dir = Path(context.test_dir) / 'codev' / 'protocols'
+    assert not any(protocols_dir.iterdir()), "Протоколы частично установлены"
+
+
 @then('существует директория "{directory}"')
 def step_verify_directory_exists(context, directory):
     """Проверить существование конкретной директории"""
@@ -290,6 +401,21 @@ def step_verify_permissions_preserved(context, permissions):
         f"Права изменились: {permissions} → {current_perms}"
 
 
+@then('файл протокола старой версии удалён')
+def step_verify_stale_protocol_file_removed(context):
+    """Обновление из архива заменяет каталог протокола целиком"""
+    assert not context.update_failed, f"Обновление не удалось: {context.error_message}"
+    assert not context.stale_protocol_file.exists(), \
+        f"{context.stale_protocol_file} остался после обновления"
+
+
+@then('вне каталога codev не создан файл "{name}"')
+def step_verify_no_file_outside_codev(context, name):
+    """Путь с .. из архива не записан за пределы каталога установки"""
+    escaped = Path(context.test_dir) / name
+    assert not escaped.exists(), f"Создан файл {escaped}"
+
+
 def after_scenario(context, scenario):
     """Очистка после каждого сценария"""
     if hasattr(context, 'test_dir') and os.path.exists(context.test_dir):
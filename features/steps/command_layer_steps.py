@@ -0,0 +1,122 @@
+"""
+Step definitions для слоя запуска внешних команд
+"""
+import os
+import shlex
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+from behave import given, when, then
+
+
+def _make_runner(context, mode, **kwargs):
+    from features.support.commands import CommandRunner
+
+    if not getattr(context, 'command_fixtures', None):
+        context.command_fixtures = Path(tempfile.mkdtemp(prefix='codev-commands-'))
+        context.cleanup_functions = getattr(context, 'cleanup_functions', [])
+        context.cleanup_functions.append(
+            lambda ctx: shutil.rmtree(ctx.command_fixtures, ignore_errors=True))
+    context.command_runner = CommandRunner(mode, fixtures_dir=context.command_fixtures, **kwargs)
+    context.command_results = []
+
+
+@given('слой команд записывает программу "{program}" в режиме "{mode}"')
+def step_command_runner_for_program(context, mode, program):
+    """Создать слой команд, записывающий указанную программу"""
+    _make_runner(context, mode, replay_programs=(program,))
+    context.replay_programs = (program,)
+
+
+@given('слой команд ограничен {jobs:d} процессами в режиме "{mode}"')
+def step_command_runner_limited(context, mode, jobs):
+    """Создать слой команд с ограничением параллельности"""
+    _make_runner(context, mode, max_concurrency=jobs)
+
+
+@given('слой команд в режиме "{mode}"')
+def step_command_runner(context, mode):
+    """Создать отдельный экземпляр слоя команд"""
+    _make_runner(context, mode)
+
+
+@when('я выполняю через слой команд "{command}"')
+def step_run_command(context, command):
+    """Выполнить команду через слой"""
+    context.command_results.append(context.command_runner.run(shlex.split(command)))
+
+
+@when('я дважды выполняю через слой команд "{command}"')
+def step_run_command_twice(context, command):
+    """Выполнить команду два раза подряд"""
+    for _ in range(2):
+        context.command_results.append(context.command_runner.run(shlex.split(command)))
+
+
+@when('я переключаю слой команд в режим "{mode}" и убираю программы из PATH')
+def step_switch_to_replay(context, mode):
+    """Новый экземпляр слоя над теми же fixtures и пустой PATH"""
+    from features.support.commands import CommandRunner
+
+    context.command_runner = CommandRunner(mode, fixtures_dir=context.command_fixtures,
+                                           replay_programs=context.replay_programs)
+    context.saved_path = os.environ.get('PATH', '')
+    os.environ['PATH'] = ''
+    context.cleanup_functions.append(
+        lambda ctx: os.environ.__setitem__('PATH', ctx.saved_path))
+
+
+@when('я параллельно выполняю {count:d} команды по {seconds:f} секунды')
+def step_run_parallel(context, count, seconds):
+    """Запустить несколько команд из потоков"""
+    from concurrent.futures import ThreadPoolExecutor
+
+    argv = [sys.executable, '-c', f'import time; time.sleep({seconds})']
+    with ThreadPoolExecutor(max_workers=count) as pool:
+        context.command_results = list(pool.map(
+            lambda _: context.command_runner.run(argv, memoize=False), range(count)))
+
+
+@then('первый результат получен запуском процесса')
+def step_verify_first_run(context):
+    """Проверить источник первого результата"""
+    first = context.command_results[0]
+    assert first.ok and first.source == 'run', f"Первый результат: {first}"
+    assert first.duration > 0, "Для запущенной команды должна быть записана длительность"
+
+
+@then('второй результат взят из памяти с тем же выводом')
+def step_verify_memoized(context):
+    """Проверить мемоизацию"""
+    first, second = context.command_results[:2]
+    assert second.source == 'memo', f"Второй результат: {second}"
+    assert second.stdout == first.stdout, "Вывод из памяти отличается"
+    stats = context.command_runner.stats()
+    assert (stats.run, stats.memo) == (1, 1), f"Статистика: {stats}"
+
+
+@then('команда завершилась с ошибкой "{error}"')
+def step_verify_command_error(context, error):
+    """Проверить код ошибки без исключения"""
+    result = context.command_results[-1]
+    assert not result.ok and result.error == error, f"Результат: {result}"
+
+
+@then('результат воспроизведён из записи с исходным выводом')
+def step_verify_replayed(context):
+    """Сравнить записанный и воспроизведённый результаты"""
+    recorded, replayed = context.command_results
+    assert recorded.source == 'run' and recorded.ok, f"Запись: {recorded}"
+    assert replayed.source == 'replay', f"Воспроизведение: {replayed}"
+    assert (replayed.returncode, replayed.stdout) == (recorded.returncode, recorded.stdout), \
+        f"Вывод отличается: {replayed.stdout!r} != {recorded.stdout!r}"
+
+
+@then('одновременно работало не более {jobs:d} процессов')
+def step_verify_concurrency(context, jobs):
+    """Проверить пик параллельности"""
+    runner = context.command_runner
+    assert all(r.ok for r in context.command_results), f"Ошибки: {context.command_results}"
+    assert runner.peak_concurrency == jobs, \
+        f"Пик параллельности {runner.peak_concurrency}, ожидался {jobs}"
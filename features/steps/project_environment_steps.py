@@ -0,0 +1,194 @@
+"""
+Step definitions для кэша окружений сгенерированных проектов
+"""
+import time
+from pathlib import Path
+from behave import given, when, then
+
+
+def _workdir(context) -> Path:
+    from features.support.step_helpers import scenario_dir
+    return scenario_dir(context, 'env_workdir', 'codev-envs-')
+
+
+@given('локальный wheelhouse с пакетом "{package}"')
+def step_local_wheelhouse(context, package):
+    """Собрать минимальный wheel пакета в локальный каталог"""
+    from features.support.step_helpers import build_wheel
+
+    context.wheelhouse = _workdir(context) / 'wheelhouse'
+    build_wheel(context.wheelhouse, package,
+                source=b'def greet(name):\n    return f"Hello, {name}!"\n')
+
+
+@given('пустой кэш окружений')
+def step_empty_env_cache(context):
+    """Кэш окружений во временном каталоге, установка только из wheelhouse"""
+    from features.support.venv_cache import VenvCache
+
+    context.env_cache = VenvCache(_workdir(context) / 'venvs', wheelhouse=context.wheelhouse)
+    context.env_projects = {}
+    context.env_runs = {}
+
+
+@given('лимит кэша окружений "{budget}"')
+def step_env_cache_budget(context, budget):
+    """Ограничить объём кэша окружений"""
+    from features.support.venv_cache import parse_size
+    context.env_cache.budget = parse_size(budget)
+
+
+@given('проект "{name}" без зависимостей')
+def step_project_without_dependencies(context, name):
+    """Создать проект без зависимостей"""
+    step_project_with_dependencies(context, name, '')
+
+
+@given('проект "{name}" с зависимостями "{dependencies}"')
+def step_project_with_dependencies(context, name, dependencies):
+    """Создать проект с pyproject.toml и unittest-тестом"""
+    project = _workdir(context) / name
+    (project / 'src').mkdir(parents=True)
+    (project / 'tests').mkdir()
+    requirements = [d.strip() for d in dependencies.split(',') if d.strip()]
+    (project / 'pyproject.toml').write_text(
+        f'[project]\nname = "{name}"\nversion = "0.1.0"\n'
+        f'dependencies = {requirements!r}\n'.replace("'", '"'), encoding='utf-8')
+    (project / 'src' / 'main.py').write_text(
+        'def hello():\n    return "Hello, World!"\n', encoding='utf-8')
+    imports = ''.join(f'import {r}\n' for r in requirements)
+    (project / 'tests' / 'test_main.py').write_text(
+        f'import unittest\n{imports}\nfrom src.main import hello\n\n\n'
+        'class TestMain(unittest.TestCase):\n'
+        '    def test_hello(self):\n'
+        '        self.assertEqual(hello(), "Hello, World!")\n', encoding='utf-8')
+    context.env_projects[name] = project
+
+
+@when('я запускаю тесты проекта "{name}" в окружении из кэша')
+def step_run_project_tests(context, name):
+    """Получить окружение проекта из кэша и выполнить в нём тесты"""
+    project = context.env_projects[name]
+    started = time.perf_counter()
+    with context.env_cache.use(project) as env:
+        setup_time = time.perf_counter() - started
+        result = context.commands.run([env.python, '-m', 'unittest', 'discover', '-s', 'tests'],
+                                      cwd=project, timeout=60)
+    context.env_runs[name] = {'env': env, 'setup_time': setup_time, 'result': result}
+
+
+@given('окружение проекта "{name}" занято другим процессом')
+def step_env_in_use(context, name):
+    """Взять окружение через use() отдельным экземпляром кэша и не отпускать"""
+    import contextlib
+    from features.support.venv_cache import VenvCache
+
+    holder = contextlib.ExitStack()
+    other = VenvCache(context.env_cache.root, context.env_cache.budget,
+                      context.env_cache.wheelhouse)
+    context.held_env = holder.enter_context(other.use(context.env_projects[name]))
+    context.env_holder = holder
+    context.cleanup_functions.append(lambda ctx: ctx.env_holder.close())
+
+
+@when('другой процесс освобождает окружение')
+def step_env_released(context):
+    """Выйти из блока use() держателя окружения"""
+    context.env_holder.close()
+
+
+@when('я вытесняю окружения сверх лимита, кроме окружения проекта "{name}"')
+def step_prune_env_cache(context, name):
+    """Вытеснение без создания нового окружения"""
+    context.env_cache.evict(keep=(context.env_runs[name]['env'].key,))
+
+
+@then('занятое окружение осталось в кэше')
+def step_held_env_kept(context):
+    """Вытеснение пропускает окружение, которое сейчас используется"""
+    keys = [env.key for env in context.env_cache.entries()]
+    assert context.held_env.key in keys, f"Занятое окружение вытеснено: в кэше {keys}"
+    assert context.held_env.python.exists(), "Интерпретатор занятого окружения удалён"
+
+
+@then('в кэше нет файлов блокировки вытесненных окружений')
+def step_no_stale_env_locks(context):
+    """После вытеснения <key>.lock удаляется вместе с окружением"""
+    locks = sorted(p.stem for p in context.env_cache.root.glob('*.lock'))
+    kept = sorted(env.key for env in context.env_cache.entries())
+    assert context.held_env.key not in kept, "Освобождённое окружение не вытеснено"
+    assert set(locks) <= set(kept), f"Остались блокировки {locks}, окружения {kept}"
+
+
+@then('тесты проекта "{name}" прошли')
+def step_project_tests_passed(context, name):
+    """Проверка результата тестов в окружении"""
+    result = context.env_runs[name]['result']
+    assert result.ok, f"Тесты {name} не прошли: {result.stderr}"
+    assert 'OK' in result.stderr, f"unittest не сообщил об успехе: {result.stderr}"
+
+
+@then('окружение создано {builds:d} раз и переиспользовано {hits:d} раз')
+def step_env_builds_and_hits(context, builds, hits):
+    """Проверка счётчиков кэша окружений"""
+    cache = context.env_cache
+    assert (cache.builds, cache.hits) == (builds, hits), \
+        f"Создано {cache.builds}, переиспользовано {cache.hits}"
+
+
+@then('подготовка окружения для "{name}" заняла меньше {seconds:f} секунды')
+def step_env_setup_time(context, name, seconds):
+    """Проверка времени получения окружения из кэша"""
+    run = context.env_runs[name]
+    assert run['env'].reused, f"Окружение для {name} было создано заново"
+    assert run['setup_time'] < seconds, \
+        f"Подготовка заняла {run['setup_time']:.3f}s (создание: {run['env'].build_time:.3f}s)"
+
+
+@then('в кэше осталось только окружение проекта "{name}"')
+def step_only_env_left(context, name):
+    """Проверка LRU-вытеснения"""
+    keys = [env.key for env in context.env_cache.entries()]
+    expected = context.env_runs[name]['env'].key
+    assert keys == [expected], f"В кэше окружения {keys}, ожидалось только {expected}"
+
+
+@given('проект "{name}" с локальным пакетом "{package}" содержимым "{content}"')
+def step_project_with_local_package(context, name, package, content):
+    """Проект, зависящий от пакета из собственного каталога (-e ./<package>)"""
+    step_project_with_dependencies(context, name, '')
+    project = context.env_projects[name]
+    local = project / package
+    local.mkdir(exist_ok=True)
+    (local / '__init__.py').write_text(f'VALUE = {content!r}\n', encoding='utf-8')
+    (project / 'requirements.txt').write_text(f'-e ./{package}\n', encoding='utf-8')
+    (project / 'pyproject.toml').unlink()
+
+
+@when('я меняю локальный пакет "{package}" проекта "{name}" на "{content}"')
+def step_change_local_package(context, package, name, content):
+    """Изменить исходники локальной зависимости"""
+    init = context.env_projects[name] / package / '__init__.py'
+    init.write_text(f'VALUE = {content!r}\n', encoding='utf-8')
+
+
+def _project_key(context, name):
+    from features.support.venv_cache import environment_key, project_requirements, resolve_local
+
+    project = context.env_projects[name]
+    return environment_key(resolve_local(project_requirements(project), project))
+
+
+@then('ключи окружений проектов "{first}" и "{second}" различаются')
+def step_env_keys_differ(context, first, second):
+    """Разные локальные исходники не делят одно окружение"""
+    context.env_keys = {name: _project_key(context, name) for name in (first, second)}
+    assert context.env_keys[first] != context.env_keys[second], \
+        f"Проекты {first} и {second} получили одно окружение {context.env_keys[first]}"
+
+
+@then('ключ окружения проекта "{name}" изменился')
+def step_env_key_changed(context, name):
+    """Изменённый локальный пакет требует нового окружения"""
+    key = _project_key(context, name)
+    assert key != context.env_keys[name], f"Ключ окружения {name} не изменился: {key}"
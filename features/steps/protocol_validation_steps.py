@@ -0,0 +1,90 @@
+"""
+Step definitions для валидации протоколов Codev
+"""
+import shutil
+import tempfile
+from pathlib import Path
+from behave import given, when, then
+
+
+def _run_validator(context):
+    """Проверить протоколы во временной копии"""
+    from features.support.protocol_validator import validate
+
+    context.validation_report = validate(
+        context.protocols_root, cache_path=context.protocols_cache)
+
+
+@given('создана копия протоколов проекта и codev-skeleton')
+def step_copy_protocol_trees(context):
+    """Скопировать codev/protocols и codev-skeleton/protocols во временный каталог"""
+    context.protocols_root = Path(tempfile.mkdtemp(prefix='codev-protocols-'))
+    context.protocols_cache = context.protocols_root / 'parse-cache.json'
+
+    for tree in ['codev/protocols', 'codev-skeleton/protocols']:
+        shutil.copytree(context.project_root / tree, context.protocols_root / tree)
+
+    if not hasattr(context, 'cleanup_functions'):
+        context.cleanup_functions = []
+    context.cleanup_functions.append(lambda ctx: shutil.rmtree(ctx.protocols_root))
+
+
+@given('в "{file_path}" удалена секция "{heading}"')
+def step_remove_section(context, file_path, heading):
+    """Удалить секцию вместе с её содержимым до следующего заголовка"""
+    from features.support.documents import parse_sections
+
+    target = context.protocols_root / file_path
+    lines = target.read_text(encoding='utf-8').splitlines()
+    section = next(s for s in parse_sections('\n'.join(lines)) if s.heading == heading)
+    del lines[section.line - 1:section.end_line]
+    target.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+@given('из протокола "{protocol_dir}" удалён шаблон "{template}"')
+def step_remove_template(context, protocol_dir, template):
+    """Удалить шаблон протокола"""
+    (context.protocols_root / protocol_dir / 'templates' / template).unlink()
+
+
+@given('корпус протоколов уже проверен')
+def step_protocols_validated(context):
+    """Выполнить первую проверку для прогрева кэша"""
+    _run_validator(context)
+
+
+@when('я проверяю корпус протоколов')
+def step_validate_protocols(context):
+    """Запустить валидатор протоколов"""
+    _run_validator(context)
+
+
+@then('структурных ошибок в протоколах нет')
+def step_verify_no_errors(context):
+    """Проверить отсутствие ошибок структуры"""
+    errors = context.validation_report.errors
+    assert not errors, "Ошибки структуры: " + '; '.join(f.message for f in errors)
+
+
+@then('обнаружено расхождение "{code}" для секции "{heading}"')
+def step_verify_drift(context, code, heading):
+    """Проверить наличие расхождения по секции"""
+    matches = [f for f in context.validation_report.drift
+               if f.code == code and f"'{heading}'" in f.message]
+    assert matches, f"Расхождение {code} для секции '{heading}' не обнаружено"
+
+
+@then('обнаружена ошибка "{code}" в "{file_path}"')
+def step_verify_error(context, code, file_path):
+    """Проверить наличие ошибки структуры"""
+    matches = [f for f in context.validation_report.errors
+               if f.code == code and f.path == file_path]
+    assert matches, f"Ошибка {code} в {file_path} не обнаружена"
+
+
+@then('ни один файл не разобран повторно')
+def step_verify_cache_hit(context):
+    """Проверить что все файлы взяты из кэша"""
+    report = context.validation_report
+    assert report.parsed == 0, f"Повторно разобрано файлов: {report.parsed}"
+    assert report.cached == report.files, "Не все файлы взяты из кэша"
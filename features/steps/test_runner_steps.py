@@ -0,0 +1,578 @@
+"""
+Step definitions для инструментов запуска BDD-тестов
+"""
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from behave import given, when, then
+
+SAMPLE_FEATURE = """# language: ru
+Функционал: Пример
+  Сценарий: Удвоение
+    Дано число 2
+    Тогда удвоенное число равно 4
+"""
+
+SAMPLE_STEPS = """from behave import given, then
+
+
+@given('число {n:d}')
+def step_number(context, n):
+    context.n = n
+
+
+@then('удвоенное число равно {m:d}')
+def step_double(context, m):
+    assert context.n * 2 == m
+"""
+
+OTHER_FEATURE = """# language: ru
+Функционал: Другой пример
+  Сценарий: Пустой шаг
+    Дано ничего не происходит
+"""
+
+FAILING_FEATURE = """# language: ru
+Функционал: Падающий пример
+  Сценарий: Неверное удвоение
+    Дано число 2
+    Тогда удвоенное число равно 5
+    И удвоенное число равно 4
+"""
+
+STREAMED_FEATURE = """# language: ru
+Функционал: Внешние примеры
+  Структура сценария: Удвоение из файла
+    Дано число <n>
+    Тогда удвоенное число равно <m>
+
+    @examples:data/doubling.csv
+    Примеры: Сгенерированные
+      | n | m |
+"""
+
+SUITE_ENVIRONMENT = """from features.support import example_sources
+
+example_sources.install()
+"""
+
+RETAINED_ROWS_HOOK = """
+
+def after_feature(context, feature):
+    for outline in feature.scenarios:
+        if example_sources.is_streamed(outline):
+            print(f"retained={len(outline.scenarios)} status={outline.status.name}")
+"""
+
+OTHER_STEPS = """from behave import given
+
+
+@given('ничего не происходит')
+def step_nothing(context):
+    pass
+"""
+
+
+def _add_cleanup(context, cleanup_fn):
+    if not hasattr(context, 'cleanup_functions'):
+        context.cleanup_functions = []
+    context.cleanup_functions.append(cleanup_fn)
+
+
+@given('создан временный набор BDD-тестов')
+def step_create_sample_suite(context):
+    """Создать минимальный набор features со step-модулями"""
+    context.suite_root = Path(tempfile.mkdtemp(prefix='codev-suite-'))
+    context.suite_features = context.suite_root / 'features'
+    (context.suite_features / 'steps').mkdir(parents=True)
+    (context.suite_features / 'sample.feature').write_text(SAMPLE_FEATURE, encoding='utf-8')
+    (context.suite_features / 'steps' / 'sample_steps.py').write_text(
+        SAMPLE_STEPS, encoding='utf-8')
+    (context.suite_features / 'other.feature').write_text(OTHER_FEATURE, encoding='utf-8')
+    (context.suite_features / 'steps' / 'other_steps.py').write_text(
+        OTHER_STEPS, encoding='utf-8')
+    _add_cleanup(context, lambda ctx: shutil.rmtree(ctx.suite_root, ignore_errors=True))
+
+
+@given('запущен демон behave для временного набора')
+def step_start_daemon(context):
+    """Запустить демон в отдельном процессе и дождаться сокета"""
+    context.daemon_socket = context.suite_root / 'daemon.sock'
+    # Демон читает настройки behave из pyproject.toml рабочего каталога
+    (context.suite_root / 'pyproject.toml').write_text(
+        '[tool.behave]\njunit = true\njunit_directory = "test-reports"\n', encoding='utf-8')
+    context.daemon_process = subprocess.Popen(
+        [sys.executable, '-m', 'features.support.test_daemon',
+         '--socket', str(context.daemon_socket),
+         'serve', '--features-dir', str(context.suite_features)],
+        cwd=context.suite_root, stderr=subprocess.DEVNULL,
+        env={**os.environ, 'PYTHONPATH': str(context.project_root)})
+
+    def stop_daemon(ctx):
+        ctx.daemon_process.terminate()
+        ctx.daemon_process.wait(timeout=10)
+
+    _add_cleanup(context, stop_daemon)
+
+    deadline = time.monotonic() + 10
+    while not context.daemon_socket.exists():
+        assert time.monotonic() < deadline, "Демон не создал сокет за 10 секунд"
+        assert context.daemon_process.poll() is None, "Демон завершился при старте"
+        time.sleep(0.05)
+
+
+@when('я запускаю сценарий через демон')
+def step_run_via_daemon(context):
+    """Отправить демону запрос на прогон"""
+    import io
+    from features.support.test_daemon import send_request
+
+    context.daemon_output = io.StringIO()
+    context.daemon_result = send_request(
+        context.daemon_socket,
+        {'command': 'run', 'args': [str(context.suite_features / 'sample.feature')]},
+        out=context.daemon_output)
+
+
+@given('запущен непрерывный режим для временного набора')
+def step_start_watch_mode(context):
+    """Запустить наблюдатель до первого перезапуска и дождаться готовности"""
+    context.watch_process = subprocess.Popen(
+        [sys.executable, '-m', 'features.support.watch_mode',
+         '--root', str(context.suite_root), '--features-dir', str(context.suite_features),
+         '--no-initial', '--max-runs', '1'],
+        cwd=context.project_root, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+        text=True, encoding='utf-8')
+
+    def stop_watch(ctx):
+        if ctx.watch_process.poll() is None:
+            ctx.watch_process.kill()
+        ctx.watch_process.wait(timeout=10)
+        ctx.watch_process.stdout.close()
+
+    _add_cleanup(context, stop_watch)
+
+    first_line = context.watch_process.stdout.readline()
+    assert first_line.startswith('watching'), f"Наблюдатель не запустился: {first_line}"
+
+
+@when('я изменяю step-модуль "{module}" временного набора')
+def step_touch_step_module(context, module):
+    """Изменить step-модуль и сдвинуть mtime"""
+    path = context.suite_features / 'steps' / module
+    path.write_text(path.read_text(encoding='utf-8') + '\n# changed\n', encoding='utf-8')
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@then('прогон через демон успешен')
+def step_verify_daemon_run(context):
+    """Проверить результат прогона"""
+    result = context.daemon_result
+    assert result.get('type') == 'result', f"Ошибка демона: {result}"
+    assert result['status'] == 'passed', \
+        f"Прогон не прошёл:\n{context.daemon_output.getvalue()}"
+
+
+@then('итоговая сводка прогона получена клиентом демона')
+def step_verify_daemon_summary(context):
+    """Сводка behave идёт клиенту, а не в stdout демона, и junit-отчёты не пишутся"""
+    output = context.daemon_output.getvalue()
+    assert 'scenario passed' in output or 'scenarios passed' in output, \
+        f"Клиент не получил итоговую сводку:\n{output}"
+    reports = context.suite_root / 'test-reports'
+    assert not reports.exists(), f"Демон записал junit-отчёты: {sorted(reports.iterdir())}"
+
+
+@then('демон перезагрузил только "{module}"')
+def step_verify_reloaded(context, module):
+    """Проверить что перечитан только изменённый модуль"""
+    assert context.daemon_result['reloaded'] == [module], \
+        f"Перезагружены: {context.daemon_result['reloaded']}"
+
+
+@then('непрерывный режим перезапустил только "{feature}"')
+def step_verify_watch_rerun(context, feature):
+    """Дождаться перезапуска и проверить, какие файлы были выполнены"""
+    try:
+        output, _ = context.watch_process.communicate(timeout=30)
+    except subprocess.TimeoutExpired:
+        context.watch_process.kill()
+        output, _ = context.watch_process.communicate()
+        raise AssertionError(f"Перезапуск не произошёл за 30 секунд:\n{output}")
+
+    assert context.watch_process.returncode == 0, f"Перезапуск не прошёл:\n{output}"
+    lines = output.splitlines()
+    marker = next((i for i, line in enumerate(lines) if line.startswith('▶ changed:')), None)
+    assert marker is not None, f"Нет отметки о перезапуске:\n{output}"
+    match = re.search(r'→ (\d+) location\(s\)$', lines[marker])
+    assert match, f"Наблюдатель выбрал полный прогон:\n{output}"
+    count = int(match.group(1))
+    # Локации наблюдатель печатает абсолютными путями сразу после отметки
+    locations = [line.strip() for line in lines[marker + 1:marker + 1 + count]]
+    assert all(os.path.isabs(loc) for loc in locations), f"Локации не выведены:\n{output}"
+    rerun = {Path(loc.split(':', 1)[0]).resolve() for loc in locations}
+    expected = (context.suite_features / feature).resolve()
+    assert rerun == {expected}, f"Перезапущены {sorted(map(str, rerun))}:\n{output}"
+
+
+@when('я дважды разбираю .feature файлы временного набора через дисковый кэш')
+def step_parse_twice(context):
+    """Разобрать файлы двумя экземплярами кэша над одним каталогом"""
+    from behave.parser import parse_file
+    from features.support.feature_cache import FeatureCache
+
+    files = sorted(context.suite_features.glob('*.feature'))
+    cache_path = context.suite_root / 'feature-cache'
+    first, second = FeatureCache(cache_path), FeatureCache(cache_path)
+    for path in files:
+        first.load(str(path), 'ru')
+    context.cached_features = [second.load(str(path), 'ru') for path in files]
+    context.parsed_features = [parse_file(str(path), language='ru') for path in files]
+    context.feature_caches = (first, second)
+
+
+@then('первый разбор прочитал {count:d} файла, а второй взял их из кэша')
+def step_verify_cache_stats(context, count):
+    """Проверить счётчики попаданий в кэш"""
+    first, second = context.feature_caches
+    assert (first.misses, first.hits) == (count, 0), \
+        f"Первый разбор: misses={first.misses} hits={first.hits}"
+    assert (second.misses, second.hits) == (0, count), \
+        f"Второй разбор: misses={second.misses} hits={second.hits}"
+
+
+@then('модели из кэша совпадают с результатом разбора')
+def step_verify_cached_models(context):
+    """Сравнить имена, сценарии и шаги моделей"""
+    def outline(feature):
+        return (feature.filename, feature.name, [
+            (s.name, s.line, [(st.step_type, st.name) for st in s.steps])
+            for s in feature.scenarios])
+
+    for cached, parsed in zip(context.cached_features, context.parsed_features):
+        assert outline(cached) == outline(parsed), \
+            f"Модель из кэша отличается: {outline(cached)} != {outline(parsed)}"
+
+
+@given('во временный набор добавлен step-модуль "{module}" с шаблоном "{pattern}"')
+def step_add_step_module(context, module, pattern):
+    """Добавить step-модуль с одним шаблоном"""
+    source = f"from behave import then\n\n\n@then({pattern!r})\ndef step_extra(context, **kwargs):\n    pass\n"
+    (context.suite_features / 'steps' / module).write_text(source, encoding='utf-8')
+
+
+@when('я строю индекс шагов временного набора')
+def step_build_step_index(context):
+    """Загрузить step-модули набора в отдельный registry и построить индекс"""
+    from behave.parser import parse_file
+    from behave.runner_util import load_step_modules
+    from features.support.step_index import StepIndex
+
+    # Временно подменить шаги registry текущего прогона шагами набора
+    # (behave пересоздаёт behave.step_registry.registry при запуске из CLI)
+    registry = getattr(context._runner.step_registry, 'base', context._runner.step_registry)
+    saved = registry.steps
+    registry.steps = dict(given=[], when=[], then=[], step=[])
+    try:
+        load_step_modules([str(context.suite_features / 'steps')])
+        context.suite_steps = registry.steps
+    finally:
+        registry.steps = saved
+
+    context.step_index = StepIndex(context.suite_steps)
+    context.suite_step_list = [
+        step
+        for path in sorted(context.suite_features.glob('*.feature'))
+        for scenario in parse_file(str(path), language='ru').walk_scenarios()
+        for step in scenario.all_steps
+    ]
+
+
+@then('индекс предупреждает о неоднозначности шаблона "{pattern}"')
+def step_verify_ambiguity(context, pattern):
+    """Проверить находку step-ambiguous для шаблона"""
+    findings = context.step_index.ambiguities()
+    assert any(f.code == 'step-ambiguous' and f"('{pattern}')" in f.message
+               for f in findings), f"Нет предупреждения для '{pattern}': {findings}"
+
+
+@then('индекс находит для каждого шага то же определение, что и behave')
+def step_verify_index_matches_registry(context):
+    """Сравнить поиск через индекс с линейным перебором StepRegistry"""
+    from behave.step_registry import StepRegistry
+
+    linear = StepRegistry()
+    linear.steps = context.suite_steps
+    assert context.suite_step_list, "В наборе нет шагов"
+    for step in context.suite_step_list:
+        expected = linear.find_step_definition(step)
+        actual = context.step_index.find_step_definition(step.step_type, step.name)
+        assert actual is expected, f"Шаг '{step.name}': индекс {actual}, behave {expected}"
+
+
+@given('во временный набор добавлен падающий сценарий')
+def step_add_failing_feature(context):
+    """Добавить сценарий с заведомо неверной проверкой"""
+    (context.suite_features / 'failing.feature').write_text(FAILING_FEATURE, encoding='utf-8')
+
+
+@when('я запускаю behave для временного набора с потоком событий')
+def step_run_with_events(context):
+    """Запустить behave в отдельном процессе с NDJSON-форматтером"""
+    context.events_path = context.suite_root / 'events.ndjson'
+    env = dict(os.environ, PYTHONPATH=str(context.project_root), CODEV_WORKER_ID='shard-1')
+    context.behave_result = subprocess.run(
+        [sys.executable, '-m', 'behave', str(context.suite_features), '--no-capture',
+         '-f', 'features.support.event_stream:EventFormatter', '-o', str(context.events_path)],
+        cwd=context.suite_root, env=env, capture_output=True, text=True, timeout=60)
+    assert context.events_path.exists(), \
+        f"Поток событий не создан:\n{context.behave_result.stdout}{context.behave_result.stderr}"
+
+
+@then('в потоке событий есть начало и конец каждого сценария и шага')
+def step_verify_events(context):
+    """Проверить парность и порядок событий"""
+    import json
+
+    events = [json.loads(line) for line in
+              context.events_path.read_text(encoding='utf-8').splitlines()]
+    assert events[0]['event'] == 'run.start' and events[-1]['event'] == 'run.end', \
+        f"Поток должен начинаться run.start и заканчиваться run.end: {events[0]}, {events[-1]}"
+    assert all(e['worker'] == 'shard-1' and e['ts'] > 0 for e in events), \
+        "У каждого события должны быть worker и ts"
+
+    open_items = []
+    for event in events[1:-1]:
+        kind, _, phase = event['event'].partition('.')
+        if phase == 'start':
+            open_items.append(kind)
+        else:
+            assert open_items and open_items.pop() == kind, f"Непарное событие: {event}"
+            assert event['status'], f"Нет статуса: {event}"
+    assert not open_items, f"Не закрыты: {open_items}"
+
+    failed_steps = [e for e in events if e['event'] == 'step.end' and e['status'] == 'failed']
+    assert len(failed_steps) == 1 and failed_steps[0].get('error'), \
+        f"Ожидался один упавший шаг с ошибкой: {failed_steps}"
+    context.stream_events = events
+
+
+@then('шаг после падения отмечен в потоке событий как пропущенный')
+def step_verify_skipped_step_events(context):
+    """Невыполненный шаг тоже получает step.start и step.end"""
+    skipped = [e for e in context.stream_events
+               if e['event'] == 'step.end' and e['status'] == 'skipped']
+    assert [e['location'].rsplit('/', 1)[-1] for e in skipped] == ['failing.feature:6'], \
+        f"Ожидался один пропущенный шаг failing.feature:6: {skipped}"
+    starts = [e for e in context.stream_events
+              if e['event'] == 'step.start' and e['location'] == skipped[0]['location']]
+    assert len(starts) == 1, f"Нет step.start для пропущенного шага: {starts}"
+
+
+@then('просмотр потока событий показывает {passed:d} успешных и {failed:d} упавший сценарий')
+def step_verify_events_tail(context, passed, failed):
+    """Запустить просмотрщик потока и проверить сводку"""
+    result = subprocess.run(
+        [sys.executable, '-m', 'features.support.event_stream', 'tail', str(context.events_path)],
+        cwd=context.project_root, capture_output=True, text=True, timeout=30)
+    assert f"scenarios: {passed} passed, {failed} failed" in result.stdout, \
+        f"Неверная сводка:\n{result.stdout}{result.stderr}"
+    assert 'failing.feature:3' in result.stdout, f"Нет упавшего сценария:\n{result.stdout}"
+    assert result.returncode == 1, "При падениях просмотрщик должен завершаться с кодом 1"
+
+
+@given('во временный набор добавлен feature "{name}" со сценариями:')
+def step_add_feature_with_scenarios(context, name):
+    """Создать feature-файл с простыми сценариями из таблицы"""
+    lines = ['# language: ru', 'Функционал: Сценарии с историей']
+    for row in context.table:
+        lines += [f"  Сценарий: {row['сценарий']}", '    Дано число 1',
+                  '    Тогда удвоенное число равно 2']
+    (context.suite_features / name).write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    context.timed_feature = name
+
+
+@given('история длительностей временного набора:')
+def step_write_duration_history(context):
+    """Записать историю длительностей и статусов для сценариев"""
+    from features.support.documents import cache_dir
+    from features.support.scheduler import DurationHistory, scenario_key
+
+    history = DurationHistory(cache_dir(context.suite_root / 'codev') / 'durations.json')
+    for row in context.table:
+        key = scenario_key(f'features/{context.timed_feature}', row['сценарий'])
+        for duration, status in zip(row['длительности'].split(), row['статусы'].split()):
+            history.record(key, float(duration), status)
+    history.save()
+
+
+@when('я планирую прогон временного набора на {workers:d} воркера')
+def step_plan_shards(context, workers):
+    """Разложить сценарии набора по воркерам"""
+    from features.support.documents import cache_dir
+    from features.support.scheduler import DurationHistory, collect_scenarios, schedule
+
+    context.history = DurationHistory(cache_dir(context.suite_root / 'codev') / 'durations.json')
+    scenarios = collect_scenarios(context.suite_features, context.suite_root)
+    context.shards = schedule(scenarios, context.history, workers)
+
+
+@then('оценки нагрузки шардов отличаются не более чем на {delta:f} с')
+def step_verify_shard_balance(context, delta):
+    """Проверить баланс нагрузки"""
+    loads = [shard.load for shard in context.shards]
+    assert len(loads) > 1, f"Ожидалось несколько шардов: {loads}"
+    assert max(loads) - min(loads) <= delta, f"Шарды несбалансированы: {loads}"
+
+
+@then('сценарий "{name}" стоит первым в своём шарде')
+def step_verify_failed_first(context, name):
+    """Проверить порядок внутри шарда"""
+    for shard in context.shards:
+        keys = [ref.key.rsplit('::', 1)[1] for ref in shard.scenarios]
+        if name in keys:
+            assert keys[0] == name, f"Шард {shard.index}: {keys}"
+            return
+    raise AssertionError(f"Сценарий '{name}' не попал ни в один шард")
+
+
+@then('сценарий "{name}" помечен как возможно нестабильный')
+def step_verify_flaky(context, name):
+    """Проверить пометку нестабильного сценария"""
+    flaky = context.history.flaky()
+    assert any(key.endswith(f'::{name}') for key in flaky), f"Нестабильные: {flaky}"
+    assert len(flaky) == 1, f"Лишние пометки: {flaky}"
+
+
+@when('я запускаю временный набор на {workers:d} воркерах')
+def step_run_shards(context, workers):
+    """Запустить шардированный прогон в отдельном процессе"""
+    context.shard_result = subprocess.run(
+        [sys.executable, '-m', 'features.support.scheduler',
+         '--root', str(context.suite_root), '--workers', str(workers)],
+        cwd=context.project_root, capture_output=True, text=True, timeout=120)
+
+
+@then('шардированный прогон успешен')
+def step_verify_shard_run(context):
+    """Проверить код возврата и отчёт по шардам"""
+    result = context.shard_result
+    assert result.returncode == 0, f"Прогон не прошёл:\n{result.stdout}{result.stderr}"
+    assert result.stdout.count('exit 0') == 2, f"Ожидалось два шарда:\n{result.stdout}"
+
+
+@then('в истории длительностей есть все {count:d} сценария временного набора')
+def step_verify_history(context, count):
+    """Проверить, что длительности записаны для каждого сценария"""
+    from features.support.documents import cache_dir
+    from features.support.scheduler import DurationHistory
+
+    history = DurationHistory(cache_dir(context.suite_root / 'codev') / 'durations.json')
+    assert len(history.entries) == count, f"В истории: {sorted(history.entries)}"
+    assert all(entry['statuses'] == ['passed'] for entry in history.entries.values()), \
+        f"Неверные статусы: {history.entries}"
+
+
+@given('во временный набор добавлен Outline с внешними примерами на {count:d} строк')
+def step_add_streamed_outline(context, count):
+    """Outline с примерами в CSV и environment.py, подключающий внешние примеры"""
+    data_dir = context.suite_features / 'data'
+    data_dir.mkdir()
+    rows = ''.join(f'{n},{n * 2}\n' for n in range(1, count + 1))
+    (data_dir / 'doubling.csv').write_text('n,m\n' + rows, encoding='utf-8')
+    (context.suite_features / 'streamed.feature').write_text(STREAMED_FEATURE, encoding='utf-8')
+    (context.suite_features / 'environment.py').write_text(SUITE_ENVIRONMENT, encoding='utf-8')
+    context.example_rows = count
+
+
+@given('в строке {line:d} файла примеров неверный результат')
+def step_break_example_row(context, line):
+    """Испортить ожидаемое значение в одной строке CSV"""
+    path = context.suite_features / 'data' / 'doubling.csv'
+    lines = path.read_text(encoding='utf-8').splitlines()
+    n, m = lines[line - 1].split(',')
+    lines[line - 1] = f'{n},{int(m) + 1}'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def _run_suite(context, *args, **env):
+    run_env = {k: v for k, v in os.environ.items() if k != 'CODEV_EXAMPLES_SHARD'}
+    run_env.update(PYTHONPATH=str(context.project_root), **env)
+    return subprocess.run(
+        [sys.executable, '-m', 'behave', str(context.suite_features / 'streamed.feature'),
+         '--no-capture', '--no-junit', '-f', 'plain', *args],
+        cwd=context.suite_root, env=run_env, capture_output=True, text=True, timeout=60)
+
+
+@when('я запускаю Outline с внешними примерами')
+def step_run_streamed_outline(context):
+    """Прогнать streamed.feature без шардирования"""
+    context.behave_result = _run_suite(context)
+
+
+@when('я запускаю Outline с внешними примерами без репортёров')
+def step_run_streamed_outline_without_reporters(context):
+    """--no-summary --no-junit; after_feature печатает, сколько строк осталось в Outline"""
+    environment = context.suite_features / 'environment.py'
+    environment.write_text(SUITE_ENVIRONMENT + RETAINED_ROWS_HOOK, encoding='utf-8')
+    context.behave_result = _run_suite(context, '--no-summary')
+
+
+@then('в Outline осталось сценариев: {count:d}, статус "{status}"')
+def step_verify_retained_rows(context, count, status):
+    """Выполненные строки без репортёров не копятся, статус Outline по счётчикам"""
+    result = context.behave_result
+    assert f'retained={count} status={status}' in result.stdout, \
+        f"Вывод прогона:\n{result.stdout}{result.stderr}"
+    assert result.returncode != 0 if status == 'failed' else result.returncode == 0, \
+        f"Код возврата {result.returncode}"
+
+
+@then('упал только сценарий строки "{reference}"')
+def step_verify_failed_row(context, reference):
+    """Отчёт о падениях указывает строку файла примеров"""
+    import re
+
+    output = context.behave_result.stdout
+    failing = output.split('Failing scenarios:', 1)[-1].split('\n\n', 1)[0]
+    assert re.findall(r'\(([\w.]+:\d+)\)', failing) == [reference], \
+        f"Упавшие сценарии:\n{output}{context.behave_result.stderr}"
+    assert f'{context.example_rows - 1} scenarios passed, 1 failed' in output, output
+
+
+@then('шарды {count:d} воркеров вместе выполняют каждую строку примеров ровно один раз')
+def step_verify_example_shards(context, count):
+    """Прогнать каждый шард через CODEV_EXAMPLES_SHARD и сравнить строки"""
+    import re
+
+    executed = []
+    for index in range(1, count + 1):
+        result = _run_suite(context, CODEV_EXAMPLES_SHARD=f'{index}/{count}')
+        rows = re.findall(r'\(doubling\.csv:(\d+)\)', result.stdout)
+        assert len(set(rows)) <= -(-context.example_rows // count), \
+            f"Шард {index}/{count} выполнил {len(set(rows))} строк"
+        executed += sorted(set(rows), key=int)
+    expected = [str(line) for line in range(2, context.example_rows + 2)]
+    assert sorted(executed, key=int) == expected, f"Выполнены строки {executed}"
+
+
+@then('планировщик отправляет Outline с внешними примерами во все {count:d} шарда')
+def step_verify_streamed_outline_planned(context, count):
+    """Outline не разворачивается при планировании и попадает в каждый шард"""
+    from features.support.documents import cache_dir
+    from features.support.scheduler import DurationHistory, collect_scenarios, schedule
+
+    history = DurationHistory(cache_dir(context.suite_root / 'codev') / 'durations.json')
+    refs = collect_scenarios(context.suite_features, context.suite_root)
+    streamed = [ref for ref in refs if ref.location.startswith('features/streamed.feature')]
+    assert [ref.location for ref in streamed] == ['features/streamed.feature:3'], \
+        f"Outline развёрнут при планировании: {[ref.location for ref in streamed]}"
+    shards = schedule(refs, history, count)
+    assert len(shards) == count and all(streamed[0] in shard.scenarios for shard in shards), \
+        f"Outline попал не во все шарды: {[[r.location for r in s.scenarios] for s in shards]}"
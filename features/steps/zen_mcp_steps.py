@@ -2,43 +2,90 @@
 Step definitions для тестирования интеграции Zen MCP
 """
 import os
-import subprocess
 from pathlib import Path
 from behave import given, when, then
 import json
 
 
-def _ensure_env_flags(context):
-    """Загрузить состояние API-ключей один раз за сценарий"""
-    if getattr(context, '_env_flags_loaded', False):
-        return
+def _transcripts(context):
+    """Журнал консультаций: codev/consultations тестового проекта или временный каталог"""
+    if getattr(context, 'transcripts', None) is None:
+        from features.support.transcripts import TranscriptStore
 
-    project_root = Path(__file__).resolve().parent.parent.parent
-    env_file = project_root / '.env'
+        if getattr(context, 'test_project', None) is not None:
+            directory = context.test_project / 'codev' / 'consultations'
+        else:
+            import shutil
+            import tempfile
+            directory = Path(tempfile.mkdtemp(prefix='codev-consultations-'))
+            context.cleanup_functions = getattr(context, 'cleanup_functions', [])
+            context.cleanup_functions.append(
+                lambda ctx: shutil.rmtree(directory, ignore_errors=True))
+        context.transcripts = TranscriptStore(directory)
+    return context.transcripts
 
-    context.has_gemini_key = False
-    context.has_openai_key = False
-    context.has_xai_key = False
 
-    if env_file.exists():
-        content = env_file.read_text()
-        context.has_gemini_key = 'GEMINI_API_KEY=' in content
-        context.has_openai_key = 'OPENAI_API_KEY=' in content
-        context.has_xai_key = 'XAI_API_KEY=' in content
+def _record_consultation(context, model, prompt, response, latency):
+    """Дописать консультацию в журнал"""
+    from features.support.transcripts import ConsultationRecord
 
-    context._env_flags_loaded = True
+    record = ConsultationRecord.from_prompt(
+        model, getattr(context, 'consultation_phase', 'specify'),
+        getattr(context, 'spec_number', '0000'), prompt, response, latency)
+    _transcripts(context).append(record)
+    return record
 
 
-def _require_api_key(context, attr_name, error_message):
+def _require_api_key(context, key, error_message):
     """Убедиться что указанный API-ключ настроен"""
-    _ensure_env_flags(context)
-    assert getattr(context, attr_name, False), error_message
+    assert context.settings.is_set(key), error_message
+
+
+def _offline_workdir(context) -> Path:
+    """Временный каталог: исходный репозиторий, wheelhouse, проект и HOME установки"""
+    from features.support.step_helpers import scenario_dir
+
+    return scenario_dir(context, 'zen_offline_dir', 'codev-zen-offline-')
+
+
+def _run_zen_installer(context, *args, input=None, **env):
+    """Запустить scripts/install-zen-mcp.sh с HOME и проектом во временном каталоге"""
+    workdir = _offline_workdir(context)
+    script = Path(__file__).resolve().parent.parent.parent / 'scripts' / 'install-zen-mcp.sh'
+    run_env = {key: value for key, value in os.environ.items() if not key.startswith('PIP_')}
+    run_env.update(HOME=str(workdir / 'home'), ZEN_REPO=str(workdir / 'zen-src'),
+                   PROJECT_ROOT=str(workdir / 'project'), PIP_NO_INDEX='1', **env)
+    return context.commands.run(['bash', str(script), *args], cwd=workdir, env=run_env,
+                                input=input, timeout=300, memoize=False)
+
+
+def _settings_project(context) -> Path:
+    """Временный проект и HOME для проверки снимка конфигурации"""
+    from features.support.step_helpers import scenario_dir
+
+    if getattr(context, 'settings_project', None) is None:
+        project = scenario_dir(context, 'settings_project', 'codev-settings-')
+        (project / 'home').mkdir()
+        context.settings_environ = {'HOME': str(project / 'home')}
+    return context.settings_project
+
+
+def _rewrite_bundle(context, edit):
+    """Распаковать бандл, изменить его содержимое и упаковать обратно"""
+    import tarfile
+
+    unpacked = _offline_workdir(context) / 'unpacked'
+    with tarfile.open(context.zen_bundle) as archive:
+        archive.extractall(unpacked)
+    edit(unpacked / 'zen-mcp-bundle')
+    with tarfile.open(context.zen_bundle, 'w:gz') as archive:
+        archive.add(unpacked / 'zen-mcp-bundle', arcname='zen-mcp-bundle')
 
 
 @given('установлен Zen MCP server')
 def step_zen_mcp_installed(context):
     """Проверить что Zen MCP установлен"""
-    zen_dir = Path.home() / '.zen-mcp-server'
+    zen_dir = context.settings.zen_env_link.parent
     context.zen_mcp_installed = zen_dir.exists()
 
     if context.zen_mcp_installed:
@@ -50,19 +97,20 @@ def step_zen_mcp_installed(context):
 @given('настроен файл .env с API-ключами')
 def step_env_with_api_keys(context):
     """Проверить наличие .env с API-ключами"""
-    _ensure_env_flags(context)
+    # .env уже разобран в снимок context.settings (before_scenario)
+    assert context.settings is not None
 
 
 @given('API-ключ Gemini настроен в .env')
 def step_gemini_key_configured(context):
     """Проверить наличие Gemini API ключа"""
-    _require_api_key(context, 'has_gemini_key', "GEMINI_API_KEY не настроен в .env")
+    _require_api_key(context, 'GEMINI_API_KEY', "GEMINI_API_KEY не настроен в .env")
 
 
 @given('API-ключ OpenAI настроен в .env')
 def step_openai_key_configured(context):
     """Проверить наличие OpenAI API ключа"""
-    _require_api_key(context, 'has_openai_key', "OPENAI_API_KEY не настроен в .env")
+    _require_api_key(context, 'OPENAI_API_KEY', "OPENAI_API_KEY не настроен в .env")
 
 
 @given('доступны Gemini и GPT-5')
@@ -71,7 +119,8 @@ def step_both_models_available(context):
     step_gemini_key_configured(context)
     step_openai_key_configured(context)
 
-    context.multiagent_available = context.has_gemini_key and context.has_openai_key
+    context.multiagent_available = (context.settings.is_set('GEMINI_API_KEY') and
+                                    context.settings.is_set('OPENAI_API_KEY'))
 
 
 @given('API-ключи не настроены')
@@ -91,10 +140,354 @@ def step_no_api_keys(context):
 @given('Zen MCP установлен через install-zen-mcp.sh')
 def step_zen_mcp_from_script(context):
     """Проверить установку через скрипт"""
-    zen_dir = Path.home() / '.zen-mcp-server'
-    env_link = zen_dir / '.env'
+    target = context.settings.zen_env_target
+    context.zen_mcp_via_script = target is not None and target.exists()
+
+
+@given('локальный репозиторий Zen MCP с зависимостью "{package}"')
+def step_local_zen_repository(context, package):
+    """Репозиторий-заменитель zen-mcp-server и wheelhouse его зависимости"""
+    from features.support.step_helpers import build_wheel
+
+    workdir = _offline_workdir(context)
+    build_wheel(workdir / 'wheels', package)
+
+    source = workdir / 'zen-src'
+    source.mkdir()
+    (source / 'server.py').write_text(f'import {package}\n', encoding='utf-8')
+    (source / 'requirements.txt').write_text(f'{package}\n', encoding='utf-8')
+    (source / '.env.example').write_text('GEMINI_API_KEY=\n', encoding='utf-8')
+    run = context.commands.run
+    run(['git', 'init', '-q'], cwd=source, check=True)
+    run(['git', 'add', '.'], cwd=source, check=True)
+    run(['git', '-c', 'user.name=Test User', '-c', 'user.email=test@example.com',
+         'commit', '-q', '-m', 'Initial commit'], cwd=source, check=True)
+
+    (workdir / 'project').mkdir()
+    (workdir / 'project' / '.env').write_text('GEMINI_API_KEY=test-key\n', encoding='utf-8')
+    (workdir / 'home').mkdir()
+    context.zen_dependency = package
+
+
+@when('я собираю офлайн-бандл Zen MCP')
+def step_create_zen_bundle(context):
+    """Собрать бандл; PyPI заменён локальным wheelhouse"""
+    workdir = _offline_workdir(context)
+    context.zen_bundle = workdir / 'dist' / 'zen-mcp-bundle.tar.gz'
+    result = _run_zen_installer(context, '--bundle', context.zen_bundle,
+                                PIP_FIND_LINKS=str(workdir / 'wheels'))
+    assert result.ok, f"Сборка бандла не удалась:\n{result.stdout}\n{result.stderr}"
+
+
+@when('я собираю обновлённый офлайн-бандл Zen MCP с зависимостью "{package}" версии "{version}"')
+def step_create_updated_zen_bundle(context, package, version):
+    """Новый коммит репозитория с новой версией зависимости и второй бандл"""
+    from features.support.step_helpers import build_wheel
+
+    workdir = _offline_workdir(context)
+    build_wheel(workdir / 'wheels', package, version)
+    source = workdir / 'zen-src'
+    (source / 'requirements.txt').write_text(f'{package}=={version}\n', encoding='utf-8')
+    run = context.commands.run
+    run(['git', '-c', 'user.name=Test User', '-c', 'user.email=test@example.com',
+         'commit', '-q', '-am', f'Bump {package} to {version}'], cwd=source, check=True)
+    context.zen_update_commit = run(['git', 'rev-parse', 'HEAD'], cwd=source,
+                                    check=True).stdout.strip()
+    context.zen_update_bundle = workdir / 'dist' / 'zen-mcp-bundle-update.tar.gz'
+    result = _run_zen_installer(context, '--bundle', context.zen_update_bundle,
+                                PIP_FIND_LINKS=str(workdir / 'wheels'))
+    assert result.ok, f"Сборка бандла не удалась:\n{result.stdout}\n{result.stderr}"
+
+
+@when('в бандле подменён файл зависимости')
+def step_tamper_zen_bundle(context):
+    """Заменить wheel зависимости в бандле другим содержимым"""
+    def tamper(bundle_dir):
+        wheel = next((bundle_dir / 'wheelhouse').glob('*.whl'))
+        with open(wheel, 'ab') as f:
+            f.write(b'\0')
+
+    _rewrite_bundle(context, tamper)
+
+
+@when('в манифесте бандла указана платформа "{platform}"')
+def step_zen_bundle_platform(context, platform):
+    """Подменить платформу в MANIFEST с пересчётом SHA256SUMS"""
+    import hashlib
+    import re
+
+    def retarget(bundle_dir):
+        manifest = bundle_dir / 'MANIFEST'
+        text = re.sub(r'(?m)^platform=.*$', f'platform={platform}',
+                      manifest.read_text(encoding='utf-8'))
+        manifest.write_text(text, encoding='utf-8')
+        digest = hashlib.sha256(manifest.read_bytes()).hexdigest()
+        sums = bundle_dir / 'SHA256SUMS'
+        sums.write_text(re.sub(r'(?m)^\w+(  \./MANIFEST)$', digest + r'\1',
+                               sums.read_text(encoding='utf-8')), encoding='utf-8')
+
+    _rewrite_bundle(context, retarget)
+
+
+@when('я устанавливаю Zen MCP из бандла без доступа к сети')
+def step_install_zen_offline(context):
+    """Установить из бандла, удалив исходный репозиторий и wheelhouse"""
+    import shutil
+
+    workdir = _offline_workdir(context)
+    shutil.rmtree(workdir / 'zen-src')
+    shutil.rmtree(workdir / 'wheels')
+    context.zen_install_result = _run_zen_installer(context, '--offline', context.zen_bundle,
+                                                    '--yes')
+    context.zen_install_dir = workdir / 'home' / '.zen-mcp-server'
+
+
+@when('я обновляю установленный Zen MCP из обновлённого бандла без доступа к сети')
+def step_update_zen_offline(context):
+    """Ответить "нет" на переустановку: обновление существующей установки"""
+    context.zen_install_result = _run_zen_installer(context, '--offline',
+                                                    context.zen_update_bundle, input='n\nn\n')
+
+
+@when('я запускаю установщик Zen MCP с опцией "{option}" без файла')
+def step_run_zen_installer_without_file(context, option):
+    """Опция, требующая путь к бандлу, последней в командной строке"""
+    context.zen_install_result = _run_zen_installer(context, option)
+
+
+@given('проект с файлом .env:')
+def step_settings_project_env(context):
+    """Записать .env временного проекта"""
+    (_settings_project(context) / '.env').write_text(context.text + '\n', encoding='utf-8')
+
+
+@given('в pyproject.toml проекта userdata "{key}" = "{value}"')
+def step_settings_project_userdata(context, key, value):
+    """Записать [tool.behave.userdata] временного проекта"""
+    (_settings_project(context) / 'pyproject.toml').write_text(
+        f'[tool.behave.userdata]\n{key} = "{value}"\n', encoding='utf-8')
+
+
+@given('в окружении процесса задано "{assignment}"')
+def step_settings_process_env(context, assignment):
+    """Переменная окружения процесса для снимка конфигурации"""
+    _settings_project(context)
+    key, value = assignment.split('=', 1)
+    context.settings_environ[key] = value
+
+
+@given('Zen MCP установлен со ссылкой на .env проекта')
+def step_settings_zen_link(context):
+    """Создать ~/.zen-mcp-server/.env как симлинк на .env проекта"""
+    project = _settings_project(context)
+    zen_dir = project / 'home' / '.zen-mcp-server'
+    zen_dir.mkdir()
+    (zen_dir / '.env').symlink_to(project / '.env')
+
+
+@when('я читаю конфигурацию проекта')
+def step_read_settings(context):
+    """Получить снимок через сервис конфигурации временного проекта"""
+    step_read_settings_times(context, 1)
+
+
+@when('я читаю конфигурацию проекта {count:d} раза')
+def step_read_settings_times(context, count):
+    """Получить снимок несколько раз одним сервисом"""
+    from features.support.settings import SettingsService
+
+    if getattr(context, 'project_settings_service', None) is None:
+        context.project_settings_service = SettingsService(
+            _settings_project(context), environ=context.settings_environ)
+    context.project_settings = [context.project_settings_service.snapshot()
+                                for _ in range(count)]
+
+
+@when('я меняю в .env проекта "{assignment}"')
+def step_change_settings_env(context, assignment):
+    """Переписать .env и сдвинуть mtime"""
+    env_file = _settings_project(context) / '.env'
+    env_file.write_text(assignment + '\n', encoding='utf-8')
+    stat = env_file.stat()
+    os.utime(env_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+@then('API-ключ "{key}" не настроен')
+def step_verify_key_not_set(context, key):
+    """Пустое значение и заглушка не считаются настроенным ключом"""
+    settings = context.project_settings[-1]
+    assert not settings.is_set(key), f"{key}={settings.get(key)!r} считается настроенным"
+
+
+@then('API-ключ "{key}" равен "{value}"')
+def step_verify_key_value(context, key, value):
+    """Проверить значение ключа с учётом приоритета слоёв"""
+    settings = context.project_settings[-1]
+    assert settings.is_set(key) and settings.get(key) == value, \
+        f"{key}={settings.get(key)!r}, ожидалось {value!r}"
+
+
+@then('переменная "{key}" конфигурации равна "{value}"')
+def step_verify_settings_variable(context, key, value):
+    """Проверить разобранную переменную .env (подстановка ${VAR})"""
+    settings = context.project_settings[-1]
+    expected = value.replace('$HOME', context.settings_environ['HOME'])
+    assert settings.get(key) == expected, f"{key}={settings.get(key)!r}, ожидалось {expected!r}"
 
-    context.zen_mcp_via_script = env_link.exists() and env_link.is_symlink()
+
+@then('userdata конфигурации содержит "{key}" = "{value}"')
+def step_verify_settings_userdata(context, key, value):
+    """Проверить userdata из pyproject.toml"""
+    userdata = context.project_settings[-1].userdata
+    assert userdata.get(key) == value, f"userdata: {dict(userdata)}"
+
+
+@then('число чтений источников конфигурации: {count:d}')
+def step_verify_settings_loads(context, count):
+    """Проверить число чтений файлов сервисом"""
+    loads = context.project_settings_service.loads
+    assert loads == count, f"Источники прочитаны {loads} раз(а), ожидалось {count}"
+
+
+@then('все чтения вернули один неизменяемый снимок')
+def step_verify_settings_shared(context):
+    """Один объект на все чтения; изменить его нельзя, передать в другой процесс можно"""
+    import dataclasses
+    import pickle
+
+    first = context.project_settings[0]
+    assert all(s is first for s in context.project_settings), "Снимок перестроен без изменений"
+    try:
+        first.dotenv['GEMINI_API_KEY'] = 'changed'
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("Значения снимка изменяемы")
+    try:
+        first.userdata = {}
+    except dataclasses.FrozenInstanceError:
+        pass
+    else:
+        raise AssertionError("Поля снимка изменяемы")
+    copy = pickle.loads(pickle.dumps(first))
+    assert copy == first and copy.get('GEMINI_API_KEY') == first.get('GEMINI_API_KEY'), \
+        "Снимок изменился после передачи через pickle"
+
+
+@then('ссылка .env Zen MCP указывает на .env проекта')
+def step_verify_settings_zen_link(context):
+    """Проверить ссылку .env установки Zen MCP в снимке"""
+    settings = context.project_settings[-1]
+    assert settings.zen_env_linked, \
+        f"{settings.zen_env_link} -> {settings.zen_env_target}, ожидалось {settings.env_file}"
+
+
+@given('журнал консультаций с сегментами по {size:d} КБ')
+def step_transcript_store(context, size):
+    """Журнал консультаций во временном каталоге с маленькими сегментами"""
+    from features.support.transcripts import TranscriptStore
+
+    _transcripts(context)
+    context.transcripts = TranscriptStore(context.transcripts.directory, segment_size=size * 1024)
+    context.recorded_consultations = {}
+
+
+@when('в журнал записано {count:d} консультаций по {specs:d} спецификациям')
+def step_record_many_consultations(context, count, specs):
+    """Дописать консультации, распределённые по спецификациям и фазам"""
+    phases = ('specify', 'plan', 'implement', 'defend', 'evaluate', 'review')
+    for i in range(count):
+        context.spec_number = f"{i % specs + 1:04d}"
+        context.consultation_phase = phases[i // specs % len(phases)]
+        model = 'gemini-2.5-pro' if i % 2 else 'gpt-5'
+        record = _record_consultation(context, model, f"prompt {i}",
+                                      f"Замечания к спецификации {context.spec_number}: {i}\n" * 5,
+                                      0.1 * (i % 10))
+        key = (record.spec, record.phase)
+        context.recorded_consultations[key] = context.recorded_consultations.get(key, 0) + 1
+
+
+@when('в журнал повторно записаны консультации спецификации "{spec}"')
+def step_record_duplicate_consultations(context, spec):
+    """Дописать копии уже сохранённых консультаций"""
+    store = context.transcripts
+    copies = list(store.iter_records(spec=spec))
+    for record in copies:
+        store.append(record)
+    context.duplicate_consultations = len(copies)
+
+
+@when('те же ответы моделей записаны для спецификации "{target}" из "{spec}"')
+def step_record_same_responses_for_other_spec(context, target, spec):
+    """Дописать консультации с теми же запросом и ответом, но другой спецификацией"""
+    from dataclasses import replace
+
+    store = context.transcripts
+    for record in list(store.iter_records(spec=spec)):
+        store.append(replace(record, spec=target))
+        key = (target, record.phase)
+        context.recorded_consultations[key] = context.recorded_consultations.get(key, 0) + 1
+
+
+@when('в каталоге журнала остались временные файлы прерванной компактизации')
+def step_transcripts_leftovers(context):
+    """Создать файлы, которые оставляет компактизация, прерванная до переименования"""
+    directory = context.transcripts.directory
+    context.transcript_leftovers = [directory / 'seg-000999.jsonl.gz.compact',
+                                    directory / 'seg-000999.jsonl.tmp']
+    for path in context.transcript_leftovers:
+        path.write_bytes(b'partial')
+
+
+@when('я выполняю компактизацию журнала')
+def step_compact_transcripts(context):
+    """Закрыть активный сегмент и объединить сегменты"""
+    context.transcripts.seal()
+    context.compaction = context.transcripts.compact()
+
+
+@then('журнал разбит на сжатые сегменты')
+def step_transcripts_segmented(context):
+    """Проверить сегментацию и сжатие"""
+    stats = context.transcripts.stats()
+    assert stats.sealed > 1, f"Закрытых сегментов: {stats.sealed}"
+    assert stats.bytes_on_disk < stats.bytes_raw, \
+        f"Сегменты не сжаты: {stats.bytes_on_disk} байт на диске из {stats.bytes_raw}"
+
+
+@then('по спецификации "{spec}" фазы "{phase}" найдены все её консультации')
+def step_transcripts_query(context, spec, phase):
+    """Проверить выборку по индексу спецификаций и фаз"""
+    store = context.transcripts
+    found = list(store.iter_records(spec=spec, phase=phase))
+    expected = context.recorded_consultations.get((spec, phase), 0)
+    assert expected and len(found) == expected, f"Найдено {len(found)} из {expected}"
+    read = len(store.segments_for(spec))
+    total = store.stats().segments
+    assert read < total, f"Выборка читает {read} сегментов из {total}"
+
+
+@then('компактизация удалила повторы, а консультации спецификации "{spec}" сохранены')
+def step_transcripts_compacted(context, spec):
+    """Проверить результат компактизации"""
+    assert context.compaction['removed'] == context.duplicate_consultations, \
+        f"Удалено {context.compaction['removed']} из {context.duplicate_consultations} повторов"
+    found = sum(1 for _ in context.transcripts.iter_records(spec=spec))
+    expected = sum(n for (s, _p), n in context.recorded_consultations.items() if s == spec)
+    assert found == expected, f"После компактизации {found} консультаций из {expected}"
+
+
+@then('консультации спецификации "{spec}" с теми же ответами сохранены')
+def step_transcripts_other_spec_kept(context, spec):
+    """Повтором считается только запись той же спецификации и фазы"""
+    step_transcripts_compacted(context, spec)
+
+
+@then('временные файлы прерванной компактизации удалены')
+def step_transcripts_leftovers_removed(context):
+    """Проверить, что остатки прерванной компактизации не копятся в каталоге"""
+    left = [p.name for p in context.transcript_leftovers if p.exists()]
+    assert not left, f"Остались временные файлы: {left}"
 
 
 # Note: @given('Zen MCP недоступен') уже определён в codev_installation_steps.py
@@ -108,40 +501,22 @@ def step_zen_mcp_unavailable_for_consultation(context):
 @when('я выполняю команду "mcp list"')
 def step_run_mcp_list(context):
     """Выполнить команду mcp list"""
-    try:
-        result = subprocess.run(
-            ['mcp', 'list'],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        context.mcp_list_output = result.stdout
-        context.mcp_list_returncode = result.returncode
-        context.mcp_list_succeeded = result.returncode == 0
-    except FileNotFoundError:
-        context.mcp_list_succeeded = False
-        context.mcp_list_output = ""
+    result = context.commands.run(['mcp', 'list'], timeout=10)
+    context.mcp_list_output = result.stdout
+    context.mcp_list_returncode = result.returncode
+    context.mcp_list_succeeded = result.ok
+    if result.error == 'not-found':
         context.mcp_list_error = "mcp command not found"
-    except subprocess.TimeoutExpired:
-        context.mcp_list_succeeded = False
-        context.mcp_list_error = "mcp list timeout"
+    elif result.error:
+        context.mcp_list_error = f"mcp list {result.error}"
 
 
 @when('я запрашиваю версию Zen MCP')
 def step_request_zen_version(context):
     """Запросить версию Zen MCP"""
-    try:
-        result = subprocess.run(
-            ['mcp', '--version'],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        context.zen_version_output = result.stdout
-        context.zen_version_succeeded = result.returncode == 0
-    except (FileNotFoundError, subprocess.TimeoutExpired):
-        context.zen_version_succeeded = False
-        context.zen_version_output = ""
+    result = context.commands.run(['mcp', '--version'], timeout=10)
+    context.zen_version_output = result.stdout if result.ok else ""
+    context.zen_version_succeeded = result.ok
 
 
 @when('я запрашиваю консультацию у Gemini Pro')
@@ -149,10 +524,11 @@ def step_request_gemini_consultation(context):
     """Симулировать запрос консультации у Gemini"""
     # В реальной реализации это бы делало API вызов через Zen MCP
     # Для теста просто проверяем что ключ настроен
-    _ensure_env_flags(context)
-    if context.has_gemini_key:
+    if context.settings.is_set('GEMINI_API_KEY'):
         context.gemini_response = "Mock response from Gemini Pro"
         context.gemini_consultation_succeeded = True
+        _record_consultation(context, 'gemini-2.5-pro', "Review the specification",
+                             context.gemini_response, 0.0)
     else:
         context.gemini_consultation_succeeded = False
 
@@ -160,10 +536,11 @@ def step_request_gemini_consultation(context):
 @when('я запрашиваю консультацию у GPT-5')
 def step_request_gpt5_consultation(context):
     """Симулировать запрос консультации у GPT-5"""
-    _ensure_env_flags(context)
-    if context.has_openai_key:
+    if context.settings.is_set('OPENAI_API_KEY'):
         context.gpt5_response = "Mock response from GPT-5"
         context.gpt5_consultation_succeeded = True
+        _record_consultation(context, 'gpt-5', "Review the specification",
+                             context.gpt5_response, 0.0)
     else:
         context.gpt5_consultation_succeeded = False
 
@@ -232,9 +609,10 @@ def step_verify_gemini_response(context):
 
 @then('контекст консультации сохранён')
 def step_verify_context_saved(context):
-    """Проверить сохранение контекста"""
-    # В реальной реализации проверялась бы БД или файл
+    """Проверить что консультация записана в журнал"""
     assert hasattr(context, 'gemini_response'), "Контекст не сохранён"
+    responses = [r.response for r in _transcripts(context).iter_records(model='gemini-2.5-pro')]
+    assert context.gemini_response in responses, "Консультация не записана в журнал"
 
 
 @then('получен ответ от GPT-5')
@@ -259,19 +637,74 @@ def step_verify_both_responses(context):
     assert hasattr(context, 'gpt5_response'), "Ответ от GPT-5 отсутствует"
 
 
+def _dedupe_responses(context, responses=None):
+    """Кластеры почти одинаковых замечаний ответов моделей"""
+    from features.support.similarity import dedupe
+
+    if responses is None:
+        responses = {'gemini-2.5-pro': context.gemini_response, 'gpt-5': context.gpt5_response}
+    context.dedup_report = dedupe(responses)
+    return context.dedup_report
+
+
 @then('ответы имеют различные перспективы')
 def step_verify_different_perspectives(context):
-    """Проверить различие перспектив"""
-    # В реальной реализации сравнивались бы ответы
-    assert context.gemini_response != context.gpt5_response, \
-        "Ответы идентичны, различные перспективы не обнаружены"
+    """Проверить, что ответы не повторяют друг друга целиком"""
+    report = _dedupe_responses(context)
+    assert report.overlap < 1.0, \
+        "Ответы совпадают по всем пунктам, различные перспективы не обнаружены"
 
 
 @then('найдены дополнительные инсайты')
 def step_verify_additional_insights(context):
-    """Проверить наличие дополнительных инсайтов"""
-    # Проверка что оба ответа получены (мультиагентный подход дал больше информации)
+    """Проверить, что каждая модель добавила свои замечания"""
     assert hasattr(context, 'multiagent_succeeded') and context.multiagent_succeeded
+    report = getattr(context, 'dedup_report', None) or _dedupe_responses(context)
+    contributors = {cluster.models[0] for cluster in report.unique}
+    assert len(contributors) > 1, \
+        f"Уникальные замечания только от {', '.join(contributors) or 'никого'}"
+
+
+@given('ответ модели "{model}":')
+def step_model_response(context, model):
+    """Ответ модели из docstring"""
+    context.model_responses = getattr(context, 'model_responses', {})
+    context.model_responses[model] = context.text
+
+
+@when('я объединяю похожие замечания моделей')
+def step_merge_similar_suggestions(context):
+    """Кластеризовать замечания всех ответов"""
+    _dedupe_responses(context, context.model_responses)
+
+
+@then('найдено {shared:d} общих замечания и {unique:d} уникальных')
+def step_verify_suggestion_clusters(context, shared, unique):
+    """Проверить число общих и уникальных кластеров"""
+    report = context.dedup_report
+    clusters = '\n'.join(f"  [{', '.join(c.models)}] {c.representative.text}"
+                         for c in report.clusters)
+    assert len(report.shared) == shared and len(report.unique) == unique, \
+        f"Общих {len(report.shared)}, уникальных {len(report.unique)}:\n{clusters}"
+
+
+@then('замечание "{text}" поддержано моделями {models}')
+def step_verify_suggestion_models(context, text, models):
+    """Проверить модели, высказавшие замечание"""
+    expected = [m.strip().strip('"') for m in models.split(',')]
+    for cluster in context.dedup_report.clusters:
+        if any(point.text == text for point in cluster.points):
+            assert sorted(cluster.models) == sorted(expected), \
+                f"Замечание поддержано {cluster.models}, ожидалось {expected}"
+            return
+    raise AssertionError(f"Замечание '{text}' не найдено")
+
+
+@then('оценка пересечения ответов больше {value:f}')
+def step_verify_overlap(context, value):
+    """Проверить долю повторённых пунктов"""
+    assert context.dedup_report.overlap > value, \
+        f"Оценка пересечения {context.dedup_report.overlap:.2f} не больше {value}"
 
 
 @then('возвращается сообщение об ошибке')
@@ -291,34 +724,104 @@ def step_verify_api_key_error(context):
 @then('~/.zen-mcp-server/.env является симлинком')
 def step_verify_env_is_symlink(context):
     """Проверить что .env это символическая ссылка"""
-    zen_env = Path.home() / '.zen-mcp-server' / '.env'
+    zen_env = context.settings.zen_env_link
 
     if zen_env.exists():
-        assert zen_env.is_symlink(), "~/.zen-mcp-server/.env не является симлинком"
+        assert context.settings.zen_env_target is not None, f"{zen_env} не является симлинком"
 
 
-@then('симлинк указывает на /srv/anygen/.env')
+@then('симлинк указывает на .env проекта')
 def step_verify_symlink_target(context):
     """Проверить цель симлинка"""
-    zen_env = Path.home() / '.zen-mcp-server' / '.env'
-
-    if zen_env.exists() and zen_env.is_symlink():
-        target = zen_env.resolve()
-        expected = Path('/srv/anygen/.env')
+    settings = context.settings
 
-        assert target == expected, \
-            f"Симлинк указывает на {target}, ожидалось {expected}"
+    if settings.zen_env_target is not None:
+        assert settings.zen_env_linked, \
+            f"Симлинк указывает на {settings.zen_env_target}, ожидалось {settings.env_file}"
 
 
 @then('изменения в .env проекта отражаются в Zen MCP')
 def step_verify_env_changes_reflected(context):
     """Проверить что изменения .env отражаются"""
-    project_env = Path('/srv/anygen/.env')
-    zen_env = Path.home() / '.zen-mcp-server' / '.env'
-
-    if zen_env.is_symlink():
-        # Проверить что оба файла идентичны
-        assert zen_env.resolve() == project_env
+    settings = context.settings
+
+    if settings.zen_env_target is not None:
+        # Проверить что оба пути ведут к одному файлу
+        assert settings.zen_env_link.resolve() == settings.env_file.resolve()
+
+
+@then('Zen MCP установлен из бандла')
+def step_verify_zen_offline_install(context):
+    """Проверить установку и источник обновлений"""
+    result = context.zen_install_result
+    assert result.ok, f"Установка из бандла не удалась:\n{result.stdout}\n{result.stderr}"
+    assert (context.zen_install_dir / 'server.py').exists(), "Репозиторий Zen MCP не развёрнут"
+    origin = context.commands.run(['git', 'remote', 'get-url', 'origin'],
+                                  cwd=context.zen_install_dir, check=True)
+    assert origin.stdout.strip() == str(_offline_workdir(context) / 'zen-src'), \
+        f"origin установки: {origin.stdout.strip()}"
+
+
+@then('зависимость Zen MCP установлена в его окружение')
+def step_verify_zen_dependency(context):
+    """Проверить импорт зависимости в .zen_venv"""
+    python = context.zen_install_dir / '.zen_venv' / 'bin' / 'python'
+    result = context.commands.run([python, '-c', f'import {context.zen_dependency}'],
+                                  memoize=False)
+    assert result.ok, f"Зависимость не установлена: {result.stderr}"
+
+
+@then('.env установки Zen MCP является симлинком на .env проекта')
+def step_verify_offline_env_symlink(context):
+    """Проверить симлинк .env на абсолютный путь проекта"""
+    zen_env = context.zen_install_dir / '.env'
+    project_env = _offline_workdir(context) / 'project' / '.env'
+    assert zen_env.is_symlink(), f"{zen_env} не является симлинком"
+    assert Path(os.readlink(zen_env)) == project_env, \
+        f"Симлинк указывает на {os.readlink(zen_env)}, ожидалось {project_env}"
+
+
+@then('Zen MCP обновлён из бандла до новой версии "{package}" {version}')
+def step_verify_zen_offline_update(context, package, version):
+    """Проверить, что обновление развернуло коммит и зависимости нового бандла"""
+    result = context.zen_install_result
+    assert result.ok, f"Обновление из бандла не удалось:\n{result.stdout}\n{result.stderr}"
+    head = context.commands.run(['git', 'rev-parse', 'HEAD'], cwd=context.zen_install_dir,
+                                check=True).stdout.strip()
+    assert head == context.zen_update_commit, f"Установка на {head}, ожидался {context.zen_update_commit}"
+    python = context.zen_install_dir / '.zen_venv' / 'bin' / 'python'
+    installed = context.commands.run([python, '-c', f'import {package}; print({package}.VERSION)'],
+                                     memoize=False)
+    assert installed.stdout.strip() == version, \
+        f"В окружении {package} {installed.stdout.strip() or installed.stderr}, ожидалась {version}"
+
+
+@then('установка из бандла прервана с ошибкой "{message}"')
+def step_verify_zen_bundle_rejected_with(context, message):
+    """Проверить отказ с сообщением до развёртывания"""
+    result = context.zen_install_result
+    assert not result.ok, "Бандл установлен несмотря на ошибку"
+    assert message in result.stderr, result.stderr
+    assert not context.zen_install_dir.exists(), "Каталог установки создан несмотря на ошибку"
+
+
+@then('установщик Zen MCP завершился с ошибкой использования "{message}"')
+def step_verify_zen_installer_usage_error(context, message):
+    """Понятная ошибка и справка вместо падения на непривязанной переменной"""
+    result = context.zen_install_result
+    assert result.returncode == 1, f"Код возврата {result.returncode}:\n{result.stderr}"
+    assert message in result.stderr, result.stderr
+    assert 'unbound variable' not in result.stderr, result.stderr
+    assert 'Использование:' in result.stdout, result.stdout
+
+
+@then('установка из бандла прервана с ошибкой контрольных сумм')
+def step_verify_zen_bundle_rejected(context):
+    """Проверить отказ до развёртывания"""
+    result = context.zen_install_result
+    assert not result.ok, "Повреждённый бандл установлен"
+    assert 'Контрольные суммы бандла не совпадают' in result.stderr, result.stderr
+    assert not context.zen_install_dir.exists(), "Каталог установки создан несмотря на ошибку"
 
 
 @then('автоматически используется SPIDER-SOLO')
@@ -0,0 +1,3 @@
+"""
+Вспомогательные модули для работы с документами и протоколами Codev
+"""
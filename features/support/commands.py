@@ -0,0 +1,226 @@
+"""
+Единый слой запуска внешних команд (git, mcp) для step-модулей
+
+CommandRunner ограничивает число одновременно запущенных процессов,
+записывает длительность и код возврата каждой команды, запоминает на
+время прогона результаты идемпотентных команд (например mcp --version)
+и не бросает исключений при отсутствии программы или таймауте - это
+отражается в CommandResult.error.
+
+Режимы (переменная окружения CODEV_COMMANDS):
+- live   - обычный запуск (по умолчанию);
+- record - запуск с сохранением результатов в fixtures;
+- replay - результаты берутся из fixtures, процессы не запускаются.
+Записываются и воспроизводятся только программы из replay_programs
+(по умолчанию mcp): git создаёт файлы, которые нужны следующим шагам.
+
+Команды mcp выполняют сценарии с тегом @mcp-commands. Записи для них
+снимаются только на машине с установленным Zen MCP:
+    CODEV_COMMANDS=record behave features --lang=ru --tags=@mcp-commands
+и попадают в features/fixtures/commands; после этого те же сценарии
+проходят без mcp с CODEV_COMMANDS=replay. Записи в репозитории пока нет,
+руками их не пишут.
+"""
+import hashlib
+import json
+import os
+import subprocess
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+MODE_ENV = 'CODEV_COMMANDS'
+FIXTURES_ENV = 'CODEV_COMMANDS_FIXTURES'
+JOBS_ENV = 'CODEV_COMMANDS_JOBS'
+
+MODES = ('live', 'record', 'replay')
+DEFAULT_TIMEOUT = 10
+DEFAULT_FIXTURES_DIR = Path(__file__).resolve().parent.parent / 'fixtures' / 'commands'
+REPLAY_PROGRAMS = ('mcp',)
+# Сколько последних команд хранится для отчёта
+LOG_SIZE = 1000
+
+NOT_FOUND_CODE = 127
+TIMEOUT_CODE = 124
+
+
+@dataclass
+class CommandResult:
+    """Результат внешней команды"""
+    argv: List[str]
+    returncode: int
+    stdout: str = ''
+    stderr: str = ''
+    duration: float = 0.0
+    error: Optional[str] = None     # not-found, timeout, missing-fixture
+    source: str = 'run'             # run, memo, replay
+
+    @property
+    def ok(self) -> bool:
+        return self.returncode == 0 and self.error is None
+
+
+class CommandError(subprocess.CalledProcessError):
+    """Команда завершилась с ошибкой при check=True"""
+
+    def __init__(self, result: CommandResult):
+        super().__init__(result.returncode, result.argv, result.stdout, result.stderr)
+        self.result = result
+
+    def __str__(self):
+        reason = self.result.error or f'exit status {self.returncode}'
+        return f"Command {' '.join(self.cmd)} failed: {reason}"
+
+
+def is_idempotent(argv: Sequence[str]) -> bool:
+    """Команды, результат которых не меняется в течение прогона"""
+    return len(argv) >= 2 and argv[-1] in ('--version', '-V', 'version')
+
+
+@dataclass
+class CommandStats:
+    """Сводка по выполненным командам"""
+    run: int = 0
+    memo: int = 0
+    replay: int = 0
+    failed: int = 0
+    duration: float = 0.0
+    by_program: Dict[str, float] = field(default_factory=dict)
+
+
+class CommandRunner:
+    """Запуск команд с лимитом параллельности, мемоизацией и record/replay"""
+
+    def __init__(self, mode: str = 'live', fixtures_dir: Optional[Path] = None,
+                 max_concurrency: Optional[int] = None,
+                 replay_programs: Sequence[str] = REPLAY_PROGRAMS):
+        if mode not in MODES:
+            raise ValueError(f"Неизвестный режим команд: {mode} (ожидается {', '.join(MODES)})")
+        self.mode = mode
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else DEFAULT_FIXTURES_DIR
+        self.replay_programs = tuple(replay_programs)
+        self.max_concurrency = max_concurrency or os.cpu_count() or 4
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._lock = threading.Lock()
+        self._memo: Dict[tuple, CommandResult] = {}
+        self.log: List[CommandResult] = []
+        self.active = 0
+        self.peak_concurrency = 0
+
+    @classmethod
+    def from_env(cls) -> 'CommandRunner':
+        jobs = os.environ.get(JOBS_ENV)
+        return cls(mode=os.environ.get(MODE_ENV, 'live'),
+                   fixtures_dir=os.environ.get(FIXTURES_ENV) or None,
+                   max_concurrency=int(jobs) if jobs else None)
+
+    # ------------------------------------------------------------------
+
+    def run(self, argv: Sequence[str], cwd=None, timeout: Optional[float] = DEFAULT_TIMEOUT,
+            input: Optional[str] = None, env: Optional[dict] = None,
+            memoize: Optional[bool] = None, check: bool = False) -> CommandResult:
+        """Выполнить команду (или взять результат из памяти/fixtures)"""
+        argv = [str(a) for a in argv]
+        if memoize is None:
+            memoize = is_idempotent(argv)
+        memo_key = (tuple(argv), input)
+
+        result = None
+        if memoize:
+            with self._lock:
+                cached = self._memo.get(memo_key)
+            if cached is not None:
+                result = CommandResult(**{**asdict(cached), 'source': 'memo', 'duration': 0.0})
+
+        if result is None:
+            replayable = Path(argv[0]).name in self.replay_programs
+            if self.mode == 'replay' and replayable:
+                result = self._replay(argv, input)
+            else:
+                result = self._execute(argv, cwd, timeout, input, env)
+                if self.mode == 'record' and replayable:
+                    self._record(result, input)
+            if memoize and result.error != 'missing-fixture':
+                with self._lock:
+                    self._memo[memo_key] = result
+
+        with self._lock:
+            self.log.append(result)
+            del self.log[:-LOG_SIZE]
+        if check and not result.ok:
+            raise CommandError(result)
+        return result
+
+    def _execute(self, argv, cwd, timeout, input, env) -> CommandResult:
+        with self._slots:
+            with self._lock:
+                self.active += 1
+                self.peak_concurrency = max(self.peak_concurrency, self.active)
+            started = time.perf_counter()
+            try:
+                completed = subprocess.run(argv, cwd=cwd, input=input, env=env, timeout=timeout,
+                                           capture_output=True, text=True)
+                result = CommandResult(argv, completed.returncode,
+                                       completed.stdout, completed.stderr)
+            except FileNotFoundError:
+                result = CommandResult(argv, NOT_FOUND_CODE, error='not-found',
+                                       stderr=f'{argv[0]}: command not found')
+            except subprocess.TimeoutExpired as e:
+                result = CommandResult(argv, TIMEOUT_CODE, error='timeout',
+                                       stdout=_text(e.stdout), stderr=_text(e.stderr))
+            finally:
+                with self._lock:
+                    self.active -= 1
+            result.duration = time.perf_counter() - started
+        return result
+
+    # ------------------------------------------------------------------
+    # Record / replay
+    # ------------------------------------------------------------------
+
+    def fixture_path(self, argv: Sequence[str], input: Optional[str] = None) -> Path:
+        payload = json.dumps({'argv': list(argv), 'input': input}, ensure_ascii=False)
+        digest = hashlib.sha1(payload.encode('utf-8')).hexdigest()[:12]
+        return self.fixtures_dir / f'{Path(argv[0]).name}-{digest}.json'
+
+    def _record(self, result: CommandResult, input: Optional[str]):
+        path = self.fixture_path(result.argv, input)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        data = asdict(result)
+        data.update(input=input, duration=round(result.duration, 4))
+        del data['source']
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        os.replace(tmp, path)
+
+    def _replay(self, argv: List[str], input: Optional[str]) -> CommandResult:
+        path = self.fixture_path(argv, input)
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return CommandResult(argv, NOT_FOUND_CODE, error='missing-fixture', source='replay',
+                                 stderr=f'нет записи команды: {path.name}')
+        data.pop('input', None)
+        return CommandResult(**{**data, 'argv': argv, 'source': 'replay'})
+
+    # ------------------------------------------------------------------
+
+    def stats(self) -> CommandStats:
+        stats = CommandStats()
+        with self._lock:
+            log = list(self.log)
+        for result in log:
+            setattr(stats, result.source, getattr(stats, result.source) + 1)
+            stats.failed += 0 if result.ok else 1
+            stats.duration += result.duration
+            program = Path(result.argv[0]).name
+            stats.by_program[program] = stats.by_program.get(program, 0.0) + result.duration
+        return stats
+
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    return value.decode('utf-8', 'replace') if isinstance(value, bytes) else value
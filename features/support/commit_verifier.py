@@ -0,0 +1,299 @@
+"""
+Потоковая проверка истории git по соглашениям SPIDER и Conventional Commits
+
+git log читается одним проходом из канала: записи разделяются символом
+\\x1e и разбираются по мере поступления, в памяти держатся только
+счётчики, коммиты фаз плана и ограниченный список нарушений, поэтому
+история в сотни тысяч коммитов проверяется с постоянным расходом памяти.
+
+Форматы зашиты в SPEC_PREFIX_RE и CONVENTIONAL_RE и повторяют раздел
+"Интеграция с Git" протокола SPIDER; при изменении раздела
+выражения нужно обновить вручную:
+    [Spec 0001] Первоначальный черновик спецификации
+    [Spec 0001][Phase: user-auth] feat: Добавлен сервис хеширования паролей
+Коммит фазы должен следовать Conventional Commits
+(<тип>[(область)][!]: <описание>); коммиты без префикса [Spec ####]
+проверяются по Conventional Commits, с --require-spec это ошибка.
+
+Фазы коммитов сопоставляются с фазами плана ("### Фаза 1: Подготовка"):
+по номеру ("1", "phase-1") или по имени в виде slug ("подготовка").
+
+Использование:
+    python -m features.support.commit_verifier
+    python -m features.support.commit_verifier main..HEAD --plan codev/plans/0001-auth.md
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from features.support.doc_graph import PHASE_HEADING_RE, parse_plan_phases
+from features.support.documents import parse_document_name
+from features.support.protocol_validator import Finding
+
+CONVENTIONAL_TYPES = ('feat', 'fix', 'docs', 'style', 'refactor', 'perf', 'test',
+                      'build', 'ci', 'chore', 'revert')
+CONVENTIONAL_RE = re.compile(
+    r'^(?P<type>[A-Za-z]+)(?:\((?P<scope>[^()\r\n]+)\))?(?P<breaking>!)?: (?P<description>\S.*)$')
+SPEC_PREFIX_RE = re.compile(r'^\[Spec (?P<spec>\d{4})\](?:\[Phase: (?P<phase>[^\]]+)\])?\s*')
+PHASE_NUMBER_RE = re.compile(r'^(?:(?:phase|фаза)[-\s]*)?(\d+)$', re.IGNORECASE)
+MAX_HEADER = 100
+MAX_FINDINGS = 1000
+
+RECORD_SEP = b'\x1e'
+FIELD_SEP = '\x1f'
+LOG_FORMAT = '%H%x1f%s%x1f%b%x1e'
+CHUNK_SIZE = 1 << 16
+
+
+@dataclass
+class Commit:
+    """Коммит из потока git log"""
+    sha: str
+    subject: str
+    body: str = ''
+
+
+@dataclass
+class PlanPhase:
+    """Фаза плана и найденные для неё коммиты"""
+    ordinal: int
+    name: str
+    slug: str
+    commits: int = 0
+    first: Optional[str] = None
+
+
+@dataclass
+class VerifyReport:
+    """Итог проверки истории"""
+    commits: int = 0
+    spec_commits: int = 0
+    phase_commits: int = 0
+    conventional: int = 0
+    phases: List[PlanPhase] = field(default_factory=list)
+    findings: List[Finding] = field(default_factory=list)
+    dropped_findings: int = 0
+
+    @property
+    def errors(self) -> List[Finding]:
+        return [f for f in self.findings if f.severity == 'error']
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def slugify(text: str) -> str:
+    """'Схема базы данных' -> 'схема-базы-данных'"""
+    return re.sub(r'[^\w]+', '-', text.strip().lower()).strip('-')
+
+
+def plan_phases(plan: Path) -> List[PlanPhase]:
+    """Фазы плана с именами для сопоставления с [Phase: ...]"""
+    phases = []
+    for phase in parse_plan_phases(Path(plan).read_text(encoding='utf-8')):
+        title = PHASE_HEADING_RE.sub('', phase['title']).lstrip(' :.-—')
+        title = re.sub(r'\s*\[[^\]]*\]\s*$', '', title)
+        phases.append(PlanPhase(phase['ordinal'], title, slugify(title)))
+    return phases
+
+
+def iter_commits(repo: Path, revision_range: Optional[str] = None,
+                 no_merges: bool = True) -> Iterator[Commit]:
+    """Коммиты из git log, разобранные по мере чтения канала"""
+    command = ['git', 'log', f'--format={LOG_FORMAT}']
+    if no_merges:
+        command.append('--no-merges')
+    if revision_range:
+        command.append(revision_range)
+    process = subprocess.Popen(command, cwd=repo, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    try:
+        yield from parse_log_stream(iter(lambda: process.stdout.read(CHUNK_SIZE), b''))
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+        process.stderr.close()
+        code = process.wait()
+    # Пустой репозиторий без коммитов - не ошибка
+    if code != 0 and 'does not have any commits' not in stderr:
+        raise RuntimeError(f"git log завершился с кодом {code}: {stderr.strip()}")
+
+
+def parse_log_stream(chunks: Iterable[bytes]) -> Iterator[Commit]:
+    """Разбор потока записей LOG_FORMAT, разделённых \\x1e"""
+    pending = b''
+    for chunk in chunks:
+        pending += chunk
+        *records, pending = pending.split(RECORD_SEP)
+        for record in records:
+            commit = _parse_record(record)
+            if commit:
+                yield commit
+    commit = _parse_record(pending)
+    if commit:
+        yield commit
+
+
+def _parse_record(record: bytes) -> Optional[Commit]:
+    text = record.decode('utf-8', 'replace').lstrip('\n')
+    if not text.strip():
+        return None
+    sha, subject, body = (text.split(FIELD_SEP, 2) + ['', ''])[:3]
+    return Commit(sha, subject, body.strip())
+
+
+class CommitVerifier:
+    """Проверка коммитов по одному с накоплением итогов"""
+
+    def __init__(self, phases: Optional[List[PlanPhase]] = None, spec: Optional[str] = None,
+                 require_spec: bool = False, max_findings: int = MAX_FINDINGS):
+        self.report = VerifyReport(phases=list(phases or []))
+        self.spec = spec
+        self.require_spec = require_spec
+        self.max_findings = max_findings
+        self._by_key: Dict[str, PlanPhase] = {}
+        for phase in self.report.phases:
+            for key in (str(phase.ordinal), phase.slug):
+                self._by_key.setdefault(key, phase)
+
+    def _finding(self, severity: str, code: str, commit: Commit, message: str):
+        if len(self.report.findings) >= self.max_findings:
+            self.report.dropped_findings += 1
+            return
+        self.report.findings.append(Finding(severity, code, commit.sha[:12], 0,
+                                            f"{message}: {commit.subject[:MAX_HEADER]}"))
+
+    def match_phase(self, name: str) -> Optional[PlanPhase]:
+        number = PHASE_NUMBER_RE.match(name.strip())
+        if number:
+            return self._by_key.get(number.group(1))
+        return self._by_key.get(slugify(name))
+
+    def check(self, commit: Commit):
+        report = self.report
+        report.commits += 1
+        header = commit.subject
+        if len(header) > MAX_HEADER:
+            self._finding('warning', 'commit-header-length', commit,
+                          f"заголовок длиннее {MAX_HEADER} символов")
+
+        prefix = SPEC_PREFIX_RE.match(header)
+        if prefix:
+            report.spec_commits += 1
+            rest = header[prefix.end():]
+            if prefix.group('phase') is None:
+                # Коммиты документов спецификации и плана: свободное описание
+                if not rest:
+                    self._finding('error', 'commit-empty', commit, "нет описания после [Spec ####]")
+                return
+            report.phase_commits += 1
+            self._check_conventional(commit, rest)
+            if self.spec is None or prefix.group('spec') == self.spec:
+                self._check_phase(commit, prefix.group('phase'))
+            return
+
+        if self.require_spec:
+            self._finding('error', 'commit-no-spec', commit, "нет префикса [Spec ####]")
+        self._check_conventional(commit, header)
+
+    def _check_conventional(self, commit: Commit, header: str) -> bool:
+        match = CONVENTIONAL_RE.match(header)
+        if not match:
+            self._finding('error', 'commit-conventional', commit,
+                          "не соответствует Conventional Commits (<тип>[(область)]: <описание>)")
+            return False
+        self.report.conventional += 1
+        if match.group('type').lower() not in CONVENTIONAL_TYPES:
+            self._finding('warning', 'commit-type', commit,
+                          f"неизвестный тип '{match.group('type')}'")
+        return True
+
+    def _check_phase(self, commit: Commit, name: str):
+        if not self.report.phases:
+            return
+        phase = self.match_phase(name)
+        if phase is None:
+            self._finding('error', 'commit-phase-unknown', commit,
+                          f"фазы '{name}' нет в плане")
+            return
+        phase.commits += 1
+        # git log идёт от новых к старым: последний увиденный - первый коммит фазы
+        phase.first = commit.sha[:12]
+
+    def finish(self) -> VerifyReport:
+        for phase in self.report.phases:
+            if phase.commits == 0:
+                self.report.findings.append(Finding(
+                    'error', 'phase-no-commits', f"Фаза {phase.ordinal}", 0,
+                    f"для фазы '{phase.name}' нет коммитов [Phase: {phase.slug}]"))
+        return self.report
+
+
+def verify(repo: Path, revision_range: Optional[str] = None, plan: Optional[Path] = None,
+           require_spec: bool = False, no_merges: bool = True,
+           max_findings: int = MAX_FINDINGS) -> VerifyReport:
+    """Проверить историю репозитория (и покрытие фаз плана коммитами)"""
+    phases, spec = None, None
+    if plan is not None:
+        phases = plan_phases(plan)
+        spec, _slug = parse_document_name(Path(plan).name)
+    verifier = CommitVerifier(phases, spec, require_spec, max_findings)
+    for commit in iter_commits(repo, revision_range, no_merges):
+        verifier.check(commit)
+    return verifier.finish()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-verify-commits',
+        description='Проверка истории git по соглашениям SPIDER и Conventional Commits')
+    parser.add_argument('range', nargs='?', default=None,
+                        help='диапазон ревизий git log (по умолчанию вся история HEAD)')
+    parser.add_argument('--repo', type=Path, default=Path(os.getcwd()))
+    parser.add_argument('--plan', type=Path, default=None,
+                        help='план, фазы которого должны иметь коммиты')
+    parser.add_argument('--require-spec', action='store_true',
+                        help='считать ошибкой коммиты без префикса [Spec ####]')
+    parser.add_argument('--merges', action='store_true', help='проверять и merge-коммиты')
+    parser.add_argument('--max-findings', type=int, default=MAX_FINDINGS)
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    report = verify(args.repo, args.range, args.plan, args.require_spec,
+                    no_merges=not args.merges, max_findings=args.max_findings)
+
+    if args.json:
+        print(json.dumps({
+            'commits': report.commits,
+            'spec_commits': report.spec_commits,
+            'phase_commits': report.phase_commits,
+            'conventional': report.conventional,
+            'phases': [asdict(p) for p in report.phases],
+            'findings': [asdict(f) for f in report.findings],
+            'dropped_findings': report.dropped_findings,
+        }, ensure_ascii=False, indent=2))
+    else:
+        for f in report.findings:
+            print(f"{f.path}: {f.severity}: [{f.code}] {f.message}")
+        if report.dropped_findings:
+            print(f"... и ещё {report.dropped_findings} нарушений")
+        for phase in report.phases:
+            print(f"Фаза {phase.ordinal} ({phase.slug}): {phase.commits} commit(s)")
+        print(f"commits={report.commits} spec={report.spec_commits} "
+              f"phase={report.phase_commits} conventional={report.conventional} "
+              f"errors={len(report.errors)}")
+    return 0 if report.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Потоковые консультации: замечания моделей вносятся в спецификацию по мере поступления
+
+Ответ каждой модели читается частями (в своём потоке); части разбираются
+построчно: "## Раздел" задаёт раздел спецификации, строки-пункты
+("- ...", "* ...", "1. ...") становятся замечаниями к нему. Замечание
+сразу вносится в черновик спецификации в конец своего раздела (или в
+раздел "Замечания консультантов", если такого раздела нет); одинаковые
+замечания разных моделей объединяются. Поэтому работу над
+спецификацией можно начинать после первой части самого быстрого ответа.
+
+Время до первого замечания (time-to-first-feedback) и полное время
+ответа каждой модели возвращаются в ConsultationMetrics.
+
+Для тестов есть локальная заглушка, отдающая текст частями с задержкой:
+    python -m features.support.consultation_stream stub response.md --chunk 24 --delay 0.02
+
+Использование:
+    python -m features.support.consultation_stream merge codev/specs/0001-x.md \\
+        --model gemini=gemini.md --model gpt-5=gpt5.md
+"""
+import argparse
+import codecs
+import os
+import queue
+import re
+import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+from features.support.documents import parse_sections
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+FALLBACK_SECTION = 'Замечания консультантов'
+BULLET_RE = re.compile(r'^\s*(?:[-*+]|\d+[.)])\s+(?P<text>\S.*)$')
+HEADING_RE = re.compile(r'^\s*#{1,6}\s+(?P<heading>.+?)\s*#*\s*$')
+READ_SIZE = 4096
+
+
+@dataclass
+class Suggestion:
+    """Замечание модели к разделу спецификации"""
+    model: str
+    section: Optional[str]
+    text: str
+
+
+class SuggestionParser:
+    """Построчный разбор частей ответа одной модели"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.section: Optional[str] = None
+        self._pending = ''
+
+    def feed(self, chunk: str) -> List[Suggestion]:
+        self._pending += chunk
+        *lines, self._pending = self._pending.split('\n')
+        return [s for s in map(self._parse_line, lines) if s]
+
+    def close(self) -> List[Suggestion]:
+        line, self._pending = self._pending, ''
+        suggestion = self._parse_line(line)
+        return [suggestion] if suggestion else []
+
+    def _parse_line(self, line: str) -> Optional[Suggestion]:
+        heading = HEADING_RE.match(line)
+        if heading:
+            self.section = heading.group('heading')
+            return None
+        bullet = BULLET_RE.match(line)
+        if bullet:
+            return Suggestion(self.model, self.section, bullet.group('text').strip())
+        return None
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r'\W+', ' ', text).strip().lower()
+
+
+class SpecDraft:
+    """Черновик спецификации, в который вносятся замечания"""
+
+    def __init__(self, text: str):
+        self.lines = text.splitlines()
+        self.applied: List[Suggestion] = []
+        # Нормализованный текст замечания -> (номер строки, модели)
+        self._seen: Dict[str, tuple] = {}
+
+    @classmethod
+    def load(cls, path: Path) -> 'SpecDraft':
+        return cls(Path(path).read_text(encoding='utf-8'))
+
+    def text(self) -> str:
+        return '\n'.join(self.lines) + '\n'
+
+    def save(self, path: Path):
+        path = Path(path)
+        tmp = path.with_suffix(path.suffix + '.tmp')
+        tmp.write_text(self.text(), encoding='utf-8')
+        os.replace(tmp, path)
+
+    def _section_end(self, heading: str) -> Optional[int]:
+        """Индекс строки, после которой дописывается пункт раздела"""
+        wanted = _normalize(heading)
+        for section in parse_sections(self.text()):
+            if section.heading and _normalize(section.heading) == wanted:
+                end = section.end_line
+                while end > section.line and not self.lines[end - 1].strip():
+                    end -= 1
+                return end
+        return None
+
+    def apply(self, suggestion: Suggestion) -> bool:
+        """Внести замечание; False если такое уже внесено этой моделью"""
+        key = _normalize(suggestion.text)
+        if key in self._seen:
+            line, models = self._seen[key]
+            if suggestion.model in models:
+                return False
+            models.append(suggestion.model)
+            self.lines[line] = re.sub(r'\s*\([^()]*\)$', '', self.lines[line]) + \
+                f" ({', '.join(models)})"
+            self.applied.append(suggestion)
+            return True
+
+        end = self._section_end(suggestion.section) if suggestion.section else None
+        if end is None:
+            end = self._section_end(FALLBACK_SECTION)
+        if end is None:
+            if self.lines and self.lines[-1].strip():
+                self.lines.append('')
+            self.lines += [f'## {FALLBACK_SECTION}', '']
+            end = len(self.lines)
+        self.lines.insert(end, f"- {suggestion.text} ({suggestion.model})")
+        # Строки после вставки сдвигаются
+        for other, (line, models) in self._seen.items():
+            if line >= end:
+                self._seen[other] = (line + 1, models)
+        self._seen[key] = (end, [suggestion.model])
+        self.applied.append(suggestion)
+        return True
+
+
+@dataclass
+class ModelMetrics:
+    """Время ответа одной модели"""
+    model: str
+    first_chunk: Optional[float] = None
+    first_suggestion: Optional[float] = None
+    total: Optional[float] = None
+    chunks: int = 0
+    suggestions: int = 0
+    error: Optional[str] = None
+    response: str = ''
+
+
+@dataclass
+class ConsultationMetrics:
+    """Время до первого замечания и до последнего ответа"""
+    models: Dict[str, ModelMetrics] = field(default_factory=dict)
+
+    @property
+    def time_to_first_feedback(self) -> Optional[float]:
+        times = [m.first_suggestion for m in self.models.values() if m.first_suggestion is not None]
+        return min(times) if times else None
+
+    @property
+    def time_to_last_response(self) -> Optional[float]:
+        times = [m.total for m in self.models.values() if m.total is not None]
+        return max(times) if times else None
+
+
+def stub_stream(text: str, chunk_size: int = 24, delay: float = 0.02,
+                first_delay: float = 0.0) -> Iterator[str]:
+    """Текст частями по chunk_size символов с паузой между ними"""
+    if first_delay:
+        time.sleep(first_delay)
+    for start in range(0, len(text), chunk_size):
+        if start and delay:
+            time.sleep(delay)
+        yield text[start:start + chunk_size]
+
+
+def subprocess_stream(argv: Sequence[str], cwd: Optional[Path] = None) -> Iterator[str]:
+    """Вывод процесса по мере поступления"""
+    process = subprocess.Popen(list(argv), cwd=cwd or PROJECT_ROOT, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE)
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    try:
+        for data in iter(lambda: os.read(process.stdout.fileno(), READ_SIZE), b''):
+            text = decoder.decode(data)
+            if text:
+                yield text
+        tail = decoder.decode(b'', final=True)
+        if tail:
+            yield tail
+    finally:
+        process.stdout.close()
+        stderr = process.stderr.read().decode('utf-8', 'replace')
+        process.stderr.close()
+        code = process.wait()
+    if code != 0:
+        raise RuntimeError(f"{argv[0]} завершился с кодом {code}: {stderr.strip()}")
+
+
+def stub_command(response_file: Path, chunk_size: int = 24, delay: float = 0.02,
+                 first_delay: float = 0.0) -> List[str]:
+    """Команда локальной заглушки модели"""
+    return [sys.executable, '-m', 'features.support.consultation_stream', 'stub',
+            str(response_file), '--chunk', str(chunk_size), '--delay', str(delay),
+            '--first-delay', str(first_delay)]
+
+
+_DONE = object()
+
+
+def consult(streams: Dict[str, Iterable[str]], draft: SpecDraft,
+            on_update: Optional[Callable[[SpecDraft, Suggestion], None]] = None,
+            on_complete: Optional[Callable[[ModelMetrics], None]] = None
+            ) -> ConsultationMetrics:
+    """Читать ответы моделей параллельно и вносить замечания по мере разбора"""
+    metrics = ConsultationMetrics({name: ModelMetrics(name) for name in streams})
+    events: queue.Queue = queue.Queue()
+    started = time.perf_counter()
+
+    def read(name, stream):
+        try:
+            for chunk in stream:
+                events.put((name, chunk))
+        except Exception as e:
+            metrics.models[name].error = str(e)
+        events.put((name, _DONE))
+
+    threads = [threading.Thread(target=read, args=item, daemon=True, name=f'consult-{item[0]}')
+               for item in streams.items()]
+    for thread in threads:
+        thread.start()
+
+    parsers = {name: SuggestionParser(name) for name in streams}
+    active = len(threads)
+    while active:
+        name, chunk = events.get()
+        model = metrics.models[name]
+        elapsed = time.perf_counter() - started
+        if chunk is _DONE:
+            suggestions = parsers[name].close()
+            model.total = elapsed
+            active -= 1
+        else:
+            if model.first_chunk is None:
+                model.first_chunk = elapsed
+            model.chunks += 1
+            model.response += chunk
+            suggestions = parsers[name].feed(chunk)
+        for suggestion in suggestions:
+            if draft.apply(suggestion):
+                model.suggestions += 1
+                if model.first_suggestion is None:
+                    model.first_suggestion = time.perf_counter() - started
+                if on_update:
+                    on_update(draft, suggestion)
+        if chunk is _DONE and on_complete:
+            on_complete(model)
+    for thread in threads:
+        thread.join()
+    return metrics
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-consult-stream',
+        description='Потоковое внесение замечаний моделей в спецификацию')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    stub_cmd = sub.add_parser('stub', help='заглушка модели: вывести файл частями')
+    stub_cmd.add_argument('response', type=Path)
+    stub_cmd.add_argument('--chunk', type=int, default=24)
+    stub_cmd.add_argument('--delay', type=float, default=0.02)
+    stub_cmd.add_argument('--first-delay', type=float, default=0.0)
+
+    merge_cmd = sub.add_parser('merge', help='внести ответы заглушек в спецификацию')
+    merge_cmd.add_argument('spec', type=Path)
+    merge_cmd.add_argument('--model', action='append', required=True, metavar='NAME=FILE',
+                           help='модель и файл её ответа (отдаётся заглушкой частями)')
+    merge_cmd.add_argument('--delay', type=float, default=0.02)
+    merge_cmd.add_argument('--output', type=Path, default=None,
+                           help='куда записать черновик (по умолчанию в спецификацию)')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == 'stub':
+        text = args.response.read_text(encoding='utf-8')
+        for chunk in stub_stream(text, args.chunk, args.delay, args.first_delay):
+            sys.stdout.write(chunk)
+            sys.stdout.flush()
+        return 0
+
+    draft = SpecDraft.load(args.spec)
+    output = args.output or args.spec
+    streams = {}
+    for item in args.model:
+        name, _, response = item.partition('=')
+        streams[name] = subprocess_stream(stub_command(Path(response).resolve(),
+                                                       delay=args.delay))
+
+    def on_update(draft, suggestion):
+        draft.save(output)
+        print(f"+ [{suggestion.model}] {suggestion.section or FALLBACK_SECTION}: "
+              f"{suggestion.text}", flush=True)
+
+    metrics = consult(streams, draft, on_update)
+    for model in metrics.models.values():
+        first = f"{model.first_suggestion:.2f}s" if model.first_suggestion is not None else '-'
+        print(f"{model.model}: {model.suggestions} suggestion(s), first {first}, "
+              f"total {model.total:.2f}s" + (f", error: {model.error}" if model.error else ''))
+    feedback = metrics.time_to_first_feedback
+    print(f"time_to_first_feedback={feedback:.2f}s " if feedback is not None else
+          "time_to_first_feedback=- ", end='')
+    print(f"time_to_last_response={metrics.time_to_last_response:.2f}s")
+    return 1 if any(m.error for m in metrics.models.values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
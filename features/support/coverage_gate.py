@@ -0,0 +1,346 @@
+"""
+Измерение покрытия тестов проекта в том же процессе (фаза Defend)
+
+Тесты проекта запускаются через pytest.main() внутри текущего процесса,
+выполненные строки собираются:
+- на Python 3.12+ через sys.monitoring: обработчик события LINE
+  возвращает DISABLE, поэтому каждая строка обходится один раз, а
+  код вне измеряемого каталога сразу перестаёт генерировать события;
+- на более старых версиях через sys.settrace: построчная трассировка
+  включается только для фреймов файлов измеряемого каталога.
+
+Измеряется каталог src, а без него - весь проект, кроме каталога тестов,
+conftest.py, скрытых каталогов и виртуальных окружений (каталогов с
+pyvenv.cfg и site-packages).
+
+Исполняемые строки берутся из co_lines() скомпилированных модулей,
+строки с "pragma: no cover" не учитываются. Порог покрытия берётся из
+шаблонов протокола ("покрытием >90%"), по умолчанию 90%.
+
+Использование:
+    python -m features.support.coverage_gate path/to/project
+    python -m features.support.coverage_gate path/to/project --source src --threshold 95
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+DEFAULT_THRESHOLD = 90.0
+PRAGMA_RE = re.compile(r'#\s*pragma:\s*no\s*cover', re.IGNORECASE)
+THRESHOLD_RE = re.compile(r'(?:покрыти\w*|coverage)\s*>=?\s*(\d+(?:\.\d+)?)\s*%', re.IGNORECASE)
+
+# Каталоги, которые никогда не входят в измеряемый код
+SKIP_DIRS = ('__pycache__', 'site-packages', 'node_modules')
+
+# Свободные идентификаторы инструментов sys.monitoring в порядке предпочтения
+MONITORING_TOOL_IDS = (1, 3, 4)
+
+
+def executable_lines(path: Path) -> Set[int]:
+    """Номера строк, для которых компилятор генерирует байткод"""
+    source = path.read_text(encoding='utf-8')
+    try:
+        code = compile(source, str(path), 'exec', dont_inherit=True)
+    except SyntaxError:
+        return set()
+    lines = set()
+    stack = [code]
+    while stack:
+        current = stack.pop()
+        lines.update(line for _start, _end, line in current.co_lines() if line)
+        stack.extend(c for c in current.co_consts if hasattr(c, 'co_lines'))
+    excluded = {n for n, text in enumerate(source.splitlines(), 1) if PRAGMA_RE.search(text)}
+    return lines - excluded
+
+
+def _skipped_dir(path: Path) -> bool:
+    return (path.name.startswith('.') or path.name in SKIP_DIRS
+            or (path / 'pyvenv.cfg').exists())
+
+
+def source_files(source: Path, exclude: Sequence[Path] = ()) -> List[Path]:
+    """Измеряемые .py файлы source без exclude, тестов и виртуальных окружений"""
+    excluded = {str(Path(p).resolve()) for p in exclude}
+    files = []
+    for root, dirs, names in os.walk(source):
+        dirs[:] = sorted(d for d in dirs if not _skipped_dir(Path(root) / d)
+                         and str(Path(root, d).resolve()) not in excluded)
+        files.extend(Path(root) / name for name in sorted(names)
+                     if name.endswith('.py') and name != 'conftest.py')
+    return files
+
+
+class LineCollector:
+    """Сбор выполненных строк файлов из каталога source"""
+
+    def __init__(self, source: Path, files: Optional[Sequence[Path]] = None):
+        self.source = str(Path(source).resolve()) + os.sep
+        # Если список файлов задан, собираются только их строки
+        self.files = None if files is None else {str(Path(f).resolve()) for f in files}
+        self.lines: Dict[str, Set[int]] = {}
+        self.backend = 'sys.monitoring' if hasattr(sys, 'monitoring') else 'settrace'
+        self._wanted: Dict[str, bool] = {}
+        self._tool_id: Optional[int] = None
+        self._previous_trace = None
+        self._previous_thread_trace = None
+
+    def _is_wanted(self, filename: str) -> bool:
+        wanted = self._wanted.get(filename)
+        if wanted is None:
+            path = os.path.abspath(filename)
+            wanted = path.startswith(self.source) and (self.files is None or path in self.files)
+            self._wanted[filename] = wanted
+        return wanted
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def start(self):
+        if self.backend == 'sys.monitoring':
+            self._start_monitoring()
+        else:
+            self._previous_trace = sys.gettrace()
+            self._previous_thread_trace = threading.gettrace()
+            threading.settrace(self._trace_call)
+            sys.settrace(self._trace_call)
+
+    def stop(self):
+        if self.backend == 'sys.monitoring':
+            monitoring = sys.monitoring
+            monitoring.set_events(self._tool_id, 0)
+            monitoring.register_callback(self._tool_id, monitoring.events.LINE, None)
+            monitoring.free_tool_id(self._tool_id)
+            self._tool_id = None
+        else:
+            sys.settrace(self._previous_trace)
+            threading.settrace(self._previous_thread_trace)
+
+    # sys.monitoring (Python 3.12+)
+
+    def _start_monitoring(self):
+        monitoring = sys.monitoring
+        for tool_id in MONITORING_TOOL_IDS:
+            try:
+                monitoring.use_tool_id(tool_id, 'codev-coverage')
+            except ValueError:
+                continue
+            self._tool_id = tool_id
+            break
+        else:
+            raise RuntimeError('нет свободного идентификатора sys.monitoring для покрытия')
+        # restart_events() не вызывается: он включает события всех инструментов.
+        # Модули проекта импортируются заново внутри project_imports, поэтому
+        # DISABLE прошлых замеров на их код не распространяется
+        monitoring.register_callback(self._tool_id, monitoring.events.LINE, self._on_line)
+        monitoring.set_events(self._tool_id, monitoring.events.LINE)
+
+    def _on_line(self, code, line):
+        filename = code.co_filename
+        if self._is_wanted(filename):
+            self.lines.setdefault(os.path.abspath(filename), set()).add(line)
+        return sys.monitoring.DISABLE
+
+    # sys.settrace (Python < 3.12)
+
+    def _trace_call(self, frame, event, arg):
+        if event != 'call' or not self._is_wanted(frame.f_code.co_filename):
+            return None
+        return self._trace_line
+
+    def _trace_line(self, frame, event, arg):
+        if event == 'line':
+            filename = os.path.abspath(frame.f_code.co_filename)
+            self.lines.setdefault(filename, set()).add(frame.f_lineno)
+        return self._trace_line
+
+
+@dataclass
+class FileCoverage:
+    """Покрытие одного файла"""
+    path: str
+    statements: int
+    missing: List[int] = field(default_factory=list)
+
+    @property
+    def covered(self) -> int:
+        return self.statements - len(self.missing)
+
+
+@dataclass
+class CoverageReport:
+    """Результат прогона тестов с измерением покрытия"""
+    files: List[FileCoverage]
+    threshold: float
+    backend: str
+    exit_code: int = 0
+    passed: int = 0
+    failed: int = 0
+    duration: float = 0.0
+
+    @property
+    def statements(self) -> int:
+        return sum(f.statements for f in self.files)
+
+    @property
+    def percent(self) -> float:
+        if not self.statements:
+            return 100.0
+        return 100.0 * sum(f.covered for f in self.files) / self.statements
+
+    @property
+    def tests_ok(self) -> bool:
+        return self.exit_code == 0 and self.failed == 0
+
+    @property
+    def ok(self) -> bool:
+        return self.tests_ok and self.percent >= self.threshold
+
+
+def format_lines(lines: List[int]) -> str:
+    """[3, 4, 5, 9] -> '3-5, 9'"""
+    ranges = []
+    for line in sorted(lines):
+        if ranges and line == ranges[-1][1] + 1:
+            ranges[-1][1] = line
+        else:
+            ranges.append([line, line])
+    return ', '.join(str(a) if a == b else f'{a}-{b}' for a, b in ranges)
+
+
+def protocol_threshold(protocol_dir: Path, default: float = DEFAULT_THRESHOLD) -> float:
+    """Порог покрытия из protocol.md и шаблонов протокола"""
+    found = []
+    for path in sorted(Path(protocol_dir).rglob('*.md')):
+        found.extend(float(m.group(1)) for m in THRESHOLD_RE.finditer(
+            path.read_text(encoding='utf-8')))
+    return max(found) if found else default
+
+
+class _ResultPlugin:
+    """Подсчёт результатов pytest"""
+
+    def __init__(self):
+        self.passed = 0
+        self.failed = 0
+
+    def pytest_runtest_logreport(self, report):
+        if report.failed:
+            self.failed += 1
+        elif report.passed and report.when == 'call':
+            self.passed += 1
+
+
+@contextmanager
+def project_imports(project: Path):
+    """Импорт модулей проекта на время блока
+
+    Загруженные модули проекта затем выгружаются, чтобы следующий проект
+    с теми же именами модулей не получил их из кэша импорта.
+    """
+    root = str(Path(project).resolve())
+    modules_before = set(sys.modules)
+    sys.path.insert(0, root)
+    try:
+        yield
+    finally:
+        sys.path.remove(root)
+        for name in set(sys.modules) - modules_before:
+            filename = getattr(sys.modules[name], '__file__', None) or ''
+            if os.path.abspath(filename).startswith(root + os.sep):
+                del sys.modules[name]
+
+
+def measure(project: Path, source: Optional[Path] = None, tests: Optional[Path] = None,
+            threshold: float = DEFAULT_THRESHOLD, pytest_args: Optional[List[str]] = None
+            ) -> CoverageReport:
+    """Запустить тесты проекта в текущем процессе и посчитать покрытие source"""
+    import pytest
+
+    project = Path(project).resolve()
+    source = (project / source if source else _default_source(project)).resolve()
+    tests = (project / tests if tests else project / 'tests').resolve()
+    measured = source_files(source, exclude=[tests])
+
+    plugin = _ResultPlugin()
+    collector = LineCollector(source, measured)
+    started = time.perf_counter()
+    with project_imports(project), collector:
+        exit_code = pytest.main([str(tests), '-q', '-p', 'no:cacheprovider',
+                                 '--rootdir', str(project), *(pytest_args or [])],
+                                plugins=[plugin])
+    duration = time.perf_counter() - started
+
+    files = []
+    for path in measured:
+        statements = executable_lines(path)
+        executed = collector.lines.get(str(path), set())
+        files.append(FileCoverage(os.path.relpath(path, project), len(statements),
+                                  sorted(statements - executed)))
+    return CoverageReport(files, threshold, collector.backend, int(exit_code),
+                          plugin.passed, plugin.failed, duration)
+
+
+def _default_source(project: Path) -> Path:
+    return project / 'src' if (project / 'src').is_dir() else project
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-coverage',
+        description='Прогон тестов проекта с измерением покрытия и проверкой порога')
+    parser.add_argument('project', type=Path, nargs='?', default=Path(os.getcwd()))
+    parser.add_argument('--source', type=Path, default=None,
+                        help='измеряемый каталог (по умолчанию src или проект без тестов '
+                             'и виртуальных окружений)')
+    parser.add_argument('--tests', type=Path, default=None,
+                        help='каталог тестов (по умолчанию tests)')
+    parser.add_argument('--threshold', type=float, default=None,
+                        help='порог покрытия в процентах (по умолчанию из протокола)')
+    parser.add_argument('--protocol', default='spider',
+                        help='протокол, из шаблонов которого берётся порог')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    threshold = args.threshold
+    if threshold is None:
+        threshold = protocol_threshold(args.project / 'codev' / 'protocols' / args.protocol)
+    report = measure(args.project, args.source, args.tests, threshold)
+
+    if args.json:
+        print(json.dumps({
+            'percent': round(report.percent, 2),
+            'threshold': report.threshold,
+            'backend': report.backend,
+            'passed': report.passed,
+            'failed': report.failed,
+            'duration': round(report.duration, 4),
+            'files': [{'path': f.path, 'statements': f.statements, 'missing': f.missing}
+                      for f in report.files],
+        }, ensure_ascii=False, indent=2))
+    else:
+        for f in report.files:
+            missing = f"  missing: {format_lines(f.missing)}" if f.missing else ''
+            print(f"{f.path}: {f.covered}/{f.statements}{missing}")
+        print(f"coverage={report.percent:.1f}% threshold={report.threshold:g}% "
+              f"passed={report.passed} failed={report.failed} "
+              f"backend={report.backend} in {report.duration:.2f}s")
+    return 0 if report.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,376 @@
+"""
+Материализованный граф связей specs/plans/reviews и статусов фаз
+
+Документы связаны общим префиксом ####-имя. Граф хранится в SQLite
+(codev/.cache/graph.sqlite3) и обновляется инкрементально: разбираются
+только файлы с изменившимися mtime или размером. Два документа одного вида
+с одинаковым номером - конфликт: он показывается в статусе функции и
+командой conflicts.
+
+Использование:
+    python -m features.support.doc_graph missing plans
+    python -m features.support.doc_graph missing reviews
+    python -m features.support.doc_graph show 0001
+    python -m features.support.doc_graph conflicts
+"""
+import argparse
+import json
+import os
+import re
+import sqlite3
+import sys
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from features.support.documents import (
+    DOC_KINDS,
+    cache_dir,
+    parse_document_name,
+    parse_sections,
+)
+
+SCHEMA_VERSION = 2
+
+PHASE_HEADING_RE = re.compile(r'^(?:Фаза|Phase)\s+(\d+)', re.IGNORECASE)
+MARKDOWN_HEADING_RE = re.compile(r'^#{1,6}\s+(.+?)\s*#*\s*$', re.MULTILINE)
+STATUS_LINE_RE = re.compile(r'^\s*[-*]?\s*\*\*(?:Статус|Status)\*\*:\s*(.+?)\s*$',
+                            re.IGNORECASE | re.MULTILINE)
+
+# Статусы фаз из раздела "Отслеживание статуса" протокола SPIDER
+PHASE_STATUSES = ('pending', 'in-progress', 'completed', 'blocked')
+STATUS_ALIASES = (
+    # Отрицательные формы проверяются первыми: "не завершена" - это pending
+    ('не начат', 'pending'), ('не заверш', 'pending'), ('не выполн', 'pending'),
+    ('pending', 'pending'), ('черновик', 'pending'),
+    ('completed', 'completed'), ('complete', 'completed'), ('done', 'completed'),
+    ('выполнен', 'completed'), ('заверш', 'completed'),
+    ('in-progress', 'in-progress'), ('in progress', 'in-progress'),
+    ('в процессе', 'in-progress'), ('в работе', 'in-progress'),
+    ('blocked', 'blocked'), ('заблокирован', 'blocked'),
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    number TEXT,
+    slug TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    status TEXT
+);
+CREATE TABLE IF NOT EXISTS phases (
+    path TEXT NOT NULL REFERENCES documents(path) ON DELETE CASCADE,
+    ordinal INTEGER NOT NULL,
+    title TEXT NOT NULL,
+    status TEXT NOT NULL,
+    PRIMARY KEY (path, ordinal)
+);
+CREATE INDEX IF NOT EXISTS documents_number_kind ON documents(number, kind);
+CREATE INDEX IF NOT EXISTS documents_kind ON documents(kind);
+"""
+
+
+@dataclass
+class GraphStats:
+    """Результат инкрементального обновления графа"""
+    parsed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+@dataclass
+class FeatureStatus:
+    """Сводный статус функции с номером ####"""
+    number: str
+    slug: str
+    documents: dict = field(default_factory=dict)
+    modified: dict = field(default_factory=dict)
+    phases: List[dict] = field(default_factory=list)
+    status: str = 'unknown'
+    # Вид -> все пути, если документов этого вида с номером больше одного
+    conflicts: Dict[str, List[str]] = field(default_factory=dict)
+
+
+def normalize_status(value: str) -> str:
+    """Привести статус из документа к одному из PHASE_STATUSES"""
+    value = value.strip().strip('`[]').lower().replace('ё', 'е')
+    for alias, status in STATUS_ALIASES:
+        if alias in value:
+            return status
+    return 'pending'
+
+
+def parse_plan_phases(text: str) -> List[dict]:
+    """Извлечь фазы плана и их статусы"""
+    phases = []
+    for section in parse_sections(text):
+        match = PHASE_HEADING_RE.match(section.heading)
+        if not match:
+            continue
+        status_match = STATUS_LINE_RE.search(section.text)
+        if status_match:
+            status = normalize_status(status_match.group(1))
+        else:
+            marker = re.search(r'\[([^\]]+)\]', section.heading)
+            status = normalize_status(marker.group(1)) if marker else 'pending'
+        phases.append({
+            'ordinal': int(match.group(1)),
+            'title': section.heading,
+            'status': status,
+        })
+    return phases
+
+
+def parse_document_status(text: str) -> Optional[str]:
+    """Статус документа из метаданных (**Статус**: ...) до первого заголовка фазы"""
+    end = next((m.start() for m in MARKDOWN_HEADING_RE.finditer(text)
+                if PHASE_HEADING_RE.match(m.group(1))), len(text))
+    match = STATUS_LINE_RE.search(text, 0, end)
+    return match.group(1) if match else None
+
+
+def derive_feature_status(kinds: set, phases: List[dict]) -> str:
+    """Вычислить стадию функции по набору документов и статусам фаз"""
+    if 'reviews' in kinds:
+        return 'reviewed'
+    if 'plans' in kinds:
+        statuses = [p['status'] for p in phases]
+        if statuses and all(s == 'completed' for s in statuses):
+            return 'implemented'
+        if 'blocked' in statuses:
+            return 'blocked'
+        if any(s in ('completed', 'in-progress') for s in statuses):
+            return 'in-progress'
+        return 'planned'
+    if 'specs' in kinds:
+        return 'specified'
+    return 'unknown'
+
+
+class DocumentGraph:
+    """Индекс связей между документами Codev"""
+
+    def __init__(self, root: Path, db_path: Optional[Path] = None):
+        self.root = Path(root)
+        self.codev_dir = self.root / 'codev'
+        self.db_path = Path(db_path) if db_path else \
+            cache_dir(self.codev_dir) / 'graph.sqlite3'
+        self.conn = sqlite3.connect(str(self.db_path))
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self._init_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _init_schema(self):
+        row = None
+        try:
+            row = self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        except sqlite3.OperationalError:
+            pass
+        if row and int(row[0]) != SCHEMA_VERSION:
+            self.conn.executescript(
+                'DROP TABLE IF EXISTS phases; DROP TABLE IF EXISTS documents;'
+                'DROP TABLE IF EXISTS meta;')
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+            (str(SCHEMA_VERSION),))
+        self.conn.commit()
+
+    def update(self) -> GraphStats:
+        """Синхронизировать граф с файлами, разбирая только изменившиеся"""
+        stats = GraphStats()
+        known = {
+            row[0]: (row[1], row[2])
+            for row in self.conn.execute('SELECT path, mtime_ns, size FROM documents')
+        }
+        seen = set()
+
+        with self.conn:
+            for kind in DOC_KINDS:
+                kind_dir = self.codev_dir / kind
+                if not kind_dir.is_dir():
+                    continue
+                # scandir отдаёт тип файла из каталога без отдельного stat
+                with os.scandir(kind_dir) as entries:
+                    for entry in entries:
+                        if not entry.name.endswith('.md') or not entry.is_file():
+                            continue
+                        rel = f'codev/{kind}/{entry.name}'
+                        seen.add(rel)
+                        st = entry.stat()
+                        if known.get(rel) == (st.st_mtime_ns, st.st_size):
+                            stats.unchanged += 1
+                            continue
+                        self._store(rel, kind, Path(entry.path), st)
+                        stats.parsed += 1
+
+            for rel in set(known) - seen:
+                self.conn.execute('DELETE FROM documents WHERE path = ?', (rel,))
+                stats.removed += 1
+
+        return stats
+
+    def _store(self, rel: str, kind: str, path: Path, st):
+        number, slug = parse_document_name(path.name)
+        text = path.read_text(encoding='utf-8')
+        self.conn.execute('DELETE FROM documents WHERE path = ?', (rel,))
+        self.conn.execute(
+            'INSERT INTO documents (path, kind, number, slug, mtime_ns, size, status) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (rel, kind, number, slug, st.st_mtime_ns, st.st_size, parse_document_status(text)))
+        if kind == 'plans':
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO phases (path, ordinal, title, status) '
+                'VALUES (?, ?, ?, ?)',
+                [(rel, p['ordinal'], p['title'], p['status']) for p in parse_plan_phases(text)])
+
+    def _missing(self, present: str, absent: str) -> List[str]:
+        rows = self.conn.execute(
+            'SELECT d.path FROM documents d WHERE d.kind = ? AND d.number IS NOT NULL '
+            'AND NOT EXISTS (SELECT 1 FROM documents o '
+            '                WHERE o.number = d.number AND o.kind = ?) '
+            'ORDER BY d.number',
+            (present, absent))
+        return [row[0] for row in rows]
+
+    def document_status(self, path: str) -> Optional[str]:
+        """Статус документа из его метаданных (путь вида codev/plans/0001-auth.md)"""
+        row = self.conn.execute('SELECT status FROM documents WHERE path = ?', (path,)).fetchone()
+        return row[0] if row else None
+
+    def specs_without_plan(self) -> List[str]:
+        """Спецификации, для которых ещё нет плана"""
+        return self._missing('specs', 'plans')
+
+    def plans_without_review(self) -> List[str]:
+        """Планы, для которых ещё нет обзора"""
+        return self._missing('plans', 'reviews')
+
+    def feature_status(self, key: str) -> Optional[FeatureStatus]:
+        """Статус функции по номеру (0001) или имени (user-auth)"""
+        if key.isdigit():
+            number = f'{int(key):04d}'
+        else:
+            row = self.conn.execute(
+                'SELECT number FROM documents WHERE slug = ? AND number IS NOT NULL LIMIT 1',
+                (key,)).fetchone()
+            if row is None:
+                return None
+            number = row[0]
+        features = self._features('d.number = ?', (number,))
+        return features[0] if features else None
+
+    def list_features(self) -> List[FeatureStatus]:
+        """Статусы всех пронумерованных функций"""
+        return self._features('d.number IS NOT NULL', ())
+
+    def conflicts(self) -> List[FeatureStatus]:
+        """Функции, у которых несколько документов одного вида"""
+        return [f for f in self.list_features() if f.conflicts]
+
+    def _features(self, where: str, params: tuple) -> List[FeatureStatus]:
+        # Документы и фазы планов одним запросом, без запроса на каждую функцию
+        rows = self.conn.execute(
+            'SELECT d.number, d.kind, d.path, d.slug, d.mtime_ns, p.ordinal, p.title, p.status '
+            'FROM documents d LEFT JOIN phases p ON p.path = d.path '
+            f'WHERE {where} ORDER BY d.number, d.kind, d.path, p.ordinal', params)
+        features: Dict[str, FeatureStatus] = {}
+        for number, kind, path, slug, mtime_ns, ordinal, title, status in rows:
+            feature = features.get(number)
+            if feature is None:
+                feature = features[number] = FeatureStatus(number=number, slug=slug)
+            first = feature.documents.setdefault(kind, path)
+            if first != path:
+                # Фазы и статус берутся из первого документа вида
+                paths = feature.conflicts.setdefault(kind, [first])
+                if path not in paths:
+                    paths.append(path)
+                continue
+            feature.modified[kind] = mtime_ns / 1e9
+            if ordinal is not None:
+                feature.phases.append({'ordinal': ordinal, 'title': title, 'status': status})
+        for feature in features.values():
+            feature.status = derive_feature_status(set(feature.documents), feature.phases)
+        return list(features.values())
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-status',
+        description='Связи и статусы спецификаций, планов и обзоров Codev')
+    parser.add_argument('--root', type=Path, default=Path(os.getcwd()),
+                        help='корень проекта с каталогом codev/ (по умолчанию текущий)')
+    parser.add_argument('--db', type=Path, default=None,
+                        help='путь к базе графа (по умолчанию codev/.cache/graph.sqlite3)')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('update', help='обновить граф по изменившимся файлам')
+    missing = sub.add_parser('missing', help='документы без следующего артефакта')
+    missing.add_argument('what', choices=('plans', 'reviews'))
+    show = sub.add_parser('show', help='статус функции по номеру или имени')
+    show.add_argument('feature')
+    sub.add_parser('list', help='статусы всех функций')
+    sub.add_parser('conflicts', help='номера, занятые несколькими документами одного вида')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    with DocumentGraph(args.root, args.db) as graph:
+        stats = graph.update()
+
+        if args.command == 'update':
+            print(f"parsed={stats.parsed} removed={stats.removed} unchanged={stats.unchanged}")
+            return 0
+
+        if args.command == 'missing':
+            paths = graph.specs_without_plan() if args.what == 'plans' \
+                else graph.plans_without_review()
+            print(json.dumps(paths, ensure_ascii=False, indent=2) if args.json
+                  else '\n'.join(paths))
+            return 0
+
+        if args.command == 'conflicts':
+            features = graph.conflicts()
+            if args.json:
+                print(json.dumps({f.number: f.conflicts for f in features},
+                                 ensure_ascii=False, indent=2))
+            else:
+                for feature in features:
+                    for kind, paths in feature.conflicts.items():
+                        print(f"{feature.number} {kind}: {', '.join(paths)}")
+            return 1 if features else 0
+
+        features = [graph.feature_status(args.feature)] if args.command == 'show' \
+            else graph.list_features()
+        features = [f for f in features if f is not None]
+        if args.json:
+            print(json.dumps([asdict(f) for f in features], ensure_ascii=False, indent=2))
+        else:
+            for feature in features:
+                done = sum(1 for p in feature.phases if p['status'] == 'completed')
+                phases = f" phases {done}/{len(feature.phases)}" if feature.phases else ''
+                print(f"{feature.number}-{feature.slug}: {feature.status}{phases} "
+                      f"[{', '.join(sorted(feature.documents))}]")
+                for kind, paths in feature.conflicts.items():
+                    print(f"  conflict {kind}: {', '.join(paths)}")
+        return 0 if features else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
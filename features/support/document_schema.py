@@ -0,0 +1,354 @@
+"""
+Валидация specs, plans и reviews по схемам, выведенным из шаблонов протокола
+
+Схема строится из templates/spec.md, plan.md и review.md выбранного протокола:
+- секции - заголовки второго уровня без плейсхолдеров и их подсекции
+  третьего уровня без плейсхолдеров;
+- обязательны секции из REQUIRED_SECTIONS, их отсутствие - ошибка;
+  отсутствие остальных секций шаблона - предупреждение, а подсекции
+  отсутствующей необязательной секции не проверяются;
+- HEADING_ALIASES сопоставляет принятые в документах названия секций
+  с названиями шаблона;
+- повторяющиеся секции (например "### Фаза 1: [Описание]") задают шаблон
+  заголовка и обязательные поля вида **Зависимости**:.
+
+Результаты кэшируются по SHA-256 документа и отпечатку схемы (без путей,
+поэтому кэш переносим между копиями проекта); повторная проверка
+затрагивает только изменённые файлы.
+
+Использование (в том числе как локальный pre-commit hook):
+    python -m features.support.document_schema --protocol spider
+    python -m features.support.document_schema --json
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from features.support.documents import cache_dir, iter_documents, parse_sections
+from features.support.hash_cache import HashCache
+from features.support.protocol_validator import PARALLEL_THRESHOLD, Finding
+
+CACHE_VERSION = 3
+
+KIND_TEMPLATES = {'specs': 'spec.md', 'plans': 'plan.md', 'reviews': 'review.md'}
+
+PLACEHOLDER_RE = re.compile(r'\[[^\]]*\]')
+FIELD_RE = re.compile(r'^\s*[-*]?\s*\*\*([^*]+)\*\*:', re.MULTILINE)
+
+# Обязательные секции по видам документов: заголовок второго уровня или пара
+# (секция, подсекция). Группирующая секция "Извлечённые уроки" необязательна,
+# обязательны её подсекции. Английские названия - шаблоны tick и codev-skeleton.
+REQUIRED_SECTIONS = {
+    'specs': [
+        'Метаданные', 'Постановка задачи', 'Текущее состояние', 'Желаемое состояние',
+        'Стейкхолдеры', 'Критерии успеха', 'Ограничения', ('Ограничения', 'Технические'),
+        ('Ограничения', 'Бизнес'), 'Допущения', 'Варианты решений', 'Открытые вопросы',
+        'Сценарии тестирования', ('Сценарии тестирования', 'Функциональные тесты'),
+        'Зависимости', 'Риски и меры',
+        'Metadata', 'Task Description', 'Scope', 'Success Criteria', 'Constraints',
+        'Assumptions', 'Testing Approach',
+    ],
+    'plans': [
+        'Метаданные', 'Краткое резюме', 'Метрики успеха', 'Разбиение по фазам',
+        'Metadata', 'Executive Summary', 'Success Metrics', 'Phase Breakdown',
+        'Implementation Steps', 'Success Criteria',
+    ],
+    'reviews': [
+        'Метаданные', ('Извлечённые уроки', 'Что получилось хорошо'),
+        ('Извлечённые уроки', 'Что было сложным'), ('Извлечённые уроки', 'Что сделали бы иначе'),
+        ('Извлечённые уроки', 'Что сделать иначе'), 'Заключение',
+        'Metadata', ('Lessons Learned', 'What Went Well'),
+        ('Lessons Learned', 'What Was Challenging'),
+        ('Lessons Learned', 'What Would You Do Differently'),
+        ('Lessons Learned', 'What Could Improve'), 'Conclusion',
+    ],
+}
+
+# Названия секций в документах -> названия в шаблонах протокола
+HEADING_ALIASES = {
+    'Заинтересованные стороны': 'Стейкхолдеры',
+    'Бизнес-ограничения': 'Бизнес',
+    'Риски и стратегии смягчения': 'Риски и меры',
+    'Обзор': 'Краткое резюме',
+    'Разбивка по фазам': 'Разбиение по фазам',
+    'Что прошло хорошо': 'Что получилось хорошо',
+    'Приятно иметь': 'Желательно знать',
+    'Что оказалось сложным': 'Что было сложным',
+    'Итог': 'Заключение',
+}
+
+
+@dataclass
+class SchemaSection:
+    """Секция шаблона; parent задан у подсекций третьего уровня"""
+    heading: str
+    parent: Optional[str] = None
+    required: bool = False
+
+    @property
+    def label(self) -> str:
+        return f"{self.parent} / {self.heading}" if self.parent else self.heading
+
+
+@dataclass
+class RepeatedSection:
+    """Повторяющаяся секция шаблона (например фазы плана)"""
+    pattern: str
+    level: int
+    example: str
+    fields: List[str]
+
+
+@dataclass
+class DocumentSchema:
+    """Схема документа одного вида, выведенная из шаблона"""
+    kind: str
+    template: str
+    title: Optional[str]
+    # Секции и подсекции в порядке шаблона
+    sections: List[SchemaSection] = field(default_factory=list)
+    repeated: List[RepeatedSection] = field(default_factory=list)
+
+    def fingerprint(self) -> str:
+        # Путь к шаблону не влияет на проверку и не входит в отпечаток
+        payload = json.dumps({k: v for k, v in asdict(self).items() if k != 'template'},
+                             ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+@dataclass
+class SchemaReport:
+    """Результат валидации документов"""
+    findings: List[Finding] = field(default_factory=list)
+    documents: int = 0
+    validated: int = 0
+    cached: int = 0
+
+    @property
+    def errors(self) -> List[Finding]:
+        return [f for f in self.findings if f.severity == 'error']
+
+
+def normalize_heading(heading: str) -> str:
+    """Нормализовать заголовок: регистр, ё, пояснения в скобках, пунктуация и эмодзи"""
+    heading = re.sub(r'\([^)]*\)', ' ', heading.casefold().replace('ё', 'е'))
+    return ' '.join(re.findall(r'[\w-]+', heading))
+
+
+ALIASES = {normalize_heading(k): normalize_heading(v) for k, v in HEADING_ALIASES.items()}
+
+
+def canonical_heading(heading: str) -> str:
+    """Нормализованное название секции с учётом HEADING_ALIASES"""
+    key = normalize_heading(heading)
+    return ALIASES.get(key, key)
+
+
+def _required_keys(kind: str) -> set:
+    keys = set()
+    for entry in REQUIRED_SECTIONS.get(kind, ()):
+        parent, heading = entry if isinstance(entry, tuple) else (None, entry)
+        keys.add((parent and canonical_heading(parent), canonical_heading(heading)))
+    return keys
+
+
+def derive_schema(kind: str, template_path: Path) -> DocumentSchema:
+    """Вывести схему документа из шаблона протокола"""
+    sections = parse_sections(template_path.read_text(encoding='utf-8'))
+    title = None
+    if sections and sections[0].level == 1:
+        title = PLACEHOLDER_RE.sub('', sections[0].heading).strip(' :')
+
+    schema = DocumentSchema(kind=kind, template=template_path.as_posix(), title=title)
+    required = _required_keys(kind)
+    patterns = set()
+    # Подсекции учитываются только у секции второго уровня без плейсхолдеров
+    parent = None
+    for section in sections:
+        if section.level == 2:
+            parent = None if PLACEHOLDER_RE.search(section.heading) else section.heading
+        if section.level <= 3 and not PLACEHOLDER_RE.search(section.heading) and (
+                section.level == 2 or (section.level == 3 and parent)):
+            owner = parent if section.level == 3 else None
+            key = (owner and canonical_heading(owner), canonical_heading(section.heading))
+            schema.sections.append(SchemaSection(section.heading, owner, key in required))
+        elif section.level >= 3 and PLACEHOLDER_RE.search(section.heading):
+            prefix = PLACEHOLDER_RE.split(section.heading)[0].strip(' :')
+            if not prefix:
+                continue
+            pattern = '^' + re.sub(r'\\ ', r'\\s+', re.sub(r'\d+', r'\\d+', re.escape(prefix)))
+            if pattern in patterns:
+                continue
+            patterns.add(pattern)
+            schema.repeated.append(RepeatedSection(
+                pattern=pattern,
+                level=section.level,
+                example=section.heading,
+                fields=FIELD_RE.findall(section.text)))
+    return schema
+
+
+def load_schemas(protocol_dir: Path) -> Dict[str, DocumentSchema]:
+    """Схемы для всех видов документов, для которых у протокола есть шаблон"""
+    schemas = {}
+    for kind, template in KIND_TEMPLATES.items():
+        template_path = protocol_dir / 'templates' / template
+        if template_path.exists():
+            schemas[kind] = derive_schema(kind, template_path)
+    return schemas
+
+
+def check_document(text: str, schema: DocumentSchema) -> List[dict]:
+    """Проверить текст документа по схеме; вернуть находки без пути"""
+    findings = []
+    sections = parse_sections(text)
+    line_count = len(text.splitlines())
+    present = {}
+    for section in sections:
+        present.setdefault(canonical_heading(section.heading), section)
+
+    if schema.title and (not sections or sections[0].level != 1):
+        findings.append({'severity': 'warning', 'code': 'missing-title', 'line': 1,
+                         'message': f"нет заголовка первого уровня ({schema.title}: ...)"})
+
+    # Отсутствующая секция привязывается к следующей найденной секции схемы.
+    # Подсекция ищется по всему документу: в принятых документах она бывает
+    # и секцией второго уровня ("## Что прошло хорошо")
+    expected_line = line_count + 1
+    for entry in reversed(schema.sections):
+        section = present.get(canonical_heading(entry.heading))
+        if section is not None:
+            expected_line = section.line
+            continue
+        if entry.parent and not entry.required and \
+                canonical_heading(entry.parent) not in present:
+            continue
+        line = min(expected_line, max(line_count, 1))
+        where = f" в '{entry.parent}'" if entry.parent else ''
+        if entry.required:
+            findings.append({'severity': 'error', 'code': 'missing-section', 'line': line,
+                             'section': entry.label,
+                             'message': f"нет обязательной секции '{entry.heading}'{where}"})
+        else:
+            findings.append({'severity': 'warning', 'code': 'missing-optional-section',
+                             'line': line, 'section': entry.label,
+                             'message': f"нет необязательной секции '{entry.heading}'{where}"})
+    findings.reverse()
+
+    for repeated in schema.repeated:
+        regex = re.compile(repeated.pattern, re.IGNORECASE)
+        instances = [s for s in sections if regex.match(s.heading)]
+        for instance in instances:
+            fields = {f.strip().casefold() for f in FIELD_RE.findall(instance.text)}
+            for name in repeated.fields:
+                if name.strip().casefold() not in fields:
+                    findings.append({
+                        'severity': 'error', 'code': 'missing-field', 'line': instance.line,
+                        'section': instance.heading,
+                        'message': f"в секции '{instance.heading}' нет поля **{name}**:"})
+    return findings
+
+
+def _validate_file(args):
+    """Проверка одного файла в рабочем процессе"""
+    path, schema_dict = args
+    schema = DocumentSchema(**{
+        **schema_dict,
+        'sections': [SchemaSection(**s) for s in schema_dict['sections']],
+        'repeated': [RepeatedSection(**r) for r in schema_dict['repeated']],
+    })
+    return check_document(Path(path).read_text(encoding='utf-8'), schema)
+
+
+def validate_documents(root: Path, protocol: str = 'spider', jobs: Optional[int] = None,
+                       cache_path: Optional[Path] = None) -> SchemaReport:
+    """Проверить все документы codev/ по схемам протокола"""
+    root = Path(root)
+    codev_dir = root / 'codev'
+    schemas = load_schemas(codev_dir / 'protocols' / protocol)
+    cache = HashCache(cache_path, CACHE_VERSION)
+    report = SchemaReport()
+
+    pending = []
+    results = {}
+    for doc in iter_documents(codev_dir, tuple(schemas)):
+        report.documents += 1
+        schema = schemas[doc.kind]
+        key = f"{cache.digest(doc.path)}:{schema.fingerprint()}"
+        cached = cache.get(key)
+        if cached is None:
+            pending.append((doc.path, key, schema))
+        else:
+            results[doc.path] = cached
+            report.cached += 1
+
+    work = [(str(path), asdict(schema)) for path, _key, schema in pending]
+    if len(work) >= PARALLEL_THRESHOLD and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            outcomes = list(pool.map(_validate_file, work, chunksize=16))
+    else:
+        outcomes = [_validate_file(item) for item in work]
+
+    for (path, key, _schema), outcome in zip(pending, outcomes):
+        cache.put(key, outcome)
+        results[path] = outcome
+        report.validated += 1
+    cache.save()
+
+    for path in sorted(results):
+        rel = path.relative_to(root).as_posix()
+        for item in results[path]:
+            report.findings.append(Finding(
+                item['severity'], item['code'], rel, item['line'], item['message']))
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-validate-docs',
+        description='Проверка спецификаций, планов и обзоров по шаблонам протокола')
+    parser.add_argument('--root', type=Path, default=Path(os.getcwd()),
+                        help='корень проекта с каталогом codev/ (по умолчанию текущий)')
+    parser.add_argument('--protocol', default='spider',
+                        help='протокол, шаблоны которого задают схему (по умолчанию spider)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='число процессов (по умолчанию по числу CPU)')
+    parser.add_argument('--no-cache', action='store_true', help='не использовать кэш')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    protocol_dir = args.root / 'codev' / 'protocols' / args.protocol
+    if not protocol_dir.is_dir():
+        print(f"Протокол не найден: {protocol_dir}", file=sys.stderr)
+        return 2
+
+    cache_path = None if args.no_cache else cache_dir(args.root / 'codev') / 'validation.json'
+    report = validate_documents(args.root, args.protocol, args.jobs, cache_path)
+
+    if args.json:
+        print(json.dumps({
+            'documents': report.documents,
+            'validated': report.validated,
+            'cached': report.cached,
+            'findings': [asdict(f) for f in report.findings],
+        }, ensure_ascii=False, indent=2))
+    else:
+        for f in report.findings:
+            print(f"{f.path}:{f.line}: {f.severity}: [{f.code}] {f.message}")
+        print(f"documents={report.documents} validated={report.validated} "
+              f"cached={report.cached} errors={len(report.errors)}")
+    return 1 if report.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
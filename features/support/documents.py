@@ -0,0 +1,93 @@
+"""
+Общие функции для обхода документов Codev (specs, plans, reviews)
+"""
+import hashlib
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional
+
+DOC_KINDS = ('specs', 'plans', 'reviews')
+
+# Формат имени документа: ####-описательное-имя.md
+DOC_NAME_RE = re.compile(r'^(\d{4})-(.+)\.md$')
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+
+
+@dataclass(frozen=True)
+class DocumentRef:
+    """Ссылка на документ Codev"""
+    kind: str
+    path: Path
+    number: Optional[str]
+    slug: str
+
+
+@dataclass(frozen=True)
+class Section:
+    """Секция markdown-документа (заголовок и строки до следующего заголовка)"""
+    heading: str
+    level: int
+    line: int
+    end_line: int
+    text: str
+
+
+def parse_document_name(filename: str):
+    """Разобрать имя файла на номер и slug, вернуть (None, stem) для прочих имён"""
+    match = DOC_NAME_RE.match(filename)
+    if match:
+        return match.group(1), match.group(2)
+    return None, Path(filename).stem
+
+
+def iter_documents(codev_dir: Path, kinds=DOC_KINDS) -> Iterator[DocumentRef]:
+    """Перечислить markdown-документы в указанных каталогах codev/"""
+    for kind in kinds:
+        kind_dir = Path(codev_dir) / kind
+        if not kind_dir.is_dir():
+            continue
+        for path in sorted(kind_dir.glob('*.md')):
+            number, slug = parse_document_name(path.name)
+            yield DocumentRef(kind=kind, path=path, number=number, slug=slug)
+
+
+def parse_sections(text: str) -> List[Section]:
+    """Разбить markdown на секции по заголовкам, игнорируя блоки кода"""
+    lines = text.splitlines()
+    sections = []
+    heading, level, start = '', 0, 1
+    body: List[str] = []
+    in_code = False
+
+    for lineno, line in enumerate(lines, start=1):
+        if line.lstrip().startswith('```'):
+            in_code = not in_code
+        match = None if in_code else HEADING_RE.match(line)
+        if match:
+            if heading or any(l.strip() for l in body):
+                sections.append(Section(heading, level, start, lineno - 1, '\n'.join(body)))
+            heading, level, start = match.group(2), len(match.group(1)), lineno
+            body = []
+        else:
+            body.append(line)
+
+    if heading or any(l.strip() for l in body):
+        sections.append(Section(heading, level, start, len(lines), '\n'.join(body)))
+    return sections
+
+
+def file_digest(path: Path) -> str:
+    """SHA-256 содержимого файла"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_dir(codev_dir: Path) -> Path:
+    """Каталог для локальных кэшей и индексов (codev/.cache)"""
+    path = Path(codev_dir) / '.cache'
+    path.mkdir(parents=True, exist_ok=True)
+    return path
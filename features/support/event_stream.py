@@ -0,0 +1,444 @@
+"""
+Потоковый NDJSON-репортёр событий behave и просмотр прогресса
+
+EventFormatter пишет по одной JSON-строке на начало и конец прогона,
+feature, сценария и шага - с временем, статусом и идентификатором
+воркера - и сбрасывает каждую строку сразу, ничего не накапливая.
+Шаги, не выполненные после падения или в пропущенном сценарии, получают
+пару событий со статусом skipped (undefined - для неопределённых).
+Поток идёт в файл (-o) или в Unix-сокет (userdata events_socket или
+переменная CODEV_EVENTS_SOCKET).
+
+Команды tail и listen показывают живой прогресс и число падений, пока
+шардированный прогон ещё идёт.
+
+Имя ndjson зарегистрировано в [tool.behave.formatters] pyproject.toml
+ссылкой на этот модуль, поэтому пакет features должен быть импортируем:
+проект установлен (uv sync, pip install -e .) или behave запущен как
+python -m behave из корня репозитория. Иначе behave завершится с
+BAD_FORMAT=ndjson (problem: ModuleNotFoundError).
+
+Использование:
+    uv run behave -f ndjson -o test-reports/events-1.ndjson features
+    python -m behave -f ndjson -o test-reports/events-1.ndjson features
+    python -m features.support.event_stream tail --follow test-reports/events-*.ndjson
+    python -m features.support.event_stream listen /tmp/codev-events.sock
+"""
+import argparse
+import collections
+import glob
+import json
+import os
+import selectors
+import socket
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from behave.formatter.base import Formatter
+
+WORKER_ENV = 'CODEV_WORKER_ID'
+SOCKET_ENV = 'CODEV_EVENTS_SOCKET'
+
+# Сколько последних падений держит в памяти просмотрщик
+MAX_FAILURES = 50
+MAX_ERROR_CHARS = 2000
+
+
+def worker_id() -> str:
+    """Идентификатор воркера: CODEV_WORKER_ID или host:pid"""
+    return os.environ.get(WORKER_ENV) or f'{socket.gethostname()}:{os.getpid()}'
+
+
+def _status(item) -> str:
+    status = getattr(item, 'status', None)
+    return getattr(status, 'name', str(status)) if status is not None else 'untested'
+
+
+class _SocketWriter:
+    """Запись строк в Unix-сокет"""
+
+    def __init__(self, path: str):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+
+    def write(self, data: str):
+        self.sock.sendall(data.encode('utf-8'))
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.sock.close()
+
+
+class EventFormatter(Formatter):
+    """behave-форматтер, выдающий события прогона в формате NDJSON"""
+
+    name = 'ndjson'
+    description = 'Streams run events as newline-delimited JSON'
+
+    def __init__(self, stream_opener, config):
+        super().__init__(stream_opener, config)
+        self.worker = worker_id()
+        self.sink = None
+        self.current_feature = None
+        self.current_scenario = None
+        self.current_step = None
+        self.pending_steps = collections.deque()
+        self.started: Dict[int, float] = {}
+        self.run_started = False
+
+    # ------------------------------------------------------------------
+
+    def _sink(self):
+        if self.sink is None:
+            socket_path = self.config.userdata.get('events_socket') or os.environ.get(SOCKET_ENV)
+            if socket_path:
+                try:
+                    self.sink = _SocketWriter(socket_path)
+                except OSError as e:
+                    print(f"ndjson: сокет {socket_path} недоступен ({e}), вывод в поток",
+                          file=sys.stderr)
+            if self.sink is None:
+                self.sink = self.open()
+        return self.sink
+
+    def emit(self, event: str, **fields):
+        record = {'event': event, 'ts': round(time.time(), 6), 'worker': self.worker}
+        record.update(fields)
+        sink = self._sink()
+        sink.write(json.dumps(record, ensure_ascii=False) + '\n')
+        sink.flush()
+
+    def _begin(self, item):
+        self.started[id(item)] = time.perf_counter()
+
+    def _duration(self, item) -> float:
+        started = self.started.pop(id(item), None)
+        return round(time.perf_counter() - started, 6) if started is not None else 0.0
+
+    def _end_step(self):
+        step = self.current_step
+        if step is None:
+            return
+        fields = {'status': _status(step), 'duration': self._duration(step)}
+        if step.error_message:
+            fields['error'] = step.error_message[:MAX_ERROR_CHARS]
+        self.emit('step.end', step=f'{step.keyword} {step.name}',
+                  location=str(step.location), **fields)
+        self.current_step = None
+
+    def _skip_pending(self):
+        # До невыполненных шагов match() не доходит: закрыть их сразу
+        while self.pending_steps:
+            step = self.pending_steps.popleft()
+            status = _status(step)
+            name, location = f'{step.keyword} {step.name}', str(step.location)
+            self.emit('step.start', step=name, location=location)
+            self.emit('step.end', step=name, location=location,
+                      status='skipped' if status == 'untested' else status, duration=0.0)
+
+    def _end_scenario(self):
+        scenario = self.current_scenario
+        if scenario is None:
+            return
+        self._end_step()
+        self._skip_pending()
+        self.emit('scenario.end', feature=self.current_feature.name, scenario=scenario.name,
+                  location=str(scenario.location), status=_status(scenario),
+                  duration=self._duration(scenario))
+        self.current_scenario = None
+
+    def _end_feature(self):
+        feature = self.current_feature
+        if feature is None:
+            return
+        self._end_scenario()
+        self.emit('feature.end', feature=feature.name, location=str(feature.location),
+                  status=_status(feature), duration=self._duration(feature))
+        self.current_feature = None
+
+    # ------------------------------------------------------------------
+    # Formatter API
+    # ------------------------------------------------------------------
+
+    def uri(self, uri):
+        if not self.run_started:
+            self.run_started = True
+            self.emit('run.start', pid=os.getpid())
+
+    def feature(self, feature):
+        self._end_feature()
+        self.current_feature = feature
+        self._begin(feature)
+        self.emit('feature.start', feature=feature.name, location=str(feature.location))
+
+    def scenario(self, scenario):
+        self._end_scenario()
+        self.pending_steps.clear()
+        self.current_scenario = scenario
+        self._begin(scenario)
+        self.emit('scenario.start', feature=self.current_feature.name, scenario=scenario.name,
+                  location=str(scenario.location))
+
+    def step(self, step):
+        # behave сообщает о всех шагах сценария заранее, до их выполнения
+        self.pending_steps.append(step)
+
+    def match(self, match):
+        self._end_step()
+        if not self.pending_steps:
+            return
+        step = self.pending_steps.popleft()
+        self.current_step = step
+        self._begin(step)
+        self.emit('step.start', step=f'{step.keyword} {step.name}', location=str(step.location))
+
+    def result(self, step):
+        self._end_step()
+
+    def eof(self):
+        self._end_feature()
+
+    def close(self):
+        self._end_feature()
+        if self.run_started:
+            self.emit('run.end', pid=os.getpid())
+        if self.sink is not None and self.sink is not self.stream:
+            self.sink.close()
+        self.close_stream()
+
+
+class ProgressTally:
+    """Сводка по потоку событий с ограниченной памятью"""
+
+    def __init__(self):
+        self.counts = {kind: collections.Counter() for kind in ('feature', 'scenario', 'step')}
+        self.running: Dict[str, str] = {}
+        self.workers = set()
+        self.finished = set()
+        self.failures = collections.deque(maxlen=MAX_FAILURES)
+        self.events = 0
+
+    def update(self, event: dict):
+        self.events += 1
+        kind, _, phase = event.get('event', '').partition('.')
+        worker = event.get('worker', '?')
+        if kind == 'run':
+            (self.workers if phase == 'start' else self.finished).add(worker)
+            self.running.pop(worker, None)
+            return
+        if kind == 'scenario' and phase == 'start':
+            self.running[worker] = event.get('location', '')
+        if phase != 'end' or kind not in self.counts:
+            return
+        status = event.get('status', 'untested')
+        self.counts[kind][status] += 1
+        if kind == 'scenario':
+            self.running.pop(worker, None)
+            if status in ('failed', 'error'):
+                self.failures.append(event)
+
+    @property
+    def done(self) -> bool:
+        return bool(self.workers) and self.workers <= self.finished
+
+    def failed(self) -> int:
+        return sum(self.counts['scenario'][s] for s in ('failed', 'error'))
+
+    def summary(self) -> str:
+        def fmt(kind):
+            counter = self.counts[kind]
+            parts = [f"{counter[s]} {s}" for s in ('passed', 'failed', 'error', 'skipped')
+                     if counter[s]]
+            return f"{kind}s: " + (', '.join(parts) if parts else '0')
+
+        workers = f"workers {len(self.finished)}/{len(self.workers)} done"
+        return ' | '.join([fmt('feature'), fmt('scenario'), fmt('step'), workers])
+
+
+class _LineReader:
+    """Чтение дописываемого файла по целым строкам"""
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.handle = None
+        self.buffer = ''
+
+    def read(self) -> List[dict]:
+        if self.handle is None:
+            try:
+                self.handle = open(self.path, encoding='utf-8')
+            except OSError:
+                return []
+        self.buffer += self.handle.read()
+        *lines, self.buffer = self.buffer.split('\n')
+        return _decode(lines)
+
+
+def _decode(lines: Iterable[str]) -> List[dict]:
+    events = []
+    for line in lines:
+        if line.strip():
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                continue
+    return events
+
+
+class _Display:
+    """Вывод строки прогресса и падений по мере поступления событий"""
+
+    # Без терминала строка прогресса печатается не чаще раза в секунду
+    PLAIN_INTERVAL = 1.0
+
+    def __init__(self, tally: ProgressTally, out):
+        self.tally = tally
+        self.out = out
+        self.live = out.isatty()
+        self.reported = 0
+        self.last_line = None
+        self.last_print = 0.0
+
+    def refresh(self, final: bool = False):
+        failures = list(self.tally.failures)
+        new = min(self.tally.failed() - self.reported, len(failures))
+        for event in failures[len(failures) - new:] if new > 0 else []:
+            self._line(f"✗ {event.get('location')}  {event.get('scenario')} "
+                       f"[{event.get('worker')}]", newline=True)
+        self.reported = self.tally.failed()
+
+        line = self.tally.summary()
+        if self.tally.running and self.live and not final:
+            line += f" | running: {', '.join(sorted(self.tally.running.values()))}"
+        if line == self.last_line:
+            if final and self.live:
+                self.out.write('\n')
+            return
+        if not self.live and not final and \
+                time.monotonic() - self.last_print < self.PLAIN_INTERVAL:
+            return
+        self._line(line, newline=final or not self.live)
+        self.last_line = line
+        self.last_print = time.monotonic()
+
+    def _line(self, text: str, newline: bool):
+        if self.live:
+            self.out.write('\r\033[K' + text + ('\n' if newline else ''))
+        else:
+            self.out.write(text + '\n')
+        self.out.flush()
+
+    def finish(self):
+        self.refresh(final=True)
+
+
+def tail(patterns: List[str], follow: bool = False, interval: float = 0.5,
+         timeout: Optional[float] = None, out=None) -> ProgressTally:
+    """Читать NDJSON-файлы (glob-шаблоны) и показывать прогресс"""
+    out = out or sys.stdout
+    tally = ProgressTally()
+    display = _Display(tally, out)
+    readers: Dict[str, _LineReader] = {}
+    started = time.monotonic()
+
+    while True:
+        for pattern in patterns:
+            for path in sorted(glob.glob(pattern)) or [pattern]:
+                readers.setdefault(path, _LineReader(Path(path)))
+        for reader in readers.values():
+            for event in reader.read():
+                tally.update(event)
+        if not follow or tally.done:
+            break
+        if timeout is not None and time.monotonic() - started > timeout:
+            break
+        display.refresh()
+        time.sleep(interval)
+
+    display.finish()
+    return tally
+
+
+def listen(socket_path: Path, timeout: Optional[float] = None, out=None) -> ProgressTally:
+    """Принимать потоки событий воркеров через Unix-сокет до их завершения"""
+    out = out or sys.stdout
+    socket_path = Path(socket_path)
+    if socket_path.exists():
+        socket_path.unlink()
+    tally = ProgressTally()
+    display = _Display(tally, out)
+    selector = selectors.DefaultSelector()
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(str(socket_path))
+    server.listen()
+    server.setblocking(False)
+    selector.register(server, selectors.EVENT_READ)
+    buffers: Dict[socket.socket, bytes] = {}
+    started = time.monotonic()
+
+    try:
+        while not tally.done:
+            if timeout is not None and time.monotonic() - started > timeout:
+                break
+            for key, _ in selector.select(timeout=0.5):
+                if key.fileobj is server:
+                    conn, _ = server.accept()
+                    conn.setblocking(False)
+                    selector.register(conn, selectors.EVENT_READ)
+                    buffers[conn] = b''
+                    continue
+                conn = key.fileobj
+                data = conn.recv(65536)
+                if not data:
+                    selector.unregister(conn)
+                    conn.close()
+                    buffers.pop(conn, None)
+                    continue
+                *lines, buffers[conn] = (buffers[conn] + data).split(b'\n')
+                for event in _decode(line.decode('utf-8') for line in lines):
+                    tally.update(event)
+            display.refresh()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        selector.close()
+        server.close()
+        socket_path.unlink(missing_ok=True)
+
+    display.finish()
+    return tally
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-events',
+        description='Живой прогресс BDD-прогона по потоку NDJSON-событий')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    tail_cmd = sub.add_parser('tail', help='читать файлы событий')
+    tail_cmd.add_argument('files', nargs='+', help='файлы или glob-шаблоны (по одному на шард)')
+    tail_cmd.add_argument('-f', '--follow', action='store_true',
+                          help='ждать новых событий, пока все воркеры не завершатся')
+    tail_cmd.add_argument('--timeout', type=float, default=None)
+
+    listen_cmd = sub.add_parser('listen', help='принимать события через Unix-сокет')
+    listen_cmd.add_argument('socket', type=Path)
+    listen_cmd.add_argument('--timeout', type=float, default=None)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == 'tail':
+        tally = tail(args.files, follow=args.follow, timeout=args.timeout)
+    else:
+        tally = listen(args.socket, timeout=args.timeout)
+    return 1 if tally.failed() else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
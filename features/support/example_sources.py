@@ -0,0 +1,382 @@
+"""
+Внешние таблицы примеров Scenario Outline (CSV и JSONL)
+
+Блок «Примеры:» с тегом @examples:<путь> и таблицей из одной строки
+заголовков берёт строки из файла; путь задаётся относительно .feature файла:
+
+    @examples:examples/spec_numbering.csv
+    Примеры: Сгенерированные наборы спецификаций
+      | существующие | название | номер |
+
+Заголовки таблицы выбирают столбцы источника (лишние столбцы допустимы).
+Строки читаются потоково: сценарий строки строится непосредственно перед
+её выполнением, файл не загружается в память и таблица не
+разворачивается заранее. Имя сценария заканчивается ссылкой на строку
+источника (spec_numbering.csv:17), и отчёт о падении указывает её точно.
+
+Выполненные сценарии остаются в Outline до конца прогона, если включены
+репортёры summary или junit: они читают результаты из outline.scenarios
+после feature, и память растёт с числом строк процесса (ограничивается
+шардами). С --no-summary --no-junit Outline хранит только упавшие
+сценарии и счётчики строк. Выбор по file:line и пропуск Outline строят
+сценарии всех строк шарда: behave сопоставляет строки по их списку.
+
+CODEV_EXAMPLES_SHARD=i/n (i от 1) оставляет процессу каждую n-ю строку
+Outline начиная с i-й; шардированный прогон (scheduler) выставляет его
+каждому воркеру.
+
+install() подменяет behave.parser.parse_file (поверх кэша feature_cache),
+чтобы разобранные features получали потоковые Outline.
+
+Использование:
+    codev-examples features/spider_protocol.feature
+    codev-examples features/spider_protocol.feature --shard 2/4 --rows
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import behave.parser
+from behave.model import Row, ScenarioOutline, ScenarioOutlineBuilder
+from behave.model_type import Status
+from behave.parser import ParserError
+
+SOURCE_TAG = 'examples:'
+SHARD_ENV = 'CODEV_EXAMPLES_SHARD'
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+
+class ExampleSourceError(ValueError):
+    """Источник примеров не читается или не соответствует таблице"""
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'i/n' -> (i, n), i от 1 до n"""
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ExampleSourceError(f"Неверный шард '{spec}', ожидается i/n") from None
+    if not 1 <= index <= count:
+        raise ExampleSourceError(f"Неверный шард '{spec}': нужно 1 <= i <= n")
+    return index, count
+
+
+def shard_from_env() -> Optional[Tuple[int, int]]:
+    spec = os.environ.get(SHARD_ENV)
+    return parse_shard(spec) if spec else None
+
+
+def in_shard(ordinal: int, shard: Optional[Tuple[int, int]]) -> bool:
+    """Принадлежит ли строка с порядковым номером ordinal (от 0) шарду"""
+    return shard is None or ordinal % shard[1] == shard[0] - 1
+
+
+class ExampleSource:
+    """Файл примеров: заголовок и потоковое чтение строк"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.format = FORMATS.get(self.path.suffix.lower())
+        if self.format is None:
+            raise ExampleSourceError(
+                f"{self.path.name}: неизвестный формат, ожидается {', '.join(FORMATS)}")
+        if not self.path.is_file():
+            raise ExampleSourceError(f"Файл примеров не найден: {self.path}")
+
+    def __repr__(self):
+        return f'<ExampleSource {self.path}>'
+
+    def columns(self) -> List[str]:
+        """Столбцы источника: строка заголовков CSV или ключи первой записи JSONL"""
+        records = self._records()
+        try:
+            for _, record in records:
+                return list(record) if self.format == 'jsonl' else record
+        finally:
+            records.close()
+        raise ExampleSourceError(f"{self.path.name}: файл пуст")
+
+    def rows(self) -> Iterator[Tuple[int, dict]]:
+        """(строка файла, значения по столбцам) для каждой записи"""
+        records = self._records()
+        columns = None
+        for line, record in records:
+            if self.format == 'jsonl':
+                columns = columns or list(record)
+                missing = [c for c in columns if c not in record]
+                if missing:
+                    raise ExampleSourceError(
+                        f"{self.path.name}:{line}: нет полей {', '.join(missing)}")
+                yield line, {key: _text(value) for key, value in record.items()}
+            elif columns is None:
+                columns = record
+            elif len(record) != len(columns):
+                raise ExampleSourceError(
+                    f"{self.path.name}:{line}: {len(record)} значений при {len(columns)} столбцах")
+            else:
+                yield line, dict(zip(columns, record))
+
+    def _records(self) -> Iterator[Tuple[int, object]]:
+        with open(self.path, encoding='utf-8', newline='') as f:
+            if self.format == 'csv':
+                reader = csv.reader(f)
+                line = 1
+                for record in reader:
+                    if record and any(cell.strip() for cell in record):
+                        yield line, [cell.strip() for cell in record]
+                    line = reader.line_num + 1
+                return
+            for line, text in enumerate(f, 1):
+                if not text.strip():
+                    continue
+                try:
+                    record = json.loads(text)
+                except ValueError as e:
+                    raise ExampleSourceError(f"{self.path.name}:{line}: {e}") from None
+                if not isinstance(record, dict):
+                    raise ExampleSourceError(f"{self.path.name}:{line}: ожидается JSON-объект")
+                yield line, record
+
+
+def _text(value) -> str:
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return value if isinstance(value, str) else json.dumps(value, ensure_ascii=False)
+
+
+def source_tag(example) -> Optional[str]:
+    """Путь из тега @examples:<путь> блока примеров"""
+    for tag in example.tags:
+        if tag.startswith(SOURCE_TAG):
+            return tag[len(SOURCE_TAG):]
+    return None
+
+
+class StreamedScenarioOutline(ScenarioOutline):
+    """Outline, строящий сценарии по одному по мере выполнения"""
+
+    _built = False
+    # Без репортёров выполненные строки не хранятся: итоги в счётчиках
+    _compact = False
+    _rows = _skipped_rows = 0
+    _rows_duration = 0.0
+
+    def iter_rows(self) -> Iterator[Tuple[object, Row, Optional[str]]]:
+        """(примеры, строка, ссылка на источник) строк этого процесса в порядке Outline"""
+        shard = shard_from_env()
+        ordinal = 0
+        for example_index, example in enumerate(self.examples, 1):
+            example.index = example_index
+            if example.table is None:
+                continue
+            source = getattr(example, 'source', None)
+            if source is None:
+                rows = ((row, None) for row in example.table)
+            else:
+                headings = list(example.table.headings)
+                rows = ((Row(headings, [values[h] for h in headings], line=example.line),
+                         f"{source.path.name}:{line}") for line, values in source.rows())
+            for row_index, (row, reference) in enumerate(rows, 1):
+                ordinal += 1
+                if in_shard(ordinal - 1, shard):
+                    row.index = row_index
+                    row.id = f"{example.index}.{row_index}"
+                    yield example, row, reference
+
+    def _iter_scenarios(self):
+        builder = ScenarioOutlineBuilder(self.annotation_schema)
+        for example, row, reference in self.iter_rows():
+            params = {'examples.name': example.name, 'examples.index': str(example.index),
+                      'row.index': str(row.index), 'row.id': row.id}
+            scenario = builder.make_scenario_for(example, row, self, params)
+            if reference:
+                scenario.name = f"{scenario.name} ({reference})"
+            yield scenario
+
+    @property
+    def scenarios(self):
+        # Полный список нужен отбору по строкам и пропуску; обычный прогон его не строит
+        if not self._built:
+            self._scenarios = list(self._iter_scenarios())
+            self._built = True
+        return self._scenarios
+
+    def should_run_with_tags(self, tag_expression):
+        # Теги строк внешних примеров - теги Outline и блока примеров
+        return any(tag_expression.check(self.effective_tags | set(example.tags))
+                   for example in self.examples) or tag_expression.check(self.effective_tags)
+
+    def compute_status(self):
+        status = super().compute_status()
+        if not self._compact or status.has_failed():
+            return status
+        if self._rows and self._skipped_rows == self._rows:
+            return Status.skipped
+        return Status.passed
+
+    @property
+    def duration(self):
+        return self._rows_duration if self._compact else super().duration
+
+    def reset(self):
+        super().reset()
+        if self._compact:
+            # Отброшенные строки не перезапустить по списку: следующий прогон читает источник заново
+            self._scenarios = []
+            self._built = self._compact = False
+
+    def run(self, runner):
+        # pylint: disable=protected-access
+        if self._built:
+            return super().run(runner)
+        self.clear_status()
+        self._scenarios = []
+        self._built = True
+        self._compact = not runner.config.reporters
+        self._rows = self._skipped_rows = 0
+        self._rows_duration = 0.0
+        failed_count = 0
+        for scenario in self._iter_scenarios():
+            runner.context._set_root_attribute('active_outline', scenario._row)
+            failed = scenario.run(runner)
+            if failed or not self._compact:
+                self._scenarios.append(scenario)
+            self._rows += 1
+            self._skipped_rows += scenario.status == Status.skipped
+            self._rows_duration += scenario.duration
+            if failed:
+                failed_count += 1
+                if runner.config.stop or runner.aborted:
+                    break
+        runner.context._set_root_attribute('active_outline', None)
+        return failed_count > 0
+
+
+def _outlines(container):
+    for item in container.run_items:
+        if isinstance(item, ScenarioOutline):
+            yield item
+        elif hasattr(item, 'run_items'):
+            yield from _outlines(item)
+
+
+def attach_sources(feature) -> int:
+    """Подключить внешние примеры к Outline разобранного feature; число потоковых Outline"""
+    base = Path(feature.filename).resolve().parent
+    count = 0
+    for outline in _outlines(feature):
+        streamed = False
+        for example in outline.examples:
+            path = source_tag(example)
+            if path is None:
+                continue
+            if example.table is None or example.table.rows:
+                raise ParserError(
+                    f"@{SOURCE_TAG}{path}: таблица примеров должна содержать только заголовки",
+                    example.line, feature.filename)
+            try:
+                source = ExampleSource(base / path)
+                missing = set(example.table.headings) - set(source.columns())
+            except (ExampleSourceError, OSError) as e:
+                raise ParserError(str(e), example.line, feature.filename) from None
+            if missing:
+                raise ParserError(
+                    f"{source.path.name}: нет столбцов {', '.join(sorted(missing))}",
+                    example.line, feature.filename)
+            example.source = source
+            streamed = True
+        if streamed and not isinstance(outline, StreamedScenarioOutline):
+            outline.__class__ = StreamedScenarioOutline
+            count += 1
+    return count
+
+
+def is_streamed(outline) -> bool:
+    return isinstance(outline, StreamedScenarioOutline)
+
+
+def walk_scenarios(container) -> Iterator:
+    """Как Feature.walk_scenarios, но потоковый Outline выдаётся целиком, без развёртывания"""
+    for item in container.run_items:
+        if is_streamed(item):
+            yield item
+        elif isinstance(item, ScenarioOutline):
+            yield from item.scenarios
+        elif hasattr(item, 'run_items'):
+            yield from walk_scenarios(item)
+        else:
+            yield item
+
+
+def install() -> bool:
+    """Подключать внешние примеры при каждом behave.parser.parse_file; False если уже подключено"""
+    current = behave.parser.parse_file
+    if getattr(current, 'example_sources', False):
+        return False
+
+    def parse_file(filename, language=None):
+        feature = current(filename, language=language)
+        if feature is not None:
+            attach_sources(feature)
+        return feature
+
+    parse_file.example_sources = True
+    parse_file.original = getattr(current, 'original', current)
+    if hasattr(current, 'cache'):
+        parse_file.cache = current.cache
+    behave.parser.parse_file = parse_file
+    return True
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-examples',
+        description='Внешние таблицы примеров Scenario Outline: источники и строки по шардам')
+    parser.add_argument('features', nargs='+', type=Path, help='.feature файлы')
+    parser.add_argument('--lang', default=None, help='язык .feature файлов по умолчанию')
+    parser.add_argument('--shard', default=None, help='показать только строки шарда i/n')
+    parser.add_argument('--rows', action='store_true', help='вывести строки')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ExampleSourceError as e:
+        print(f"ошибка: {e}", file=sys.stderr)
+        return 2
+    if shard:
+        os.environ[SHARD_ENV] = args.shard
+
+    exit_code = 0
+    for path in args.features:
+        try:
+            feature = behave.parser.parse_file(str(path), language=args.lang)
+            if feature is None:
+                continue
+            attach_sources(feature)
+            for outline in filter(is_streamed, _outlines(feature)):
+                count = 0
+                for example, row, reference in outline.iter_rows():
+                    count += 1
+                    if args.rows:
+                        print(f"  {reference or f'{path}:{row.line}'}  "
+                              + ' | '.join(f"{h}={v}" for h, v in zip(row.headings, row.cells)))
+                sources = ', '.join(os.path.relpath(e.source.path) for e in outline.examples
+                                    if getattr(e, 'source', None))
+                print(f"{path}:{outline.line}  {outline.name}: {count} строк ({sources})")
+        except (ParserError, ExampleSourceError) as e:
+            print(f"{path}: {e}", file=sys.stderr)
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
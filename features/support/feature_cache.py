@@ -0,0 +1,98 @@
+"""
+Дисковый кэш разобранных .feature файлов
+
+Разобранная модель behave сохраняется pickle-файлом, ключ - SHA-256 пути,
+языка, версии behave и содержимого файла. Повторный запуск читает готовую
+модель вместо разбора Gherkin; при изменении файла старая запись удаляется.
+
+install() подменяет behave.parser.parse_file кэширующей версией, чтобы
+кэш использовался и обычным запуском behave (environment.py загружается
+раньше, чем разбираются .feature файлы). Отключается переменной окружения
+CODEV_FEATURE_CACHE=0.
+"""
+import copyreg
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Optional
+
+import behave
+import behave.parser
+from behave.model import Tag
+
+CACHE_VERSION = 1
+DISABLE_ENV = 'CODEV_FEATURE_CACHE'
+
+# Tag - подкласс str с обязательным аргументом line, pickle по умолчанию его теряет
+copyreg.pickle(Tag, lambda tag: (Tag, (str(tag), tag.line)))
+
+# При перезагрузке модуля parse_file уже может быть подменён
+_original_parse_file = getattr(behave.parser.parse_file, 'original', behave.parser.parse_file)
+
+
+class FeatureCache:
+    """Каталог pickle-файлов с разобранными моделями features"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, filename: str, language: Optional[str], data: bytes) -> Path:
+        path_key = hashlib.sha256(filename.encode('utf-8')).hexdigest()[:16]
+        content = hashlib.sha256()
+        for part in (str(CACHE_VERSION), behave.__version__, language or ''):
+            content.update(part.encode('utf-8') + b'\0')
+        content.update(data)
+        return self.directory / f'{path_key}-{content.hexdigest()[:32]}.pickle'
+
+    def load(self, filename: str, language: Optional[str] = None):
+        """Модель файла из кэша или из разбора с сохранением в кэш"""
+        filename = os.path.abspath(filename)
+        with open(filename, 'rb') as f:
+            data = f.read()
+        entry = self._entry(filename, language, data)
+        try:
+            with open(entry, 'rb') as f:
+                feature = pickle.load(f)
+            self.hits += 1
+            return feature
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            pass
+
+        self.misses += 1
+        feature = _original_parse_file(filename, language=language)
+        self._store(entry, feature)
+        return feature
+
+    def _store(self, entry: Path, feature):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Удалить записи прежних версий этого же файла
+        path_key = entry.name.split('-', 1)[0]
+        for stale in self.directory.glob(f'{path_key}-*.pickle'):
+            stale.unlink(missing_ok=True)
+        tmp = entry.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp, 'wb') as f:
+            pickle.dump(feature, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, entry)
+
+
+def default_cache_dir(features_dir: Path) -> Path:
+    """codev/.cache/features рядом с каталогом features"""
+    return Path(features_dir).resolve().parent / 'codev' / '.cache' / 'features'
+
+
+def install(cache: FeatureCache) -> bool:
+    """Направить behave.parser.parse_file через кэш; False если кэш отключён"""
+    if os.environ.get(DISABLE_ENV) == '0':
+        behave.parser.parse_file = _original_parse_file
+        return False
+
+    def parse_file(filename, language=None):
+        return cache.load(filename, language)
+
+    parse_file.cache = cache
+    parse_file.original = _original_parse_file
+    behave.parser.parse_file = parse_file
+    return True
@@ -0,0 +1,71 @@
+"""
+Персистентный кэш результатов по хэшу содержимого файлов
+
+Хранит два отображения:
+- путь -> (mtime, размер, SHA-256), чтобы не перечитывать неизменённые файлы;
+- ключ (обычно производный от SHA-256) -> результат обработки.
+
+При сохранении остаются только записи, использованные в текущем запуске.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from features.support.documents import file_digest
+
+
+class HashCache:
+    """JSON-кэш результатов, адресуемых хэшем содержимого"""
+
+    def __init__(self, path: Optional[Path], version: int):
+        self.path = Path(path) if path else None
+        self.version = version
+        self.files: Dict[str, list] = {}
+        self.results: Dict[str, Any] = {}
+        self._used_files = set()
+        self._used_results = set()
+
+        if self.path and self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                data = {}
+            if data.get('version') == version:
+                self.files = data.get('files', {})
+                self.results = data.get('results', {})
+
+    def digest(self, path: Path) -> str:
+        """SHA-256 файла; пересчитывается только при изменении mtime или размера"""
+        key = str(path)
+        st = os.stat(path)
+        self._used_files.add(key)
+        entry = self.files.get(key)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[2]
+        digest = file_digest(path)
+        self.files[key] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def get(self, key: str) -> Optional[Any]:
+        if key in self.results:
+            self._used_results.add(key)
+            return self.results[key]
+        return None
+
+    def put(self, key: str, value: Any):
+        self.results[key] = value
+        self._used_results.add(key)
+
+    def save(self):
+        """Атомарно записать кэш, отбросив записи, не использованные в этом запуске"""
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({
+            'version': self.version,
+            'files': {k: v for k, v in self.files.items() if k in self._used_files},
+            'results': {k: v for k, v in self.results.items() if k in self._used_results},
+        }, ensure_ascii=False), encoding='utf-8')
+        os.replace(tmp, self.path)
@@ -0,0 +1,317 @@
+"""
+Бюджеты производительности проекта для фазы Evaluate
+
+Бенчмарки - функции bench_* без аргументов в файлах bench_*.py каталогов
+benchmarks/ и tests/ проекта. Каждая функция прогревается, затем
+измеряется серией замеров; длина замера подбирается так, чтобы он занимал
+не меньше MIN_SAMPLE_TIME (как timeit.autorange), сравнивается медиана
+времени одного вызова.
+
+Бюджеты и базовые значения хранятся рядом со спецификацией:
+codev/specs/0001-name.md -> codev/specs/0001-name.perf.json
+
+    {
+      "budgets": {"bench_login": "2ms"},
+      "tolerance": 0.25,
+      "baseline": {"bench_login": 0.00081}
+    }
+
+Превышение бюджета и замедление больше чем на tolerance относительно
+базового значения - ошибки; --update-baseline записывает текущие медианы.
+
+Использование:
+    python -m features.support.perf_budget path/to/project
+    python -m features.support.perf_budget path/to/project --spec codev/specs/0001-x.md --json
+"""
+import argparse
+import importlib.util
+import inspect
+import json
+import os
+import re
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from features.support.coverage_gate import project_imports
+from features.support.documents import iter_documents
+from features.support.protocol_validator import Finding
+
+BENCH_DIRS = ('benchmarks', 'tests')
+WARMUP = 3
+SAMPLES = 7
+# Минимальная длительность одного замера, секунды
+MIN_SAMPLE_TIME = 0.005
+MAX_NUMBER = 1_000_000
+DEFAULT_TOLERANCE = 0.25
+
+DURATION_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*(ns|us|µs|мкс|ms|мс|s|с)?\s*$')
+DURATION_UNITS = {None: 1.0, 's': 1.0, 'с': 1.0, 'ms': 1e-3, 'мс': 1e-3,
+                  'us': 1e-6, 'µs': 1e-6, 'мкс': 1e-6, 'ns': 1e-9}
+
+
+def parse_duration(value) -> float:
+    """'2ms' -> 0.002; число - секунды"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = DURATION_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Неверная длительность: {value!r} (ожидается например 50us, 2ms, 1s)")
+    return float(match.group(1)) * DURATION_UNITS[match.group(2)]
+
+
+def format_duration(seconds: float) -> str:
+    for unit, scale in (('s', 1.0), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3g}{unit}"
+    return f"{seconds / 1e-9:.3g}ns"
+
+
+@dataclass
+class Benchmark:
+    """Найденная функция бенчмарка"""
+    name: str
+    path: str
+    line: int
+    func: Callable = field(repr=False, compare=False)
+
+
+@dataclass
+class BenchmarkResult:
+    """Время одного вызова по серии замеров"""
+    name: str
+    path: str
+    line: int
+    number: int
+    samples: List[float]
+    budget: Optional[float] = None
+    baseline: Optional[float] = None
+
+    @property
+    def median(self) -> float:
+        return statistics.median(self.samples)
+
+    @property
+    def best(self) -> float:
+        return min(self.samples)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data.update(median=self.median, best=self.best)
+        return data
+
+
+@dataclass
+class PerfBudget:
+    """Содержимое файла .perf.json спецификации"""
+    path: Path
+    budgets: Dict[str, float] = field(default_factory=dict)
+    baseline: Dict[str, float] = field(default_factory=dict)
+    tolerance: float = DEFAULT_TOLERANCE
+
+    @classmethod
+    def load(cls, path: Path) -> 'PerfBudget':
+        budget = cls(Path(path))
+        if not budget.path.exists():
+            return budget
+        data = json.loads(budget.path.read_text(encoding='utf-8'))
+        budget.budgets = {k: parse_duration(v) for k, v in data.get('budgets', {}).items()}
+        budget.baseline = {k: float(v) for k, v in data.get('baseline', {}).items()}
+        budget.tolerance = float(data.get('tolerance', DEFAULT_TOLERANCE))
+        return budget
+
+    def save(self):
+        data = {}
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        # Бюджеты остаются в записи автора (например "2ms"), обновляется только baseline
+        data.setdefault('budgets', {})
+        data.setdefault('tolerance', self.tolerance)
+        data['baseline'] = {k: float(f"{v:.6g}") for k, v in sorted(self.baseline.items())}
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        os.replace(tmp, self.path)
+
+
+@dataclass
+class PerfReport:
+    """Результаты бенчмарков и найденные нарушения"""
+    results: List[BenchmarkResult]
+    findings: List[Finding]
+    budget_path: Optional[str] = None
+
+    @property
+    def errors(self) -> List[Finding]:
+        return [f for f in self.findings if f.severity == 'error']
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+    def to_dict(self) -> dict:
+        return {
+            'performance': 'OK' if self.ok else 'FAIL',
+            'budget_file': self.budget_path,
+            'benchmarks': [r.to_dict() for r in self.results],
+            'findings': [asdict(f) for f in self.findings],
+        }
+
+
+def budget_path(spec: Path) -> Path:
+    """codev/specs/0001-name.md -> codev/specs/0001-name.perf.json"""
+    return Path(spec).with_suffix('.perf.json')
+
+
+def latest_spec(project: Path) -> Optional[Path]:
+    """Спецификация с наибольшим номером"""
+    specs = [d for d in iter_documents(Path(project) / 'codev', kinds=('specs',)) if d.number]
+    return max(specs, key=lambda d: d.number).path if specs else None
+
+
+def discover(project: Path) -> List[Benchmark]:
+    """Функции bench_* из файлов bench_*.py (модули проекта должны быть импортируемы)"""
+    project = Path(project).resolve()
+    found = []
+    for directory in BENCH_DIRS:
+        for path in sorted((project / directory).rglob('bench_*.py')):
+            relative = os.path.relpath(path, project)
+            module_name = '_codev_bench_' + re.sub(r'\W', '_', relative[:-3])
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+            for name, func in inspect.getmembers(module, inspect.isfunction):
+                if not name.startswith('bench_') or func.__module__ != module_name:
+                    continue
+                line = func.__code__.co_firstlineno
+                found.append(Benchmark(name, relative, line, func))
+    return sorted(found, key=lambda b: (b.path, b.line))
+
+
+def calibrate(func: Callable, min_time: float = MIN_SAMPLE_TIME) -> int:
+    """Число вызовов в замере, при котором замер длится не меньше min_time"""
+    number = 1
+    while number < MAX_NUMBER:
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        if time.perf_counter() - started >= min_time:
+            break
+        number *= 10
+    return number
+
+
+def run_benchmark(bench: Benchmark, warmup: int = WARMUP, samples: int = SAMPLES,
+                  min_time: float = MIN_SAMPLE_TIME) -> BenchmarkResult:
+    """Прогрев и серия замеров; в samples - время одного вызова"""
+    func = bench.func
+    for _ in range(warmup):
+        func()
+    number = calibrate(func, min_time)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return BenchmarkResult(bench.name, bench.path, bench.line, number, timings)
+
+
+def check(results: List[BenchmarkResult], budget: PerfBudget) -> List[Finding]:
+    """Сравнить медианы с бюджетами и базовыми значениями"""
+    findings = []
+    path = str(budget.path)
+    names = {r.name for r in results}
+    for name in sorted(set(budget.budgets) - names):
+        findings.append(Finding('warning', 'perf-missing', path, 0,
+                                f"бюджет задан для отсутствующего бенчмарка {name}"))
+    for result in results:
+        result.budget = budget.budgets.get(result.name)
+        result.baseline = budget.baseline.get(result.name)
+        median = result.median
+        if result.budget is not None and median > result.budget:
+            findings.append(Finding(
+                'error', 'perf-budget', result.path, result.line,
+                f"{result.name}: {format_duration(median)} > бюджет "
+                f"{format_duration(result.budget)}"))
+        if result.baseline is not None:
+            limit = result.baseline * (1 + budget.tolerance)
+            # Лучший замер тоже выше предела - не шум отдельных замеров
+            if median > limit and result.best > limit:
+                findings.append(Finding(
+                    'error', 'perf-regression', result.path, result.line,
+                    f"{result.name}: {format_duration(median)} медленнее базового "
+                    f"{format_duration(result.baseline)} более чем на {budget.tolerance:.0%}"))
+        if result.budget is None and result.baseline is None:
+            findings.append(Finding('warning', 'perf-unbudgeted', result.path, result.line,
+                                    f"{result.name}: нет бюджета и базового значения"))
+    return findings
+
+
+def evaluate(project: Path, spec: Optional[Path] = None, warmup: int = WARMUP,
+             samples: int = SAMPLES, update_baseline: bool = False) -> PerfReport:
+    """Найти и выполнить бенчмарки проекта, проверить бюджеты спецификации"""
+    project = Path(project).resolve()
+    spec = Path(spec) if spec else latest_spec(project)
+    budget = PerfBudget.load(budget_path(spec)) if spec else None
+
+    with project_imports(project):
+        benchmarks = discover(project)
+        results = [run_benchmark(b, warmup, samples) for b in benchmarks]
+
+    if budget is None:
+        findings = [Finding('warning', 'perf-unbudgeted', r.path, r.line,
+                            f"{r.name}: нет спецификации для бюджета") for r in results]
+        return PerfReport(results, findings)
+
+    findings = check(results, budget)
+    if update_baseline and results:
+        budget.baseline.update({r.name: r.median for r in results})
+        budget.save()
+    return PerfReport(results, findings, os.path.relpath(budget.path, project))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-perf',
+        description='Бенчмарки проекта и проверка бюджетов производительности спецификации')
+    parser.add_argument('project', type=Path, nargs='?', default=Path(os.getcwd()))
+    parser.add_argument('--spec', type=Path, default=None,
+                        help='спецификация (по умолчанию с наибольшим номером)')
+    parser.add_argument('--warmup', type=int, default=WARMUP)
+    parser.add_argument('--samples', type=int, default=SAMPLES)
+    parser.add_argument('--update-baseline', action='store_true',
+                        help='записать текущие медианы как базовые значения')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    spec = args.spec if args.spec is None or args.spec.is_absolute() else args.project / args.spec
+    report = evaluate(args.project, spec, args.warmup, args.samples, args.update_baseline)
+
+    if args.json:
+        print(json.dumps(report.to_dict(), ensure_ascii=False, indent=2))
+    else:
+        for r in report.results:
+            limits = []
+            if r.budget is not None:
+                limits.append(f"budget {format_duration(r.budget)}")
+            if r.baseline is not None:
+                limits.append(f"baseline {format_duration(r.baseline)}")
+            print(f"{r.path}:{r.line}: {r.name} {format_duration(r.median)} "
+                  f"(best {format_duration(r.best)}, {len(r.samples)}x{r.number})"
+                  + (f"  [{', '.join(limits)}]" if limits else ''))
+        for f in report.findings:
+            print(f"{f.path}:{f.line}: {f.severity}: [{f.code}] {f.message}")
+        print(f"benchmarks={len(report.results)} errors={len(report.errors)} "
+              f"performance={'OK' if report.ok else 'FAIL'}")
+    return 0 if report.ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
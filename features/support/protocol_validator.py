@@ -0,0 +1,305 @@
+"""
+Валидатор корпуса протоколов Codev и расхождений с codev-skeleton
+
+Разбирает protocol.md и шаблоны каждого протокола (параллельно, с кэшем
+по SHA-256 содержимого), проверяет обязательные фазы и шаблоны и
+сравнивает codev/protocols с codev-skeleton/protocols на уровне секций.
+
+Использование:
+    python -m features.support.protocol_validator
+    python -m features.support.protocol_validator --json --jobs 8
+"""
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from features.support.documents import cache_dir, parse_sections
+from features.support.hash_cache import HashCache
+
+CACHE_VERSION = 1
+
+# Минимум неразобранных файлов, при котором имеет смысл запускать процессы
+PARALLEL_THRESHOLD = 16
+
+PROTOCOL_TREES = ('codev/protocols', 'codev-skeleton/protocols')
+REFERENCE_TREE = 'codev-skeleton/protocols'
+
+REQUIRED_TEMPLATES = ('spec.md', 'plan.md', 'review.md')
+
+# Обязательные фазы известных протоколов (ищутся в заголовках protocol.md)
+PROTOCOL_PHASES = {
+    'spider': ('Specify', 'Plan', 'Implement', 'Defend', 'Evaluate', 'Review'),
+    'spider-solo': ('Specify', 'Plan', 'Implement', 'Defend', 'Evaluate', 'Review'),
+    'tick': ('Specification', 'Planning', 'Implementation', 'Review'),
+}
+
+TEMPLATES_HEADING_RE = re.compile(r'^(Шаблоны|Templates?|Template Usage)$', re.IGNORECASE)
+TEMPLATE_REF_RE = re.compile(r'`(?:[\w./-]*/)?([\w-]+\.md)`')
+
+
+@dataclass
+class Finding:
+    """Проблема, найденная валидатором"""
+    severity: str
+    code: str
+    path: str
+    line: int
+    message: str
+
+
+@dataclass
+class ValidationReport:
+    """Результат проверки корпуса протоколов"""
+    findings: List[Finding] = field(default_factory=list)
+    files: int = 0
+    parsed: int = 0
+    cached: int = 0
+
+    @property
+    def errors(self) -> List[Finding]:
+        return [f for f in self.findings if f.severity == 'error']
+
+    @property
+    def drift(self) -> List[Finding]:
+        return [f for f in self.findings if f.code.startswith('drift-')]
+
+
+def parse_protocol_file(path: str) -> dict:
+    """Хэш и структура секций одного файла (выполняется в рабочем процессе)"""
+    data = Path(path).read_bytes()
+    text = data.decode('utf-8')
+    sections = []
+    templates = []
+    for section in parse_sections(text):
+        body_hash = hashlib.sha1(section.text.strip().encode('utf-8')).hexdigest()
+        sections.append([section.level, section.heading, section.line, body_hash])
+        if TEMPLATES_HEADING_RE.match(section.heading):
+            templates.extend(TEMPLATE_REF_RE.findall(section.text))
+    return {
+        'sha256': hashlib.sha256(data).hexdigest(),
+        'sections': sections,
+        'templates': sorted(set(templates)),
+    }
+
+
+def discover_protocols(root: Path, trees=PROTOCOL_TREES) -> Dict[str, Dict[str, Path]]:
+    """Найти протоколы в деревьях: {дерево: {имя протокола: каталог}}"""
+    found = {}
+    for tree in trees:
+        tree_dir = root / tree
+        found[tree] = {
+            p.name: p for p in sorted(tree_dir.iterdir()) if p.is_dir()
+        } if tree_dir.is_dir() else {}
+    return found
+
+
+def protocol_files(protocol_dir: Path) -> List[Path]:
+    """protocol.md и все шаблоны протокола"""
+    files = [protocol_dir / 'protocol.md']
+    templates_dir = protocol_dir / 'templates'
+    if templates_dir.is_dir():
+        files.extend(sorted(templates_dir.glob('*.md')))
+    return [f for f in files if f.exists()]
+
+
+def parse_all(paths: List[Path], cache: HashCache, jobs: Optional[int],
+              report: ValidationReport) -> Dict[Path, dict]:
+    """Разобрать файлы, используя кэш и пул процессов для непрочитанных"""
+    outlines, pending = {}, []
+    for path in paths:
+        outline = cache.get(cache.digest(path))
+        if outline is None:
+            pending.append(path)
+        else:
+            outlines[path] = outline
+            report.cached += 1
+
+    if len(pending) >= PARALLEL_THRESHOLD and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(parse_protocol_file, map(str, pending), chunksize=8))
+    else:
+        results = [parse_protocol_file(str(p)) for p in pending]
+
+    for path, outline in zip(pending, results):
+        cache.put(outline['sha256'], outline)
+        outlines[path] = outline
+        report.parsed += 1
+    return outlines
+
+
+def check_structure(name: str, protocol_dir: Path, outlines: Dict[Path, dict],
+                    root: Path) -> List[Finding]:
+    """Проверить наличие protocol.md, шаблонов и обязательных фаз"""
+    findings = []
+    protocol_md = protocol_dir / 'protocol.md'
+    rel = protocol_md.relative_to(root).as_posix()
+
+    if protocol_md not in outlines:
+        return [Finding('error', 'missing-file', rel, 0, 'protocol.md отсутствует')]
+    outline = outlines[protocol_md]
+
+    required = set(REQUIRED_TEMPLATES) | set(outline['templates'])
+    for template in sorted(required):
+        if not (protocol_dir / 'templates' / template).exists():
+            findings.append(Finding(
+                'error', 'missing-template', rel, 0,
+                f"протокол {name}: нет шаблона templates/{template}"))
+
+    headings = ' | '.join(s[1] for s in outline['sections']).lower()
+    for phase in PROTOCOL_PHASES.get(name, ()):
+        if phase.lower() not in headings:
+            findings.append(Finding(
+                'error', 'missing-phase', rel, 0,
+                f"протокол {name}: не найдена фаза {phase}"))
+
+    for path, template_outline in outlines.items():
+        if path.parent == protocol_dir / 'templates':
+            sections = template_outline['sections']
+            if not sections or sections[0][0] != 1:
+                findings.append(Finding(
+                    'warning', 'template-title', path.relative_to(root).as_posix(), 1,
+                    'шаблон должен начинаться с заголовка первого уровня'))
+    return findings
+
+
+def compare_outlines(reference: dict, other: dict, other_rel: str) -> List[Finding]:
+    """Сравнить секции файла с эталоном из codev-skeleton"""
+    findings = []
+    ref_sections, sections = reference['sections'], other['sections']
+    matcher = difflib.SequenceMatcher(
+        a=[(s[0], s[1]) for s in ref_sections],
+        b=[(s[0], s[1]) for s in sections],
+        autojunk=False)
+
+    for op, i1, i2, j1, j2 in matcher.get_opcodes():
+        if op == 'equal':
+            for ref, cur in zip(ref_sections[i1:i2], sections[j1:j2]):
+                if ref[3] != cur[3]:
+                    findings.append(Finding(
+                        'warning', 'drift-changed', other_rel, cur[2],
+                        f"секция '{cur[1]}' отличается от codev-skeleton"))
+            continue
+        if op == 'replace' and i2 - i1 == j2 - j1:
+            for ref, cur in zip(ref_sections[i1:i2], sections[j1:j2]):
+                findings.append(Finding(
+                    'warning', 'drift-renamed', other_rel, cur[2],
+                    f"секция '{cur[1]}' вместо '{ref[1]}' из codev-skeleton"))
+            continue
+        for ref in ref_sections[i1:i2]:
+            findings.append(Finding(
+                'warning', 'drift-removed', other_rel, sections[j1][2] if j1 < len(sections) else 0,
+                f"нет секции '{ref[1]}' из codev-skeleton (строка {ref[2]})"))
+        for cur in sections[j1:j2]:
+            findings.append(Finding(
+                'warning', 'drift-added', other_rel, cur[2],
+                f"секция '{cur[1]}' отсутствует в codev-skeleton"))
+    return findings
+
+
+def check_drift(root: Path, protocols: Dict[str, Dict[str, Path]],
+                outlines: Dict[Path, dict]) -> List[Finding]:
+    """Сравнить копии протоколов с эталонным деревом codev-skeleton"""
+    findings = []
+    reference = protocols.get(REFERENCE_TREE, {})
+    for tree, tree_protocols in protocols.items():
+        if tree == REFERENCE_TREE:
+            continue
+        for name in sorted(set(reference) | set(tree_protocols)):
+            if name not in tree_protocols:
+                findings.append(Finding(
+                    'warning', 'drift-missing-protocol', f'{tree}/{name}', 0,
+                    f"протокол {name} есть только в {REFERENCE_TREE}"))
+                continue
+            if name not in reference:
+                findings.append(Finding(
+                    'warning', 'drift-extra-protocol', f'{tree}/{name}', 0,
+                    f"протокол {name} отсутствует в {REFERENCE_TREE}"))
+                continue
+
+            ref_dir, cur_dir = reference[name], tree_protocols[name]
+            ref_files = {p.relative_to(ref_dir): p for p in protocol_files(ref_dir)}
+            cur_files = {p.relative_to(cur_dir): p for p in protocol_files(cur_dir)}
+            for rel in sorted(set(ref_files) | set(cur_files)):
+                cur_rel = f'{tree}/{name}/{rel.as_posix()}'
+                if rel not in cur_files:
+                    findings.append(Finding('warning', 'drift-missing-file', cur_rel, 0,
+                                            'файл есть только в codev-skeleton'))
+                elif rel not in ref_files:
+                    findings.append(Finding('warning', 'drift-extra-file', cur_rel, 0,
+                                            'файл отсутствует в codev-skeleton'))
+                else:
+                    ref_outline = outlines[ref_files[rel]]
+                    cur_outline = outlines[cur_files[rel]]
+                    if ref_outline['sha256'] != cur_outline['sha256']:
+                        findings.extend(compare_outlines(ref_outline, cur_outline, cur_rel))
+    return findings
+
+
+def validate(root: Path, trees=PROTOCOL_TREES, jobs: Optional[int] = None,
+             cache_path: Optional[Path] = None) -> ValidationReport:
+    """Проверить структуру всех протоколов и их расхождения с codev-skeleton"""
+    root = Path(root)
+    report = ValidationReport()
+    cache = HashCache(cache_path, CACHE_VERSION)
+
+    protocols = discover_protocols(root, trees)
+    paths = [f for tree in protocols.values() for d in tree.values() for f in protocol_files(d)]
+    report.files = len(paths)
+    outlines = parse_all(paths, cache, jobs, report)
+    cache.save()
+
+    for tree, tree_protocols in protocols.items():
+        for name, protocol_dir in tree_protocols.items():
+            own = {p: outlines[p] for p in protocol_files(protocol_dir)}
+            report.findings.extend(check_structure(name, protocol_dir, own, root))
+    report.findings.extend(check_drift(root, protocols, outlines))
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-validate-protocols',
+        description='Проверка структуры протоколов Codev и расхождений с codev-skeleton')
+    parser.add_argument('--root', type=Path, default=Path(os.getcwd()),
+                        help='корень репозитория (по умолчанию текущий)')
+    parser.add_argument('--jobs', type=int, default=None,
+                        help='число процессов для разбора (по умолчанию по числу CPU)')
+    parser.add_argument('--no-cache', action='store_true', help='не использовать кэш разбора')
+    parser.add_argument('--strict-drift', action='store_true',
+                        help='считать расхождения с codev-skeleton ошибкой')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    cache_path = None if args.no_cache else cache_dir(args.root / 'codev') / 'protocols.json'
+    report = validate(args.root, jobs=args.jobs, cache_path=cache_path)
+
+    if args.json:
+        print(json.dumps({
+            'files': report.files,
+            'parsed': report.parsed,
+            'cached': report.cached,
+            'findings': [asdict(f) for f in report.findings],
+        }, ensure_ascii=False, indent=2))
+    else:
+        for f in report.findings:
+            print(f"{f.path}:{f.line}: {f.severity}: [{f.code}] {f.message}")
+        print(f"files={report.files} parsed={report.parsed} cached={report.cached} "
+              f"errors={len(report.errors)} drift={len(report.drift)}")
+
+    failed = report.errors or (args.strict_drift and report.drift)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+Пакетное создание specs, plans и reviews по бэклогу функций
+
+Для N функций за одну операцию создаются спецификация, план и (по
+желанию) заготовка обзора из шаблонов протокола. Шаблоны разбираются один
+раз на пакет; номера выделяются непрерывным диапазоном под блокировкой
+codev/.cache/scaffold.lock, так что параллельные импорты не пересекаются.
+
+Публикация транзакционна:
+    1. все файлы пишутся в codev/.scaffold-staging (та же файловая система);
+    2. файлы, журнал переносов и каталоги staging сбрасываются на диск (fsync);
+    3. журнал публикуется атомарным rename и fsync каталога codev/ - точка
+       фиксации;
+    4. файлы переносятся в specs/, plans/, reviews/, эти каталоги
+       сбрасываются на диск, и журнал удаляется.
+Ошибка до фиксации удаляет staging, ошибка переноса возвращает уже
+перенесённые файлы. Если процесс прервался после фиксации, следующий запуск
+дописывает пакет по журналу, а если до неё - удаляет staging. Частично
+созданных пакетов не остаётся.
+
+Бэклог - текстовый файл (одно название на строку, # - комментарий) или
+JSONL с полями title и необязательным slug.
+
+Использование:
+    codev-scaffold backlog.txt
+    codev-scaffold backlog.jsonl --reviews --protocol spider-solo
+    echo "Экспорт отчётов" | codev-scaffold - --json
+"""
+import argparse
+import fcntl
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from features.support.documents import cache_dir, iter_documents
+
+STAGING_DIR = '.scaffold-staging'
+JOURNAL = '.scaffold-journal.json'
+MAX_NUMBER = 9999
+
+# Вид документа -> (каталог codev/, шаблон протокола)
+KINDS = {'spec': ('specs', 'spec.md'), 'plan': ('plans', 'plan.md'),
+         'review': ('reviews', 'review.md')}
+
+# Название подставляется только в заголовок документа: [Название] встречается
+# и в повторяющихся секциях шаблона (### Вариант 1: [Название])
+TITLE_PLACEHOLDERS = {
+    '[Название]': 'title',
+    '[Название функции/проекта]': 'title',
+}
+PLACEHOLDERS = {
+    '[краткое-название]': 'slug',
+    '[ГГГГ-ММ-ДД]': 'date',
+    '[Ссылка на codev/specs/spec-file.md]': 'spec_link',
+    '[Ссылка на codev/plans/plan-file.md]': 'plan_link',
+}
+SLUG_RE = re.compile(r'[^\w]+')
+
+
+class ScaffoldError(RuntimeError):
+    """Пакет не создан; файлы проекта не изменены"""
+
+
+@dataclass(frozen=True)
+class FeatureRequest:
+    """Функция из бэклога"""
+    title: str
+    slug: str
+
+
+@dataclass
+class ScaffoldResult:
+    """Созданный пакет документов"""
+    first: int
+    last: int
+    files: List[Path] = field(default_factory=list)
+    elapsed: float = 0.0
+    synced: int = 0     # вызовы fsync файлов и каталогов
+
+    @property
+    def numbers(self) -> List[str]:
+        return [f'{n:04d}' for n in range(self.first, self.last + 1)]
+
+
+def slugify(title: str) -> str:
+    """'Экспорт отчётов в CSV' -> 'экспорт-отчётов-в-csv'"""
+    return SLUG_RE.sub('-', title.casefold()).strip('-_')
+
+
+def read_backlog(lines: Iterable[str]) -> List[FeatureRequest]:
+    """Функции из текстовых строк или JSONL"""
+    features = []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                record = json.loads(line)
+                title = str(record['title']).strip()
+            except (ValueError, KeyError, TypeError):
+                raise ScaffoldError(f"строка {number}: ожидается JSON с полем title") from None
+            slug = slugify(record.get('slug') or title)
+        else:
+            title, slug = line, slugify(line)
+        if not title or not slug:
+            raise ScaffoldError(f"строка {number}: пустое название функции")
+        features.append(FeatureRequest(title, slug))
+    return features
+
+
+class CompiledTemplate:
+    """Шаблон, заранее разбитый на текст и плейсхолдеры"""
+
+    def __init__(self, text: str):
+        title, newline, body = text.partition('\n')
+        self.parts: List[str] = []
+        self.slots: List[Tuple[int, str]] = []
+        for segment, placeholders in ((title + newline, {**TITLE_PLACEHOLDERS, **PLACEHOLDERS}),
+                                      (body, PLACEHOLDERS)):
+            pattern = '(' + '|'.join(re.escape(p) for p in placeholders) + ')'
+            # Нечётные элементы split - найденные плейсхолдеры
+            for i, part in enumerate(re.split(pattern, segment)):
+                if i % 2:
+                    self.slots.append((len(self.parts), placeholders[part]))
+                self.parts.append(part)
+
+    def render(self, values: Dict[str, str]) -> str:
+        parts = self.parts[:]
+        for i, name in self.slots:
+            parts[i] = values[name]
+        return ''.join(parts)
+
+
+def _fsync(path: Path):
+    # Для каталога fsync сохраняет записи о созданных и перенесённых в него файлах
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _move(src: Path, dst: Path):
+    # os.link + unlink не перезаписывает существующий файл, в отличие от rename
+    os.link(src, dst)
+    os.unlink(src)
+
+
+class Scaffolder:
+    """Транзакционное создание документов в codev/ проекта"""
+
+    def __init__(self, root: Path, protocol: str = 'spider', reviews: bool = False,
+                 today: Optional[str] = None, durable: bool = True):
+        self.root = Path(root)
+        self.codev_dir = self.root / 'codev'
+        self.protocol = protocol
+        self.kinds = ['spec', 'plan'] + (['review'] if reviews else [])
+        self.today = today or date.today().isoformat()
+        self.durable = durable
+        self.synced = 0
+        self.staging = self.codev_dir / STAGING_DIR
+        self.journal = self.codev_dir / JOURNAL
+
+    def _templates(self) -> Dict[str, CompiledTemplate]:
+        templates_dir = self.codev_dir / 'protocols' / self.protocol / 'templates'
+        templates = {}
+        for kind in self.kinds:
+            path = templates_dir / KINDS[kind][1]
+            try:
+                templates[kind] = CompiledTemplate(path.read_text(encoding='utf-8'))
+            except OSError:
+                raise ScaffoldError(f"нет шаблона {path}") from None
+        return templates
+
+    @contextmanager
+    def _locked(self):
+        with open(cache_dir(self.codev_dir) / 'scaffold.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _sync(self, *paths: Path):
+        if self.durable:
+            for path in paths:
+                _fsync(path)
+            self.synced += len(paths)
+
+    def next_number(self) -> int:
+        numbers = [int(doc.number) for doc in iter_documents(self.codev_dir) if doc.number]
+        return max(numbers, default=0) + 1
+
+    def create(self, features: List[FeatureRequest]) -> ScaffoldResult:
+        """Создать документы пакета целиком или не создать ничего"""
+        if not features:
+            raise ScaffoldError("бэклог пуст")
+        started = time.perf_counter()
+        self.synced = 0
+        templates = self._templates()
+        with self._locked():
+            self.recover()
+            first = self.next_number()
+            last = first + len(features) - 1
+            if last > MAX_NUMBER:
+                raise ScaffoldError(f"номера {first:04d}-{last:04d} выходят за {MAX_NUMBER}")
+            try:
+                moves = self._stage(features, first, templates)
+                self._commit(moves)
+            except BaseException as e:
+                shutil.rmtree(self.staging, ignore_errors=True)
+                if isinstance(e, OSError):
+                    raise ScaffoldError(f"подготовка пакета прервана: {e}") from e
+                raise
+            self._publish(moves)
+        return ScaffoldResult(first, last, [dst for _, dst in moves],
+                              time.perf_counter() - started, self.synced)
+
+    def _stage(self, features, first, templates) -> List[Tuple[Path, Path]]:
+        shutil.rmtree(self.staging, ignore_errors=True)
+        for kind in self.kinds:
+            (self.staging / KINDS[kind][0]).mkdir(parents=True)
+        moves = []
+        for number, feature in enumerate(features, first):
+            name = f'{number:04d}-{feature.slug}.md'
+            values = {'title': feature.title, 'slug': feature.slug, 'date': self.today,
+                      'spec_link': f'codev/specs/{name}', 'plan_link': f'codev/plans/{name}'}
+            for kind in self.kinds:
+                directory = KINDS[kind][0]
+                staged = self.staging / directory / name
+                staged.write_text(templates[kind].render(values), encoding='utf-8')
+                moves.append((staged, self.codev_dir / directory / name))
+        return moves
+
+    def _commit(self, moves):
+        pending = self.staging / 'journal.json'
+        pending.write_text(json.dumps(
+            [[str(src.relative_to(self.codev_dir)), str(dst.relative_to(self.codev_dir))]
+             for src, dst in moves], ensure_ascii=False), encoding='utf-8')
+        # Журнал фиксирует пакет, только когда файлы и записи каталогов staging на диске
+        self._sync(*(src for src, _ in moves), pending,
+                   *(self.staging / KINDS[kind][0] for kind in self.kinds), self.staging)
+        os.replace(pending, self.journal)
+        self._sync(self.codev_dir)
+
+    def _publish(self, moves):
+        done = []
+        try:
+            for src, dst in moves:
+                dst.parent.mkdir(parents=True, exist_ok=True)
+                _move(src, dst)
+                done.append((src, dst))
+        except BaseException as e:
+            for src, dst in reversed(done):
+                _move(dst, src)
+            self.journal.unlink()
+            shutil.rmtree(self.staging, ignore_errors=True)
+            if isinstance(e, OSError):
+                raise ScaffoldError(f"публикация прервана: {e}") from e
+            raise
+        self._sync(*sorted({dst.parent for _, dst in moves}))
+        self.journal.unlink()
+        shutil.rmtree(self.staging, ignore_errors=True)
+
+    def recover(self) -> int:
+        """Завершить пакет, прерванный после фиксации, или убрать незафиксированный"""
+        completed = 0
+        if self.journal.exists():
+            targets = set()
+            for src, dst in json.loads(self.journal.read_text(encoding='utf-8')):
+                src, dst = self.codev_dir / src, self.codev_dir / dst
+                if src.exists() and not dst.exists():
+                    dst.parent.mkdir(parents=True, exist_ok=True)
+                    _move(src, dst)
+                    targets.add(dst.parent)
+                    completed += 1
+            self._sync(*sorted(targets))
+            self.journal.unlink()
+        shutil.rmtree(self.staging, ignore_errors=True)
+        return completed
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-scaffold',
+        description='Пакетное создание specs, plans и reviews по бэклогу функций')
+    parser.add_argument('backlog', help='файл бэклога (строки или JSONL), - для stdin')
+    parser.add_argument('--root', type=Path, default=Path.cwd(), help='корень проекта')
+    parser.add_argument('--protocol', default='spider', help='протокол с шаблонами документов')
+    parser.add_argument('--reviews', action='store_true', help='создать заготовки обзоров')
+    parser.add_argument('--no-sync', action='store_true',
+                        help='не ждать записи на диск (временные проекты, CI)')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        if args.backlog == '-':
+            features = read_backlog(sys.stdin)
+        else:
+            with open(args.backlog, encoding='utf-8') as f:
+                features = read_backlog(f)
+        scaffolder = Scaffolder(args.root, args.protocol, reviews=args.reviews,
+                                durable=not args.no_sync)
+        result = scaffolder.create(features)
+    except (ScaffoldError, OSError) as e:
+        print(f"ошибка: {e}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        print(json.dumps({'first': result.numbers[0], 'last': result.numbers[-1],
+                          'files': [str(p.relative_to(args.root)) for p in result.files],
+                          'elapsed': round(result.elapsed, 4), 'synced': result.synced},
+                         ensure_ascii=False))
+    else:
+        print(f"created {len(features)} feature(s) {result.numbers[0]}-{result.numbers[-1]}: "
+              f"{len(result.files)} file(s) in {result.elapsed:.3f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
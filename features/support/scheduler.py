@@ -0,0 +1,303 @@
+"""
+Планирование шардированного прогона по истории длительностей сценариев
+
+История (codev/.cache/durations.json) хранит последние длительности и
+статусы каждого сценария и пополняется из NDJSON-потоков событий шардов.
+По ней сценарии раскладываются по воркерам жадным LPT (самые долгие -
+первыми, каждому наименее загруженному воркеру), недавно упавшие
+сценарии ставятся в начало своего шарда, а сценарии с большим разбросом
+длительности или меняющимся статусом помечаются как возможно нестабильные.
+Outline с внешними примерами (example_sources) не разворачивается при
+планировании: он попадает в каждый шард, а строки делятся между воркерами
+через CODEV_EXAMPLES_SHARD.
+
+Использование:
+    python -m features.support.scheduler --workers 4 -- --tags="not @requires-zen-mcp"
+    python -m features.support.scheduler --workers 4 --plan
+    python -m features.support.scheduler --flaky
+"""
+import argparse
+import heapq
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from features.support.documents import cache_dir
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+HISTORY_VERSION = 1
+HISTORY_SIZE = 10
+# Оценка для сценариев без истории
+DEFAULT_DURATION = 1.0
+# Коэффициент вариации, начиная с которого сценарий считается нестабильным
+FLAKY_CV = 0.5
+FLAKY_MIN_SAMPLES = 3
+
+
+def scenario_key(filename: str, name: str) -> str:
+    """Ключ истории: путь feature-файла и имя сценария (устойчив к сдвигу строк)"""
+    return f"{Path(filename).as_posix()}::{name}"
+
+
+@dataclass
+class ScenarioRef:
+    """Сценарий, выбранный для прогона"""
+    key: str
+    location: str
+    estimate: float = DEFAULT_DURATION
+    failed_last: bool = False
+    # Outline с внешними примерами: запускается в каждом шарде на своей доле строк
+    sharded: bool = False
+
+
+@dataclass
+class Shard:
+    """Набор сценариев одного воркера"""
+    index: int
+    scenarios: List[ScenarioRef] = field(default_factory=list)
+    load: float = 0.0
+
+
+class DurationHistory:
+    """Последние длительности и статусы сценариев"""
+
+    def __init__(self, path: Optional[Path]):
+        self.path = Path(path) if path else None
+        self.entries: Dict[str, dict] = {}
+        if self.path and self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                data = {}
+            if data.get('version') == HISTORY_VERSION:
+                self.entries = data.get('scenarios', {})
+
+    def record(self, key: str, duration: float, status: str):
+        entry = self.entries.setdefault(key, {'durations': [], 'statuses': []})
+        entry['durations'] = (entry['durations'] + [round(duration, 4)])[-HISTORY_SIZE:]
+        entry['statuses'] = (entry['statuses'] + [status])[-HISTORY_SIZE:]
+
+    def record_events(self, events, root: Path) -> int:
+        """Учесть события scenario.end из NDJSON-потока; вернуть их число"""
+        count = 0
+        for event in events:
+            if event.get('event') != 'scenario.end' or event.get('status') in ('skipped', 'untested'):
+                continue
+            filename = event['location'].rsplit(':', 1)[0]
+            relative = os.path.relpath(os.path.join(root, filename), root)
+            self.record(scenario_key(relative, event['scenario']),
+                        event.get('duration', 0.0), event['status'])
+            count += 1
+        return count
+
+    def estimate(self, key: str) -> Optional[float]:
+        entry = self.entries.get(key)
+        if not entry or not entry['durations']:
+            return None
+        return statistics.median(entry['durations'])
+
+    def failed_last(self, key: str) -> bool:
+        entry = self.entries.get(key)
+        return bool(entry and entry['statuses'] and entry['statuses'][-1] in ('failed', 'error'))
+
+    def flaky(self) -> Dict[str, str]:
+        """Сценарии с большим разбросом длительности или сменой статуса"""
+        flagged = {}
+        for key, entry in sorted(self.entries.items()):
+            durations = entry['durations']
+            statuses = set(entry['statuses'])
+            if {'passed', 'failed'} <= statuses:
+                flagged[key] = 'статус менялся: ' + ', '.join(entry['statuses'])
+            elif len(durations) >= FLAKY_MIN_SAMPLES:
+                mean = statistics.fmean(durations)
+                cv = statistics.pstdev(durations) / mean if mean > 0 else 0.0
+                if cv >= FLAKY_CV:
+                    flagged[key] = (f"разброс длительности {cv:.0%} "
+                                    f"({min(durations):.2f}-{max(durations):.2f}s)")
+        return flagged
+
+    def save(self):
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'version': HISTORY_VERSION, 'scenarios': self.entries},
+                                  ensure_ascii=False, indent=1), encoding='utf-8')
+        os.replace(tmp, self.path)
+
+
+def collect_scenarios(features_dir: Path, root: Path, tags: Optional[List[str]] = None,
+                      language: Optional[str] = None) -> List[ScenarioRef]:
+    """Сценарии набора (с развёрнутыми Scenario Outline), отобранные по тегам"""
+    from behave.configuration import Configuration
+
+    from features.support.example_sources import attach_sources, is_streamed, walk_scenarios
+    from features.support.feature_cache import FeatureCache, default_cache_dir
+
+    tag_expression = None
+    if tags:
+        tag_expression = Configuration(
+            [f'--tags={t}' for t in tags], load_config=False).tag_expression
+    cache = FeatureCache(default_cache_dir(features_dir))
+    refs = []
+    for path in sorted(Path(features_dir).rglob('*.feature')):
+        feature = cache.load(str(path), language)
+        if feature is None:
+            continue
+        relative = os.path.relpath(path, root)
+        attach_sources(feature)
+        for scenario in walk_scenarios(feature):
+            if is_streamed(scenario):
+                if tag_expression is None or scenario.should_run_with_tags(tag_expression):
+                    refs.append(ScenarioRef(
+                        key=scenario_key(relative, scenario.name),
+                        location=f"{Path(relative).as_posix()}:{scenario.line}", sharded=True))
+                continue
+            if tag_expression is not None and not tag_expression.check(scenario.effective_tags):
+                continue
+            refs.append(ScenarioRef(
+                key=scenario_key(relative, scenario.name),
+                location=f"{Path(relative).as_posix()}:{scenario.line}"))
+    return refs
+
+
+def schedule(scenarios: List[ScenarioRef], history: DurationHistory, workers: int) -> List[Shard]:
+    """LPT-распределение по воркерам; недавно упавшие - в начале шардов"""
+    known = [e for e in (history.estimate(s.key) for s in scenarios) if e is not None]
+    default = statistics.median(known) if known else DEFAULT_DURATION
+    for ref in scenarios:
+        estimate = history.estimate(ref.key)
+        ref.estimate = estimate if estimate is not None else default
+        ref.failed_last = history.failed_last(ref.key)
+
+    shards = [Shard(i) for i in range(max(1, workers))]
+    for ref in (s for s in scenarios if s.sharded):
+        for shard in shards:
+            shard.scenarios.append(ref)
+            shard.load += ref.estimate / len(shards)
+    heap = [(shard.load, shard.index) for shard in shards]
+    for ref in sorted((s for s in scenarios if not s.sharded),
+                      key=lambda s: (-s.estimate, s.location)):
+        load, index = heapq.heappop(heap)
+        shards[index].scenarios.append(ref)
+        shards[index].load = load + ref.estimate
+        heapq.heappush(heap, (shards[index].load, index))
+
+    for shard in shards:
+        # Устойчивая сортировка: упавшие первыми, внутри - по убыванию длительности
+        shard.scenarios.sort(key=lambda s: not s.failed_last)
+    return [shard for shard in shards if shard.scenarios]
+
+
+def run_shards(shards: List[Shard], root: Path, behave_args: List[str]) -> Dict[int, dict]:
+    """Запустить шарды параллельными процессами behave с NDJSON-потоками"""
+    events_dir = cache_dir(root / 'codev') / 'shards'
+    events_dir.mkdir(parents=True, exist_ok=True)
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(PROJECT_ROOT), env.get('PYTHONPATH')]))
+
+    running = {}
+    for position, shard in enumerate(shards, 1):
+        events = events_dir / f'events-{shard.index}.ndjson'
+        log = events_dir / f'shard-{shard.index}.log'
+        command = [sys.executable, '-m', 'behave', '--no-junit', '--no-capture',
+                   '-f', 'features.support.event_stream:EventFormatter', '-o', str(events),
+                   '-f', 'progress', '-o', str(log), *behave_args,
+                   *[ref.location for ref in shard.scenarios]]
+        shard_env = dict(env, CODEV_WORKER_ID=f'shard-{shard.index}',
+                         CODEV_EXAMPLES_SHARD=f'{position}/{len(shards)}')
+        running[shard.index] = (subprocess.Popen(command, cwd=root, env=shard_env,
+                                                 stdout=subprocess.DEVNULL,
+                                                 stderr=subprocess.STDOUT),
+                                time.monotonic(), events, log)
+
+    results = {}
+    for index, (process, started, events, log) in running.items():
+        code = process.wait()
+        results[index] = {'exit_code': code, 'elapsed': time.monotonic() - started,
+                          'events': events, 'log': log}
+    return results
+
+
+def _read_events(path: Path) -> List[dict]:
+    if not path.exists():
+        return []
+    events = []
+    for line in path.read_text(encoding='utf-8').splitlines():
+        try:
+            events.append(json.loads(line))
+        except ValueError:
+            continue
+    return events
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-behave-shard',
+        description='Шардированный прогон BDD-тестов с балансировкой по истории длительностей')
+    parser.add_argument('--root', type=Path, default=PROJECT_ROOT,
+                        help='каталог, из которого запускается behave')
+    parser.add_argument('--features-dir', type=Path, default=None)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--tags', action='append', help='отбор сценариев по тегам (как в behave)')
+    parser.add_argument('--lang', default=None, help='язык .feature файлов по умолчанию')
+    parser.add_argument('--plan', action='store_true', help='только показать распределение')
+    parser.add_argument('--flaky', action='store_true', help='показать нестабильные сценарии')
+    parser.add_argument('behave_args', nargs=argparse.REMAINDER,
+                        help='дополнительные аргументы behave')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    root = args.root.resolve()
+    features_dir = (args.features_dir or root / 'features').resolve()
+    history = DurationHistory(cache_dir(root / 'codev') / 'durations.json')
+
+    if args.flaky:
+        for key, reason in history.flaky().items():
+            print(f"{key}: {reason}")
+        return 0
+
+    behave_args = [a for a in args.behave_args if a != '--']
+    # --tags для behave учитываются уже при отборе сценариев в шарды
+    tags = (args.tags or []) + [a.split('=', 1)[1] for a in behave_args if a.startswith('--tags=')]
+    scenarios = collect_scenarios(features_dir, root, tags, args.lang)
+    shards = schedule(scenarios, history, args.workers)
+    for shard in shards:
+        failed = sum(1 for s in shard.scenarios if s.failed_last)
+        print(f"shard {shard.index}: {len(shard.scenarios)} scenario(s), "
+              f"estimate {shard.load:.2f}s" + (f", {failed} failed last run" if failed else ''))
+    if args.plan:
+        for shard in shards:
+            for ref in shard.scenarios:
+                print(f"  [{shard.index}] {ref.location}  {ref.estimate:.2f}s"
+                      + ('  (failed last run)' if ref.failed_last else ''))
+        return 0
+
+    if args.lang:
+        behave_args.append(f'--lang={args.lang}')
+    results = run_shards(shards, root, behave_args)
+
+    exit_code = 0
+    for index, result in sorted(results.items()):
+        history.record_events(_read_events(result['events']), root)
+        print(f"shard {index}: exit {result['exit_code']} in {result['elapsed']:.2f}s "
+              f"(log: {result['log']})")
+        exit_code = max(exit_code, result['exit_code'])
+    history.save()
+
+    for key, reason in history.flaky().items():
+        print(f"possibly flaky: {key}: {reason}")
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,340 @@
+"""
+Инкрементальный полнотекстовый индекс по codev/specs, codev/plans и codev/reviews
+
+Индекс хранится в SQLite (codev/.cache/search.sqlite3) и обновляется
+только для файлов, у которых изменились mtime/размер и SHA-256.
+Ранжирование - BM25 по секциям документов.
+
+Использование:
+    python -m features.support.search_index update
+    python -m features.support.search_index search "кэш токенов" --section "Уроки"
+"""
+import argparse
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+from features.support.documents import (
+    DOC_KINDS,
+    cache_dir,
+    file_digest,
+    iter_documents,
+    parse_sections,
+)
+
+SCHEMA_VERSION = 1
+
+TOKEN_RE = re.compile(r'[0-9a-zа-яё]+', re.IGNORECASE)
+
+# Окончания для облегчённого стемминга (от длинных к коротким)
+RU_ENDINGS = (
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией',
+    'йте', 'ите', 'ете', 'ует', 'ают', 'яют', 'ются', 'ться', 'ешь',
+    'ов', 'ев', 'ей', 'ий', 'ый', 'ой', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие',
+    'ам', 'ям', 'ах', 'ях', 'ом', 'ем', 'ую', 'юю', 'ть', 'ия', 'ья', 'ют', 'ет', 'ит',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+)
+EN_ENDINGS = ('ing', 'ies', 'ed', 'es', 's')
+MIN_STEM = 3
+
+# Параметры BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS documents (
+    path TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    number TEXT,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    sha256 TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sections (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL REFERENCES documents(path) ON DELETE CASCADE,
+    heading TEXT NOT NULL,
+    heading_norm TEXT NOT NULL,
+    line INTEGER NOT NULL,
+    end_line INTEGER NOT NULL,
+    length INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    section_id INTEGER NOT NULL REFERENCES sections(id) ON DELETE CASCADE,
+    tf INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS postings_term ON postings(term);
+CREATE INDEX IF NOT EXISTS postings_section ON postings(section_id);
+CREATE INDEX IF NOT EXISTS sections_path ON sections(path);
+"""
+
+
+@dataclass
+class UpdateStats:
+    """Результат инкрементального обновления индекса"""
+    added: int = 0
+    updated: int = 0
+    removed: int = 0
+    unchanged: int = 0
+
+
+@dataclass
+class SearchHit:
+    """Найденная секция документа"""
+    path: str
+    kind: str
+    heading: str
+    line: int
+    end_line: int
+    score: float
+
+
+def stem(token: str) -> str:
+    """Облегчённый стемминг: отрезать одно типичное окончание"""
+    endings = RU_ENDINGS if re.match('[а-я]', token) else EN_ENDINGS
+    for ending in endings:
+        if token.endswith(ending) and len(token) - len(ending) >= MIN_STEM:
+            if ending == 'ies':
+                return token[:-3] + 'y'
+            return token[:-len(ending)]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбить текст на нормализованные русские и английские термы"""
+    return [stem(t.lower().replace('ё', 'е')) for t in TOKEN_RE.findall(text)]
+
+
+def normalize_heading(heading: str) -> str:
+    """Нормализовать заголовок для фильтрации по секциям"""
+    return heading.casefold().replace('ё', 'е')
+
+
+class SearchIndex:
+    """Персистентный инвертированный индекс документов Codev"""
+
+    def __init__(self, root: Path, index_path: Optional[Path] = None):
+        self.root = Path(root)
+        self.codev_dir = self.root / 'codev'
+        self.index_path = Path(index_path) if index_path else \
+            cache_dir(self.codev_dir) / 'search.sqlite3'
+        self.conn = sqlite3.connect(str(self.index_path))
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self._init_schema()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def _init_schema(self):
+        row = None
+        try:
+            row = self.conn.execute(
+                "SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        except sqlite3.OperationalError:
+            pass
+        if row and int(row[0]) != SCHEMA_VERSION:
+            # Формат индекса изменился - пересобрать с нуля
+            self.conn.executescript(
+                'DROP TABLE IF EXISTS postings; DROP TABLE IF EXISTS sections;'
+                'DROP TABLE IF EXISTS documents; DROP TABLE IF EXISTS meta;')
+        self.conn.executescript(SCHEMA)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES ('schema_version', ?)",
+            (str(SCHEMA_VERSION),))
+        self.conn.commit()
+
+    def _relative(self, path: Path) -> str:
+        return path.relative_to(self.root).as_posix()
+
+    def update(self, kinds: Iterable[str] = DOC_KINDS) -> UpdateStats:
+        """Обновить индекс по изменившимся файлам (mtime/размер, затем SHA-256)"""
+        stats = UpdateStats()
+        known = {
+            row[0]: row[1:]
+            for row in self.conn.execute('SELECT path, mtime_ns, size, sha256 FROM documents')
+        }
+        seen = set()
+
+        with self.conn:
+            for doc in iter_documents(self.codev_dir, kinds):
+                rel = self._relative(doc.path)
+                seen.add(rel)
+                st = doc.path.stat()
+                previous = known.get(rel)
+
+                if previous and previous[0] == st.st_mtime_ns and previous[1] == st.st_size:
+                    stats.unchanged += 1
+                    continue
+
+                digest = file_digest(doc.path)
+                if previous and previous[2] == digest:
+                    # Файл тронут, но содержимое прежнее
+                    self.conn.execute(
+                        'UPDATE documents SET mtime_ns = ?, size = ? WHERE path = ?',
+                        (st.st_mtime_ns, st.st_size, rel))
+                    stats.unchanged += 1
+                    continue
+
+                if previous:
+                    self.conn.execute('DELETE FROM documents WHERE path = ?', (rel,))
+                    stats.updated += 1
+                else:
+                    stats.added += 1
+
+                self.conn.execute(
+                    'INSERT INTO documents (path, kind, number, mtime_ns, size, sha256) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (rel, doc.kind, doc.number, st.st_mtime_ns, st.st_size, digest))
+                self._index_sections(rel, doc.path.read_text(encoding='utf-8'))
+
+            for rel in set(known) - seen:
+                self.conn.execute('DELETE FROM documents WHERE path = ?', (rel,))
+                stats.removed += 1
+
+        return stats
+
+    def _index_sections(self, rel: str, text: str):
+        for section in parse_sections(text):
+            terms = tokenize(section.heading) + tokenize(section.text)
+            cursor = self.conn.execute(
+                'INSERT INTO sections (path, heading, heading_norm, line, end_line, length) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (rel, section.heading, normalize_heading(section.heading),
+                 section.line, section.end_line, len(terms)))
+            counts = {}
+            for term in terms:
+                counts[term] = counts.get(term, 0) + 1
+            self.conn.executemany(
+                'INSERT INTO postings (term, section_id, tf) VALUES (?, ?, ?)',
+                [(term, cursor.lastrowid, tf) for term, tf in counts.items()])
+
+    def search(self, query: str, kinds: Optional[Iterable[str]] = None,
+               section: Optional[str] = None, limit: int = 10) -> List[SearchHit]:
+        """Найти секции по запросу с ранжированием BM25"""
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+
+        filters, params = [], []
+        if kinds:
+            kinds = list(kinds)
+            filters.append(f"d.kind IN ({', '.join('?' * len(kinds))})")
+            params.extend(kinds)
+        if section:
+            filters.append('instr(s.heading_norm, ?) > 0')
+            params.append(normalize_heading(section))
+        where = ''.join(f' AND {f}' for f in filters)
+
+        total, avg_length = self.conn.execute(
+            'SELECT count(*), avg(length) FROM sections').fetchone()
+        if not total:
+            return []
+        avg_length = avg_length or 1.0
+
+        placeholders = ', '.join('?' * len(terms))
+        doc_freq = dict(self.conn.execute(
+            f'SELECT term, count(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term',
+            terms))
+
+        rows = self.conn.execute(
+            'SELECT s.id, p.term, p.tf, s.length, s.path, d.kind, s.heading, s.line, s.end_line '
+            'FROM postings p JOIN sections s ON s.id = p.section_id '
+            'JOIN documents d ON d.path = s.path '
+            f'WHERE p.term IN ({placeholders}){where}',
+            terms + params)
+
+        hits = {}
+        for section_id, term, tf, length, path, kind, heading, line, end_line in rows:
+            df = doc_freq.get(term, 0)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length)
+            score = idf * tf * (BM25_K1 + 1) / norm
+            hit = hits.get(section_id)
+            if hit is None:
+                hits[section_id] = SearchHit(path, kind, heading, line, end_line, score)
+            else:
+                hit.score += score
+
+        ranked = sorted(hits.values(), key=lambda h: (-h.score, h.path, h.line))
+        return ranked[:limit]
+
+    def section_text(self, hit: SearchHit) -> str:
+        """Прочитать текст найденной секции из файла"""
+        lines = (self.root / hit.path).read_text(encoding='utf-8').splitlines()
+        return '\n'.join(lines[hit.line - 1:hit.end_line])
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-search',
+        description='Полнотекстовый поиск по спецификациям, планам и обзорам Codev')
+    parser.add_argument('--root', type=Path, default=Path(os.getcwd()),
+                        help='корень проекта с каталогом codev/ (по умолчанию текущий)')
+    parser.add_argument('--index', type=Path, default=None,
+                        help='путь к файлу индекса (по умолчанию codev/.cache/search.sqlite3)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    sub.add_parser('update', help='обновить индекс по изменившимся файлам')
+
+    search = sub.add_parser('search', help='найти секции по запросу')
+    search.add_argument('query', nargs='+')
+    search.add_argument('--kind', action='append', choices=DOC_KINDS,
+                        help='ограничить поиск каталогом (можно повторять)')
+    search.add_argument('--section', help='искать только в секциях с этим заголовком')
+    search.add_argument('--limit', type=int, default=10)
+    search.add_argument('--content', action='store_true', help='вывести текст секций')
+    search.add_argument('--json', action='store_true', help='вывод в JSON')
+    search.add_argument('--no-update', action='store_true',
+                        help='не обновлять индекс перед поиском')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+
+    with SearchIndex(args.root, args.index) as index:
+        if args.command == 'update':
+            stats = index.update()
+            print(f"added={stats.added} updated={stats.updated} "
+                  f"removed={stats.removed} unchanged={stats.unchanged}")
+            return 0
+
+        if not args.no_update:
+            index.update()
+        hits = index.search(' '.join(args.query), kinds=args.kind,
+                            section=args.section, limit=args.limit)
+
+        if args.json:
+            payload = []
+            for hit in hits:
+                item = asdict(hit)
+                if args.content:
+                    item['content'] = index.section_text(hit)
+                payload.append(item)
+            print(json.dumps(payload, ensure_ascii=False, indent=2))
+        else:
+            for hit in hits:
+                print(f"{hit.score:7.3f}  {hit.path}:{hit.line}  [{hit.heading}]")
+                if args.content:
+                    print(index.section_text(hit))
+                    print()
+    return 0 if hits else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
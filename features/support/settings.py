@@ -0,0 +1,257 @@
+"""
+Единый снимок конфигурации проекта
+
+Снимок объединяет слои (последующие важнее предыдущих):
+    1. .env проекта - разбирается как dotenv: комментарии, export, кавычки,
+       подстановка ${VAR}; пустое KEY= и заглушки your_..._here не считаются
+       заданным значением
+    2. переменные окружения процесса
+а также [tool.behave.userdata] из pyproject.toml и ссылку .env установки
+Zen MCP (~/.zen-mcp-server/.env или $ZEN_INSTALL_DIR/.env).
+
+Settings неизменяем и сериализуем, его можно передавать между потоками и
+процессами. SettingsService читает источники один раз и перечитывает их
+только после изменения mtime (или размера) одного из файлов; каждый
+сценарий получает в context.settings снимок, одинаковый для всех шагов.
+
+Использование:
+    codev-settings
+    codev-settings --root path/to/project --json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+from dataclasses import dataclass, fields
+from pathlib import Path
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+try:
+    import tomllib
+except ImportError:  # Python 3.10
+    tomllib = None
+
+API_KEYS = ('GEMINI_API_KEY', 'OPENAI_API_KEY', 'XAI_API_KEY')
+ZEN_DIR_ENV = 'ZEN_INSTALL_DIR'
+ZEN_DIR_NAME = '.zen-mcp-server'
+
+LINE_RE = re.compile(r'^\s*(?:export\s+)?([A-Za-z_][A-Za-z0-9_]*)\s*=\s*(.*)$')
+VAR_RE = re.compile(r'\$\{([A-Za-z_][A-Za-z0-9_]*)\}|\$([A-Za-z_][A-Za-z0-9_]*)')
+# Значения-заглушки из .env.example
+PLACEHOLDER_RE = re.compile(r'^your_\w*_here$')
+ESCAPES = {'n': '\n', 't': '\t', '"': '"', '\\': '\\', '$': '$'}
+
+
+def parse_dotenv(text: str, environ: Optional[Mapping[str, str]] = None) -> Dict[str, str]:
+    """Переменные dotenv-файла; ${VAR} берётся из уже прочитанных строк или environ"""
+    values: Dict[str, str] = {}
+    scope = environ or {}
+
+    def expand(value: str) -> str:
+        return VAR_RE.sub(lambda m: values.get(m.group(1) or m.group(2),
+                                               scope.get(m.group(1) or m.group(2), '')), value)
+
+    for line in text.splitlines():
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        key, raw = match.group(1), match.group(2).strip()
+        if raw[:1] == "'":
+            end = raw.find("'", 1)
+            value = raw[1:end] if end > 0 else raw[1:]
+        elif raw[:1] == '"':
+            chars, escaped = [], False
+            for char in raw[1:]:
+                if escaped:
+                    chars.append(ESCAPES.get(char, '\\' + char))
+                    escaped = False
+                elif char == '\\':
+                    escaped = True
+                elif char == '"':
+                    break
+                else:
+                    chars.append(char)
+            value = expand(''.join(chars))
+        else:
+            # Комментарий в строке без кавычек начинается с " #"
+            value = expand(re.split(r'\s+#', raw, maxsplit=1)[0].strip())
+        values[key] = value
+    return values
+
+
+def _frozen(mapping) -> Mapping[str, str]:
+    return MappingProxyType(dict(mapping))
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Неизменяемый снимок конфигурации"""
+    project_root: Path
+    env_file: Path
+    dotenv: Mapping[str, str]
+    environ: Mapping[str, str]
+    userdata: Mapping[str, str]
+    zen_env_link: Path
+    zen_env_target: Optional[Path]
+    # (путь, mtime_ns, размер) источников, по которым снимок был прочитан
+    stamp: Tuple = ()
+
+    def __post_init__(self):
+        for name in ('dotenv', 'environ', 'userdata'):
+            object.__setattr__(self, name, _frozen(getattr(self, name)))
+
+    def __reduce__(self):
+        # MappingProxyType не сериализуется pickle
+        values = [getattr(self, f.name) for f in fields(self)]
+        return (self.__class__, tuple(dict(v) if isinstance(v, MappingProxyType) else v
+                                      for v in values))
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        """Значение с учётом приоритета: окружение процесса, затем .env"""
+        if key in self.environ:
+            return self.environ[key]
+        return self.dotenv.get(key, default)
+
+    def is_set(self, key: str) -> bool:
+        """Задано ли непустое значение, отличное от заглушки"""
+        value = (self.get(key) or '').strip()
+        return bool(value) and not PLACEHOLDER_RE.match(value)
+
+    @property
+    def api_keys(self) -> Dict[str, bool]:
+        return {key: self.is_set(key) for key in API_KEYS}
+
+    @property
+    def zen_env_linked(self) -> bool:
+        """Ссылка .env Zen MCP указывает на .env проекта"""
+        return self.zen_env_target is not None and self.zen_env_target == self.env_file
+
+
+def _stat(path: Path, follow: bool = True):
+    try:
+        st = os.stat(path) if follow else os.lstat(path)
+    except OSError:
+        return (str(path), None, None)
+    return (str(path), st.st_mtime_ns, st.st_size)
+
+
+class SettingsService:
+    """Снимок конфигурации, перечитываемый только после изменения файлов-источников"""
+
+    def __init__(self, project_root: Path, home: Optional[Path] = None,
+                 environ: Optional[Mapping[str, str]] = None):
+        self.project_root = Path(project_root).resolve()
+        self.home = Path(home) if home is not None else None
+        self._environ = environ
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Settings] = None
+        self.loads = 0
+
+    def _environ_now(self) -> Mapping[str, str]:
+        return dict(self._environ if self._environ is not None else os.environ)
+
+    def _zen_dir(self, environ: Mapping[str, str]) -> Path:
+        if environ.get(ZEN_DIR_ENV):
+            return Path(environ[ZEN_DIR_ENV])
+        home = self.home or Path(environ.get('HOME') or Path.home())
+        return home / ZEN_DIR_NAME
+
+    def _stamp(self, environ: Mapping[str, str]) -> Tuple:
+        link = self._zen_dir(environ) / '.env'
+        return (_stat(self.project_root / '.env'), _stat(self.project_root / 'pyproject.toml'),
+                _stat(link, follow=False), _stat(link))
+
+    def snapshot(self) -> Settings:
+        """Текущий снимок; источники перечитываются только после изменения"""
+        snapshot = self._snapshot
+        environ = self._environ if self._environ is not None else os.environ
+        stamp = self._stamp(environ)
+        if snapshot is not None and snapshot.stamp == stamp:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or self._snapshot.stamp != stamp:
+                self._snapshot = self._load(stamp)
+                self.loads += 1
+            return self._snapshot
+
+    def _load(self, stamp: Tuple) -> Settings:
+        environ = self._environ_now()
+        env_file = self.project_root / '.env'
+        try:
+            dotenv = parse_dotenv(env_file.read_text(encoding='utf-8'), environ)
+        except OSError:
+            dotenv = {}
+
+        userdata = {}
+        pyproject = self.project_root / 'pyproject.toml'
+        if tomllib is not None and pyproject.exists():
+            try:
+                data = tomllib.loads(pyproject.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                data = {}
+            raw = data.get('tool', {}).get('behave', {}).get('userdata', {})
+            userdata = {str(k): str(v) for k, v in raw.items()}
+
+        link = self._zen_dir(environ) / '.env'
+        target = None
+        if link.is_symlink():
+            target = Path(os.path.normpath(link.parent / os.readlink(link)))
+        return Settings(self.project_root, env_file, dotenv, environ, userdata,
+                        link, target, stamp)
+
+
+_services: Dict[Path, SettingsService] = {}
+_services_lock = threading.Lock()
+
+
+def service(project_root: Path) -> SettingsService:
+    """Общий для процесса SettingsService проекта"""
+    root = Path(project_root).resolve()
+    with _services_lock:
+        if root not in _services:
+            _services[root] = SettingsService(root)
+        return _services[root]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-settings',
+        description='Снимок конфигурации проекта: API-ключи, userdata, ссылка .env Zen MCP')
+    parser.add_argument('--root', type=Path, default=Path.cwd(), help='корень проекта')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    settings = SettingsService(args.root).snapshot()
+    report = {
+        'project_root': str(settings.project_root),
+        'env_file': str(settings.env_file) if settings.env_file.exists() else None,
+        'api_keys': settings.api_keys,
+        'userdata': dict(settings.userdata),
+        'zen_env_link': str(settings.zen_env_link),
+        'zen_env_target': str(settings.zen_env_target) if settings.zen_env_target else None,
+        'zen_env_linked': settings.zen_env_linked,
+    }
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"project: {report['project_root']}")
+    print(f".env: {report['env_file'] or 'нет'}")
+    for key, configured in report['api_keys'].items():
+        print(f"  {key}: {'задан' if configured else 'не задан'}")
+    for key, value in report['userdata'].items():
+        print(f"userdata.{key} = {value}")
+    target = report['zen_env_target'] or 'нет ссылки'
+    print(f"zen .env: {report['zen_env_link']} -> {target}"
+          + (' (.env проекта)' if settings.zen_env_linked else ''))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
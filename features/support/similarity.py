@@ -0,0 +1,268 @@
+"""
+Поиск почти одинаковых замечаний в ответах нескольких моделей (MinHash/LSH)
+
+Ответы разбиваются на пункты (строки списков, иначе предложения), пункт
+представляется множеством основ слов (первые STEM_LENGTH букв) - грубая
+замена стемминга, устойчивая к падежным окончаниям и смене части речи
+("ограничить"/"ограничение") и к перестановке слов.
+
+Подпись MinHash строится однопроходным хешированием (one permutation
+hashing): каждая основа хешируется один раз, младшие биты выбирают
+ячейку, остальные сравниваются с минимумом ячейки; пустые ячейки
+заполняются значениями ячеек-доноров (optimal densification). Подписи режутся на полосы
+(LSH), пары-кандидаты - пункты с совпавшей полосой, для них считается
+точный коэффициент Жаккара. Время почти линейно по размеру ответов.
+
+Кандидаты с коэффициентом не ниже порога объединяются в кластеры;
+кластер одной модели - уникальное замечание, нескольких - общее.
+Оценка пересечения - доля пунктов, у которых есть близкий пункт другой
+модели.
+
+Использование:
+    python -m features.support.similarity gemini=gemini.md gpt-5=gpt5.md grok=grok.md
+    python -m features.support.similarity *.md --threshold 0.6 --json
+"""
+import argparse
+import json
+import re
+import sys
+import time
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+from features.support.consultation_stream import BULLET_RE, HEADING_RE
+
+STEM_LENGTH = 5
+NUM_PERM = 128
+BANDS = 32
+DEFAULT_THRESHOLD = 0.5
+MIN_POINT_LENGTH = 12
+DONOR_ATTEMPTS = 64
+
+SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+WORD_RE = re.compile(r'\w+')
+_EMPTY = 1 << 32
+
+
+@dataclass
+class Point:
+    """Отдельное замечание из ответа модели"""
+    model: str
+    index: int
+    text: str
+    shingles: frozenset = field(default=frozenset(), repr=False, compare=False)
+
+
+@dataclass
+class Cluster:
+    """Группа почти одинаковых замечаний"""
+    points: List[Point]
+
+    @property
+    def models(self) -> List[str]:
+        return list(dict.fromkeys(p.model for p in self.points))
+
+    @property
+    def representative(self) -> Point:
+        """Самая подробная формулировка"""
+        return max(self.points, key=lambda p: (len(p.text), -p.index))
+
+    @property
+    def shared(self) -> bool:
+        return len(self.models) > 1
+
+
+@dataclass
+class DedupReport:
+    """Кластеры замечаний и пересечение ответов"""
+    points: List[Point]
+    clusters: List[Cluster]
+    candidates: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def shared(self) -> List[Cluster]:
+        return [c for c in self.clusters if c.shared]
+
+    @property
+    def unique(self) -> List[Cluster]:
+        return [c for c in self.clusters if not c.shared]
+
+    @property
+    def overlap(self) -> float:
+        """Доля пунктов, повторённых (близко) другой моделью"""
+        if not self.points:
+            return 0.0
+        return sum(len(c.points) for c in self.shared) / len(self.points)
+
+    def pairwise(self) -> Dict[Tuple[str, str], float]:
+        """Доля пунктов модели a, близкие к которым есть у модели b"""
+        totals: Dict[str, int] = {}
+        for point in self.points:
+            totals[point.model] = totals.get(point.model, 0) + 1
+        covered: Dict[Tuple[str, str], int] = {}
+        for cluster in self.shared:
+            models = cluster.models
+            for point in cluster.points:
+                for other in models:
+                    if other != point.model:
+                        covered[(point.model, other)] = covered.get((point.model, other), 0) + 1
+        return {(a, b): covered.get((a, b), 0) / totals[a]
+                for a in totals for b in totals if a != b}
+
+
+def split_points(text: str) -> List[str]:
+    """Пункты списков, а при их отсутствии - предложения абзацев"""
+    lines = text.splitlines()
+    bullets = [m.group('text') for m in map(BULLET_RE.match, lines) if m]
+    if bullets:
+        points = bullets
+    else:
+        prose = ' '.join(line for line in lines if not HEADING_RE.match(line))
+        points = SENTENCE_SPLIT_RE.split(prose)
+    return [p.strip() for p in points if len(p.strip()) >= MIN_POINT_LENGTH]
+
+
+def shingles(text: str, stem: int = STEM_LENGTH) -> frozenset:
+    """Множество основ слов пункта"""
+    return frozenset(word[:stem] for word in WORD_RE.findall(text.lower()))
+
+
+@lru_cache(maxsize=None)
+def _donors(num_perm: int) -> Tuple[Tuple[int, ...], ...]:
+    """Для каждой ячейки - псевдослучайная последовательность ячеек-доноров"""
+    return tuple(tuple(zlib.crc32(f'{slot}:{attempt}'.encode()) % num_perm
+                       for attempt in range(DONOR_ATTEMPTS))
+                 for slot in range(num_perm))
+
+
+def signature(items: frozenset, num_perm: int = NUM_PERM) -> List[int]:
+    """MinHash однопроходным хешированием с заполнением пустых ячеек"""
+    bins = [_EMPTY] * num_perm
+    for item in items:
+        h = zlib.crc32(item.encode('utf-8'))
+        slot, value = h % num_perm, h // num_perm
+        if value < bins[slot]:
+            bins[slot] = value
+    if _EMPTY in bins and any(v != _EMPTY for v in bins):
+        # Пустая ячейка копирует значение донора, выбранного хешем номера
+        # ячейки (а не соседа справа): иначе у коротких пунктов соседние
+        # ячейки одной полосы копируют одно значение и одно общее слово
+        # даёт ложного кандидата
+        donors = _donors(num_perm)
+        filled = list(bins)
+        for slot in range(num_perm):
+            if bins[slot] != _EMPTY:
+                continue
+            for donor in donors[slot]:
+                if bins[donor] != _EMPTY:
+                    filled[slot] = bins[donor]
+                    break
+            else:
+                filled[slot] = next(v for v in bins[slot:] + bins[:slot] if v != _EMPTY)
+        bins = filled
+    return bins
+
+
+def jaccard(a: frozenset, b: frozenset) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def dedupe(responses: Dict[str, str], threshold: float = DEFAULT_THRESHOLD,
+           num_perm: int = NUM_PERM, bands: int = BANDS) -> DedupReport:
+    """Кластеризовать почти одинаковые пункты ответов моделей"""
+    started = time.perf_counter()
+    points = []
+    for model, text in responses.items():
+        for point_text in split_points(text):
+            points.append(Point(model, len(points), point_text, shingles(point_text)))
+
+    rows = num_perm // bands
+    buckets: Dict[Tuple, List[int]] = {}
+    for point in points:
+        sig = signature(point.shingles, num_perm)
+        for band in range(bands):
+            key = (band, *sig[band * rows:(band + 1) * rows])
+            buckets.setdefault(key, []).append(point.index)
+
+    parent = list(range(len(points)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    checked = set()
+    for members in buckets.values():
+        if len(members) < 2:
+            continue
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                if (a, b) in checked:
+                    continue
+                checked.add((a, b))
+                if jaccard(points[a].shingles, points[b].shingles) >= threshold:
+                    parent[find(b)] = find(a)
+
+    groups: Dict[int, List[Point]] = {}
+    for point in points:
+        groups.setdefault(find(point.index), []).append(point)
+    clusters = sorted((Cluster(members) for members in groups.values()),
+                      key=lambda c: c.points[0].index)
+    return DedupReport(points, clusters, len(checked), time.perf_counter() - started)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-dedupe',
+        description='Объединение почти одинаковых замечаний из ответов нескольких моделей')
+    parser.add_argument('responses', nargs='+', metavar='[MODEL=]FILE',
+                        help='файлы ответов (имя модели - имя файла, если не указано)')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='минимальный коэффициент Жаккара для объединения')
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    return parser
+
+
+def _load_responses(items: Sequence[str]) -> Dict[str, str]:
+    responses = {}
+    for item in items:
+        model, sep, path = item.partition('=')
+        if not sep:
+            model, path = Path(item).stem, item
+        responses[model] = Path(path).read_text(encoding='utf-8')
+    return responses
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    report = dedupe(_load_responses(args.responses), args.threshold)
+
+    if args.json:
+        print(json.dumps({
+            'points': len(report.points),
+            'overlap': round(report.overlap, 4),
+            'elapsed': round(report.elapsed, 6),
+            'clusters': [{'text': c.representative.text, 'models': c.models,
+                          'variants': [p.text for p in c.points]} for c in report.clusters],
+            'pairwise': {f"{a}->{b}": round(v, 4) for (a, b), v in report.pairwise().items()},
+        }, ensure_ascii=False, indent=2))
+    else:
+        for cluster in report.shared:
+            print(f"[{', '.join(cluster.models)}] {cluster.representative.text}")
+        for cluster in report.unique:
+            print(f"[{cluster.models[0]} only] {cluster.representative.text}")
+        print(f"points={len(report.points)} clusters={len(report.clusters)} "
+              f"shared={len(report.shared)} unique={len(report.unique)} "
+              f"overlap={report.overlap:.2f} in {report.elapsed * 1000:.1f}ms")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
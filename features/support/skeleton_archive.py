@@ -0,0 +1,344 @@
+"""
+Индексированный архив codev-skeleton для установки Codev
+
+codev-skeleton - дерево из множества маленьких markdown-файлов и
+.gitkeep; установка обходом дерева (iterdir/copytree) - сотни операций с
+метаданными. Архив - один zip с центральным каталогом (индексом) и
+манифестом codev-skeleton.json: версия, SHA-256 и размер каждого файла,
+хеш всего дерева и список протоколов. Архив воспроизводим: файлы в
+отсортированном порядке с фиксированным временем, поэтому одинаковое
+дерево даёт одинаковый SHA-256 архива.
+
+Установщик открывает архив через mmap, читает центральный каталог и
+извлекает только выбранные протоколы (без Zen MCP - протоколы, не
+помеченные в манифесте multi_agent), сверяя SHA-256 каждого извлекаемого
+файла с манифестом. Каталоги выбранных протоколов перед извлечением
+очищаются, как при установке из дерева, поэтому удалённые из скелета
+файлы не остаются после обновления. Архив с абсолютными путями или ".."
+в именах файлов не открывается. Архив можно проверить по версии и хешу
+(verify --version/--sha256).
+
+Использование:
+    python -m features.support.skeleton_archive build codev-skeleton dist/
+    python -m features.support.skeleton_archive verify dist/codev-skeleton-0.1.0.zip --version 0.1.0
+    python -m features.support.skeleton_archive install dist/codev-skeleton-0.1.0.zip codev --no-zen
+"""
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import sys
+import zipfile
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+try:
+    import tomllib
+except ImportError:  # Python 3.10
+    tomllib = None
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = 'codev-skeleton.json'
+PROTOCOLS_DIR = 'protocols'
+# Протоколы с обязательной мультиагентной консультацией через Zen MCP;
+# при сборке записываются в манифест, установщик читает флаги из него
+MULTI_AGENT_PROTOCOLS = ('spider', 'tick')
+ZIP_TIMESTAMP = (1980, 1, 1, 0, 0, 0)
+
+
+class ArchiveError(ValueError):
+    """Архив повреждён или не соответствует ожидаемой версии/хешу"""
+
+
+@dataclass
+class InstallResult:
+    """Итог извлечения скелета"""
+    version: str
+    protocols: List[str]
+    files: List[str] = field(default_factory=list)
+    bytes: int = 0
+
+
+def project_version(root: Path = PROJECT_ROOT) -> str:
+    """Версия из pyproject.toml ([project].version)"""
+    pyproject = Path(root) / 'pyproject.toml'
+    if pyproject.exists() and tomllib is not None:
+        data = tomllib.loads(pyproject.read_text(encoding='utf-8'))
+        return data.get('project', {}).get('version', '0')
+    return '0'
+
+
+def archive_name(version: str) -> str:
+    return f'codev-skeleton-{version}.zip'
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def tree_hash(files: Dict[str, dict]) -> str:
+    """Хеш дерева: отсортированные пары путь/SHA-256"""
+    digest = hashlib.sha256()
+    for name in sorted(files):
+        digest.update(f"{name}\0{files[name]['sha256']}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def protocol_of(name: str) -> Optional[str]:
+    parts = name.split('/')
+    if len(parts) > 2 and parts[0] == PROTOCOLS_DIR:
+        return parts[1]
+    return None
+
+
+def check_name(name: str):
+    """Имя файла архива - относительный путь без выхода за каталог установки"""
+    parts = name.split('/')
+    if (not name or name.startswith('/') or '\\' in name or ':' in parts[0]
+            or any(part in ('', '.', '..') for part in parts)):
+        raise ArchiveError(f"{name!r}: недопустимый путь в архиве")
+
+
+def select_protocols(available: Iterable[str], zen_available: bool = True,
+                     requested: Optional[Iterable[str]] = None,
+                     multi_agent: Iterable[str] = MULTI_AGENT_PROTOCOLS) -> List[str]:
+    """Протоколы для установки: явно запрошенные или все доступные без Zen MCP-зависимых"""
+    available = sorted(available)
+    if requested is not None:
+        requested = list(requested)
+        unknown = sorted(set(requested) - set(available))
+        if unknown:
+            raise ArchiveError(f"Неизвестные протоколы: {', '.join(unknown)} "
+                               f"(доступны {', '.join(available)})")
+        return sorted(requested)
+    if zen_available:
+        return available
+    multi_agent = set(multi_agent)
+    return [p for p in available if p not in multi_agent]
+
+
+def build(skeleton_dir: Path, output: Path, version: Optional[str] = None) -> Path:
+    """Упаковать дерево скелета в воспроизводимый zip с манифестом"""
+    skeleton_dir = Path(skeleton_dir)
+    version = version or project_version()
+    output = Path(output)
+    if output.is_dir() or not output.suffix:
+        output = output / archive_name(version)
+
+    paths = sorted(p for p in skeleton_dir.rglob('*') if p.is_file())
+    files = {}
+    for path in paths:
+        name = path.relative_to(skeleton_dir).as_posix()
+        files[name] = {'sha256': file_sha256(path), 'size': path.stat().st_size}
+    protocols = sorted({protocol_of(name) for name in files} - {None})
+    manifest = {
+        'format': FORMAT_VERSION,
+        'version': version,
+        'tree_hash': tree_hash(files),
+        'protocols': {p: {'multi_agent': p in MULTI_AGENT_PROTOCOLS} for p in protocols},
+        'files': files,
+    }
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    tmp = output.with_suffix(output.suffix + '.tmp')
+    with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_DEFLATED) as archive:
+        # Манифест первым: его можно прочитать, не дочитывая архив
+        _write_entry(archive, MANIFEST_NAME,
+                     json.dumps(manifest, ensure_ascii=False, indent=1, sort_keys=True).encode())
+        for path in paths:
+            _write_entry(archive, path.relative_to(skeleton_dir).as_posix(), path.read_bytes())
+    os.replace(tmp, output)
+    return output
+
+
+def _write_entry(archive: zipfile.ZipFile, name: str, data: bytes):
+    info = zipfile.ZipInfo(name, ZIP_TIMESTAMP)
+    info.compress_type = zipfile.ZIP_DEFLATED
+    info.external_attr = 0o644 << 16
+    archive.writestr(info, data)
+
+
+class _MappedFile(mmap.mmap):
+    """mmap как файл для zipfile (seekable() есть у mmap только с Python 3.13)"""
+
+    def seekable(self):
+        return True
+
+
+class SkeletonArchive:
+    """Архив скелета, открытый через mmap"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = _MappedFile(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._zip = zipfile.ZipFile(self._map)
+            self.manifest = json.loads(self._zip.read(MANIFEST_NAME))
+        except (ValueError, KeyError, zipfile.BadZipFile) as e:
+            self.close()
+            raise ArchiveError(f"{self.path}: не архив codev-skeleton ({e})") from e
+        if self.manifest.get('format') != FORMAT_VERSION:
+            self.close()
+            raise ArchiveError(f"{self.path}: неподдерживаемый формат {self.manifest.get('format')}")
+        try:
+            for name in self.files:
+                check_name(name)
+        except ArchiveError:
+            self.close()
+            raise
+
+    def close(self):
+        for resource in ('_zip', '_map', '_file'):
+            handle = getattr(self, resource, None)
+            if handle is not None:
+                handle.close()
+                setattr(self, resource, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def version(self) -> str:
+        return self.manifest['version']
+
+    @property
+    def protocols(self) -> List[str]:
+        return sorted(self.manifest['protocols'])
+
+    @property
+    def multi_agent(self) -> List[str]:
+        return sorted(p for p, info in self.manifest['protocols'].items()
+                      if info.get('multi_agent'))
+
+    @property
+    def files(self) -> Dict[str, dict]:
+        return self.manifest['files']
+
+    def read(self, name: str) -> bytes:
+        """Содержимое файла с проверкой SHA-256 по манифесту"""
+        expected = self.files.get(name)
+        if expected is None:
+            raise ArchiveError(f"{name}: нет в манифесте архива")
+        try:
+            data = self._zip.read(name)
+        except KeyError:
+            raise ArchiveError(f"{name}: есть в манифесте, но нет в архиве") from None
+        if hashlib.sha256(data).hexdigest() != expected['sha256']:
+            raise ArchiveError(f"{name}: SHA-256 не совпадает с манифестом")
+        return data
+
+    def verify(self, version: Optional[str] = None, sha256: Optional[str] = None):
+        """Проверить версию, хеш архива, хеш дерева и все файлы"""
+        if version is not None and version != self.version:
+            raise ArchiveError(f"Версия архива {self.version}, ожидалась {version}")
+        if sha256 is not None:
+            actual = hashlib.sha256(self._map).hexdigest()
+            if actual != sha256.lower():
+                raise ArchiveError(f"SHA-256 архива {actual} не совпадает с {sha256}")
+        if tree_hash(self.files) != self.manifest['tree_hash']:
+            raise ArchiveError("Хеш дерева не совпадает с манифестом")
+        extra = set(self._zip.namelist()) - set(self.files) - {MANIFEST_NAME}
+        if extra:
+            raise ArchiveError(f"Файлы вне манифеста: {', '.join(sorted(extra))}")
+        for name in self.files:
+            self.read(name)
+
+    def select(self, zen_available: bool = True,
+               protocols: Optional[Iterable[str]] = None) -> List[str]:
+        return select_protocols(self.protocols, zen_available, protocols, self.multi_agent)
+
+    def extract(self, target: Path, protocols: Optional[Iterable[str]] = None,
+                zen_available: bool = True) -> InstallResult:
+        """Извлечь общие файлы скелета и выбранные протоколы в target (каталог codev)"""
+        target = Path(target)
+        selected = self.select(zen_available, protocols)
+        wanted = set(selected)
+        names = [n for n in self.files if protocol_of(n) is None or protocol_of(n) in wanted]
+
+        # Всё читается и проверяется до первой записи: повреждённый архив не
+        # оставляет наполовину установленный протокол
+        contents = {name: self.read(name) for name in names}
+        result = InstallResult(self.version, selected)
+        for protocol in selected:
+            shutil.rmtree(target / PROTOCOLS_DIR / protocol, ignore_errors=True)
+        for directory in sorted({(target / name).parent for name in names}):
+            directory.mkdir(parents=True, exist_ok=True)
+        for name, data in contents.items():
+            (target / name).write_bytes(data)
+            result.files.append(name)
+            result.bytes += len(data)
+        return result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-skeleton-archive',
+        description='Индексированный архив codev-skeleton: сборка, проверка и установка')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    build_cmd = sub.add_parser('build', help='упаковать дерево скелета в архив')
+    build_cmd.add_argument('skeleton', type=Path, nargs='?', default=PROJECT_ROOT / 'codev-skeleton')
+    build_cmd.add_argument('output', type=Path, nargs='?', default=Path('dist'),
+                           help='файл архива или каталог (имя codev-skeleton-<версия>.zip)')
+    build_cmd.add_argument('--version', default=None,
+                           help='версия скелета (по умолчанию из pyproject.toml)')
+
+    verify_cmd = sub.add_parser('verify', help='проверить архив')
+    verify_cmd.add_argument('archive', type=Path)
+    verify_cmd.add_argument('--version', default=None, help='ожидаемая версия')
+    verify_cmd.add_argument('--sha256', default=None, help='ожидаемый SHA-256 архива')
+
+    install_cmd = sub.add_parser('install', help='извлечь скелет в каталог codev проекта')
+    install_cmd.add_argument('archive', type=Path)
+    install_cmd.add_argument('target', type=Path, nargs='?', default=Path('codev'))
+    install_cmd.add_argument('--protocol', action='append', default=None, dest='protocols',
+                             help='установить только этот протокол (можно несколько раз)')
+    install_cmd.add_argument('--no-zen', action='store_true',
+                             help='Zen MCP недоступен: без протоколов с мультиагентной консультацией')
+    install_cmd.add_argument('--version', default=None, help='ожидаемая версия')
+    install_cmd.add_argument('--sha256', default=None, help='ожидаемый SHA-256 архива')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if args.command == 'build':
+        output = build(args.skeleton, args.output, args.version)
+        with SkeletonArchive(output) as archive:
+            print(f"{output}: version={archive.version} files={len(archive.files)} "
+                  f"protocols={','.join(archive.protocols)}")
+            print(f"sha256={file_sha256(output)} tree={archive.manifest['tree_hash']}")
+        return 0
+
+    try:
+        with SkeletonArchive(args.archive) as archive:
+            if args.command == 'verify':
+                archive.verify(args.version, args.sha256)
+                print(f"{args.archive}: OK version={archive.version} files={len(archive.files)}")
+                return 0
+            if args.version or args.sha256:
+                archive.verify(args.version, args.sha256)
+            result = archive.extract(args.target, args.protocols, zen_available=not args.no_zen)
+    except ArchiveError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    print(f"{args.target}: version={result.version} protocols={','.join(result.protocols)} "
+          f"files={len(result.files)} bytes={result.bytes}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
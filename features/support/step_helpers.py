@@ -0,0 +1,51 @@
+"""
+Общие заготовки для step-модулей
+
+Step-модули behave не импортируют друг друга, поэтому то, что нужно
+нескольким из них - временные каталоги сценария и минимальные wheel для
+установки без сети, - собрано здесь.
+"""
+import base64
+import hashlib
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import Optional
+
+
+def scenario_dir(context, attr: str, prefix: str) -> Path:
+    """Временный каталог context.<attr>: создаётся при первом обращении, удаляется после сценария"""
+    path = getattr(context, attr, None)
+    if path is None:
+        path = Path(tempfile.mkdtemp(prefix=prefix))
+        setattr(context, attr, path)
+        context.cleanup_functions = getattr(context, 'cleanup_functions', [])
+        context.cleanup_functions.append(lambda ctx: shutil.rmtree(path, ignore_errors=True))
+    return path
+
+
+def _record_hash(data: bytes) -> str:
+    digest = base64.urlsafe_b64encode(hashlib.sha256(data).digest()).rstrip(b'=')
+    return f"sha256={digest.decode('ascii')}"
+
+
+def build_wheel(wheelhouse: Path, package: str, version: str = '1.0',
+                source: Optional[bytes] = None) -> Path:
+    """Минимальный wheel пакета без сборки; source - содержимое __init__.py"""
+    dist_info = f'{package}-{version}.dist-info'
+    files = {
+        f'{package}/__init__.py': source or f'VERSION = "{version}"\n'.encode(),
+        f'{dist_info}/METADATA': (f'Metadata-Version: 2.1\nName: {package}\n'
+                                  f'Version: {version}\n').encode(),
+        f'{dist_info}/WHEEL': (b'Wheel-Version: 1.0\nGenerator: codev-tests\n'
+                               b'Root-Is-Purelib: true\nTag: py3-none-any\n'),
+    }
+    record = ''.join(f'{name},{_record_hash(data)},{len(data)}\n' for name, data in files.items())
+    files[f'{dist_info}/RECORD'] = (record + f'{dist_info}/RECORD,,\n').encode()
+    wheelhouse.mkdir(parents=True, exist_ok=True)
+    wheel_path = wheelhouse / f'{package}-{version}-py3-none-any.whl'
+    with zipfile.ZipFile(wheel_path, 'w') as wheel:
+        for name, data in files.items():
+            wheel.writestr(name, data)
+    return wheel_path
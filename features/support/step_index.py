@@ -0,0 +1,245 @@
+"""
+Индекс step-определений: поиск шага без перебора всех шаблонов
+
+Registry behave сопоставляет текст шага со всеми шаблонами по очереди.
+StepIndex раскладывает шаблоны по префиксному дереву литерального начала
+("я создаю спецификацию " для 'я создаю спецификацию "{name}"'), так что
+для текста шага проверяются только шаблоны, чей префикс с ним совпадает,
+в исходном порядке регистрации - результат тот же, что у behave.
+
+При построении индекса ищутся неоднозначные шаблоны: для каждого
+parse-шаблона синтезируется пример текста и проверяется, какие ещё шаблоны
+его принимают. Если это более ранний шаблон - новый недостижим для таких
+шагов (shadowed), если более поздний - результат зависит от порядка
+регистрации (ambiguous).
+
+Использование:
+    python -m features.support.step_index
+    python -m features.support.step_index --features-dir features --json
+"""
+import argparse
+import json
+import re
+import sys
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from behave.matchers import ParseMatcher, RegexMatcher
+from behave.step_registry import StepRegistry
+
+from features.support.protocol_validator import Finding
+
+STEP_TYPES = ('given', 'when', 'then', 'step')
+
+PARSE_FIELD_RE = re.compile(r'\{[^{}]*\}')
+REGEX_META = set('.^$*+?{}[]\\|()')
+
+# Примеры значений для синтеза текста шага по типу поля parse
+SAMPLE_VALUES = {'d': '7', 'n': '7', 'f': '7.5', 'g': '7.5', 'w': 'sample'}
+
+
+def literal_prefix(matcher) -> str:
+    """Литеральное начало шаблона: любой подходящий текст начинается с него"""
+    pattern = matcher.pattern
+    if isinstance(matcher, ParseMatcher):
+        if not matcher.CASE_SENSITIVE:
+            return ''
+        match = PARSE_FIELD_RE.search(pattern)
+        prefix = pattern[:match.start()] if match else pattern
+        return prefix.replace('{{', '{').replace('}}', '}')
+    if isinstance(matcher, RegexMatcher):
+        # Альтернатива на верхнем уровне и флаг IGNORECASE лишают шаблон префикса
+        if '|' in pattern or re.compile(pattern).flags & re.IGNORECASE:
+            return ''
+        prefix = []
+        for char in pattern[1:] if pattern.startswith('^') else pattern:
+            if char in REGEX_META:
+                # Квантификатор делает необязательным предыдущий символ
+                if char in '?*{' and prefix:
+                    prefix.pop()
+                break
+            prefix.append(char)
+        return ''.join(prefix)
+    return ''
+
+
+def sample_text(matcher) -> Optional[str]:
+    """Пример текста шага для parse-шаблона; None для регулярных выражений"""
+    if not isinstance(matcher, ParseMatcher):
+        return None
+
+    def fill(field):
+        spec = field.group(0)[1:-1]
+        kind = spec.rsplit(':', 1)[1] if ':' in spec else ''
+        return SAMPLE_VALUES.get(kind, 'sample')
+
+    return PARSE_FIELD_RE.sub(fill, matcher.pattern).replace('{{', '{').replace('}}', '}')
+
+
+class _TrieNode:
+    __slots__ = ('children', 'entries')
+
+    def __init__(self):
+        self.children: Dict[str, '_TrieNode'] = {}
+        self.entries: List[Tuple[int, object]] = []
+
+
+class StepIndex:
+    """Префиксные деревья шаблонов для каждого типа шага"""
+
+    def __init__(self, steps: Dict[str, list]):
+        self.tries: Dict[str, _TrieNode] = {}
+        self.ordered: Dict[str, list] = {}
+        for step_type in STEP_TYPES:
+            # Тот же порядок кандидатов, что у StepRegistry.find_match
+            candidates = list(steps.get(step_type, []))
+            if step_type != 'step':
+                candidates += steps.get('step', [])
+            root = _TrieNode()
+            for ordinal, matcher in enumerate(candidates):
+                node = root
+                for char in literal_prefix(matcher):
+                    node = node.children.setdefault(char, _TrieNode())
+                node.entries.append((ordinal, matcher))
+            self.tries[step_type] = root
+            self.ordered[step_type] = candidates
+
+    def candidates(self, step_type: str, text: str) -> List[object]:
+        """Шаблоны, литеральный префикс которых совпадает с началом текста"""
+        node = self.tries.get(step_type)
+        found = []
+        position = 0
+        while node is not None:
+            found.extend(node.entries)
+            if position == len(text):
+                break
+            node = node.children.get(text[position])
+            position += 1
+        found.sort(key=lambda entry: entry[0])
+        return [matcher for _ordinal, matcher in found]
+
+    def find_match(self, step_type: str, text: str):
+        for matcher in self.candidates(step_type, text):
+            result = matcher.match(text)
+            if result:
+                return result
+        return None
+
+    def find_step_definition(self, step_type: str, text: str):
+        for matcher in self.candidates(step_type, text):
+            if matcher.match(text):
+                return matcher
+        return None
+
+    def ambiguities(self) -> List[Finding]:
+        """Пары шаблонов, принимающих один и тот же синтезированный текст"""
+        findings = []
+        seen = set()
+        for step_type in STEP_TYPES:
+            ordered = self.ordered[step_type]
+            positions = {id(m): i for i, m in enumerate(ordered)}
+            for matcher in ordered:
+                if matcher.step_type != step_type and step_type != 'step':
+                    # Общие @step шаблоны проверяются в собственном дереве
+                    continue
+                text = sample_text(matcher)
+                if text is None:
+                    continue
+                for other in self.candidates(step_type, text):
+                    if other is matcher or not other.match(text):
+                        continue
+                    key = (id(matcher), id(other))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    earlier = positions[id(other)] < positions[id(matcher)]
+                    findings.append(Finding(
+                        'error' if earlier else 'warning',
+                        'step-shadowed' if earlier else 'step-ambiguous',
+                        matcher.location.filename, matcher.location.line,
+                        f"@{matcher.step_type}('{matcher.pattern}'): текст \"{text}\" "
+                        f"{'уже' if earlier else 'также'} подходит под "
+                        f"@{other.step_type}('{other.pattern}') из {other.location}"))
+        return findings
+
+
+class IndexedStepRegistry(StepRegistry):
+    """StepRegistry поверх общего registry behave с поиском через StepIndex
+
+    Индекс перестраивается, когда меняются списки шагов (например после
+    перезагрузки step-модуля прогретым раннером).
+    """
+
+    def __init__(self, base: StepRegistry):
+        self.base = base
+        self._index: Optional[StepIndex] = None
+        self._signature = None
+
+    @property
+    def steps(self):
+        return self.base.steps
+
+    @property
+    def error_handler(self):
+        return self.base.error_handler
+
+    @property
+    def index(self) -> StepIndex:
+        signature = tuple((id(self.steps.get(t)), len(self.steps.get(t, ()))) for t in STEP_TYPES)
+        if self._index is None or signature != self._signature:
+            self._index = StepIndex(self.steps)
+            self._signature = signature
+        return self._index
+
+    def clear(self):
+        self.base.clear()
+
+    def add_step_definition(self, keyword, step_text, func):
+        self.base.add_step_definition(keyword, step_text, func)
+
+    def find_match(self, step):
+        return self.index.find_match(step.step_type, step.name)
+
+    def find_step_definition(self, step):
+        return self.index.find_step_definition(step.step_type, step.name)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-steps',
+        description='Проверка step-определений на неоднозначные шаблоны')
+    parser.add_argument('--features-dir', type=Path, default=None)
+    parser.add_argument('--json', action='store_true', help='вывод в JSON')
+    return parser
+
+
+def main(argv=None) -> int:
+    from behave.runner_util import load_step_modules
+    from behave.step_registry import registry
+
+    from features.support.warm_runner import FEATURES_DIR
+
+    args = build_parser().parse_args(argv)
+    features_dir = (args.features_dir or FEATURES_DIR).resolve()
+    registry.clear()
+    load_step_modules([str(features_dir / 'steps')])
+
+    index = StepIndex(registry.steps)
+    findings = index.ambiguities()
+    if args.json:
+        print(json.dumps({
+            'steps': {t: len(registry.steps[t]) for t in STEP_TYPES},
+            'findings': [asdict(f) for f in findings],
+        }, ensure_ascii=False, indent=2))
+    else:
+        for f in findings:
+            print(f"{f.path}:{f.line}: {f.severity}: [{f.code}] {f.message}")
+        total = sum(len(registry.steps[t]) for t in STEP_TYPES)
+        errors = sum(1 for f in findings if f.severity == 'error')
+        print(f"steps={total} errors={errors} warnings={len(findings) - errors}")
+    return 1 if any(f.severity == 'error' for f in findings) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""
+Резидентный демон behave, принимающий запросы на прогон через Unix-сокет
+
+Демон держит интерпретатор, behave, step-модули и разобранные .feature
+файлы загруженными (см. WarmRunner) и перед каждым прогоном перечитывает
+только изменившиеся модули. Вывод форматтеров передаётся клиенту по мере
+появления.
+
+Протокол: клиент отправляет одну JSON-строку, демон отвечает потоком
+JSON-строк {"type": "output", "data": ...} и завершающей
+{"type": "result", "status": ..., "exit_code": ..., "reloaded": [...]}.
+
+Использование:
+    python -m features.support.test_daemon serve &
+    python -m features.support.test_daemon run features/spider_protocol.feature:60
+    python -m features.support.test_daemon run -- features --tags=@smoke
+    python -m features.support.test_daemon stop
+"""
+import argparse
+import hashlib
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+def default_socket_path(root: Path = PROJECT_ROOT) -> Path:
+    """Путь к сокету демона, уникальный для проекта и пользователя"""
+    digest = hashlib.sha1(str(Path(root).resolve()).encode('utf-8')).hexdigest()[:10]
+    base = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    return Path(base) / f'codev-behave-{os.getuid()}-{digest}.sock'
+
+
+class SocketStream:
+    """Текстовый поток, пересылающий каждую запись клиенту JSON-строкой"""
+
+    encoding = 'utf-8'
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def write(self, data: str) -> int:
+        if data:
+            self.send({'type': 'output', 'data': data})
+        return len(data)
+
+    def send(self, message: dict):
+        self.wfile.write((json.dumps(message, ensure_ascii=False) + '\n').encode('utf-8'))
+        self.wfile.flush()
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+
+def request_args(request: dict) -> List[str]:
+    """Аргументы behave из запроса: готовый args или поля feature/tags/name"""
+    args = list(request.get('args', []))
+    if request.get('feature'):
+        line = request.get('line')
+        args.append(f"{request['feature']}:{line}" if line else request['feature'])
+    for tag in request.get('tags', []):
+        args.append(f'--tags={tag}')
+    if request.get('name'):
+        args.append(f"--name={request['name']}")
+    return args
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        stream = SocketStream(self.wfile)
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            stream.send({'type': 'error', 'message': f'bad request: {e}'})
+            return
+
+        command = request.get('command', 'run')
+        if command == 'ping':
+            stream.send({'type': 'result', 'status': 'ok', 'pid': os.getpid()})
+        elif command == 'stop':
+            stream.send({'type': 'result', 'status': 'stopping'})
+            self.server.stopping = True
+        elif command == 'run':
+            try:
+                result = self.server.warm.run(
+                    request_args(request), stream=stream, formats=request.get('format'))
+            except Exception as e:
+                stream.send({'type': 'error', 'message': f'{type(e).__name__}: {e}'})
+                return
+            stream.send({'type': 'result', **result})
+        else:
+            stream.send({'type': 'error', 'message': f'unknown command: {command}'})
+
+
+class TestDaemon(socketserver.UnixStreamServer):
+    """Однопоточный сервер: behave держит глобальное состояние, прогоны идут по очереди"""
+
+    def __init__(self, socket_path: Path, features_dir: Optional[Path] = None):
+        from features.support.warm_runner import FEATURES_DIR, WarmRunner
+
+        self.socket_path = Path(socket_path)
+        if self.socket_path.exists():
+            self.socket_path.unlink()
+        self.warm = WarmRunner(features_dir or FEATURES_DIR)
+        self.stopping = False
+        super().__init__(str(self.socket_path), _Handler)
+
+    def serve(self):
+        try:
+            while not self.stopping:
+                self.handle_request()
+        finally:
+            self.server_close()
+            if self.socket_path.exists():
+                self.socket_path.unlink()
+
+
+def send_request(socket_path: Path, request: dict, out=None) -> dict:
+    """Отправить запрос демону и вывести поток результатов; вернуть итоговое сообщение"""
+    out = out or sys.stdout
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(str(socket_path))
+        sock.sendall((json.dumps(request, ensure_ascii=False) + '\n').encode('utf-8'))
+        result = {'type': 'error', 'message': 'connection closed'}
+        with sock.makefile('rb') as reader:
+            for raw in reader:
+                message = json.loads(raw)
+                if message['type'] == 'output':
+                    out.write(message['data'])
+                    out.flush()
+                else:
+                    result = message
+    return result
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-behave-daemon',
+        description='Прогретый демон behave для быстрых повторных прогонов')
+    parser.add_argument('--socket', type=Path, default=None,
+                        help='путь к Unix-сокету (по умолчанию во временном каталоге)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    serve = sub.add_parser('serve', help='запустить демон')
+    serve.add_argument('--features-dir', type=Path, default=None)
+    run = sub.add_parser('run', help='выполнить прогон в демоне')
+    run.add_argument('--format', action='append', help='форматтер behave (можно повторять)')
+    run.add_argument('args', nargs=argparse.REMAINDER,
+                     help='аргументы behave: пути, file:line, --tags, --name')
+    sub.add_parser('ping', help='проверить что демон запущен')
+    sub.add_parser('stop', help='остановить демон')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    socket_path = args.socket or default_socket_path()
+
+    if args.command == 'serve':
+        daemon = TestDaemon(socket_path, args.features_dir)
+        print(f"behave daemon listening on {socket_path}", file=sys.stderr)
+        daemon.serve()
+        return 0
+
+    request = {'command': args.command}
+    if args.command == 'run':
+        behave_args = [a for a in args.args if a != '--']
+        request.update(args=behave_args, format=args.format)
+
+    try:
+        result = send_request(socket_path, request)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"Демон не запущен: {socket_path}\n"
+              f"Запустите: python -m features.support.test_daemon serve", file=sys.stderr)
+        return 2
+
+    if result['type'] == 'error':
+        print(result['message'], file=sys.stderr)
+        return 2
+    if args.command == 'run':
+        if result.get('reloaded'):
+            print(f"reloaded: {', '.join(result['reloaded'])}", file=sys.stderr)
+        print(f"elapsed: {result['elapsed']:.3f}s", file=sys.stderr)
+        return result['exit_code']
+    print(json.dumps(result, ensure_ascii=False))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
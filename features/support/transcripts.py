@@ -0,0 +1,396 @@
+"""
+Журнал консультаций с моделями: сегментированные сжатые файлы только для дозаписи
+
+Каждая консультация (модель, фаза, номер спецификации, хэш запроса,
+ответ, задержка) дописывается строкой JSON в активный сегмент
+seg-000001.jsonl. Когда сегмент превышает segment_size, он сжимается в
+seg-000001.jsonl.gz и начинается следующий. Для закрытых сегментов в
+index.json хранится, какие спецификации и фазы в них есть, поэтому
+выборка по спецификации читает только нужные сегменты, а записи
+читаются потоково, без загрузки сегмента в память.
+
+Компактизация объединяет недозаполненные закрытые сегменты (например
+закрытые командой seal) в полноразмерные и удаляет повторы (та же
+спецификация, фаза, модель, запрос и ответ); память расходуется только
+на хэши записей. Временные файлы прерванной компактизации или закрытия
+сегмента удаляются при следующем захвате блокировки журнала.
+
+Использование:
+    python -m features.support.transcripts list --spec 0001 --phase specify
+    python -m features.support.transcripts stats
+    python -m features.support.transcripts compact
+"""
+import argparse
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+INDEX_VERSION = 1
+SEGMENT_SIZE = 4 * 1024 * 1024
+SEGMENT_RE = re.compile(r'^seg-(\d{6})\.jsonl(\.gz)?$')
+LEFTOVER_RE = re.compile(r'^seg-\d{6}\.jsonl(?:\.gz\.compact|\.tmp)$')
+
+
+def prompt_hash(prompt: str) -> str:
+    return hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:16]
+
+
+@dataclass
+class ConsultationRecord:
+    """Одна консультация"""
+    model: str
+    phase: str
+    spec: str
+    prompt_hash: str
+    response: str
+    latency: float = 0.0
+    ts: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_prompt(cls, model: str, phase: str, spec: str, prompt: str, response: str,
+                    latency: float = 0.0) -> 'ConsultationRecord':
+        return cls(model, phase, spec, prompt_hash(prompt), response, latency)
+
+
+@dataclass
+class StoreStats:
+    """Размеры журнала"""
+    segments: int = 0
+    sealed: int = 0
+    records: int = 0
+    specs: int = 0
+    bytes_on_disk: int = 0
+    bytes_raw: int = 0
+
+
+class TranscriptStore:
+    """Каталог сегментов журнала консультаций"""
+
+    def __init__(self, directory: Path, segment_size: int = SEGMENT_SIZE):
+        self.directory = Path(directory)
+        self.segment_size = segment_size
+        self.index_path = self.directory / 'index.json'
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+
+    def append(self, record: ConsultationRecord) -> ConsultationRecord:
+        line = (json.dumps(asdict(record), ensure_ascii=False) + '\n').encode('utf-8')
+        with self._locked():
+            active = self._active_segment()
+            fd = os.open(active, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+            if size >= self.segment_size:
+                self._seal(active)
+        return record
+
+    def seal(self):
+        """Закрыть и сжать активный сегмент"""
+        with self._locked():
+            active = self._active_segment()
+            if active.exists() and active.stat().st_size:
+                self._seal(active)
+
+    @contextmanager
+    def _locked(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                self._remove_leftovers()
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _remove_leftovers(self):
+        # Под блокировкой никто не пишет временные файлы, значит они остались после сбоя
+        for path in self.directory.iterdir():
+            if LEFTOVER_RE.match(path.name):
+                path.unlink()
+
+    def _segments(self) -> List[Path]:
+        if not self.directory.is_dir():
+            return []
+        found = [p for p in self.directory.iterdir() if SEGMENT_RE.match(p.name)]
+        return sorted(found, key=lambda p: p.name)
+
+    def _active_segment(self) -> Path:
+        segments = self._segments()
+        if segments and not segments[-1].name.endswith('.gz'):
+            return segments[-1]
+        number = int(SEGMENT_RE.match(segments[-1].name).group(1)) + 1 if segments else 1
+        return self.directory / f'seg-{number:06d}.jsonl'
+
+    def _seal(self, active: Path):
+        sealed = active.with_name(active.name + '.gz')
+        entry = _Summary()
+        tmp = sealed.with_suffix('.tmp')
+        with open(active, 'rb') as source, gzip.open(tmp, 'wb') as target:
+            for line in source:
+                target.write(line)
+                entry.add(json.loads(line))
+        os.replace(tmp, sealed)
+        index = self._load_index()
+        index[sealed.name] = dict(entry.to_dict(), size=sealed.stat().st_size)
+        self._save_index(index)
+        active.unlink()
+
+    # ------------------------------------------------------------------
+    # Индекс закрытых сегментов
+    # ------------------------------------------------------------------
+
+    def _load_index(self) -> Dict[str, dict]:
+        try:
+            data = json.loads(self.index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            data = {}
+        sizes = {p.name: p.stat().st_size for p in self._segments() if p.name.endswith('.gz')}
+        segments = data.get('segments', {}) if data.get('version') == INDEX_VERSION else {}
+        # Записи потерянных или устаревших сегментов пересобираются по их содержимому
+        segments = {name: entry for name, entry in segments.items()
+                    if sizes.get(name) == entry.get('size')}
+        for name in sorted(set(sizes) - set(segments)):
+            entry = _Summary()
+            for record in _read_segment(self.directory / name):
+                entry.add(record)
+            segments[name] = dict(entry.to_dict(), size=sizes[name])
+        return segments
+
+    def _save_index(self, segments: Dict[str, dict]):
+        tmp = self.index_path.with_suffix('.tmp')
+        tmp.write_text(json.dumps({'version': INDEX_VERSION, 'segments': segments},
+                                  ensure_ascii=False, separators=(',', ':')), encoding='utf-8')
+        os.replace(tmp, self.index_path)
+
+    # ------------------------------------------------------------------
+    # Чтение
+    # ------------------------------------------------------------------
+
+    def iter_records(self, spec: Optional[str] = None, phase: Optional[str] = None,
+                     model: Optional[str] = None) -> Iterator[ConsultationRecord]:
+        """Записи журнала по порядку сегментов; закрытые сегменты отбираются по индексу"""
+        index = self._load_index()
+        for path in self._segments():
+            entry = index.get(path.name)
+            if entry is not None:
+                phases = entry['specs'].get(spec) if spec is not None else None
+                if spec is not None and phases is None:
+                    continue
+                if phase is not None and phase not in (phases or entry['phases']):
+                    continue
+            for data in _read_segment(path):
+                if spec is not None and data['spec'] != spec:
+                    continue
+                if phase is not None and data['phase'] != phase:
+                    continue
+                if model is not None and data['model'] != model:
+                    continue
+                yield ConsultationRecord(**data)
+
+    def segments_for(self, spec: str) -> List[str]:
+        """Сегменты, которые будут прочитаны при выборке по спецификации"""
+        index = self._load_index()
+        return [p.name for p in self._segments()
+                if p.name not in index or spec in index[p.name]['specs']]
+
+    def stats(self) -> StoreStats:
+        stats = StoreStats()
+        index = self._load_index()
+        specs = set()
+        for path in self._segments():
+            stats.segments += 1
+            stats.bytes_on_disk += path.stat().st_size
+            entry = index.get(path.name)
+            if entry is None:
+                entry = _Summary()
+                for record in _read_segment(path):
+                    entry.add(record)
+                entry = entry.to_dict()
+            else:
+                stats.sealed += 1
+            stats.records += entry['records']
+            stats.bytes_raw += entry['bytes']
+            specs.update(entry['specs'])
+        stats.specs = len(specs)
+        return stats
+
+    # ------------------------------------------------------------------
+    # Компактизация
+    # ------------------------------------------------------------------
+
+    def compact(self, dedupe: bool = True) -> Dict[str, int]:
+        """Объединить закрытые сегменты в полноразмерные и удалить повторы"""
+        with self._locked():
+            index = self._load_index()
+            sealed = [p for p in self._segments() if p.name in index]
+            if not sealed:
+                return {'segments_before': 0, 'segments_after': 0, 'removed': 0}
+            first = int(SEGMENT_RE.match(sealed[0].name).group(1))
+
+            removed = 0
+            seen = set()
+            writer = _SegmentWriter(self.directory, first, self.segment_size)
+            for path in sealed:
+                for data in _read_segment(path):
+                    if dedupe:
+                        key = hashlib.blake2b('\0'.join(
+                            (data['spec'], data['phase'], data['model'],
+                             data['prompt_hash'], data['response'])
+                        ).encode('utf-8'), digest_size=12).digest()
+                        if key in seen:
+                            removed += 1
+                            continue
+                        seen.add(key)
+                    writer.write(data)
+            written = writer.close()
+
+            # Новые сегменты занимают номера старых: при сбое возможны повторы, но не потери
+            names = set()
+            for tmp, name, _entry in written:
+                os.replace(tmp, self.directory / name)
+                names.add(name)
+            for path in sealed:
+                if path.name not in names:
+                    path.unlink()
+            self._save_index({name: dict(entry, size=(self.directory / name).stat().st_size)
+                              for _tmp, name, entry in written})
+            return {'segments_before': len(sealed), 'segments_after': len(written),
+                    'removed': removed}
+
+
+class _Summary:
+    """Сводка сегмента для индекса"""
+
+    def __init__(self):
+        self.records = 0
+        self.bytes = 0
+        self.specs: Dict[str, set] = {}
+
+    def add(self, record: dict):
+        self.records += 1
+        self.bytes += len(json.dumps(record, ensure_ascii=False).encode('utf-8')) + 1
+        self.specs.setdefault(record['spec'], set()).add(record['phase'])
+
+    def to_dict(self) -> dict:
+        return {'records': self.records, 'bytes': self.bytes,
+                'phases': sorted(set().union(*self.specs.values())) if self.specs else [],
+                'specs': {s: sorted(p) for s, p in sorted(self.specs.items())}}
+
+
+class _SegmentWriter:
+    """Запись сжатых сегментов компактизации во временные файлы"""
+
+    def __init__(self, directory: Path, first: int, segment_size: int):
+        self.directory = directory
+        self.number = first
+        self.segment_size = segment_size
+        self.done = []
+        self._file = None
+        self._name = self._tmp = self._summary = None
+
+    def write(self, data: dict):
+        if self._file is None:
+            self._name = f'seg-{self.number:06d}.jsonl.gz'
+            self._tmp = self.directory / f'{self._name}.compact'
+            self._file = gzip.open(self._tmp, 'wb')
+            self._summary = _Summary()
+        line = (json.dumps(data, ensure_ascii=False) + '\n').encode('utf-8')
+        self._file.write(line)
+        self._summary.add(data)
+        if self._summary.bytes >= self.segment_size:
+            self._finish()
+
+    def _finish(self):
+        self._file.close()
+        self.done.append((self._tmp, self._name, self._summary.to_dict()))
+        self._file = None
+        self.number += 1
+
+    def close(self) -> list:
+        if self._file is not None:
+            self._finish()
+        return self.done
+
+
+def _read_segment(path: Path) -> Iterator[dict]:
+    """Потоковое чтение строк сегмента (сжатого или активного)"""
+    opener = gzip.open if path.name.endswith('.gz') else open
+    try:
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # Оборванная последняя строка после сбоя записи
+                        continue
+    except FileNotFoundError:
+        return
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-consultations',
+        description='Журнал консультаций с моделями по спецификациям и фазам')
+    parser.add_argument('--dir', type=Path, default=Path(os.getcwd()) / 'codev' / 'consultations',
+                        help='каталог журнала (по умолчанию codev/consultations)')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    list_cmd = sub.add_parser('list', help='вывести консультации')
+    list_cmd.add_argument('--spec')
+    list_cmd.add_argument('--phase')
+    list_cmd.add_argument('--model')
+    list_cmd.add_argument('--json', action='store_true', help='по записи JSON на строку')
+
+    sub.add_parser('stats', help='размер журнала')
+    sub.add_parser('seal', help='закрыть и сжать активный сегмент')
+    compact_cmd = sub.add_parser('compact', help='объединить закрытые сегменты')
+    compact_cmd.add_argument('--keep-duplicates', action='store_true')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    store = TranscriptStore(args.dir)
+
+    if args.command == 'list':
+        for record in store.iter_records(args.spec, args.phase, args.model):
+            if args.json:
+                print(json.dumps(asdict(record), ensure_ascii=False))
+            else:
+                when = time.strftime('%Y-%m-%d %H:%M', time.localtime(record.ts))
+                first_line = record.response.strip().splitlines()[0] if record.response.strip() else ''
+                print(f"{when}  [Spec {record.spec}] {record.phase:<10} {record.model:<16} "
+                      f"{record.latency:6.2f}s  {first_line[:80]}")
+    elif args.command == 'seal':
+        store.seal()
+    elif args.command == 'compact':
+        result = store.compact(dedupe=not args.keep_duplicates)
+        print(f"segments {result['segments_before']} -> {result['segments_after']}, "
+              f"removed {result['removed']} duplicate(s)")
+
+    if args.command in ('stats', 'seal', 'compact'):
+        stats = store.stats()
+        ratio = stats.bytes_raw / stats.bytes_on_disk if stats.bytes_on_disk else 0.0
+        print(f"segments={stats.segments} sealed={stats.sealed} records={stats.records} "
+              f"specs={stats.specs} disk={stats.bytes_on_disk} raw={stats.bytes_raw} "
+              f"ratio={ratio:.1f}x")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,494 @@
+"""
+Кэш виртуальных окружений для запуска тестов сгенерированных проектов
+
+Окружение определяется набором зависимостей проекта: ключ - SHA-256
+версии интерпретатора и содержимого uv.lock, а без него - отсортированного
+списка зависимостей из pyproject.toml ([project].dependencies и extras
+test/dev) или requirements.txt. Проекты с одинаковыми зависимостями
+используют одно окружение в любых сценариях и прогонах. Локальные
+зависимости (-e ., ./pkg, file:...) приводятся к абсолютному пути, и в
+ключ входит хэш их содержимого: разные или изменённые локальные исходники
+не получают чужое окружение.
+
+Окружение создаётся без pip (venv --without-pip, доли секунды), пакеты
+ставятся pip текущего интерпретатора через --python (или uv, если он
+установлен). С каталогом wheelhouse (CODEV_WHEELHOUSE) установка идёт
+без сети: --no-index --find-links. Окружение считается готовым, когда
+записан файл-маркер; недостроенные окружения пересоздаются.
+
+Кэш ограничен объёмом на диске (CODEV_VENV_BUDGET, например 2G): после
+создания окружения удаляются давно не использованные (LRU). Окружение,
+полученное через use(), держит разделяемую блокировку <key>.lock до конца
+блока with, и вытеснение его пропускает; файл блокировки удаляется вместе
+с окружением.
+
+Использование:
+    python -m features.support.venv_cache ensure path/to/project --with pytest
+    python -m features.support.venv_cache run path/to/project -- -m pytest -q
+    python -m features.support.venv_cache list
+    python -m features.support.venv_cache --budget 500M prune
+"""
+import argparse
+import contextlib
+import fcntl
+import hashlib
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import time
+import venv
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import List, Optional, Sequence
+from urllib.parse import unquote, urlparse
+
+try:
+    import tomllib
+except ImportError:  # Python 3.10
+    tomllib = None
+
+from features.support.documents import cache_dir
+
+CACHE_VERSION = 2
+MARKER = '.codev-env.json'
+BUDGET_ENV = 'CODEV_VENV_BUDGET'
+WHEELHOUSE_ENV = 'CODEV_WHEELHOUSE'
+DEFAULT_BUDGET = 2 * 1024 ** 3
+# Extras pyproject, нужные для запуска тестов
+TEST_EXTRAS = ('test', 'tests', 'dev')
+INSTALL_TIMEOUT = 600
+
+EDITABLE_RE = re.compile(r'^(-e|--editable)(?:\s+|=)(.+)$')
+# Каталоги локального пакета, не влияющие на устанавливаемое содержимое
+LOCAL_SKIP_DIRS = ('__pycache__', 'build', 'dist', 'node_modules')
+
+SIZE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([KMG]?)i?B?\s*$', re.IGNORECASE)
+SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+class EnvBuildError(RuntimeError):
+    """Не удалось создать окружение или установить зависимости"""
+
+
+def parse_size(value) -> int:
+    """'500M' -> 524288000; число - байты"""
+    if isinstance(value, int):
+        return value
+    match = SIZE_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Неверный размер: {value!r} (ожидается например 500M, 2G)")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def format_size(size: int) -> str:
+    for unit in ('G', 'M', 'K'):
+        if size >= SIZE_UNITS[unit]:
+            return f"{size / SIZE_UNITS[unit]:.1f}{unit}"
+    return f"{size}B"
+
+
+def project_requirements(project: Path) -> List[str]:
+    """Зависимости проекта из pyproject.toml или requirements.txt"""
+    project = Path(project)
+    pyproject = project / 'pyproject.toml'
+    if pyproject.exists() and tomllib is not None:
+        data = tomllib.loads(pyproject.read_text(encoding='utf-8')).get('project', {})
+        requirements = list(data.get('dependencies', []))
+        extras = data.get('optional-dependencies', {})
+        for extra in TEST_EXTRAS:
+            requirements.extend(extras.get(extra, []))
+        return requirements
+    requirements_txt = project / 'requirements.txt'
+    if requirements_txt.exists():
+        lines = requirements_txt.read_text(encoding='utf-8').splitlines()
+        return [line.split('#', 1)[0].strip() for line in lines
+                if line.split('#', 1)[0].strip()]
+    return []
+
+
+def _local_target(requirement: str) -> Optional[str]:
+    """Путь локальной зависимости ('-e .', './pkg', 'file:...') или None"""
+    target = requirement.strip()
+    match = EDITABLE_RE.match(target)
+    if match:
+        target = match.group(2).strip()
+    if target.startswith('file:'):
+        return unquote(urlparse(target).path)
+    if target in ('.', '..') or target.startswith(('./', '../', '/', '~')):
+        return target
+    return None
+
+
+def resolve_local(requirements: Sequence[str], base: Path) -> List[str]:
+    """Локальные зависимости с путями относительно base -> абсолютные пути"""
+    resolved = []
+    for requirement in requirements:
+        target = _local_target(requirement)
+        if target is None:
+            resolved.append(requirement)
+            continue
+        path = str((Path(base) / Path(target).expanduser()).resolve())
+        editable = EDITABLE_RE.match(requirement.strip())
+        resolved.append(f'-e {path}' if editable else path)
+    return resolved
+
+
+def local_digest(path: Path) -> str:
+    """SHA-256 содержимого локального пакета (файла или каталога)"""
+    path = Path(path)
+    digest = hashlib.sha256()
+    if path.is_file():
+        digest.update(path.read_bytes())
+        return digest.hexdigest()
+    for root, dirs, names in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if not d.startswith('.') and d not in LOCAL_SKIP_DIRS
+                         and not d.endswith('.egg-info')
+                         and not (Path(root) / d / 'pyvenv.cfg').exists())
+        for name in sorted(names):
+            file_path = Path(root) / name
+            digest.update(file_path.relative_to(path).as_posix().encode('utf-8') + b'\0')
+            with contextlib.suppress(OSError):
+                digest.update(file_path.read_bytes())
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def environment_key(requirements: Sequence[str], lock: Optional[str] = None,
+                    extra: Sequence[str] = ()) -> str:
+    """Ключ окружения: интерпретатор, платформа и lock-файл или набор зависимостей
+
+    Для локальных зависимостей (после resolve_local) учитывается хэш их содержимого.
+    """
+    digest = hashlib.sha256()
+    interpreter = (str(CACHE_VERSION), platform.python_implementation(),
+                   '.'.join(map(str, sys.version_info[:2])), sys.platform, platform.machine())
+    for part in interpreter:
+        digest.update(part.encode('utf-8') + b'\0')
+    if lock is not None:
+        digest.update(b'lock\0' + lock.encode('utf-8') + b'\0')
+        requirements = ()
+    normalized = sorted({re.sub(r'\s+', '', r).lower() for r in [*requirements, *extra]})
+    digest.update('\n'.join(normalized).encode('utf-8'))
+    for requirement in sorted(set(requirements) | set(extra)):
+        target = _local_target(requirement)
+        if target is not None and Path(target).exists():
+            digest.update(f'\0{target}\0{local_digest(Path(target))}'.encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+@dataclass
+class CachedEnv:
+    """Окружение в кэше"""
+    key: str
+    path: Path
+    requirements: List[str] = field(default_factory=list)
+    created: float = 0.0
+    last_used: float = 0.0
+    size: int = 0
+    build_time: float = 0.0
+    reused: bool = False
+
+    @property
+    def python(self) -> Path:
+        if os.name == 'nt':
+            return self.path / 'Scripts' / 'python.exe'
+        return self.path / 'bin' / 'python'
+
+    def marker(self) -> dict:
+        data = asdict(self)
+        data.pop('reused')
+        data['path'] = str(self.path)
+        return data
+
+
+class VenvCache:
+    """Каталог окружений с ключами по зависимостям и LRU-вытеснением"""
+
+    def __init__(self, root: Path, budget: int = DEFAULT_BUDGET,
+                 wheelhouse: Optional[Path] = None):
+        self.root = Path(root)
+        self.budget = budget
+        self.wheelhouse = Path(wheelhouse) if wheelhouse else None
+        self.hits = 0
+        self.builds = 0
+
+    @classmethod
+    def from_env(cls, root: Path) -> 'VenvCache':
+        budget = os.environ.get(BUDGET_ENV)
+        return cls(root, parse_size(budget) if budget else DEFAULT_BUDGET,
+                   os.environ.get(WHEELHOUSE_ENV) or None)
+
+    @classmethod
+    def for_codev(cls, codev_dir: Path) -> 'VenvCache':
+        """Кэш в codev/.cache/venvs"""
+        return cls.from_env(cache_dir(codev_dir) / 'venvs')
+
+    # ------------------------------------------------------------------
+
+    def ensure(self, project: Optional[Path] = None, requirements: Sequence[str] = (),
+               extra: Sequence[str] = ()) -> CachedEnv:
+        """Готовое окружение для проекта (или явного списка зависимостей)"""
+        lock = None
+        if project is not None:
+            lock_file = Path(project) / 'uv.lock'
+            if lock_file.exists():
+                lock = lock_file.read_text(encoding='utf-8')
+            requirements = list(requirements) + project_requirements(project)
+        base = Path(project) if project is not None else Path.cwd()
+        # Пути локальных зависимостей считаются от проекта, а не от cwd установки
+        requirements = resolve_local(requirements, base)
+        extra = resolve_local(extra, Path.cwd())
+        key = environment_key(requirements, lock, extra)
+
+        self.root.mkdir(parents=True, exist_ok=True)
+        with self._locked(key):
+            env = self._load(key)
+            if env is not None:
+                env.last_used = time.time()
+                env.reused = True
+                self._write_marker(env)
+                self.hits += 1
+                return env
+            env = self._build(key, list(requirements), list(extra), project if lock else None)
+            self.builds += 1
+        self.evict(keep=(key,))
+        return env
+
+    @contextmanager
+    def use(self, project: Optional[Path] = None, requirements: Sequence[str] = (),
+            extra: Sequence[str] = ()):
+        """Окружение, которое не вытесняется до выхода из блока with"""
+        while True:
+            env = self.ensure(project, requirements, extra)
+            with self._locked(env.key, shared=True):
+                # Между ensure и блокировкой окружение могли вытеснить
+                if self._load(env.key) is not None:
+                    yield env
+                    return
+
+    def entries(self) -> List[CachedEnv]:
+        """Готовые окружения, от давно использованных к недавним"""
+        found = []
+        if self.root.is_dir():
+            for path in self.root.iterdir():
+                if path.is_dir():
+                    env = self._load(path.name)
+                    if env is not None:
+                        found.append(env)
+        return sorted(found, key=lambda e: e.last_used)
+
+    def evict(self, keep: Sequence[str] = (), budget: Optional[int] = None) -> List[str]:
+        """Удалить давно не использованные окружения сверх бюджета"""
+        budget = self.budget if budget is None else budget
+        entries = self.entries()
+        total = sum(e.size for e in entries)
+        removed = []
+        for env in entries:
+            if total <= budget:
+                break
+            if env.key in keep:
+                continue
+            with self._locked(env.key, blocking=False) as acquired:
+                # Окружение сейчас создаётся, обновляется или используется (use)
+                if not acquired:
+                    continue
+                shutil.rmtree(env.path, ignore_errors=True)
+                self._lock_path(env.key).unlink(missing_ok=True)
+            total -= env.size
+            removed.append(env.key)
+        self._remove_orphan_locks(keep)
+        return removed
+
+    # ------------------------------------------------------------------
+
+    def _lock_path(self, key: str) -> Path:
+        return self.root / f'{key}.lock'
+
+    @contextmanager
+    def _locked(self, key: str, blocking: bool = True, shared: bool = False):
+        path = self._lock_path(key)
+        mode = (fcntl.LOCK_SH if shared else fcntl.LOCK_EX) | (0 if blocking else fcntl.LOCK_NB)
+        while True:
+            lock = open(path, 'a')
+            try:
+                fcntl.flock(lock, mode)
+            except BlockingIOError:
+                lock.close()
+                yield False
+                return
+            # Пока ждали, файл блокировки могли удалить вместе с окружением
+            try:
+                if os.stat(path).st_ino == os.fstat(lock.fileno()).st_ino:
+                    break
+            except FileNotFoundError:
+                pass
+            lock.close()
+        try:
+            yield True
+        finally:
+            lock.close()
+
+    def _remove_orphan_locks(self, keep: Sequence[str] = ()):
+        """Удалить блокировки ключей без окружения (например после ошибки сборки)"""
+        for path in self.root.glob('*.lock'):
+            key = path.stem
+            if key in keep or (self.root / key).exists():
+                continue
+            with self._locked(key, blocking=False) as acquired:
+                if acquired and not (self.root / key).exists():
+                    path.unlink(missing_ok=True)
+
+    def _load(self, key: str) -> Optional[CachedEnv]:
+        marker = self.root / key / MARKER
+        try:
+            data = json.loads(marker.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return None
+        data['path'] = Path(data['path'])
+        return CachedEnv(**data)
+
+    def _write_marker(self, env: CachedEnv):
+        marker = env.path / MARKER
+        tmp = marker.with_suffix('.tmp')
+        tmp.write_text(json.dumps(env.marker(), ensure_ascii=False, indent=2), encoding='utf-8')
+        os.replace(tmp, marker)
+
+    def _build(self, key: str, requirements: List[str], extra: List[str],
+               lock_project: Optional[Path]) -> CachedEnv:
+        path = self.root / key
+        # Недостроенное окружение (нет маркера) создаётся заново
+        shutil.rmtree(path, ignore_errors=True)
+        started = time.perf_counter()
+        venv.EnvBuilder(with_pip=False, symlinks=os.name != 'nt').create(path)
+        env = CachedEnv(key, path, sorted(requirements + extra), created=time.time())
+        try:
+            if lock_project is not None and shutil.which('uv'):
+                lock_file = self._export_lock(lock_project, path)
+                self._install(env, ['-r', str(lock_file), *_install_args(extra)])
+            elif requirements or extra:
+                self._install(env, _install_args(requirements + extra))
+        except EnvBuildError:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+        env.build_time = time.perf_counter() - started
+        env.last_used = time.time()
+        env.size = _tree_size(path)
+        self._write_marker(env)
+        return env
+
+    def _install(self, env: CachedEnv, args: List[str]):
+        if shutil.which('uv'):
+            command = ['uv', 'pip', 'install', '--python', str(env.python)]
+        else:
+            command = [sys.executable, '-m', 'pip', '--python', str(env.python), 'install',
+                       '--disable-pip-version-check', '--quiet']
+        if self.wheelhouse:
+            command += ['--no-index', '--find-links', str(self.wheelhouse)]
+        completed = subprocess.run(command + args, capture_output=True, text=True,
+                                   timeout=INSTALL_TIMEOUT)
+        if completed.returncode != 0:
+            details = (completed.stderr or completed.stdout).strip().splitlines()[-5:]
+            raise EnvBuildError(f"Не удалось установить {' '.join(args)}: " + ' / '.join(details))
+
+    @staticmethod
+    def _export_lock(project: Path, env_path: Path) -> Path:
+        """Закреплённые версии из uv.lock в виде requirements-файла"""
+        completed = subprocess.run(['uv', 'export', '--frozen', '--no-hashes', '--no-emit-project'],
+                                   cwd=project, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise EnvBuildError(f"uv export: {completed.stderr.strip()}")
+        requirements = env_path / 'requirements.lock.txt'
+        requirements.write_text(completed.stdout, encoding='utf-8')
+        return requirements
+
+
+def _install_args(requirements: Sequence[str]) -> List[str]:
+    """'-e /path' -> ['-e', '/path'] для командной строки установщика"""
+    args = []
+    for requirement in requirements:
+        match = EDITABLE_RE.match(requirement.strip())
+        args.extend(['-e', match.group(2).strip()] if match else [requirement])
+    return args
+
+
+def _tree_size(path: Path) -> int:
+    total = 0
+    for dirpath, _dirnames, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-venv',
+        description='Кэш виртуальных окружений проектов по набору зависимостей')
+    parser.add_argument('--cache-dir', type=Path, default=None,
+                        help='каталог кэша (по умолчанию codev/.cache/venvs)')
+    parser.add_argument('--budget', default=None, help='лимит кэша на диске, например 2G')
+    parser.add_argument('--wheelhouse', type=Path, default=None,
+                        help='установка без сети из каталога wheel-файлов')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    ensure_cmd = sub.add_parser('ensure', help='создать или найти окружение и вывести его путь')
+    ensure_cmd.add_argument('project', type=Path)
+    ensure_cmd.add_argument('--with', dest='extra', action='append', default=[],
+                            help='дополнительная зависимость (например pytest)')
+
+    run_cmd = sub.add_parser('run', help='выполнить python окружения проекта')
+    run_cmd.add_argument('project', type=Path)
+    run_cmd.add_argument('--with', dest='extra', action='append', default=[])
+    run_cmd.add_argument('args', nargs=argparse.REMAINDER, help='аргументы python')
+
+    sub.add_parser('list', help='показать окружения в кэше')
+    sub.add_parser('prune', help='удалить окружения сверх лимита')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    root = args.cache_dir or cache_dir(Path(os.getcwd()) / 'codev') / 'venvs'
+    cache = VenvCache.from_env(root)
+    if args.budget:
+        cache.budget = parse_size(args.budget)
+    if args.wheelhouse:
+        cache.wheelhouse = args.wheelhouse
+
+    if args.command in ('ensure', 'run'):
+        try:
+            if args.command == 'ensure':
+                env = cache.ensure(args.project, extra=args.extra)
+                state = 'reused' if env.reused else f'built in {env.build_time:.2f}s'
+                print(f"{env.path} ({state})")
+                return 0
+            python_args = args.args[1:] if args.args[:1] == ['--'] else args.args
+            with cache.use(args.project, extra=args.extra) as env:
+                return subprocess.run([str(env.python), *python_args],
+                                      cwd=args.project).returncode
+        except EnvBuildError as e:
+            print(e, file=sys.stderr)
+            return 1
+
+    if args.command == 'prune':
+        for key in cache.evict():
+            print(f"removed {key}")
+    entries = cache.entries()
+    for env in reversed(entries):
+        used = time.strftime('%Y-%m-%d %H:%M', time.localtime(env.last_used))
+        print(f"{env.key}  {format_size(env.size):>7}  used {used}  "
+              f"{', '.join(env.requirements) or '-'}")
+    print(f"environments={len(entries)} size={format_size(sum(e.size for e in entries))} "
+          f"budget={format_size(cache.budget)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+"""
+Прогретый in-process запуск behave
+
+WarmRunner один раз загружает environment.py и step-модули и затем
+выполняет произвольное число прогонов в том же процессе. Перед каждым
+прогоном перечитываются только изменившиеся step-модули, environment.py
+и модули features.support; разобранные .feature файлы кэшируются в памяти
+по mtime и на диске по хэшу содержимого, шаги ищутся через StepIndex.
+
+Модуль опирается на внутренний API Runner и make_formatters behave, поэтому
+версия behave закреплена в pyproject.toml (1.3.x).
+"""
+import contextlib
+import importlib
+import os
+import pickle
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from behave.configuration import Configuration
+from behave.formatter._registry import make_formatters
+from behave.formatter.base import StreamOpener
+from behave.runner import Context, Runner
+from behave.runner_util import (
+    FeatureScenarioLocationCollector2,
+    exec_file,
+    load_step_modules,
+)
+from behave.step_registry import registry, setup_step_decorators
+
+from features.support.example_sources import attach_sources
+from features.support.feature_cache import FeatureCache, default_cache_dir
+from features.support.step_index import IndexedStepRegistry
+
+FEATURES_DIR = Path(__file__).resolve().parent.parent
+SUPPORT_PACKAGE = 'features.support'
+
+
+class _PreloadedRunner(Runner):
+    """Runner, использующий уже загруженные хуки, шаги и разобранные features"""
+
+    def __init__(self, config, warm):
+        super().__init__(config)
+        self.warm = warm
+        self.step_registry = warm.step_registry
+
+    def load_hooks(self, filename=None):
+        self.hooks = dict(self.warm.hooks)
+        if 'before_all' not in self.hooks:
+            self.hooks['before_all'] = self.before_all_default_hook
+
+    def load_step_definitions(self, extra_step_paths=None):
+        # Шаги уже зарегистрированы в глобальном registry прогретым процессом
+        pass
+
+    def run_with_paths(self):
+        self.context = Context(self)
+        self.load_hooks()
+        locations = [loc for loc in self.feature_locations()
+                     if not self.config.exclude(loc)]
+        self.features.extend(self.warm.parse_features(locations, self.config.lang))
+        self.formatters = make_formatters(self.config, self.config.outputs)
+        return self.run_model()
+
+
+class WarmRunner:
+    """Держит behave, хуки и step-модули загруженными между прогонами"""
+
+    def __init__(self, features_dir: Path = FEATURES_DIR):
+        self.features_dir = Path(features_dir).resolve()
+        self.steps_dir = self.features_dir / 'steps'
+        self.environment_file = self.features_dir / 'environment.py'
+        self.hooks: Dict[str, object] = {}
+        self.step_mtimes: Dict[Path, int] = {}
+        self.environment_mtime: Optional[int] = None
+        self.support_mtimes: Dict[str, int] = {}
+        self.feature_cache: Dict[str, tuple] = {}
+        self.disk_cache = FeatureCache(default_cache_dir(self.features_dir))
+        self.step_registry = IndexedStepRegistry(registry)
+        self.load()
+
+    # ------------------------------------------------------------------
+    # Загрузка и перезагрузка
+    # ------------------------------------------------------------------
+
+    def load(self):
+        """Полная загрузка хуков и всех step-модулей"""
+        registry.clear()
+        self._load_hooks()
+        load_step_modules([str(self.steps_dir)])
+        self.step_mtimes = {p: p.stat().st_mtime_ns for p in self._step_files()}
+        self.support_mtimes = self._support_mtimes()
+
+    def _load_hooks(self):
+        self.hooks = {}
+        if self.environment_file.exists():
+            exec_file(str(self.environment_file), self.hooks)
+            self.environment_mtime = self.environment_file.stat().st_mtime_ns
+
+    def _step_files(self) -> List[Path]:
+        return sorted(self.steps_dir.glob('*.py'))
+
+    def _support_mtimes(self) -> Dict[str, int]:
+        mtimes = {}
+        for name, module in list(sys.modules.items()):
+            if name.startswith(SUPPORT_PACKAGE + '.') and getattr(module, '__file__', None):
+                with contextlib.suppress(OSError):
+                    mtimes[name] = os.stat(module.__file__).st_mtime_ns
+        return mtimes
+
+    def _forget_steps(self, path: Path):
+        """Удалить из registry шаги, определённые в указанном файле"""
+        target = str(path.resolve())
+        for step_type, matchers in registry.steps.items():
+            registry.steps[step_type] = [
+                m for m in matchers
+                if str(Path(m.location.filename).resolve()) != target
+            ]
+
+    def refresh(self) -> List[str]:
+        """Перечитать изменившиеся модули; вернуть их имена"""
+        reloaded = []
+
+        # Модули features.support импортируются шагами лениво, их достаточно перезагрузить
+        for name, mtime in self._support_mtimes().items():
+            if self.support_mtimes.get(name, mtime) != mtime:
+                importlib.reload(sys.modules[name])
+                reloaded.append(name)
+
+        if self.environment_file.exists() and \
+                self.environment_file.stat().st_mtime_ns != self.environment_mtime:
+            self._load_hooks()
+            reloaded.append(self.environment_file.name)
+
+        current = {p: p.stat().st_mtime_ns for p in self._step_files()}
+        for path in set(self.step_mtimes) - set(current):
+            self._forget_steps(path)
+            reloaded.append(path.name)
+        for path, mtime in current.items():
+            if self.step_mtimes.get(path) == mtime:
+                continue
+            self._forget_steps(path)
+            step_globals = {}
+            setup_step_decorators(step_globals)
+            exec_file(str(path), step_globals)
+            reloaded.append(path.name)
+
+        self.step_mtimes = current
+        self.support_mtimes = self._support_mtimes()
+        return reloaded
+
+    # ------------------------------------------------------------------
+    # Разбор и запуск
+    # ------------------------------------------------------------------
+
+    def load_feature(self, filename: str, language=None):
+        """Свежая копия AST файла; разбор выполняется только после изменения mtime"""
+        mtime = os.stat(filename).st_mtime_ns
+        cached = self.feature_cache.get(filename)
+        if cached is None or cached[0] != mtime:
+            feature = self.disk_cache.load(filename, language)
+            cached = (mtime, pickle.dumps(feature, protocol=pickle.HIGHEST_PROTOCOL))
+            self.feature_cache[filename] = cached
+        # Модель behave хранит статусы прогона, поэтому каждый прогон получает копию
+        feature = pickle.loads(cached[1])
+        if feature is not None:
+            attach_sources(feature)
+        return feature
+
+    def parse_features(self, locations, language=None) -> list:
+        """Аналог behave.runner_util.parse_features поверх кэша AST"""
+        collector = FeatureScenarioLocationCollector2()
+        features = []
+        for location in locations:
+            if location.filename == collector.filename:
+                collector.add_location(location)
+                continue
+            if collector.feature:
+                features.append(collector.build_feature())
+                collector.clear()
+            feature = self.load_feature(os.path.abspath(location.filename), language)
+            if feature:
+                collector.feature = feature
+                collector.add_location(location)
+        if collector.feature:
+            features.append(collector.build_feature())
+        return features
+
+    def make_config(self, args: List[str], stream=None,
+                    formats: Optional[List[str]] = None) -> Configuration:
+        """Конфигурация behave для одного прогона с выводом в stream"""
+        stream = stream or sys.stdout
+        # Репортёры создаются в Configuration: junit из pyproject.toml отключается
+        # аргументом, а итоговая сводка привязывается к stdout на момент создания
+        with contextlib.redirect_stdout(stream):
+            config = Configuration(['--no-junit'] + (list(args) or [str(self.features_dir)]))
+        if not config.paths:
+            config.paths = [str(self.features_dir)]
+        config.format = formats or ['progress']
+        config.outputs = [StreamOpener(stream=stream) for _ in config.format]
+        return config
+
+    def run(self, args: List[str], stream=None, formats: Optional[List[str]] = None,
+            config: Optional[Configuration] = None) -> dict:
+        """Выполнить прогон в текущем процессе и вернуть сводку"""
+        started = time.perf_counter()
+        reloaded = self.refresh()
+        config = config or self.make_config(args, stream, formats)
+        cwd = os.getcwd()
+        environ = dict(os.environ)
+        try:
+            with contextlib.redirect_stdout(stream or sys.stdout):
+                failed = _PreloadedRunner(config, self).run()
+        finally:
+            # Шаги меняют cwd и окружение - вернуть их для следующего прогона
+            os.chdir(cwd)
+            os.environ.clear()
+            os.environ.update(environ)
+        return {
+            'status': 'failed' if failed else 'passed',
+            'exit_code': 1 if failed else 0,
+            'reloaded': reloaded,
+            'elapsed': time.perf_counter() - started,
+        }
+
@@ -0,0 +1,306 @@
+"""
+Непрерывный режим тестов: inotify-наблюдение и перезапуск затронутых сценариев
+
+Следит за features/, codev-skeleton/ и codev/protocols/ (на Linux через
+inotify, на остальных системах опросом mtime), собирает пачки изменений с
+debounce и перезапускает в прогретом процессе только затронутые сценарии:
+- изменён .feature файл - сценарии этого файла;
+- изменён step-модуль - сценарии, шаги которых определены в этом модуле;
+- изменены данные в codev-skeleton/ или codev/protocols/ - сценарии, шаги
+  которых определены в модулях, ссылающихся на эти каталоги;
+- изменены environment.py или features/support - полный прогон.
+Перед перезапуском печатается строка "▶ changed: ... → N location(s)" и
+затем по строке на каждую локацию (абсолютный путь file[:line]).
+
+Использование:
+    python -m features.support.watch_mode
+    python -m features.support.watch_mode --tags="not @requires-zen-mcp"
+"""
+import argparse
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# Каталоги данных и строки, по которым step-модуль считается зависимым от них
+DATA_ROOTS = {
+    'codev-skeleton': ('codev-skeleton',),
+    'codev/protocols': ('codev/protocols', "'protocols'", '"protocols"'),
+}
+WATCHED_SUFFIXES = ('.feature', '.py', '.md')
+
+DEBOUNCE_SECONDS = 0.15
+MAX_BATCH_SECONDS = 1.0
+
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_ISDIR = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _relevant(path: Path) -> bool:
+    return path.suffix in WATCHED_SUFFIXES and '__pycache__' not in path.parts \
+        and not path.name.startswith('.')
+
+
+class InotifyWatcher:
+    """Рекурсивное наблюдение за каталогами через inotify (ctypes, только Linux)"""
+
+    def __init__(self, roots: Iterable[Path]):
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.watches: Dict[int, Path] = {}
+        for root in roots:
+            self._watch_tree(Path(root))
+
+    def _watch_tree(self, root: Path):
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [d for d in dirnames if d != '__pycache__' and not d.startswith('.')]
+            wd = self._add_watch(self.fd, os.fsencode(dirpath), WATCH_MASK)
+            if wd >= 0:
+                self.watches[wd] = Path(dirpath)
+
+    def read(self, timeout: float) -> Optional[Set[Path]]:
+        """Изменённые пути за timeout; None при переполнении очереди событий"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changed = set()
+        data = os.read(self.fd, 1 << 16)
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                return None
+            directory = self.watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / os.fsdecode(name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self._watch_tree(path)
+                continue
+            if _relevant(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Запасной вариант без inotify: сравнение mtime всех файлов"""
+
+    def __init__(self, roots: Iterable[Path], interval: float = 0.3):
+        self.roots = [Path(r) for r in roots]
+        self.interval = interval
+        self.snapshot = self._scan()
+
+    def _scan(self) -> Dict[Path, int]:
+        result = {}
+        for root in self.roots:
+            for path in root.rglob('*'):
+                if _relevant(path):
+                    try:
+                        result[path] = path.stat().st_mtime_ns
+                    except OSError:
+                        pass
+        return result
+
+    def read(self, timeout: float) -> Set[Path]:
+        time.sleep(min(timeout, self.interval))
+        current = self._scan()
+        changed = {p for p in set(current) | set(self.snapshot)
+                   if current.get(p) != self.snapshot.get(p)}
+        self.snapshot = current
+        return changed
+
+    def close(self):
+        pass
+
+
+def make_watcher(roots: List[Path]):
+    """inotify на Linux, опрос mtime в остальных случаях"""
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(roots)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(roots)
+
+
+def collect_batch(watcher, first_timeout: float = 1.0) -> Optional[Set[Path]]:
+    """Дождаться изменений и собрать пачку, пока правки не утихнут"""
+    changed = watcher.read(first_timeout)
+    if not changed:
+        return changed
+    started = time.monotonic()
+    while time.monotonic() - started < MAX_BATCH_SECONDS:
+        more = watcher.read(DEBOUNCE_SECONDS)
+        if more is None:
+            return None
+        if not more:
+            break
+        changed |= more
+    return changed
+
+
+class ImpactIndex:
+    """Какие сценарии зависят от каких step-модулей и каталогов данных"""
+
+    def __init__(self, warm, root: Path):
+        self.warm = warm
+        self.root = Path(root)
+
+    def scenarios_by_module(self) -> Dict[Path, Set[str]]:
+        """step-модуль -> локации сценариев (file:line), использующих его шаги"""
+        from behave.model_core import FileLocation
+        from behave.step_registry import registry
+
+        usage: Dict[Path, Set[str]] = {}
+        locations = [FileLocation(str(p)) for p in sorted(self.warm.features_dir.rglob('*.feature'))]
+        for feature in self.warm.parse_features(locations):
+            for scenario in feature.walk_scenarios():
+                location = f"{feature.filename}:{scenario.line}"
+                for step in scenario.all_steps:
+                    match = registry.find_match(step)
+                    if match is None:
+                        continue
+                    module = Path(os.path.abspath(match.location.filename))
+                    usage.setdefault(module, set()).add(location)
+        return usage
+
+    def modules_for_data_root(self, data_root: str) -> Set[Path]:
+        markers = DATA_ROOTS[data_root]
+        modules = set()
+        for path in self.warm.steps_dir.glob('*.py'):
+            source = path.read_text(encoding='utf-8')
+            if any(marker in source for marker in markers):
+                modules.add(path.resolve())
+        return modules
+
+    def affected(self, changed: Set[Path]) -> Optional[List[str]]:
+        """Локации для перезапуска; None - нужен полный прогон"""
+        steps_dir = self.warm.steps_dir.resolve()
+        features_dir = self.warm.features_dir.resolve()
+        usage = None
+        selected: Set[str] = set()
+
+        for path in changed:
+            path = path.resolve()
+            if path.suffix == '.feature':
+                if path.exists():
+                    selected.add(str(path))
+                continue
+            if path.parent == steps_dir:
+                modules = {path}
+            elif path.suffix == '.py' and features_dir in path.parents:
+                # environment.py и features/support влияют на все сценарии
+                return None
+            else:
+                modules = set()
+                for data_root in DATA_ROOTS:
+                    if (self.root / data_root).resolve() in path.parents:
+                        modules |= self.modules_for_data_root(data_root)
+            if modules:
+                if usage is None:
+                    self.warm.refresh()
+                    usage = self.scenarios_by_module()
+                for module in modules:
+                    selected |= usage.get(module, set())
+
+        # Файл целиком поглощает отдельные сценарии из него
+        whole_files = {s for s in selected if ':' not in Path(s).name}
+        return sorted(s for s in selected
+                      if s in whole_files or s.rsplit(':', 1)[0] not in whole_files)
+
+
+def watch(root: Path, features_dir: Optional[Path], behave_args: List[str],
+          formats: Optional[List[str]] = None, initial: bool = True,
+          max_runs: Optional[int] = None, out=None) -> int:
+    """Главный цикл: ждать изменений и перезапускать затронутые сценарии"""
+    from features.support.warm_runner import FEATURES_DIR, WarmRunner
+
+    out = out or sys.stdout
+    warm = WarmRunner(features_dir or FEATURES_DIR)
+    impact = ImpactIndex(warm, root)
+    roots = [warm.features_dir] + [root / d for d in DATA_ROOTS if (root / d).is_dir()]
+    watcher = make_watcher(roots)
+    print(f"watching ({type(watcher).__name__}): "
+          + ', '.join(str(r) for r in roots), file=out, flush=True)
+
+    runs, last_status = 0, 0
+    try:
+        if initial:
+            last_status = warm.run([str(warm.features_dir)] + behave_args,
+                                   stream=out, formats=formats)['exit_code']
+        while max_runs is None or runs < max_runs:
+            changed = collect_batch(watcher)
+            if changed is not None and not changed:
+                continue
+            locations = impact.affected(changed) if changed is not None else None
+            if locations is not None and not locations:
+                continue
+
+            names = ', '.join(sorted(p.name for p in changed)) if changed else 'overflow'
+            target = f"{len(locations)} location(s)" if locations is not None else 'full run'
+            print(f"\n▶ changed: {names} → {target}", file=out, flush=True)
+            # Абсолютные пути не зависят от рабочего каталога, в отличие от вывода behave
+            for location in locations or ():
+                print(f"  {os.path.abspath(location)}", file=out, flush=True)
+            args = (locations if locations is not None else [str(warm.features_dir)])
+            result = warm.run(args + behave_args, stream=out, formats=formats)
+            print(f"◀ {result['status']} in {result['elapsed']:.2f}s", file=out, flush=True)
+            last_status = result['exit_code']
+            runs += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    return last_status
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='codev-behave-watch',
+        description='Непрерывный перезапуск затронутых BDD-сценариев при изменении файлов')
+    parser.add_argument('--root', type=Path, default=PROJECT_ROOT,
+                        help='корень проекта с codev/ и codev-skeleton/')
+    parser.add_argument('--features-dir', type=Path, default=None)
+    parser.add_argument('--format', action='append', help='форматтер behave (можно повторять)')
+    parser.add_argument('--no-initial', action='store_true', help='не делать полный прогон при старте')
+    parser.add_argument('--max-runs', type=int, default=None,
+                        help='завершиться после N перезапусков (для скриптов)')
+    parser.add_argument('behave_args', nargs=argparse.REMAINDER,
+                        help='дополнительные аргументы behave, например --tags')
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    behave_args = [a for a in args.behave_args if a != '--']
+    return watch(args.root, args.features_dir, behave_args, args.format,
+                 initial=not args.no_initial, max_runs=args.max_runs)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# language: ru
+Функционал: Инструменты запуска BDD-тестов
+  Как разработчик Codev
+  Я хочу быстро перезапускать сценарии во время разработки
+  Чтобы не платить за старт интерпретатора и разбор всех файлов при каждом прогоне
+
+  Предыстория:
+    Дано создан временный набор BDD-тестов
+
+  Сценарий: Повторный прогон через прогретый демон
+    Дано запущен демон behave для временного набора
+    Когда я запускаю сценарий через демон
+    Тогда прогон через демон успешен
+    И итоговая сводка прогона получена клиентом демона
+    Когда я изменяю step-модуль "sample_steps.py" временного набора
+    И я запускаю сценарий через демон
+    Тогда прогон через демон успешен
+    И демон перезагрузил только "sample_steps.py"
+
+  Сценарий: Непрерывный режим перезапускает только затронутые сценарии
+    Дано запущен непрерывный режим для временного набора
+    Когда я изменяю step-модуль "other_steps.py" временного набора
+    Тогда непрерывный режим перезапустил только "other.feature"
+
+  Сценарий: Разобранные .feature файлы берутся из дискового кэша
+    Когда я дважды разбираю .feature файлы временного набора через дисковый кэш
+    Тогда первый разбор прочитал 2 файла, а второй взял их из кэша
+    И модели из кэша совпадают с результатом разбора
+
+  Сценарий: Индекс шагов находит неоднозначные шаблоны
+    Дано во временный набор добавлен step-модуль "zz_steps.py" с шаблоном "удвоенное число равно {value}"
+    Когда я строю индекс шагов временного набора
+    Тогда индекс предупреждает о неоднозначности шаблона "удвоенное число равно {m:d}"
+    И индекс находит для каждого шага то же определение, что и behave
+
+  Сценарий: Прогон пишет поток событий NDJSON
+    Дано во временный набор добавлен падающий сценарий
+    Когда я запускаю behave для временного набора с потоком событий
+    Тогда в потоке событий есть начало и конец каждого сценария и шага
+    И шаг после падения отмечен в потоке событий как пропущенный
+    И просмотр потока событий показывает 2 успешных и 1 упавший сценарий
+
+  Сценарий: Планировщик балансирует шарды по истории длительностей
+    Дано во временный набор добавлен feature "timed.feature" со сценариями:
+      | сценарий  |
+      | Долгий    |
+      | Средний 1 |
+      | Средний 2 |
+      | Короткий  |
+      | Упавший   |
+      | Плавающий |
+    И история длительностей временного набора:
+      | сценарий  | длительности  | статусы              |
+      | Долгий    | 4.0 4.1 3.9   | passed passed passed |
+      | Средний 1 | 3.0           | passed               |
+      | Средний 2 | 3.0           | passed               |
+      | Короткий  | 2.0           | passed               |
+      | Упавший   | 1.0           | failed               |
+      | Плавающий | 0.2 2.0 0.2   | passed passed passed |
+    Когда я планирую прогон временного набора на 2 воркера
+    Тогда оценки нагрузки шардов отличаются не более чем на 1.0 с
+    И сценарий "Упавший" стоит первым в своём шарде
+    И сценарий "Плавающий" помечен как возможно нестабильный
+
+  Сценарий: Шардированный прогон пополняет историю длительностей
+    Когда я запускаю временный набор на 2 воркерах
+    Тогда шардированный прогон успешен
+    И в истории длительностей есть все 2 сценария временного набора
+
+  Сценарий: Внешние примеры Outline читаются потоково и делятся между шардами
+    Дано во временный набор добавлен Outline с внешними примерами на 40 строк
+    И в строке 18 файла примеров неверный результат
+    Когда я запускаю Outline с внешними примерами
+    Тогда упал только сценарий строки "doubling.csv:18"
+    И планировщик отправляет Outline с внешними примерами во все 3 шарда
+    И шарды 3 воркеров вместе выполняют каждую строку примеров ровно один раз
+
+  Сценарий: Outline с внешними примерами без репортёров не хранит пройденные строки
+    Дано во временный набор добавлен Outline с внешними примерами на 40 строк
+    И в строке 18 файла примеров неверный результат
+    Когда я запускаю Outline с внешними примерами без репортёров
+    Тогда в Outline осталось сценариев: 1, статус "failed"
+
+  Сценарий: Пройденный Outline без репортёров сохраняет статус по счётчикам строк
+    Дано во временный набор добавлен Outline с внешними примерами на 40 строк
+    Когда я запускаю Outline с внешними примерами без репортёров
+    Тогда в Outline осталось сценариев: 0, статус "passed"
@@ -8,13 +8,13 @@
     Дано установлен Zen MCP server
     И настроен файл .env с API-ключами
 
-  @requires-zen-mcp
+  @requires-zen-mcp @mcp-commands
   Сценарий: Проверка доступности Zen MCP
     Когда я выполняю команду "mcp list"
     Тогда Zen MCP отображается в списке серверов
     И статус Zen MCP "running"
 
-  @requires-zen-mcp
+  @requires-zen-mcp @mcp-commands
   Сценарий: Проверка версии Zen MCP
     Когда я запрашиваю версию Zen MCP
     Тогда возвращается корректная версия сервера
@@ -47,12 +47,132 @@
     Тогда возвращается сообщение об ошибке
     И указано "требуется API-ключ"
 
+  Сценарий: Объединение похожих замечаний нескольких моделей
+    Дано ответ модели "gemini-2.5-pro":
+      """
+      ## Безопасность
+      - Добавить ограничение частоты запросов к API входа
+      - Хранить пароли с использованием bcrypt
+      - Описать формат ошибок в спецификации
+      """
+    И ответ модели "gpt-5":
+      """
+      - Ограничить частоту запросов к API входа
+      - Пароли хранить с bcrypt
+      """
+    И ответ модели "grok-4":
+      """
+      - Добавить ограничение частоты запросов к API входа в систему
+      - Предусмотреть миграцию схемы базы данных
+      """
+    Когда я объединяю похожие замечания моделей
+    Тогда найдено 2 общих замечания и 2 уникальных
+    И замечание "Пароли хранить с bcrypt" поддержано моделями "gemini-2.5-pro", "gpt-5"
+    И оценка пересечения ответов больше 0.5
+
+  Сценарий: Журнал консультаций по спецификациям и фазам
+    Дано журнал консультаций с сегментами по 16 КБ
+    Когда в журнал записано 600 консультаций по 50 спецификациям
+    Тогда журнал разбит на сжатые сегменты
+    И по спецификации "0007" фазы "plan" найдены все её консультации
+
+  Сценарий: Компактизация журнала консультаций
+    Дано журнал консультаций с сегментами по 16 КБ
+    Когда в журнал записано 300 консультаций по 50 спецификациям
+    И те же ответы моделей записаны для спецификации "0051" из "0003"
+    И в журнал повторно записаны консультации спецификации "0003"
+    И в каталоге журнала остались временные файлы прерванной компактизации
+    И я выполняю компактизацию журнала
+    Тогда компактизация удалила повторы, а консультации спецификации "0003" сохранены
+    И консультации спецификации "0051" с теми же ответами сохранены
+    И временные файлы прерванной компактизации удалены
+
   Сценарий: Симлинк .env между проектом и Zen MCP
     Дано Zen MCP установлен через install-zen-mcp.sh
     Тогда ~/.zen-mcp-server/.env является симлинком
-    И симлинк указывает на /srv/anygen/.env
+    И симлинк указывает на .env проекта
     И изменения в .env проекта отражаются в Zen MCP
 
+  Сценарий: Конфигурация разбирает .env, окружение процесса и userdata
+    Дано проект с файлом .env:
+      """
+      # Ключи Zen MCP
+      GEMINI_API_KEY=
+      export OPENAI_API_KEY="sk-test"  # основной ключ
+      XAI_API_KEY=your_xai_api_key_here
+      ZEN_MCP_DIR=${HOME}/.zen-mcp-server
+      """
+    И в pyproject.toml проекта userdata "lang" = "ru"
+    Когда я читаю конфигурацию проекта
+    Тогда API-ключ "GEMINI_API_KEY" не настроен
+    И API-ключ "XAI_API_KEY" не настроен
+    И API-ключ "OPENAI_API_KEY" равен "sk-test"
+    И переменная "ZEN_MCP_DIR" конфигурации равна "$HOME/.zen-mcp-server"
+    И userdata конфигурации содержит "lang" = "ru"
+
+  Сценарий: Окружение процесса важнее .env
+    Дано проект с файлом .env:
+      """
+      GEMINI_API_KEY=from-dotenv
+      """
+    И в окружении процесса задано "GEMINI_API_KEY=from-process"
+    Когда я читаю конфигурацию проекта
+    Тогда API-ключ "GEMINI_API_KEY" равен "from-process"
+
+  Сценарий: Снимок конфигурации перечитывается только после изменения файлов
+    Дано проект с файлом .env:
+      """
+      GEMINI_API_KEY=first
+      """
+    И Zen MCP установлен со ссылкой на .env проекта
+    Когда я читаю конфигурацию проекта 3 раза
+    Тогда число чтений источников конфигурации: 1
+    И все чтения вернули один неизменяемый снимок
+    И ссылка .env Zen MCP указывает на .env проекта
+    Когда я меняю в .env проекта "GEMINI_API_KEY=second"
+    И я читаю конфигурацию проекта
+    Тогда число чтений источников конфигурации: 2
+    И API-ключ "GEMINI_API_KEY" равен "second"
+
+  Сценарий: Офлайн-установка Zen MCP из переносимого бандла
+    Дано локальный репозиторий Zen MCP с зависимостью "zendemo"
+    Когда я собираю офлайн-бандл Zen MCP
+    И я устанавливаю Zen MCP из бандла без доступа к сети
+    Тогда Zen MCP установлен из бандла
+    И зависимость Zen MCP установлена в его окружение
+    И .env установки Zen MCP является симлинком на .env проекта
+
+  Сценарий: Повреждённый офлайн-бандл не устанавливается
+    Дано локальный репозиторий Zen MCP с зависимостью "zendemo"
+    Когда я собираю офлайн-бандл Zen MCP
+    И в бандле подменён файл зависимости
+    И я устанавливаю Zen MCP из бандла без доступа к сети
+    Тогда установка из бандла прервана с ошибкой контрольных сумм
+
+  Сценарий: Обновление установленного Zen MCP из нового бандла
+    Дано локальный репозиторий Zen MCP с зависимостью "zendemo"
+    Когда я собираю офлайн-бандл Zen MCP
+    И я собираю обновлённый офлайн-бандл Zen MCP с зависимостью "zendemo" версии "2.0"
+    И я устанавливаю Zen MCP из бандла без доступа к сети
+    И я обновляю установленный Zen MCP из обновлённого бандла без доступа к сети
+    Тогда Zen MCP обновлён из бандла до новой версии "zendemo" 2.0
+
+  Сценарий: Бандл другой платформы не устанавливается
+    Дано локальный репозиторий Zen MCP с зависимостью "zendemo"
+    Когда я собираю офлайн-бандл Zen MCP
+    И в манифесте бандла указана платформа "other-platform"
+    И я устанавливаю Zen MCP из бандла без доступа к сети
+    Тогда установка из бандла прервана с ошибкой "Бандл собран для платформы other-platform"
+
+  Структура сценария: Опция установщика без файла бандла
+    Когда я запускаю установщик Zen MCP с опцией "<опция>" без файла
+    Тогда установщик Zen MCP завершился с ошибкой использования "Опция <опция> требует путь к файлу бандла"
+
+    Примеры:
+      | опция     |
+      | --bundle  |
+      | --offline |
+
   Сценарий: Fallback на SPIDER-SOLO при недоступности Zen MCP
     Дано Zen MCP server недоступен для консультации
     Когда я начинаю новую фазу SPIDER
@@ -5,6 +5,10 @@ set -euo pipefail
 # Zen MCP Server Installation Script для AnyGen
 #
 # Устанавливает Zen MCP server для мультиагентной консультации в Codev
+#
+# Офлайн-режим: --bundle собирает переносимый бандл (git bundle репозитория,
+# wheelhouse зависимостей, requirements.lock с хешами и SHA256SUMS),
+# --offline устанавливает из него без доступа к GitHub и PyPI
 # ============================================================================
 
 # Цвета для вывода
@@ -15,9 +19,13 @@ readonly BLUE='\033[0;34m'
 readonly NC='\033[0m' # No Color
 
 # Конфигурация
-readonly ZEN_INSTALL_DIR="${HOME}/.zen-mcp-server"
-readonly ZEN_REPO="https://github.com/BeehiveInnovations/zen-mcp-server.git"
+readonly ZEN_INSTALL_DIR="${ZEN_INSTALL_DIR:-${HOME}/.zen-mcp-server}"
+readonly ZEN_REPO="${ZEN_REPO:-https://github.com/BeehiveInnovations/zen-mcp-server.git}"
 readonly REQUIRED_PYTHON_VERSION="3.10"
+readonly BUNDLE_NAME="zen-mcp-bundle"
+
+# Отвечать "да" на все вопросы (для CI)
+ASSUME_YES=false
 
 # ----------------------------------------------------------------------------
 # Утилиты вывода
@@ -47,6 +55,25 @@ print_header() {
     echo ""
 }
 
+# Ключ задан в .env непустым значением (пустое KEY= и заглушки your_..._here не в счёт)
+env_has_key() {
+    local value
+    value=$(grep -E "^[[:space:]]*(export[[:space:]]+)?$1[[:space:]]*=" "$2" 2>/dev/null | tail -n 1 \
+        | sed -E "s/^[^=]*=[[:space:]]*//; s/[[:space:]]+#.*$//; s/^[\"']//; s/[\"']$//")
+    [[ -n "$value" && ! "$value" =~ ^your_[A-Za-z0-9_]*_here$ ]]
+}
+
+# Вопрос y/n; с --yes всегда "да"
+confirm() {
+    if [[ "$ASSUME_YES" == "true" ]]; then
+        REPLY=y
+        return 0
+    fi
+    read -p "$1 (y/n) " -n 1 -r
+    echo
+    [[ $REPLY =~ ^[Yy]$ ]]
+}
+
 # ----------------------------------------------------------------------------
 # Проверка предварительных условий
 # ----------------------------------------------------------------------------
@@ -65,7 +92,8 @@ check_python() {
     local python_version
     python_version=$(python3 --version | cut -d' ' -f2 | cut -d'.' -f1,2)
 
-    if (( $(echo "$python_version < $REQUIRED_PYTHON_VERSION" | bc -l) )); then
+    # Сравнение через сам python: bc есть не на всех раннерах
+    if ! python3 -c "import sys; sys.exit(sys.version_info < tuple(map(int, '$REQUIRED_PYTHON_VERSION'.split('.'))))"; then
         print_error "Python версия $python_version < $REQUIRED_PYTHON_VERSION"
         exit 1
     fi
@@ -95,9 +123,7 @@ install_zen_mcp() {
     # Удалить старую версию если есть
     if [[ -d "$ZEN_INSTALL_DIR" ]]; then
         print_warning "Найдена существующая установка в $ZEN_INSTALL_DIR"
-        read -p "Удалить и переустановить? (y/n) " -n 1 -r
-        echo
-        if [[ $REPLY =~ ^[Yy]$ ]]; then
+        if confirm "Удалить и переустановить?"; then
             rm -rf "$ZEN_INSTALL_DIR"
             print_success "Старая версия удалена"
         else
@@ -128,6 +154,151 @@ install_zen_mcp() {
     print_success "Зависимости установлены"
 }
 
+# ----------------------------------------------------------------------------
+# Офлайн-бандл
+# ----------------------------------------------------------------------------
+
+create_bundle() {
+    local output="$1"
+    print_header "Сборка офлайн-бандла Zen MCP"
+
+    local workdir
+    workdir=$(mktemp -d)
+    trap "rm -rf '$workdir'" EXIT
+    local bundle_dir="$workdir/$BUNDLE_NAME"
+    mkdir -p "$bundle_dir/wheelhouse"
+
+    print_info "Клонирование репозитория..."
+    git clone --quiet "$ZEN_REPO" "$workdir/src"
+    local commit branch
+    commit=$(git -C "$workdir/src" rev-parse HEAD)
+    branch=$(git -C "$workdir/src" symbolic-ref --short HEAD)
+    git -C "$workdir/src" bundle create "$bundle_dir/zen-mcp-server.bundle" HEAD "$branch" 2>/dev/null
+    print_success "git bundle: $branch @ ${commit:0:12}"
+
+    # Колёса всех зависимостей (включая транзитивные и собранные из sdist)
+    print_info "Сборка wheelhouse зависимостей..."
+    python3 -m pip wheel --quiet --disable-pip-version-check \
+        --wheel-dir "$bundle_dir/wheelhouse" -r "$workdir/src/requirements.txt"
+    print_success "wheelhouse: $(find "$bundle_dir/wheelhouse" -name '*.whl' | wc -l) пакет(ов)"
+
+    # Точные версии с хешами для pip install --require-hashes
+    python3 - "$bundle_dir/wheelhouse" > "$bundle_dir/requirements.lock" << 'PYEOF'
+import hashlib, sys
+from pathlib import Path
+for wheel in sorted(Path(sys.argv[1]).glob('*.whl')):
+    name, version = wheel.name.split('-')[:2]
+    digest = hashlib.sha256(wheel.read_bytes()).hexdigest()
+    print(f"{name}=={version} --hash=sha256:{digest}")
+PYEOF
+
+    cat > "$bundle_dir/MANIFEST" << EOF
+repo=$ZEN_REPO
+branch=$branch
+commit=$commit
+python=$(python3 -c 'import sys; print("%d.%d" % sys.version_info[:2])')
+platform=$(python3 -c 'import sysconfig; print(sysconfig.get_platform())')
+created=$(date -u +%Y-%m-%dT%H:%M:%SZ)
+EOF
+
+    (cd "$bundle_dir" && find . -type f ! -name SHA256SUMS | sort | xargs sha256sum > SHA256SUMS)
+
+    mkdir -p "$(dirname "$output")"
+    tar -czf "$output" -C "$workdir" "$BUNDLE_NAME"
+    print_success "Бандл создан: $output ($(du -h "$output" | cut -f1))"
+    echo "sha256: $(sha256sum "$output" | cut -d' ' -f1)"
+}
+
+manifest_value() {
+    grep "^$2=" "$1/MANIFEST" | cut -d= -f2-
+}
+
+# Только из wheelhouse и только файлы с хешами из requirements.lock
+install_bundle_requirements() {
+    local bundle_dir="$1"
+    if [[ ! -x .zen_venv/bin/pip ]]; then
+        print_info "Создание виртуального окружения..."
+        python3 -m venv .zen_venv
+        print_success "Виртуальное окружение создано"
+    fi
+
+    print_info "Установка зависимостей из wheelhouse..."
+    .zen_venv/bin/pip install --quiet --disable-pip-version-check --no-index \
+        --find-links "$bundle_dir/wheelhouse" --require-hashes -r "$bundle_dir/requirements.lock"
+    print_success "Зависимости установлены"
+}
+
+install_zen_mcp_offline() {
+    local bundle="$1"
+    print_header "Установка Zen MCP Server из бандла"
+
+    if [[ ! -f "$bundle" ]]; then
+        print_error "Бандл не найден: $bundle"
+        exit 1
+    fi
+
+    local workdir
+    workdir=$(mktemp -d)
+    trap "rm -rf '$workdir'" EXIT
+    tar -xzf "$bundle" -C "$workdir"
+    local bundle_dir="$workdir/$BUNDLE_NAME"
+
+    # Проверка целостности до установки чего-либо
+    print_info "Проверка контрольных сумм..."
+    if ! (cd "$bundle_dir" && sha256sum --check --quiet --strict SHA256SUMS); then
+        print_error "Контрольные суммы бандла не совпадают, установка прервана"
+        exit 1
+    fi
+    local unlisted
+    unlisted=$(cd "$bundle_dir" && comm -23 <(find . -type f ! -name SHA256SUMS | sort) \
+        <(cut -d' ' -f3- SHA256SUMS | sort))
+    if [[ -n "$unlisted" ]]; then
+        print_error "В бандле есть файлы вне SHA256SUMS: $unlisted"
+        exit 1
+    fi
+    print_success "Контрольные суммы совпадают"
+
+    local python_version bundle_python
+    python_version=$(python3 -c 'import sys; print("%d.%d" % sys.version_info[:2])')
+    bundle_python=$(manifest_value "$bundle_dir" python)
+    if [[ "$python_version" != "$bundle_python" ]]; then
+        print_error "Бандл собран для Python $bundle_python, найден $python_version"
+        exit 1
+    fi
+
+    local platform bundle_platform
+    platform=$(python3 -c 'import sysconfig; print(sysconfig.get_platform())')
+    bundle_platform=$(manifest_value "$bundle_dir" platform)
+    if [[ "$platform" != "$bundle_platform" ]]; then
+        print_error "Бандл собран для платформы $bundle_platform, текущая $platform"
+        exit 1
+    fi
+
+    if [[ -d "$ZEN_INSTALL_DIR" ]]; then
+        print_warning "Найдена существующая установка в $ZEN_INSTALL_DIR"
+        if confirm "Удалить и переустановить?"; then
+            rm -rf "$ZEN_INSTALL_DIR"
+            print_success "Старая версия удалена"
+        else
+            print_info "Обновление существующей установки из бандла..."
+            git -C "$ZEN_INSTALL_DIR" pull --quiet --ff-only "$bundle_dir/zen-mcp-server.bundle" \
+                "$(manifest_value "$bundle_dir" branch)"
+            print_success "Репозиторий обновлён до $(manifest_value "$bundle_dir" commit | cut -c1-12)"
+            cd "$ZEN_INSTALL_DIR"
+            install_bundle_requirements "$bundle_dir"
+            return 0
+        fi
+    fi
+
+    git clone --quiet "$bundle_dir/zen-mcp-server.bundle" "$ZEN_INSTALL_DIR"
+    # Последующие обновления - из исходного репозитория
+    git -C "$ZEN_INSTALL_DIR" remote set-url origin "$(manifest_value "$bundle_dir" repo)"
+    print_success "Репозиторий развёрнут в $ZEN_INSTALL_DIR @ $(manifest_value "$bundle_dir" commit | cut -c1-12)"
+
+    cd "$ZEN_INSTALL_DIR"
+    install_bundle_requirements "$bundle_dir"
+}
+
 # ----------------------------------------------------------------------------
 # Настройка переменных окружения
 # ----------------------------------------------------------------------------
@@ -136,7 +307,7 @@ configure_env() {
     print_header "Настройка переменных окружения"
 
     local zen_env="$ZEN_INSTALL_DIR/.env"
-    local project_env="${PROJECT_ROOT:-.}/.env"
+    local project_env="${PROJECT_ROOT}/.env"
 
     # Создать симлинк на .env проекта
     if [[ -f "$project_env" ]]; then
@@ -156,20 +327,13 @@ configure_env() {
         print_info "Проверка наличия API-ключей в $project_env..."
 
         local has_keys=false
-        if grep -q "^GEMINI_API_KEY=" "$project_env" 2>/dev/null; then
-            print_success "GEMINI_API_KEY найден"
-            has_keys=true
-        fi
-
-        if grep -q "^OPENAI_API_KEY=" "$project_env" 2>/dev/null; then
-            print_success "OPENAI_API_KEY найден"
-            has_keys=true
-        fi
-
-        if grep -q "^XAI_API_KEY=" "$project_env" 2>/dev/null; then
-            print_success "XAI_API_KEY найден"
-            has_keys=true
-        fi
+        local key
+        for key in GEMINI_API_KEY OPENAI_API_KEY XAI_API_KEY; do
+            if env_has_key "$key" "$project_env"; then
+                print_success "$key найден"
+                has_keys=true
+            fi
+        done
 
         if [[ "$has_keys" == "false" ]]; then
             echo ""
@@ -226,9 +390,7 @@ configure_claude() {
     # Проверить существующий конфиг
     if [[ -f "$claude_config" ]]; then
         print_warning "Claude MCP config уже существует: $claude_config"
-        read -p "Создать резервную копию и обновить? (y/n) " -n 1 -r
-        echo
-        if [[ $REPLY =~ ^[Yy]$ ]]; then
+        if confirm "Создать резервную копию и обновить?"; then
             cp "$claude_config" "${claude_config}.backup.$(date +%Y%m%d_%H%M%S)"
             print_success "Резервная копия создана"
         else
@@ -339,19 +501,100 @@ show_usage_instructions() {
     echo ""
 }
 
+# ----------------------------------------------------------------------------
+# Справка
+# ----------------------------------------------------------------------------
+
+show_usage() {
+    cat << EOF
+Использование: $0 [опции]
+
+Опции:
+  -h, --help              Показать эту справку
+  -y, --yes               Не задавать вопросов (переустановка, замена конфига)
+  --bundle FILE           Собрать офлайн-бандл (git bundle + wheelhouse) в FILE и выйти
+  --offline FILE          Установить из офлайн-бандла без доступа к сети
+
+Переменные окружения:
+  ZEN_REPO                Репозиторий Zen MCP (по умолчанию GitHub)
+  ZEN_INSTALL_DIR         Каталог установки (по умолчанию ~/.zen-mcp-server)
+  PROJECT_ROOT            Проект, на .env которого ссылается установка
+
+Примеры:
+  $0                                        # Установка из GitHub и PyPI
+  $0 --bundle dist/zen-mcp-bundle.tar.gz    # Собрать бандл (нужна сеть)
+  $0 --offline zen-mcp-bundle.tar.gz --yes  # Установка на раннере без сети
+
+EOF
+}
+
+# Опция с путём к бандлу: без значения под set -u скрипт упал бы на $2
+require_file_argument() {
+    if [[ $# -lt 2 || -z "$2" || "$2" == -* ]]; then
+        print_error "Опция $1 требует путь к файлу бандла"
+        show_usage
+        exit 1
+    fi
+}
+
 # ----------------------------------------------------------------------------
 # Главная функция
 # ----------------------------------------------------------------------------
 
 main() {
+    local bundle_output=""
+    local offline_bundle=""
+
+    # Парсинг аргументов
+    while [[ $# -gt 0 ]]; do
+        case $1 in
+            -h|--help)
+                show_usage
+                exit 0
+                ;;
+            -y|--yes)
+                ASSUME_YES=true
+                shift
+                ;;
+            --bundle)
+                require_file_argument "$@"
+                bundle_output="$2"
+                shift 2
+                ;;
+            --offline)
+                require_file_argument "$@"
+                offline_bundle="$(cd "$(dirname "$2")" && pwd)/$(basename "$2")"
+                shift 2
+                ;;
+            *)
+                print_error "Неизвестная опция: $1"
+                show_usage
+                exit 1
+                ;;
+        esac
+    done
+
+    # Абсолютный путь до любых cd: относительная ссылка .env указывала бы
+    # внутрь $ZEN_INSTALL_DIR
+    PROJECT_ROOT="$(cd "${PROJECT_ROOT:-.}" && pwd)"
+
     print_header "Установка Zen MCP Server для AnyGen"
 
     # Проверки
     check_python
     check_git
 
+    if [[ -n "$bundle_output" ]]; then
+        create_bundle "$bundle_output"
+        exit 0
+    fi
+
     # Установка
-    install_zen_mcp
+    if [[ -n "$offline_bundle" ]]; then
+        install_zen_mcp_offline "$offline_bundle"
+    else
+        install_zen_mcp
+    fi
     configure_env
     configure_claude
 
@@ -129,6 +129,54 @@ run_behave_tests() {
     fi
 }
 
+# ----------------------------------------------------------------------------
+# Запуск через прогретый демон
+# ----------------------------------------------------------------------------
+
+run_daemon_tests() {
+    print_header "Запуск BDD тестов через демон behave"
+
+    cd "$PROJECT_ROOT"
+
+    # Поднять демон, если он ещё не запущен
+    if ! uv run python -m features.support.test_daemon ping &> /dev/null; then
+        print_info "Запуск демона behave..."
+        nohup uv run python -m features.support.test_daemon serve &> /dev/null &
+        for _ in $(seq 1 50); do
+            uv run python -m features.support.test_daemon ping &> /dev/null && break
+            sleep 0.1
+        done
+    fi
+
+    uv run python -m features.support.test_daemon run -- features "$@"
+}
+
+# ----------------------------------------------------------------------------
+# Непрерывный режим
+# ----------------------------------------------------------------------------
+
+run_watch_mode() {
+    print_header "Непрерывный режим: перезапуск при изменении файлов"
+
+    cd "$PROJECT_ROOT"
+
+    uv run python -m features.support.watch_mode -- "$@"
+}
+
+# ----------------------------------------------------------------------------
+# Шардированный прогон
+# ----------------------------------------------------------------------------
+
+run_sharded_tests() {
+    local workers="$1"
+    shift
+    print_header "Шардированный прогон BDD тестов ($workers воркеров)"
+
+    cd "$PROJECT_ROOT"
+
+    uv run python -m features.support.scheduler --workers "$workers" -- "$@"
+}
+
 # ----------------------------------------------------------------------------
 # Генерация отчёта покрытия
 # ----------------------------------------------------------------------------
@@ -163,6 +211,10 @@ show_usage() {
   -t, --tags TAGS         Запустить только тесты с указанными тегами
   -f, --feature FEATURE   Запустить конкретный feature файл
   -v, --verbose           Подробный вывод
+  -d, --daemon            Запустить через прогретый демон behave
+  -w, --watch             Перезапускать затронутые сценарии при изменении файлов
+  -s, --shards N          Разделить прогон на N воркеров по истории длительностей
+  --commands MODE         Режим внешних команд: live, record или replay
 
 Примеры:
   $0                                    # Запустить все тесты
@@ -171,6 +223,10 @@ show_usage() {
   $0 --feature codev_installation       # Только установка
   $0 --tags @smoke                      # Только smoke тесты
   $0 --verbose                          # Подробный вывод
+  $0 --daemon --tags @smoke             # Повторный прогон через демон
+  $0 --watch                            # Непрерывный режим
+  $0 --shards 4                         # Параллельный прогон на 4 воркерах
+  $0 --commands replay                  # Без запуска mcp, по записанным fixtures
 
 EOF
 }
@@ -182,6 +238,9 @@ EOF
 main() {
     local install_deps=false
     local run_coverage=false
+    local use_daemon=false
+    local use_watch=false
+    local shards=""
     local behave_extra_args=()
 
     # Парсинг аргументов
@@ -211,6 +270,22 @@ main() {
                 behave_extra_args+=("--verbose")
                 shift
                 ;;
+            -d|--daemon)
+                use_daemon=true
+                shift
+                ;;
+            -w|--watch)
+                use_watch=true
+                shift
+                ;;
+            -s|--shards)
+                shards="$2"
+                shift 2
+                ;;
+            --commands)
+                export CODEV_COMMANDS="$2"
+                shift 2
+                ;;
             *)
                 print_error "Неизвестная опция: $1"
                 show_usage
@@ -233,6 +308,12 @@ main() {
     # Запуск тестов
     if [[ "$run_coverage" == "true" ]]; then
         generate_coverage_report
+    elif [[ -n "$shards" ]]; then
+        run_sharded_tests "$shards" "${behave_extra_args[@]}"
+    elif [[ "$use_watch" == "true" ]]; then
+        run_watch_mode "${behave_extra_args[@]}"
+    elif [[ "$use_daemon" == "true" ]]; then
+        run_daemon_tests "${behave_extra_args[@]}"
     else
         run_behave_tests "${behave_extra_args[@]}"
     fi